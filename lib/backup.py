@@ -21,13 +21,24 @@
 
 """
 This library creates a zip file with the configuration of SmartHomeNG.
+
+Backups are created incrementally: A manifest (var/backup/backup_manifest.json) holds the size,
+modification time and content hash of every file of the last backup. Only files, that have changed,
+are read and compressed again. The compressed data is kept as deduplicated objects (keyed by the
+content hash) in var/backup/objects and copied into the zip file without recompressing it.
+If the configuration has not changed at all, the existing zip file is reused.
 """
 
 import copy
 import glob
+import hashlib
+import json
 import logging
+import threading
 import zipfile
+import zlib
 import shutil
+import sys
 import time
 import os
 from datetime import datetime
@@ -35,6 +46,13 @@ from lib.shtime import Shtime
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_VERSION = 1
+RAW_COPY_PYTHON_VERSIONS = ((3, 8), (3, 13))    # Python versions, copying compressed data into zip-archives is tested with
+
+_backup_lock = threading.Lock()
+_backup_thread = None
+_progress = {'state': 'idle', 'done': 0, 'total': 0, 'changed': 0, 'filename': '', 'duration': 0}
+
 
 def get_backupdate():
     year = str(datetime.today().year)
@@ -86,6 +104,9 @@ def create_backup(conf_base_dir, base_dir, filename_with_timestamp=False, before
     This function can be called without an existing sh object (backup via commandline option), so it may nor
     use any references via 'sh.'
 
+    Only files, that have changed since the last backup, are compressed. If the configuration has not changed
+    and the zip file of the last backup still exists, it is not written again.
+
     :param conf_base_dir: basedir for configuration
                           (should be 'extern_conf_dir' to reflect --config_dir option)
     :param base_dir:      var-directory. If empty or ommited, conf_base_dir/var is used.
@@ -93,16 +114,137 @@ def create_backup(conf_base_dir, base_dir, filename_with_timestamp=False, before
     :return:
     """
 
-    make_backup_directories(base_dir)
-    backup_dir = os.path.join(base_dir, 'var','backup')
+    with _backup_lock:
+        start = time.perf_counter()
+        make_backup_directories(base_dir)
+        backup_dir = os.path.join(base_dir, 'var','backup')
+
+        backup_filename = 'shng_config_backup'
+        if before_restore:
+            backup_filename += '_before_restore'
+        if filename_with_timestamp:
+            backup_filename += '_' + get_backupdate() + '_' + get_backuptime()
+        backup_filename += '.zip'
+        zip_filename = os.path.join(backup_dir, backup_filename)
+
+        filelist = get_backup_filelist(conf_base_dir)
+        _set_progress(state='scanning', done=0, total=len(filelist), changed=0, filename=zip_filename, duration=0)
+
+        manifest = _read_manifest(backup_dir)
+        objects_dir = os.path.join(backup_dir, 'objects')
+        files = {}
+        changed = 0
+        for index, (source_filename, arcname) in enumerate(filelist):
+            try:
+                entry = _get_manifest_entry(manifest['files'].get(arcname), source_filename, objects_dir)
+            except OSError as e:
+                logger.warning(f"File {source_filename} not backed up: {e}")
+                continue
+            if entry != manifest['files'].get(arcname):
+                changed += 1
+            files[arcname] = entry
+            _set_progress(done=index + 1, changed=changed)
+
+        fingerprint = hashlib.sha256(json.dumps([[arcname, files[arcname]] for arcname in sorted(files)]).encode()).hexdigest()
+        if changed == 0 and len(files) == len(manifest['files']) and os.path.isfile(zip_filename) and \
+           manifest['zips'].get(backup_filename) == fingerprint:
+            logger.info(f"Configuration unchanged since last backup - reusing {zip_filename}")
+        else:
+            # create new zip file
+            _set_progress(state='writing')
+            tmp_filename = zip_filename + '.tmp'
+            with zipfile.ZipFile(tmp_filename, mode='w', compression=zipfile.ZIP_DEFLATED) as backupzip:
+                for source_filename, arcname in filelist:
+                    if arcname in files:
+                        _write_object(backupzip, source_filename, arcname, files[arcname], objects_dir)
+                zipped_files = backupzip.namelist()
+            os.replace(tmp_filename, zip_filename)
+            logger.info("Zipped files: {}".format(zipped_files))
+
+        manifest['files'] = files
+        # only zip files without timestamp can be reused, fingerprints of zip files that no longer exist are dropped
+        manifest['zips'] = {name: zip_fingerprint for name, zip_fingerprint in manifest['zips'].items()
+                            if os.path.isfile(os.path.join(backup_dir, name))}
+        if filename_with_timestamp:
+            manifest['zips'].pop(backup_filename, None)
+        else:
+            manifest['zips'][backup_filename] = fingerprint
+        _write_manifest(backup_dir, manifest)
+        _remove_unused_objects(objects_dir, files)
+
+        #logger.warning("- backup_dir = {}".format(backup_dir))
+
+        shtime = Shtime.get_instance()
+        if shtime == None:
+            shtime = Shtime(None)
+
+        now = shtime.now()
+        logger.info("get_backup_timestamp: now = '{}'".format(now))
+
+        fd = open(os.path.join(backup_dir, 'last_backup'), 'w+', encoding='UTF-8')
+        fd.write("%s" % now)
+        fd.close()
+
+        duration = round(time.perf_counter() - start, 3)
+        _set_progress(state='done', duration=duration)
+        logger.info(f"Backup {zip_filename} created in {duration} sec ({changed} of {len(files)} files changed)")
+
+    return zip_filename
+
+
+def start_backup(conf_base_dir, base_dir, filename_with_timestamp=False):
+    """
+    Create a backup in a background thread
+
+    The progress can be read with get_backup_progress()
+
+    :param conf_base_dir: basedir for configuration
+    :param base_dir:      var-directory
+
+    :return: False, if a backup is already running
+    :rtype: bool
+    """
+    global _backup_thread
+
+    if _backup_thread is not None and _backup_thread.is_alive():
+        return False
+
+    def _create():
+        try:
+            create_backup(conf_base_dir, base_dir, filename_with_timestamp)
+        except Exception as e:
+            logger.exception(f"Creating backup failed: {e}")
+            _set_progress(state='error')
+
+    _set_progress(state='started', done=0, total=0, changed=0)
+    _backup_thread = threading.Thread(target=_create, name='config_backup', daemon=True)
+    _backup_thread.start()
+    return True
+
 
-    backup_filename = 'shng_config_backup'
-    if before_restore:
-        backup_filename += '_before_restore'
-    if filename_with_timestamp:
-        backup_filename += '_' + get_backupdate() + '_' + get_backuptime()
-    backup_filename += '.zip'
+def get_backup_progress():
+    """
+    Returns the progress of the running (or last) backup
+
+    :return: dict with the keys state ('idle', 'started', 'scanning', 'writing', 'done', 'error'), done, total, changed, filename and duration
+    :rtype: dict
+    """
+    return dict(_progress)
+
+
+def _set_progress(**kwargs):
+    _progress.update(kwargs)
+
+
+def get_backup_filelist(conf_base_dir):
+    """
+    Returns the list of files, that are part of a backup of the configuration
+
+    :param conf_base_dir: basedir for configuration
 
+    :return: list of tuples (filename, name in the zip-archive)
+    :rtype: list
+    """
     etc_dir = os.path.join(conf_base_dir, 'etc')
     items_dir = os.path.join(conf_base_dir, 'items')
     logic_dir = os.path.join(conf_base_dir, 'logics')
@@ -110,76 +252,164 @@ def create_backup(conf_base_dir, base_dir, filename_with_timestamp=False, before
     structs_dir = os.path.join(conf_base_dir, 'structs')
     uf_dir = os.path.join(conf_base_dir, 'functions')
 
-
-    # create new zip file
-    #backupzip = zipfile.ZipFile(backup_dir + os.path.sep + backup_filename, mode='w')
-    backupzip = zipfile.ZipFile(backup_dir + os.path.sep + backup_filename, mode='w', compression=zipfile.ZIP_DEFLATED)
-    #backupzip = zipfile.ZipFile(backup_dir + os.path.sep + backup_filename, mode='w', compression=zipfile.ZIP_STORED)
+    filelist = []
 
     # backup files from /etc
-    #logger.warning("- etc_dir = {}".format(etc_dir))
     source_dir = etc_dir
     arc_dir = 'etc'
-    backup_file(backupzip, source_dir, arc_dir, 'holidays.yaml')
-    backup_file(backupzip, source_dir, arc_dir, 'logging.yaml')
-    backup_file(backupzip, source_dir, arc_dir, 'logic.yaml')
-    backup_file(backupzip, source_dir, arc_dir, 'module.yaml')
-    backup_file(backupzip, source_dir, arc_dir, 'plugin.yaml')
-    backup_file(backupzip, source_dir, arc_dir, 'smarthome.yaml')
-    backup_file(backupzip, source_dir, arc_dir, 'admin.yaml')
-
-    backup_file(backupzip, source_dir, arc_dir, 'struct.yaml')
+    for fn in ['holidays.yaml', 'logging.yaml', 'logic.yaml', 'module.yaml', 'plugin.yaml', 'smarthome.yaml', 'admin.yaml', 'struct.yaml']:
+        backup_file(filelist, source_dir, arc_dir, fn)
     struct_files = glob.glob(os.path.join( etc_dir, 'struct_*.yaml'))
     for pn in struct_files:
         fn = os.path.split(pn)[1]
-        backup_file(backupzip, source_dir, arc_dir, fn)
+        backup_file(filelist, source_dir, arc_dir, fn)
 
     # backup certificate files from /etc
-    backup_directory(backupzip, etc_dir, '.cer')
-    backup_directory(backupzip, etc_dir, '.pem')
-
-    backup_directory(backupzip, etc_dir, '.key')
+    backup_directory(filelist, etc_dir, '.cer')
+    backup_directory(filelist, etc_dir, '.pem')
+    backup_directory(filelist, etc_dir, '.key')
 
     # backup files from /items
-    #logger.warning("- items_dir = {}".format(items_dir))
-    backup_directory(backupzip, items_dir)
+    backup_directory(filelist, items_dir)
 
     # backup files from /logic
-    #logger.warning("- logic_dir = {}".format(logic_dir))
-    backup_directory(backupzip, logic_dir, '.py')
-    backup_directory(backupzip, logic_dir, '.txt')
+    backup_directory(filelist, logic_dir, '.py')
+    backup_directory(filelist, logic_dir, '.txt')
 
     # backup files from /scenes
-    #logger.warning("- scenes_dir = {}".format(scenes_dir))
-    backup_directory(backupzip, scenes_dir, '.yaml')
-    backup_directory(backupzip, scenes_dir, '.conf')
+    backup_directory(filelist, scenes_dir, '.yaml')
+    backup_directory(filelist, scenes_dir, '.conf')
 
     # backup files from /structs
-    #logger.warning("- structs_dir = {}".format(structs_dir))
-    backup_directory(backupzip, structs_dir, '.yaml')
+    backup_directory(filelist, structs_dir, '.yaml')
 
     # backup files from /functions
-    #logger.warning("- uf_dir = {}".format(uf_dir))
-    backup_directory(backupzip, uf_dir, '.*')
+    backup_directory(filelist, uf_dir, '.*')
+
+    return filelist
+
+
+def _read_manifest(backup_dir):
+    try:
+        with open(os.path.join(backup_dir, 'backup_manifest.json'), encoding='UTF-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': MANIFEST_VERSION, 'files': {}, 'zips': {}}
 
-    zipped_files = backupzip.namelist()
-    logger.info("Zipped files: {}".format(zipped_files))
-    backupzip.close()
 
-    #logger.warning("- backup_dir = {}".format(backup_dir))
+def _write_manifest(backup_dir, manifest):
+    filename = os.path.join(backup_dir, 'backup_manifest.json')
+    try:
+        with open(filename + '.tmp', 'w', encoding='UTF-8') as f:
+            json.dump(manifest, f)
+        os.replace(filename + '.tmp', filename)
+    except OSError as e:
+        logger.warning(f"Backup manifest {filename} could not be written: {e}")
+
+
+def _object_filename(objects_dir, digest):
+    return os.path.join(objects_dir, digest[:2], digest)
+
+
+def _get_manifest_entry(entry, source_filename, objects_dir):
+    """
+    Returns the manifest entry [size, mtime_ns, sha256, crc32, compressed size] of a file
+
+    The file is only read (and compressed), if the size or the modification time have changed
+    or the compressed object does not exist.
+    """
+    st = os.stat(source_filename)
+    if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns and \
+       os.path.isfile(_object_filename(objects_dir, entry[2])):
+        return entry
+
+    with open(source_filename, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    object_filename = _object_filename(objects_dir, digest)
+    if os.path.isfile(object_filename):
+        compress_size = os.path.getsize(object_filename)
+    else:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        os.makedirs(os.path.dirname(object_filename), exist_ok=True)
+        with open(object_filename + '.tmp', 'wb') as f:
+            f.write(compressed)
+        os.replace(object_filename + '.tmp', object_filename)
+        compress_size = len(compressed)
+    return [len(data), st.st_mtime_ns, digest, zlib.crc32(data), compress_size]
+
+
+def _raw_copy_supported(backupzip):
+    """
+    Returns True, if compressed data can be copied into the zip-archive without recompressing it
 
-    shtime = Shtime.get_instance()
-    if shtime == None:
-        shtime = Shtime(None)
+    Copying uses internals of zipfile.ZipFile, which are not part of its API. It is only used on
+    the Python versions it has been tested with and if all needed internals exist.
+    """
+    if not RAW_COPY_PYTHON_VERSIONS[0] <= sys.version_info[:2] <= RAW_COPY_PYTHON_VERSIONS[1]:
+        return False
+    for attr in ['fp', 'filelist', 'NameToInfo', 'start_dir', '_writecheck', '_didModify']:
+        if not hasattr(backupzip, attr):
+            return False
+    return hasattr(zipfile.ZipInfo, 'FileHeader')
 
-    now = shtime.now()
-    logger.info("get_backup_timestamp: now = '{}'".format(now))
 
-    fd = open(os.path.join(backup_dir, 'last_backup'), 'w+', encoding='UTF-8')
-    fd.write("%s" % now)
-    fd.close()
+def _write_object(backupzip, source_filename, arcname, entry, objects_dir):
+    """
+    Copy the compressed data of a file from the object store into the zip-archive (without recompressing it)
+
+    Falls back to ZipFile.write(), if copying is not supported or fails before anything is written.
+    """
+    size, mtime_ns, digest, crc, compress_size = entry
+    if size >= zipfile.ZIP64_LIMIT or compress_size >= zipfile.ZIP64_LIMIT or not _raw_copy_supported(backupzip):
+        backupzip.write(source_filename, arcname=arcname)
+        return
+    try:
+        with open(_object_filename(objects_dir, digest), 'rb') as f:
+            compressed = f.read()
+        zinfo = zipfile.ZipInfo.from_file(source_filename, arcname)
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.file_size = size
+        zinfo.compress_size = len(compressed)
+        zinfo.CRC = crc
+        zinfo.header_offset = backupzip.fp.tell()
+        backupzip._writecheck(zinfo)
+        header = zinfo.FileHeader(False)
+    except Exception as e:
+        logger.info(f"Copying compressed data of {arcname} not possible ({e}), compressing the file")
+        backupzip.write(source_filename, arcname=arcname)
+        return
+    # the data is already compressed, so the local header and the data are written directly
+    # (this is what ZipFile.write() does after compressing the data)
+    backupzip._didModify = True
+    backupzip.fp.write(header)
+    backupzip.fp.write(compressed)
+    backupzip.filelist.append(zinfo)
+    backupzip.NameToInfo[zinfo.filename] = zinfo
+    backupzip.start_dir = backupzip.fp.tell()
+
 
-    return os.path.join(backup_dir, backup_filename)
+def _remove_unused_objects(objects_dir, files):
+    """
+    Remove compressed objects, which are not part of the last backup
+    """
+    used = set(entry[2] for entry in files.values())
+    if not os.path.isdir(objects_dir):
+        return
+    for subdir in os.listdir(objects_dir):
+        path = os.path.join(objects_dir, subdir)
+        if not os.path.isdir(path):
+            continue
+        for digest in os.listdir(path):
+            if digest not in used:
+                try:
+                    os.remove(os.path.join(path, digest))
+                except OSError:
+                    pass
 
 
 def get_lastbackuptime():
@@ -202,37 +432,37 @@ def get_lastbackuptime():
 
 
 
-def backup_file(backupzip, source_dir, arc_dir, filename):
+def backup_file(filelist, source_dir, arc_dir, filename):
     """
-    Backup one file to a zip-archive
+    Add one file to the list of files to backup
 
-    :param backupzip: Name of the zip-archive (full pathname)
+    :param filelist: List of tuples (filename, name in the zip-archive)
     :param source_dir: Directory where the file to backup is located
     :param arc_dir: Name of destination directory in the zip-archive
     :param filename: Name of the file to backup
     """
     if not filename.startswith('.'):
         if os.path.isfile(os.path.join(source_dir, filename)):
-            #logger.debug("Zipping file: {}".format(filename))
-            backupzip.write(os.path.join(source_dir, filename), arcname=os.path.join(arc_dir, filename))
+            filelist.append((os.path.join(source_dir, filename), os.path.join(arc_dir, filename)))
     return
 
 
-def backup_directory(backupzip, source_dir, extenstion='.yaml'):
+def backup_directory(filelist, source_dir, extenstion='.yaml'):
     """
-    Backup all files with a certain extension from the given directory to a zip-archive
+    Add all files with a certain extension from the given directory to the list of files to backup
 
-    :param backupzip: Name of the zip-archive (full pathname)
+    :param filelist: List of tuples (filename, name in the zip-archive)
     :param source_dir: Directory where the yaml-files to backup are located
     :param extenstion: Extension of the files to backup (default is .yaml)
     """
     path = source_dir.split(os.path.sep)
     dir = path[len(path)-1]
     arc_dir = dir + os.path.sep
-    files = []
-    for filename in os.listdir(source_dir):
+    if not os.path.isdir(source_dir):
+        return
+    for filename in sorted(os.listdir(source_dir)):
         if filename.endswith(extenstion) or extenstion == '.*':
-            backup_file(backupzip, source_dir, arc_dir, filename)
+            backup_file(filelist, source_dir, arc_dir, filename)
 
     return
 
@@ -341,10 +571,14 @@ def restore_file(restorezip, arc_dir, filename, dest_dir, overwrite=False):
         logger.error("File {} not restored - it already exists at destination {}".format(filename, dest_dir))
         return False
 
+    zip_info = restorezip.getinfo(os.path.join(arc_dir, filename))
+    if _file_unchanged(dest_filename, zip_info):
+        logger.debug("File {} in {} is unchanged - not restored".format(filename, dest_dir))
+        return None
+
     logger.info("Restoring file {} to {} overwrite={}".format(filename, dest_dir, overwrite))
 
     # copy file (taken from zipfile's extract)
-    zip_info = restorezip.getinfo(os.path.join(arc_dir, filename))
     if not(zip_info.filename[-1] == '/'):
         zip_info.filename = os.path.basename(zip_info.filename)
     restorezip.extract(zip_info, path=dest_dir, pwd=None)
@@ -354,7 +588,23 @@ def restore_file(restorezip, arc_dir, filename, dest_dir, overwrite=False):
     os.utime(os.path.join(dest_dir, filename), (date_time, date_time))
 
 
-    return
+    return True
+
+
+def _file_unchanged(filename, zip_info):
+    """
+    Returns True, if the file has the same content as the member of the zip-archive (same size and crc32)
+    """
+    try:
+        if os.path.getsize(filename) != zip_info.file_size:
+            return False
+        crc = 0
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                crc = zlib.crc32(chunk, crc)
+        return crc == zip_info.CRC
+    except OSError:
+        return False
 
 
 def restore_directory(restorezip, arc_dir, dest_dir, overwrite=False):
@@ -367,9 +617,16 @@ def restore_directory(restorezip, arc_dir, dest_dir, overwrite=False):
     :param overwrite: Overwrite file in destination, if it already exists
     """
     logger.info(f"- Restoring directory {dest_dir}")
+    restored = 0
+    unchanged = 0
     for fn in restorezip.namelist():
         if fn.startswith(arc_dir+'/'):
-            restore_file(restorezip, arc_dir, os.path.basename(fn), dest_dir, overwrite)
+            result = restore_file(restorezip, arc_dir, os.path.basename(fn), dest_dir, overwrite)
+            if result is None:
+                unchanged += 1
+            elif result:
+                restored += 1
+    logger.info(f"- Restored {restored} files to {dest_dir}, {unchanged} files unchanged")
     return
 
 
@@ -33,6 +33,7 @@ import logging
 import collections
 import keyword
 import os
+import time
 
 from lib.utils import Utils
 import lib.shyaml as shyaml
@@ -96,6 +97,7 @@ def parse_itemsdir(itemsdir, item_conf, addfilenames=False, struct_dict={}):
 
     '''
     logger.info("parse_itemsdir: Beginning to parse items directory {}".format(itemsdir))
+    start = time.perf_counter()
     for item_file in sorted(os.listdir(itemsdir)):
         if not item_file.startswith('.'):
             if item_file.endswith(CONF_FILE) or item_file.endswith(YAML_FILE):
@@ -107,7 +109,10 @@ def parse_itemsdir(itemsdir, item_conf, addfilenames=False, struct_dict={}):
                     except Exception as e:
                         logger.exception("Problem reading {0}: {1}".format(item_file, e))
                         continue
-    logger.info("parse_itemsdir: Finished parsing items directory {}".format(itemsdir))
+    logger.info("parse_itemsdir: Finished parsing items directory {} in {:.0f} ms".format(itemsdir, (time.perf_counter()-start)*1000))
+    if struct_stats['instantiations']:
+        logger.info("parse_itemsdir: {} struct instantiations from {} templates in {:.0f} ms".format(struct_stats['instantiations'], struct_stats['templates_built'], struct_stats['duration']*1000))
+    clear_struct_templates()
     return item_conf
 
 
@@ -148,7 +153,11 @@ def remove_keys(ydata, func, remove=[REMOVE_ATTR], level=0, msg=None, key_prefix
     :type func: function
     :type level: int
 
+    :return: number of keys removed with a warning message
+    :rtype: int
+
     '''
+    removed = 0
     try:
         level_keys = list(ydata.keys())
         for key in level_keys:
@@ -161,11 +170,14 @@ def remove_keys(ydata, func, remove=[REMOVE_ATTR], level=0, msg=None, key_prefix
             if key_remove:
                 if msg:
                     logger.warning(msg.format(key_prefix+key_str))
+                    removed += 1
                 ydata.pop(key)
             elif key_dict:
-                remove_keys(ydata[key], func, remove, level+1, msg, key_prefix+key_str+'.')
+                removed += remove_keys(ydata[key], func, remove, level+1, msg, key_prefix+key_str+'.')
     except Exception as e:
         logger.error("Problem removing key from '{}', probably invalid YAML file: {}".format(str(ydata), e))
+        removed += 1
+    return removed
 
 
 
@@ -177,7 +189,7 @@ def remove_comments(ydata, filename=''):
     :type ydata: OrderedDict
 
     '''
-    remove_keys(ydata, lambda k: k.startswith('comment'), [REMOVE_ATTR])
+    return remove_keys(ydata, lambda k: k.startswith('comment'), [REMOVE_ATTR])
 
 
 def remove_digits(ydata, filename=''):
@@ -188,7 +200,7 @@ def remove_digits(ydata, filename=''):
     :type ydata: OrderedDict
 
     '''
-    remove_keys(ydata, lambda k: k[0] in digits, [REMOVE_ATTR, REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': item starts with digits")
+    return remove_keys(ydata, lambda k: k[0] in digits, [REMOVE_ATTR, REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': item starts with digits")
 
 
 def remove_reserved(ydata, filename=''):
@@ -199,7 +211,7 @@ def remove_reserved(ydata, filename=''):
     :type ydata: OrderedDict
 
     '''
-    remove_keys(ydata, lambda k: k in reserved, [REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': item using reserved word set/get")
+    return remove_keys(ydata, lambda k: k in reserved, [REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': item using reserved word set/get")
 
 
 def remove_keyword(ydata, filename=''):
@@ -210,7 +222,7 @@ def remove_keyword(ydata, filename=''):
     :type ydata: OrderedDict
 
     '''
-    remove_keys(ydata, lambda k: keyword.iskeyword(k), [REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': item using reserved Python keyword")
+    return remove_keys(ydata, lambda k: keyword.iskeyword(k), [REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': item using reserved Python keyword")
 
 
 def remove_invalid(ydata, filename=''):
@@ -222,7 +234,7 @@ def remove_invalid(ydata, filename=''):
 
     '''
     valid_chars = valid_item_chars + valid_attr_chars
-    remove_keys(ydata, lambda k: True if True in [True for i in range(len(k)) if k[i] not in valid_chars] else False, [REMOVE_ATTR, REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': Invalid character. Valid characters are: " + str(valid_chars))
+    return remove_keys(ydata, lambda k: True if True in [True for i in range(len(k)) if k[i] not in valid_chars] else False, [REMOVE_ATTR, REMOVE_PATH], msg="Problem parsing '{}' in file '"+filename+"': Invalid character. Valid characters are: " + str(valid_chars))
 
 
 struct_merging_active = False
@@ -488,6 +500,65 @@ def set_attr_for_subtree(subtree, attr, value, indent=0):
     return
 
 
+# templates of structs with the instance already filled in, keyed by (struct_name, instance)
+_struct_templates = {}
+# counters for struct instantiation while loading the item tree (logged by parse_itemsdir)
+struct_stats = {'instantiations': 0, 'templates_built': 0, 'duration': 0.0}
+
+
+def _copy_tree(tree):
+    '''
+    Copy a configuration (sub)tree
+
+    Only dicts and lists are copied, all other values are immutable in a configuration tree.
+    This is much faster than copy.deepcopy()
+
+    :param tree: tree to copy
+    :return: copy of the tree
+    '''
+    if isinstance(tree, dict):
+        result = tree.__class__()
+        for key, value in tree.items():
+            if isinstance(value, (dict, list)):
+                value = _copy_tree(value)
+            result[key] = value
+        return result
+    if isinstance(tree, list):
+        return [_copy_tree(value) if isinstance(value, (dict, list)) else value for value in tree]
+    return tree
+
+
+def get_struct_template(struct_name, struct, instance):
+    '''
+    Return a copy of a (resolved) struct with the instance filled in
+
+    The struct is copied and the '@instance' keys are replaced only once for each
+    struct and instance, further calls return a copy of the cached template.
+
+    :param struct_name: name of the struct
+    :param struct: definition of the struct (from struct_dict)
+    :param instance: instance to fill in
+    :return: struct template
+    :rtype: OrderedDict
+    '''
+    key = (struct_name, instance)
+    cached = _struct_templates.get(key)
+    if cached is None or cached[0] is not struct:
+        template = copy.deepcopy(struct)
+        replace_struct_instance(struct_name, template, instance)
+        cached = _struct_templates[key] = (struct, template)
+        struct_stats['templates_built'] += 1
+    struct_stats['instantiations'] += 1
+    return _copy_tree(cached[1])
+
+
+def clear_struct_templates():
+    '''
+    Clear the cached struct templates (after the item tree has been loaded)
+    '''
+    _struct_templates.clear()
+
+
 def add_struct_to_item_template(path, struct_name, template, struct_dict, instance):
     '''
     Add the referenced struct to the items_template subtree
@@ -500,7 +571,9 @@ def add_struct_to_item_template(path, struct_name, template, struct_dict, instan
 
     :return:
     '''
-    logger.info("add_struct_to_item_template: path (parent)={}, struct_name={}, template={}".format(path, struct_name, dict(template)))
+    start = time.perf_counter()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("add_struct_to_item_template: path (parent)={}, struct_name={}, template={}".format(path, struct_name, dict(template)))
     struct = struct_dict.get(struct_name, None)
     if struct is None:
         # no struct/template with this name
@@ -513,16 +586,12 @@ def add_struct_to_item_template(path, struct_name, template, struct_dict, instan
         # add struct/template to temporary item(template) tree
         #logger.debug("- add_struct_to_item_template: struct_dict = {}".format(dict(struct_dict)))
         #logger.debug("- add_struct_to_item_template: struct '{}' to item '{}'".format(struct_name, path))
-        nested_put(template, path, copy.deepcopy(struct))
-        if instance != '' or True:
-            # add instance to items added by template struct
-            subtree = nested_get(template, path)
-            # logger.info("add_struct_to_item_template: Adding 'instance: {}' to template for subtree '{}'".format(instance, path))
-            # add instance name to attributes which carry '@instance'
-            logger.debug("- add_struct_to_item_template: Add instance={} to subtree={}".format(instance, subtree))
-            replace_struct_instance(path, subtree, instance)
-
-    logger.info("- add_struct_to_item_template: - after add - template={}".format(dict(template)))
+        # add struct/template with instance name added to attributes which carry '@instance'
+        nested_put(template, path, get_struct_template(struct_name, struct, instance))
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("- add_struct_to_item_template: - after add - template={}".format(dict(template)))
+    struct_stats['duration'] += time.perf_counter() - start
     return
 
 
@@ -605,14 +674,8 @@ def parse_yaml(filename, config=None, addfilenames=False, parseitems=False, stru
     if config is None:
         config = collections.OrderedDict()
 
-    items = shyaml.yaml_load(filename, ordered=True)
+    items = shyaml.yaml_load_cached(filename, ordered=True, process=_clean_yaml, cache_key='config')
     if items is not None:
-        remove_comments(items, filename)
-        remove_digits(items, filename)
-        remove_reserved(items, filename)
-        remove_keyword(items, filename)
-        remove_invalid(items, filename)
-
         if addfilenames:
             #logger.debug("parse_yaml: Add filename = {} to items".format(os.path.basename(filename)))
             _add_filenames_to_config(items, os.path.basename(filename))
@@ -634,6 +697,27 @@ def parse_yaml(filename, config=None, addfilenames=False, parseitems=False, stru
     return config
 
 
+def _clean_yaml(items, filename):
+    '''
+    Removes comments and invalid entries from a freshly loaded configuration file
+
+    :param items: configuration tree loaded from the file
+    :param filename: name of the configuration file
+    :type items: OrderedDict
+    :type filename: str
+
+    :return: True, if nothing had to be removed with a warning (result may be cached)
+    :rtype: bool
+    '''
+    remove_comments(items, filename)
+    warnings = remove_digits(items, filename)
+    warnings += remove_reserved(items, filename)
+    warnings += remove_keyword(items, filename)
+    warnings += remove_invalid(items, filename)
+    # do not cache files with errors, so the warnings are logged again on the next start
+    return warnings == 0
+
+
 def _add_filenames_to_config(items, filename, level=0):
     """
     Adds the name of the config file to the config items
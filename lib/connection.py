@@ -45,6 +45,7 @@ logger = logging.getLogger(__name__)
 # =====================================================================================
 
 import lib.utils
+from lib.network import Framer
 import sys
 
 dep_id_list = []
@@ -528,7 +529,7 @@ class Stream(Base):
         Base.__init__(self, monitor=monitor)
         self.connected = False
         self.address = address
-        self.inbuffer = bytearray()
+        self._framer = Framer(include_terminator=False)
         self.outbuffer = collections.deque()
         self.__olock = threading.Lock()
         self._frame_size_in = 4096
@@ -541,6 +542,16 @@ class Stream(Base):
             self.socket = sock
             self._connected()
 
+    @property
+    def inbuffer(self):
+        """ received data not yet dispatched """
+        return bytearray(self._framer.remaining())
+
+    @inbuffer.setter
+    def inbuffer(self, data):
+        self._framer.clear()
+        self._framer.feed(data)
+
     def _connected(self):
             self._poller.register_connection(self.socket.fileno(), self)
             self.connected = True
@@ -556,51 +567,33 @@ class Stream(Base):
         if data == b'':
             self.close()
             return
-        self.inbuffer.extend(data)
+        self._framer.feed(data)
         while True:
             terminator = self.terminator
-            buffer_len = len(self.inbuffer)
             if not terminator:
                 if not self._balance_open:
                     break
-                index = self._is_balanced()
-                if index:
-                    data = self.inbuffer[:index]
-                    self.inbuffer = self.inbuffer[index:]
-                    self.found_balance(data)
-                else:
+                data = self._next_balanced()
+                if data is None:
                     break
-            elif isinstance(terminator, int):
-                if buffer_len < terminator:
-                    break
-                else:
-                    data = self.inbuffer[:terminator]
-                    self.inbuffer = self.inbuffer[terminator:]
-                    self.terminator = 0
-                    self.found_terminator(data)
+                self.found_balance(bytearray(data))
             else:
-                if terminator not in self.inbuffer:
+                if self._framer.terminator != terminator:
+                    self._framer.terminator = terminator
+                data = self._framer.next_frame()
+                if data is None:
                     break
-                index = self.inbuffer.find(terminator)
-                data = self.inbuffer[:index]
-                cut = index + len(terminator)
-                self.inbuffer = self.inbuffer[cut:]
-                self.found_terminator(data)
-
-    def _is_balanced(self):
-        stack = []
-        for index, char in enumerate(self.inbuffer):
-            if char == self._balance_open:
-                stack.append(char)
-            elif char == self._balance_close:
-                stack.append(char)
-                if stack.count(self._balance_open) < stack.count(self._balance_close):
-                    logger.warning("{}: unbalanced input!".format(self._name))
-                    logger.close()
-                    return False
-                if stack.count(self._balance_open) == stack.count(self._balance_close):
-                    return index + 1
-        return False
+                if isinstance(terminator, int):
+                    self.terminator = 0
+                self.found_terminator(bytearray(data))
+
+    def _next_balanced(self):
+        try:
+            return self._framer.next_balanced(self._balance_open, self._balance_close)
+        except ValueError:
+            logger.warning("{}: unbalanced input!".format(self._name))
+            logger.close()
+            return None
 
     def _out(self):
         if not self.__olock.acquire(timeout=1):
@@ -659,7 +652,7 @@ class Stream(Base):
             pass
 
     def discard_buffers(self):
-        self.inbuffer = bytearray()
+        self._framer.clear()
         self.outbuffer.clear()
 
     def found_terminator(self, data):
@@ -26,8 +26,14 @@ import datetime
 import time
 import threading
 import collections
+import functools
+import queue
 import re
 
+import lib.metrics as metrics
+
+_query_duration = metrics.histogram('shng_db_query_duration_seconds', 'Duration of the execution of database statements', ['db'])
+
 
 class Database():
     """A database abstraction layer based on DB-API2 specification.
@@ -41,6 +47,7 @@ class Database():
     'close()' - close the connection to the database
     'setup()' - check/update/upgrade database structure
     'execute()' - execute statement (no result returned)
+    'executemany()' - execute statement for a list of parameter sets and commit once
     'fetchone()' - execute statement and return first row from result
     'fetchall()' - execute statement and reeturn all rows from result
     'cursor()' - create a cursor object to execute multiple statements
@@ -50,6 +57,7 @@ class Database():
     'release()' - release the database lock
     'verify()' - check database connection and reconnect if required
     'connected()' - check if database is connected
+    'get_pool_stats()' - return wait time statistics of the database lock and the read pool
 
 
     The SQL statements executed may have placeholders and parameters which
@@ -67,6 +75,14 @@ class Database():
 
     In case the driver implementation uses a different formatting it
     will be converted transparently!
+
+    Optionally a pool of additional read connections can be used (see
+    'pool_size' parameter of the constructor). Then 'fetchone()' and
+    'fetchall()' without a cursor are executed on a pooled connection,
+    unless the calling thread holds the database lock. Statements
+    executed while holding the lock (and all writes) keep using the
+    main connection, so 'lock()'/'release()' still grant exclusive
+    access to it.
     """
 
     # Supported formatting styles
@@ -117,6 +133,9 @@ class Database():
         'pyformat' : {}
       },
     }
+    # Maximum number of translated statements kept per database instance
+    _translation_cache_size = 256
+
     _translation_param_types = {
       'qmark'    : list,
       'format'   : list,
@@ -125,7 +144,7 @@ class Database():
       'pyformat' : dict
     }
 
-    def __init__(self, name, dbapi, connect, formatting='named'):
+    def __init__(self, name, dbapi, connect, formatting='named', pool_size=0):
         """Create a new database instance
 
         The 'name' parameter identifies the name for the database access .
@@ -143,6 +162,13 @@ class Database():
 
         The 'formatting' parameter can be used to specify a different type
         of formatting (see DB-API spec) which defaults to 'pyformat'.
+
+        The 'pool_size' parameter specifies the number of additional
+        connections used for concurrent reads (default 0: all statements use
+        the main connection). For sqlite the database is switched to WAL
+        journal mode in this case, so readers do not block the writer.
+        Reads of a thread holding the database lock always use the main
+        connection.
         """
         self.logger = logging.getLogger(__name__)
 
@@ -152,6 +178,12 @@ class Database():
         self._format_input = formatting
         self._connected = False
         self._conn = None
+        self._pool = None
+        self._pool_size = 0
+        self._lock_owner = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'writer': self._new_stats(), 'reader': self._new_stats()}
+        self._query_duration = _query_duration.labels(name)
 
         self.api_initialized = False
 
@@ -192,11 +224,22 @@ class Database():
             self.logger.error("Database [{}]: DB-API driver format style {} not supported (only {})".format(self._name, self._format_output, self._styles))
             return
 
+        try:
+            self._pool_size = max(int(pool_size), 0)
+        except (TypeError, ValueError):
+            self.logger.error("Database [{}]: Invalid pool size {}, using no read pool".format(self._name, pool_size))
+        if self._pool_size > 0 and self._is_sqlite() and self._params.get('database', ':memory:') == ':memory:':
+            self.logger.warning("Database [{}]: Read pool not supported for sqlite in-memory databases".format(self._name))
+            self._pool_size = 0
+
         self._translation = self._translations[self._format_input][self._format_output]
         self._translation_param_type = self._translation_param_types[self._format_output]
 
         self._fdb_lock = threading.Lock()
 
+        # LRU cache of translated statements, keyed by (statement, formatting)
+        self._translate_cached = functools.lru_cache(maxsize=self._translation_cache_size)(self._translate_statement)
+
         self.api_initialized = True
         return
 
@@ -213,6 +256,17 @@ class Database():
         self._connected = True
         self.logger.info("Database [{}]: Connected with {} using \"{}\" style".format(self._name, self._conn, self._format_output))
 
+        if self._pool_size > 0:
+            if self._is_sqlite():
+                try:
+                    self._conn.execute("PRAGMA journal_mode=WAL")
+                except Exception as e:
+                    self.logger.warning("Database [{}]: Could not enable WAL journal mode: {}".format(self._name, e))
+            # connections of the read pool are established on first use
+            self._pool = queue.LifoQueue()
+            for i in range(self._pool_size):
+                self._pool.put(None)
+
     def close(self):
         """Closes the database connection"""
         self.lock()
@@ -225,6 +279,20 @@ class Database():
         self._conn = None
         self._connected = False
 
+        pool = self._pool
+        self._pool = None
+        if pool is not None:
+            while True:
+                try:
+                    conn = pool.get_nowait()
+                except queue.Empty:
+                    break
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
     def connected(self):
         """Return the connected status"""
         return self._connected
@@ -274,13 +342,120 @@ class Database():
         self.release()
 
     def lock(self, timeout=-1):
-        """Acquire a database lock"""
-        return self._fdb_lock.acquire(timeout=timeout)
+        """Acquire a database lock
+
+        While the calling thread holds the lock, its reads are executed on
+        the main connection and not on the read pool, so they see the
+        uncommitted writes of the thread. Readers, which only acquire the
+        lock to read, do not benefit from the read pool.
+        """
+        start = time.perf_counter()
+        locked = self._fdb_lock.acquire(timeout=timeout)
+        self._add_stats('writer', time.perf_counter() - start)
+        if locked:
+            self._lock_owner = threading.get_ident()
+        return locked
 
     def release(self):
         """Release the database lock"""
+        self._lock_owner = None
         self._fdb_lock.release()
 
+    def get_pool_stats(self):
+        """Return wait time statistics of the database lock ('writer') and the read pool ('reader')
+
+        For each of them the number of acquisitions ('count'), the total
+        and the maximum wait time in seconds ('wait_total', 'wait_max')
+        and the average wait time ('wait_avg') are returned.
+        """
+        result = {'pool_size': self._pool_size}
+        with self._stats_lock:
+            for key, stats in self._stats.items():
+                result[key] = dict(stats)
+                result[key]['wait_avg'] = stats['wait_total'] / stats['count'] if stats['count'] else 0
+        return result
+
+    def _new_stats(self):
+        return {'count': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+    def _add_stats(self, key, wait):
+        with self._stats_lock:
+            stats = self._stats[key]
+            stats['count'] += 1
+            stats['wait_total'] += wait
+            if wait > stats['wait_max']:
+                stats['wait_max'] = wait
+
+    def _is_sqlite(self):
+        return getattr(self._dbapi, '__name__', '') == 'sqlite3'
+
+    def _use_reader(self):
+        """Internal helper method to check if a read statement should be executed on the read pool"""
+        return self._pool is not None and self._lock_owner != threading.get_ident()
+
+    def _acquire_reader(self, pool):
+        """Internal helper method to get a connection from the read pool (waits until one is available)"""
+        start = time.perf_counter()
+        conn = pool.get()
+        self._add_stats('reader', time.perf_counter() - start)
+        if conn is None:
+            params = dict(self._params)
+            if self._is_sqlite():
+                params.setdefault('check_same_thread', False)
+            try:
+                conn = self._dbapi.connect(**params)
+            except Exception:
+                pool.put(None)
+                raise
+        return conn
+
+    def _is_connection_error(self, e):
+        """Internal helper method to check if an exception indicates a failed connection"""
+        errors = tuple(getattr(self._dbapi, name) for name in ('OperationalError', 'InterfaceError') if hasattr(self._dbapi, name))
+        return isinstance(e, errors)
+
+    def _release_reader(self, pool, conn, broken=False):
+        """Internal helper method to return a connection to the read pool"""
+        if broken or pool is not self._pool:
+            # connection failed or database has been closed meanwhile
+            try:
+                conn.close()
+            except Exception:
+                pass
+            conn = None
+        if pool is self._pool:
+            pool.put(conn)
+
+    def _fetch_reader(self, stmt, params, formatting, fetch):
+        """Internal helper method to execute a read statement on a connection of the read pool"""
+        pool = self._pool
+        if pool is None:
+            # database has been closed meanwhile
+            if fetch == 'one':
+                return self.fetchone(stmt, params, formatting)
+            return self.fetchall(stmt, params, formatting)
+        conn = self._acquire_reader(pool)
+        broken = False
+        try:
+            c = conn.cursor()
+            try:
+                self.execute(stmt, params, formatting=formatting, cur=c)
+                return c.fetchone() if fetch == 'one' else c.fetchall()
+            finally:
+                c.close()
+        except Exception as e:
+            # only discard the connection, if it is not usable any more
+            broken = self._is_connection_error(e)
+            raise
+        finally:
+            if not broken:
+                try:
+                    # end the read transaction, so the reader sees new data next time
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            self._release_reader(pool, conn, broken)
+
     def commit(self):
         """Commit the current transaction"""
         self._conn.commit()
@@ -319,6 +494,7 @@ class Database():
             raise
 
         c = None
+        start = time.perf_counter()
         try:
             if cur == None:
                 c = self.cursor()
@@ -330,6 +506,7 @@ class Database():
                 c = None
             else:
                 result = cur.execute(stmt, args)
+            self._query_duration.observe(time.perf_counter() - start)
             return result
         except Exception as e:
             if str(e).find('no such table: database_version') == -1:
@@ -340,6 +517,52 @@ class Database():
             if c is not None:
                 c.close()
 
+    def executemany(self, stmt, params_list, formatting=None, cur=None, commit=True):
+        """Execute the given statement for each parameter set and commit once
+
+        The statement is prepared only once and passed with all parameter
+        sets to the 'executemany()' method of the DB-API cursor. The
+        parameter sets in 'params_list' are specified in the same way as
+        the 'params' parameter of the 'execute()' method.
+
+        The statements are executed in one transaction: If 'commit' is True
+        (default) the transaction is committed after all parameter sets have
+        been executed, or rolled back if one of them fails.
+
+        As with 'execute()', acquiring the database lock is up to the caller.
+        """
+        try:
+            stmt_result, names = self._translate_cached(stmt, formatting)
+            args_list = [self._prepare_params(names, params) for params in params_list]
+        except Exception as e:
+            self.logger.error("Can not prepare query: {} ({} parameter sets): {}".format(stmt, len(params_list), e))
+            raise
+
+        if len(args_list) == 0:
+            return None
+
+        c = cur if cur is not None else self.cursor()
+        if c is None:
+            return None
+        start = time.perf_counter()
+        try:
+            result = c.executemany(stmt_result, args_list)
+            if commit:
+                self.commit()
+            self._query_duration.observe(time.perf_counter() - start)
+            return result
+        except Exception as e:
+            self.logger.error(f"Can not execute query: {stmt_result} ({len(args_list)} parameter sets): {e}")
+            if commit:
+                try:
+                    self.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            if cur is None:
+                c.close()
+
     def verify(self, retry=5, delay=5):
         """Verifies the connection status and reconnets if required
 
@@ -387,6 +610,8 @@ class Database():
         the result. It accepts the same arguments as mentioned in the
         'execute()' method.
         """
+        if cur == None and self._use_reader():
+            return self._fetch_reader(stmt, params, formatting, 'one')
         if cur == None:
             c = self.cursor()
             if c is None:
@@ -407,6 +632,8 @@ class Database():
         This method can be used to fetch all rows from the result. It accepts
         the same arguments as mentioned in the 'execute()' method.
         """
+        if cur == None and self._use_reader():
+            return self._fetch_reader(stmt, params, formatting, 'all')
         if cur == None:
             c = self.cursor()
             if c is not None:
@@ -423,6 +650,15 @@ class Database():
     def _prepare(self, stmt, params, formatting=None):
         """Internal helper method to convert the statement and parameter list"""
 
+        stmt_result, names = self._translate_cached(stmt, formatting)
+        return (stmt_result, self._prepare_params(names, params))
+
+    def _prepare_params(self, names, params):
+        """Internal helper method to convert a parameter set for a translated statement
+
+        'names' is the list of (output name, input name) pairs returned by
+        '_translate_statement()' or None, if the statement is not translated.
+        """
         if isinstance(params, dict):
             param_dict = params
         else:
@@ -430,39 +666,52 @@ class Database():
             for key, value in enumerate(params):
                 param_dict[str(key+1)] = value
 
-        if formatting is None:
-            translation = self._translation
+        if names is None:
+            param_result = param_dict
         else:
-            translation = self._translations[formatting][self._format_output]
-
-        stmt_result, param_result = self._translate(stmt, param_dict, **translation)
+            param_result = collections.OrderedDict()
+            for output_name, input_name in names:
+                param_result[output_name] = param_dict[input_name]
 
         if self._translation_param_type is list:
-            return (stmt_result, [param_result[name] for name in param_result])
+            return [param_result[name] for name in param_result]
         elif self._translation_param_type is dict:
-            return (stmt_result, param_result)
+            return param_result
 
-    def _translate(self, stmt, params, input_token=None, output_token=None, input_name='{0}', output_name='{0}'):
-        """Internal helper method to convert the statement from input format to output format"""
+    def _translate_statement(self, stmt, formatting=None):
+        """Internal helper method to convert the statement from input format to output format
+
+        Returns the converted statement and the list of (output name, input name)
+        pairs to build the parameters for it. The result only depends on the
+        statement and the formatting, so it is cached (see '_translate_cached').
+        """
+        if formatting is None:
+            translation = self._translation
+        else:
+            translation = self._translations[formatting][self._format_output]
+
+        input_token = translation.get('input_token')
+        output_token = translation.get('output_token')
+        input_name = translation.get('input_name', '{0}')
+        output_name = translation.get('output_name', '{0}')
 
         if input_token is None or output_token is None:
-            return (stmt, params)
+            return (stmt, None)
 
         cnt = 1
-        param_result = collections.OrderedDict()
+        names = []
         if isinstance(input_token, str):
             while input_token in stmt:
                 stmt = stmt.replace(input_token, output_token.format(cnt), 1)
                 args = [cnt]
-                param_result[output_name.format(*args)] = params[input_name.format(*args)]
+                names.append((output_name.format(*args), input_name.format(*args)))
                 cnt = cnt + 1
         else:
             for match in input_token.finditer(stmt):
                 args = [cnt]
                 args.extend(match.groups())
                 stmt = stmt.replace(match.group(0), output_token.format(*args), 1)
-                param_result[output_name.format(*args)] = params[input_name.format(*args)]
+                names.append((output_name.format(*args), input_name.format(*args)))
                 cnt = cnt + 1
 
-        return (stmt,  param_result)
-
+        return (stmt, names)
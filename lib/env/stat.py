@@ -15,7 +15,14 @@ if sh.env.system.libs.ephem_version is not None:
 # lib/env/statistic.py
 
 # Garbage
-gc.collect()
+# (no forced collection here, collections are controlled by the gc policy of SmartHomeNG)
+if sh.gc_policy is not None:
+    gc_stats = sh.gc_policy.get_stats(reset=True)
+    sh.env.core.gc.collections(gc_stats['collections'], logic.lname)
+    sh.env.core.gc.pause_max(gc_stats['pause_max'], logic.lname)
+    sh.env.core.gc.pause_avg(gc_stats['pause_avg'], logic.lname)
+    sh.env.core.gc.pause_total(gc_stats['pause_total'], logic.lname)
+    sh.env.core.gc.frozen(gc_stats['frozen'], logic.lname)
 if gc.garbage != []:
     sh.env.core.garbage(len(gc.garbage), logic.lname)
     logger.warning("Garbage: {} objects".format(len(gc.garbage)))
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+
+"""
+This library implements the garbage collection policy of SmartHomeNG.
+
+SmartHomeNG holds a large graph of long-lived objects (items, plugins, logics). Full collections
+have to walk that whole graph. The policy
+
+- optionally sets the thresholds of the generations of the garbage collector (Python's thresholds
+  are kept, if gc_thresholds is not configured),
+- freezes all objects that exist after the initialization (gc.freeze), so they are ignored by
+  later collections,
+- optionally runs full collections, when the scheduler is idle and
+- records the pause times of all collections (via gc.callbacks).
+
+The policy is configured in etc/smarthome.yaml (gc_thresholds, gc_freeze, gc_idle_collection).
+
+:Note: Frozen objects are never collected, even if they are released later. If objects that
+       existed after the initialization are released later and are part of reference cycles
+       (e.g. a reloaded logic or an unloaded plugin), the memory of these cycles is not freed
+       until SmartHomeNG is restarted. Set gc_freeze to False, if logics are reloaded or plugins
+       are unloaded frequently.
+"""
+
+import gc
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_gcpolicy_instance = None    # Pointer to the initialized instance of the GcPolicy class
+
+
+class GcPolicy():
+    """
+    Garbage collection policy of SmartHomeNG
+
+    :param smarthome: Instance of the smarthome master-object
+    :type smarthome: object
+    """
+
+    def __init__(self, smarthome):
+        self._sh = smarthome
+        global _gcpolicy_instance
+        _gcpolicy_instance = self
+
+        self._start = {}            # start time of running collections per thread
+        self._stats = {}
+        self.reset_stats()
+        self._total = {'collections': 0, 'pause_total': 0.0, 'pause_max': 0.0, 'idle_collections': 0, 'idle_skipped': 0}
+        self.frozen = 0
+
+        self.thresholds = self._parse_thresholds(getattr(self._sh, '_gc_thresholds', None))
+        if self.thresholds is not None:
+            gc.set_threshold(*self.thresholds)
+            logger.info(f"Garbage collector thresholds set to {self.thresholds}")
+
+        if self._gc_callback not in gc.callbacks:
+            gc.callbacks.append(self._gc_callback)
+
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the instance of the GcPolicy class
+
+        :return: gc policy instance
+        :rtype: object
+        """
+        return _gcpolicy_instance
+
+
+    def _parse_thresholds(self, value):
+        """
+        Parse the configured thresholds
+
+        :param value: list or comma separated string with up to three thresholds, empty or 'default' to keep the Python defaults
+        :return: tuple of thresholds or None to keep the thresholds of Python
+        """
+        if value is None or value == '':
+            return None
+        if isinstance(value, str):
+            if value.strip().lower() in ['default', 'python', 'false']:
+                return None
+            value = value.split(',')
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        try:
+            thresholds = tuple(int(str(v).strip()) for v in value)
+        except ValueError:
+            logger.error(f"Invalid value '{value}' for gc_thresholds, keeping the thresholds of Python")
+            return None
+        if not (1 <= len(thresholds) <= 3) or thresholds[0] < 0:
+            logger.error(f"Invalid value '{value}' for gc_thresholds, keeping the thresholds of Python")
+            return None
+        return thresholds
+
+
+    def _gc_callback(self, phase, info):
+        """
+        Callback of the garbage collector, records the pause times of all collections
+        """
+        if phase == 'start':
+            self._start[threading.get_ident()] = time.perf_counter()
+            return
+        start = self._start.pop(threading.get_ident(), None)
+        if start is None:
+            return
+        pause = time.perf_counter() - start
+        generation = info.get('generation', 0)
+        stats = self._stats
+        stats['collections'] += 1
+        stats['pause_total'] += pause
+        if pause > stats['pause_max']:
+            stats['pause_max'] = pause
+        stats['pause_last'] = pause
+        stats['collected'] += info.get('collected', 0)
+        stats['uncollectable'] += info.get('uncollectable', 0)
+        stats['gen' + str(generation)] = stats.get('gen' + str(generation), 0) + 1
+        self._total['collections'] += 1
+        self._total['pause_total'] += pause
+        if pause > self._total['pause_max']:
+            self._total['pause_max'] = pause
+
+
+    def freeze(self):
+        """
+        Freeze all objects that exist at the moment, if configured (gc_freeze)
+
+        Is called after the initialization of items, plugins and logics. The objects are collected
+        once before, so no garbage is frozen. Frozen objects are ignored by all later collections,
+        so reference cycles of frozen objects, that are released later (e.g. reloaded logics or
+        unloaded plugins), are never collected.
+
+        :return: number of frozen objects
+        :rtype: int
+        """
+        if not self._sh_bool('_gc_freeze', True):
+            logger.info("Freezing of objects for the garbage collector is disabled")
+            return 0
+        start = time.perf_counter()
+        gc.collect()
+        gc.freeze()
+        self.frozen = gc.get_freeze_count()
+        logger.info(f"Garbage collector: {self.frozen} objects frozen after initialization (took {(time.perf_counter() - start) * 1000:.0f} ms)")
+        return self.frozen
+
+
+    def _sh_bool(self, attr, default):
+        value = getattr(self._sh, attr, default)
+        if isinstance(value, str):
+            return value.strip().lower() in ['true', 'yes', '1', 'on']
+        return bool(value)
+
+
+    def get_idle_collection_cycle(self):
+        """
+        Returns the cycle (in seconds) for idle collections or 0, if they are disabled (gc_idle_collection)
+
+        :rtype: int
+        """
+        try:
+            return max(0, int(getattr(self._sh, '_gc_idle_collection', 0)))
+        except (TypeError, ValueError):
+            logger.error(f"Invalid value '{getattr(self._sh, '_gc_idle_collection', 0)}' for gc_idle_collection, idle collections disabled")
+            return 0
+
+
+    def is_idle(self):
+        """
+        Returns True, if the scheduler is idle (no tasks are waiting and no worker is busy except the calling one)
+
+        :rtype: bool
+        """
+        scheduler = getattr(self._sh, 'scheduler', None)
+        if scheduler is None:
+            return True
+        if scheduler._runq.qsize() > 0:
+            return False
+        busy = scheduler.get_worker_count() - scheduler.get_idle_worker_count()
+        return busy <= 1
+
+
+    def idle_collect(self):
+        """
+        Run a full collection, if SmartHomeNG is idle. Otherwise the collection is skipped
+
+        Is executed by the scheduler, if gc_idle_collection is configured
+
+        :return: number of collected objects or None, if skipped
+        """
+        if not self.is_idle():
+            self._total['idle_skipped'] += 1
+            logger.debug("Garbage collector: Idle collection skipped, scheduler is busy")
+            return None
+        self._total['idle_collections'] += 1
+        return self.collect()
+
+
+    def collect(self):
+        """
+        Run a full collection
+
+        :return: number of collected objects
+        :rtype: int
+        """
+        c = gc.collect()
+        logger.debug(f"Garbage collector: collected {c} objects")
+        return c
+
+
+    def reset_stats(self):
+        """
+        Reset the statistics of the interval
+        """
+        self._stats = {'collections': 0, 'pause_total': 0.0, 'pause_max': 0.0, 'pause_last': 0.0,
+                       'collected': 0, 'uncollectable': 0, 'gen0': 0, 'gen1': 0, 'gen2': 0}
+
+
+    def get_stats(self, reset=False):
+        """
+        Returns the statistics of the garbage collector since the last reset
+
+        Times are returned in milliseconds.
+
+        :param reset: reset the statistics of the interval after reading them
+        :type reset: bool
+
+        :return: dict with statistics of the interval and totals
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        if reset:
+            self.reset_stats()
+        for key in ['pause_total', 'pause_max', 'pause_last']:
+            stats[key] = round(stats[key] * 1000, 3)
+        stats['pause_avg'] = round(stats['pause_total'] / stats['collections'], 3) if stats['collections'] else 0
+        stats['frozen'] = gc.get_freeze_count()
+        stats['thresholds'] = gc.get_threshold()
+        stats['counts'] = gc.get_count()
+        total = dict(self._total)
+        total['pause_total'] = round(total['pause_total'] * 1000, 3)
+        total['pause_max'] = round(total['pause_max'] * 1000, 3)
+        stats['total'] = total
+        return stats
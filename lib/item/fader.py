@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+
+"""
+This library implements the fade engine for items.
+
+All active fades are driven by a single thread. Fades are time based: The value of an item is
+calculated from the elapsed time of the fade, so a fade finishes on time, even if single updates
+are delayed. A fade is cancelled, if the item is written by anyone else than the fader.
+"""
+
+import logging
+import threading
+import time
+import math
+
+logger = logging.getLogger(__name__)
+
+_fader_instance = None    # Pointer to the initialized instance of the FadeEngine class
+
+
+def _ease_linear(p):
+    return p
+
+def _ease_in(p):
+    return p * p
+
+def _ease_out(p):
+    return p * (2 - p)
+
+def _ease_in_out(p):
+    return p * p * (3 - 2 * p)
+
+def _ease_sine(p):
+    return (1 - math.cos(math.pi * p)) / 2
+
+
+EASINGS = {'linear': _ease_linear,
+           'ease_in': _ease_in,
+           'ease_out': _ease_out,
+           'ease_in_out': _ease_in_out,
+           'sine': _ease_sine}
+
+
+class _Fade():
+    """
+    A single active fade
+    """
+    __slots__ = ('item', 'start_value', 'dest', 'start', 'duration', 'interval', 'easing', 'next', 'caller', 'done')
+
+    def __init__(self, item, start_value, dest, start, duration, interval, easing, caller):
+        self.item = item
+        self.start_value = start_value
+        self.dest = dest
+        self.start = start
+        self.duration = duration
+        self.interval = interval
+        self.easing = easing
+        self.next = start + interval
+        self.caller = caller
+        self.done = threading.Event()   # set, when the fade has finished or has been cancelled
+
+
+class FadeEngine():
+    """
+    Engine, that drives all active fades of items from a single thread
+
+    :param smarthome: Instance of the smarthome master-object
+    :type smarthome: object
+    """
+
+    def __init__(self, smarthome):
+        self._sh = smarthome
+        global _fader_instance
+        _fader_instance = self
+
+        self._fades = {}            # dict of active fades: {id(item): _Fade}
+        self._lock = threading.Condition(threading.Lock())
+        self._thread = None
+        self._alive = False
+        self._stopped = False
+
+        self._stats = {'started': 0, 'finished': 0, 'cancelled': 0, 'updates': 0, 'late_updates': 0}
+
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the instance of the FadeEngine class
+
+        :return: fader instance
+        :rtype: object
+        """
+        return _fader_instance
+
+
+    def start(self):
+        """
+        Start the thread of the fade engine (if it is not running yet)
+        """
+        with self._lock:
+            if self._alive:
+                return
+            self._alive = True
+            self._thread = threading.Thread(target=self._run, name='_item_fader', daemon=True)
+            self._thread.start()
+
+
+    def stop(self):
+        """
+        Stop the thread of the fade engine. Active fades are cancelled
+        """
+        with self._lock:
+            self._alive = False
+            self._stopped = True
+            for fade in self._fades.values():
+                fade.item._fading = False
+                fade.done.set()
+            self._fades.clear()
+            self._lock.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2)
+        self._thread = None
+
+
+    def fade(self, item, dest, duration, update_rate=None, easing='linear', caller=None):
+        """
+        Start a time based fade of an item
+
+        If the item is already fading, the request is ignored.
+
+        :param item: item to fade
+        :param dest: destination value
+        :param duration: duration of the fade in seconds
+        :param update_rate: number of updates per second (default: fade_update_rate from smarthome.yaml)
+        :param easing: name of the easing function (linear, ease_in, ease_out, ease_in_out, sine)
+        :param caller: caller to be used for the final value (default: 'Fader')
+        :type dest: int | float
+        :type duration: int | float
+        :type update_rate: int | float
+        :type easing: str
+
+        :return: True, if the fade has been started
+        :rtype: bool
+        """
+        if easing not in EASINGS:
+            logger.warning(f"Item {item._path}: Unknown easing '{easing}' for fade, using 'linear' instead")
+            easing = 'linear'
+        if update_rate is None:
+            update_rate = getattr(self._sh, '_fade_update_rate', 4)
+        try:
+            update_rate = float(update_rate)
+        except (TypeError, ValueError):
+            update_rate = 0
+        if update_rate <= 0:
+            logger.warning(f"Item {item._path}: Invalid update rate '{update_rate}' for fade, using 1 instead")
+            update_rate = 1
+        duration = max(0.0, float(duration))
+
+        with self._lock:
+            if item._fading:
+                return False
+            item._fading = True
+            now = time.monotonic()
+            self._fades[id(item)] = _Fade(item, item._value, dest, now, duration, 1 / update_rate,
+                                          EASINGS[easing], 'Fader' if caller is None else caller)
+            self._stats['started'] += 1
+            self._lock.notify()
+        if not self._alive and not self._stopped:
+            self.start()
+        return True
+
+
+    def cancel(self, item):
+        """
+        Cancel the active fade of an item. The item keeps its current value
+
+        :param item: item, whose fade should be cancelled
+        :return: True, if an active fade has been cancelled
+        :rtype: bool
+        """
+        with self._lock:
+            fade = self._fades.pop(id(item), None)
+            item._fading = False
+        if fade is None:
+            return False
+        fade.done.set()
+        self._stats['cancelled'] += 1
+        return True
+
+
+    def wait(self, item, timeout=None):
+        """
+        Wait until the active fade of an item has finished (or has been cancelled)
+
+        :param item: item, whose fade should be waited for
+        :param timeout: maximum time to wait in seconds (None = wait until the fade has finished)
+        :type timeout: int | float
+
+        :return: False, if the fade is still active after the timeout
+        :rtype: bool
+        """
+        fade = self._fades.get(id(item))
+        if fade is None:
+            return True
+        return fade.done.wait(timeout)
+
+
+    def is_fading(self, item):
+        """
+        Returns True, if the item has an active fade
+
+        :rtype: bool
+        """
+        return id(item) in self._fades
+
+
+    def get_stats(self):
+        """
+        Return statistics of the fade engine
+
+        :return: dict with the counters and the number of active fades
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        stats['active'] = len(self._fades)
+        return stats
+
+
+    def _run(self):
+        while self._alive:
+            with self._lock:
+                now = time.monotonic()
+                due = []
+                wait = None
+                for key, fade in list(self._fades.items()):
+                    if not fade.item._fading:
+                        # the item has been written by someone else: the fade is cancelled
+                        del self._fades[key]
+                        fade.done.set()
+                        self._stats['cancelled'] += 1
+                    elif fade.next <= now or fade.start + fade.duration <= now:
+                        due.append(fade)
+                    else:
+                        next = min(fade.next, fade.start + fade.duration) - now
+                        if wait is None or next < wait:
+                            wait = next
+                if not due:
+                    if self._alive:
+                        self._lock.wait(wait)
+                    continue
+
+            for fade in due:
+                self._update(fade, now)
+
+
+    def _update(self, fade, now):
+        """
+        Set the value of the item according to the elapsed time of the fade
+        """
+        item = fade.item
+        elapsed = now - fade.start
+        try:
+            if elapsed >= fade.duration:
+                with self._lock:
+                    if self._fades.get(id(item)) is not fade or not item._fading:
+                        return
+                    del self._fades[id(item)]
+                    item._fading = False
+                self._stats['finished'] += 1
+                item(fade.dest, fade.caller)
+                fade.done.set()
+                return
+
+            if now - fade.next > fade.interval:
+                self._stats['late_updates'] += 1
+            # schedule the next update on the grid of the update interval, skipping missed updates
+            fade.next = fade.start + (math.floor(elapsed / fade.interval) + 1) * fade.interval
+            value = fade.start_value + (fade.dest - fade.start_value) * fade.easing(elapsed / fade.duration)
+            self._stats['updates'] += 1
+            if value != item._value and item._fading:
+                item(value, 'fader')
+        except Exception as e:
+            logger.exception(f"Item {item._path}: Exception while fading: {e}")
+            with self._lock:
+                if self._fades.get(id(item)) is fade:
+                    del self._fades[id(item)]
+                item._fading = False
+            fade.done.set()
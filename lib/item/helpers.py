@@ -249,6 +249,23 @@ def cache_write(filename, value, cformat=CACHE_FORMAT):
 # Fade Method
 #####################################################################
 def fadejob(item, dest, step, delta, caller=None):
+    """
+    Fade an item in steps of size 'step' every 'delta' seconds
+
+    As before, the function returns when the fade has finished (or has been cancelled). The fade
+    itself is driven by the fade engine of the items. If no fade engine exists (no Items instance),
+    the item is faded by the calling thread. It is kept for backward compatibility, use item.fade() instead.
+
+    :param caller: caller to be used for the final value (default: 'Fader')
+    """
+    from .fader import FadeEngine
+    fader = FadeEngine.get_instance()
+    if fader is not None:
+        duration = fade_duration(item._value, dest, step, delta)
+        if fader.fade(item, dest, duration, update_rate=1 / delta if delta > 0 else None, caller=caller):
+            fader.wait(item)
+        return
+
     if item._fading:
         return
     else:
@@ -267,4 +284,16 @@ def fadejob(item, dest, step, delta, caller=None):
             item._lock.release()
     if item._fading:
         item._fading = False
-        item(dest, 'Fader')
+        item(dest, 'Fader' if caller is None else caller)
+
+
+def fade_duration(value, dest, step, delta):
+    """
+    Calculate the duration of a step based fade (steps of size 'step' every 'delta' seconds)
+
+    :return: duration in seconds
+    :rtype: float
+    """
+    if step <= 0 or delta <= 0:
+        return 0
+    return abs(dest - value) / step * delta
@@ -32,6 +32,7 @@ import threading
 import ast
 
 import inspect
+import functools
 
 import time             # for calls to time in eval
 import math             # for calls to math in eval
@@ -40,6 +41,7 @@ from math import *
 
 from lib.shtime import Shtime
 import lib.env
+import lib.metrics
 from lib.plugin import Plugins
 
 
@@ -68,6 +70,30 @@ ATTRIB_COMPAT_DEFAULT = ''
 logger = logging.getLogger(__name__)
 items_count = 0
 
+_metric_updates = lib.metrics.counter('shng_item_updates_total', 'Number of item updates')
+_metric_changes = lib.metrics.counter('shng_item_changes_total', 'Number of item updates, that changed the value')
+_metric_eval_duration = lib.metrics.histogram('shng_item_eval_duration_seconds', 'Duration of the evaluation of eval expressions of items')
+_metric_method_duration = lib.metrics.histogram('shng_plugin_update_item_duration_seconds', 'Duration of the methods of plugins and modules, that are triggered by item changes (update_item)', ['plugin'])
+_metric_method_children = {}     # {method: series of _metric_method_duration}
+
+
+def _get_method_metric(method):
+    """
+    Returns the series of the duration metric for a method triggered by item changes (labeled with the name of the plugin)
+    """
+    child = _metric_method_children.get(method)
+    if child is None:
+        owner = getattr(method, '__self__', None)
+        if owner is None:
+            name = getattr(method, '__name__', '?')
+        elif hasattr(owner, 'get_fullname'):
+            name = owner.get_fullname()
+        else:
+            name = owner.__class__.__name__.lower()
+        child = _metric_method_duration.labels(name)
+        _metric_method_children[method] = child
+    return child
+
 #####################################################################
 # Item Class
 #####################################################################
@@ -118,6 +144,9 @@ class Item():
         self._filename = None
         self._autotimer_time = None
         self._autotimer_value = None
+        self._autotimer_duration = None         # pre-parsed autotimer duration (if it is a constant)
+        self._autotimer_value_is_const = False
+        self._autotimer_const_value = None      # pre-parsed autotimer value (if it is a constant)
         self._cycle_time = None
         self._cycle_value = None
         self._cache = False
@@ -146,6 +175,8 @@ class Item():
         self._hysteresis_lower_threshold = None
         self._hysteresis_upper_timer = None
         self._hysteresis_lower_timer = None
+        self._hysteresis_upper_timer_duration = None    # pre-parsed upper timer (if it is a constant)
+        self._hysteresis_lower_timer_duration = None    # pre-parsed lower timer (if it is a constant)
         self._hysteresis_upper_timer_active = False
         self._hysteresis_lower_timer_active = False
         self._hysteresis_active_timer_ends = None
@@ -783,12 +814,21 @@ class Item():
             threshold = self.get_stringwithabsolutepathes(threshold_unex.strip(), 'sh.', '(', attr)
             timer = self.get_stringwithabsolutepathes(timer_unex.strip(), 'sh.', '(', attr)
 
+        is_const, duration = self._get_constant_expression(timer)
+        if not is_const or isinstance(duration, bool) or not isinstance(duration, (int, float)):
+            duration = None
+        elif duration < 0:
+            logger.warning(f"Item '{self._path}': Hysteresis timer is less than zero ({duration}), using 0 instead")
+            duration = 0
+
         if attr == KEY_HYSTERESIS_UPPER_THRESHOLD:
             self._hysteresis_upper_threshold = threshold
             self._hysteresis_upper_timer = timer
+            self._hysteresis_upper_timer_duration = duration
         elif attr == KEY_HYSTERESIS_LOWER_THRESHOLD:
             self._hysteresis_lower_threshold = threshold
             self._hysteresis_lower_timer = timer
+            self._hysteresis_lower_timer_duration = duration
 
 
     def _parse_on_xx_list_attribute(self, attr, value):
@@ -835,9 +875,48 @@ class Item():
         auto_time, auto_value, compat = split_duration_value_string(value, ATTRIB_COMPAT_DEFAULT)
         self._autotimer_time = self.get_stringwithabsolutepathes(auto_time, 'sh.', '(', attr)
         self._autotimer_value = self.get_stringwithabsolutepathes(auto_value, 'sh.', '(', attr)
+        self._preparse_autotimer()
         #logger.notice(f"_parse_autotimer_attribute: {self._path} - value={value} -> _autotimer_time={self._autotimer_time}, _autotimer_value={self._autotimer_value}")
 
 
+    def _get_constant_expression(self, expression):
+        """
+        Checks if an attribute expression is a constant literal, that has not to be evaluated on every use
+
+        Only immutable results are treated as constants.
+
+        :param expression: expression string of an attribute
+        :return: tuple (is_constant, value)
+        :rtype: tuple
+        """
+        if expression is None:
+            return (False, None)
+        try:
+            value = ast.literal_eval(str(expression))
+        except Exception:
+            return (False, None)
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return (True, value)
+        return (False, None)
+
+
+    def _preparse_autotimer(self):
+        """
+        Pre-parse the duration and value of the autotimer, if they are constants
+
+        Constant durations and values do not need to be cast and evaluated on each update of the item
+        """
+        self._autotimer_duration = None
+        if self._autotimer_time:
+            duration = self._cast_duration(self._autotimer_time, test=True)
+            if duration is not False:
+                self._autotimer_duration = duration
+        if self._autotimer_value is None:
+            self._autotimer_value_is_const, self._autotimer_const_value = (False, None)
+        else:
+            self._autotimer_value_is_const, self._autotimer_const_value = self._get_constant_expression(self._autotimer_value)
+
+
     """
     --------------------------------------------------------------------------------------------
     END of methods to process attributes during parsing of standard attributes
@@ -1663,11 +1742,11 @@ class Item():
         lower = self.__run_attribute_eval(self._hysteresis_lower_threshold)
 
         if self._hysteresis_upper_timer_active and (value <= upper):
-            self._sh.scheduler.remove(self._itemname_prefix + self.id() + '-UpTimer')
+            _items_instance.timers.cancel(self._itemname_prefix + self.id() + '-UpTimer')
             self._hysteresis_upper_timer_active = False
             self._hysteresis_active_timer_ends = None
         if self._hysteresis_lower_timer_active and (value >= lower):
-            self._sh.scheduler.remove(self._itemname_prefix + self.id() + '-LoTimer')
+            _items_instance.timers.cancel(self._itemname_prefix + self.id() + '-LoTimer')
             self._hysteresis_lower_timer_active = False
             self._hysteresis_active_timer_ends = None
 
@@ -1676,34 +1755,36 @@ class Item():
                 self.__update(True, caller, source, dest)
             else:
                 if not self._hysteresis_upper_timer_active and (self._value == False): ###ms value = self._value
-                    timer = self.__run_attribute_eval(self._hysteresis_upper_timer)
-                    if timer < 0:
-                        logger.warning(f"Item '{self._path}': Hysteresis upper-timer evaluated to an value less than zero ({timer}), using 0 instead")
-                        timer = 0
+                    if self._hysteresis_upper_timer_duration is not None:
+                        timer = self._hysteresis_upper_timer_duration
+                    else:
+                        timer = self.__run_attribute_eval(self._hysteresis_upper_timer)
+                        if timer < 0:
+                            logger.warning(f"Item '{self._path}': Hysteresis upper-timer evaluated to an value less than zero ({timer}), using 0 instead")
+                            timer = 0
                     self._hysteresis_upper_timer_active = True
-                    next = self.shtime.now() + datetime.timedelta(seconds=timer)
-                    self.active_timer_ends = next
-                    #next = self.shtime.now() + datetime.timedelta(seconds=self._hysteresis_upper_timer)
+                    self._hysteresis_active_timer_ends = self.shtime.now() + datetime.timedelta(seconds=timer)
                     if self._hysteresis_log:
-                        logger.notice(f"__run_hysteresis {self._path}: scheduler.add {self._path}-UpTimer")
-                    self._sh.scheduler.add(self._itemname_prefix+self.id() + '-UpTimer', self.__call__, value={'value': True, 'caller': 'Hysteresis'}, next=next)
+                        logger.notice(f"__run_hysteresis {self._path}: arm timer {self._path}-UpTimer")
+                    _items_instance.timers.arm(self._itemname_prefix+self.id() + '-UpTimer', self.__call__, timer, value={'value': True, 'caller': 'Hysteresis'})
 
         if value < lower:
             if self._hysteresis_lower_timer is None:
                 self.__update(False, caller, source, dest)
             else:
                 if not self._hysteresis_lower_timer_active and (self._value == True):
-                    timer = self.__run_attribute_eval(self._hysteresis_lower_timer)
-                    if timer < 0:
-                        logger.warning(f"Item '{self._path}': Hysteresis lower-timer evaluated to an value less than zero ({timer}), using 0 instead")
-                        timer = 0
+                    if self._hysteresis_lower_timer_duration is not None:
+                        timer = self._hysteresis_lower_timer_duration
+                    else:
+                        timer = self.__run_attribute_eval(self._hysteresis_lower_timer)
+                        if timer < 0:
+                            logger.warning(f"Item '{self._path}': Hysteresis lower-timer evaluated to an value less than zero ({timer}), using 0 instead")
+                            timer = 0
                     self._hysteresis_lower_timer_active = True
-                    next = self.shtime.now() + datetime.timedelta(seconds=timer)
-                    self._hysteresis_active_timer_ends = next
-                    #next = self.shtime.now() + datetime.timedelta(seconds=self._hysteresis_lower_timer)
+                    self._hysteresis_active_timer_ends = self.shtime.now() + datetime.timedelta(seconds=timer)
                     if self._hysteresis_log:
-                        logger.notice(f"__run_hysteresis {self._path}: scheduler.add {self._path}-LoTimer")
-                    self._sh.scheduler.add(self._itemname_prefix + self.id() + '-LoTimer', self.__call__, value={'value': False, 'caller': 'Hysteresis'}, next=next)
+                        logger.notice(f"__run_hysteresis {self._path}: arm timer {self._path}-LoTimer")
+                    _items_instance.timers.arm(self._itemname_prefix + self.id() + '-LoTimer', self.__call__, timer, value={'value': False, 'caller': 'Hysteresis'})
         return
 
 
@@ -1888,6 +1969,7 @@ class Item():
                         logger.debug(f"Item {self._path} Eval triggered by: {self.__triggered_by}, Evaluating item with value {value}. Eval expression: {self._eval}")
 
                         # ms if contab: init = x is set, x is transfered as a string, for that case re-try eval with x converted to float
+                        eval_start = time.perf_counter()
                         try:
                             value = eval(self._eval)
                         except Exception as e:
@@ -1895,6 +1977,7 @@ class Item():
                             value = self.cast(value)
                             value = eval(self._eval)
                         # ms end
+                        _metric_eval_duration.observe(time.perf_counter() - eval_start)
                 except Exception as e:
                     # adding "None" as the "destination" information at end of triggered_by
                     # This helps figuring out whether an eval expression was successfully evaluated or not.
@@ -2205,6 +2288,41 @@ class Item():
 
     def __update(self, value, caller='Logic', source=None, dest=None, key=None, index=None):
 
+        result = self.__update_value(value, caller, source, dest, key, index)
+        if result is not None:
+            self.__update_triggers(caller, source, dest, *result)
+
+
+    def _update_deferred(self, value, caller='Logic', source=None, dest=None):
+        """
+        Set the value of the item, but defer the triggers (on_update, on_change, logics, plugin methods, ...)
+
+        It is used to apply a bulk of item writes (e.g. a scene) before the triggers of the items are run.
+        For items with an eval expression, the value is set the usual way (via the eval).
+
+        :param value: value to set
+        :param caller: caller of the update
+        :param source: source of the update
+        :param dest: destination of the update
+
+        :return: callable to run the triggers of the update or None, if there are no triggers to run
+        :rtype: callable | None
+        """
+        if self._eval:
+            self.__call__(value, caller, source, dest)
+            return None
+        result = self.__update_value(value, caller, source, dest)
+        if result is None:
+            return None
+        return functools.partial(self.__update_triggers, caller, source, dest, *result)
+
+
+    def __update_value(self, value, caller='Logic', source=None, dest=None, key=None, index=None):
+        """
+        First part of an update: Set the value of the item
+
+        :return: tuple (value, changed, trigger_source_details) for __update_triggers or None, if the value could not be set
+        """
         # special handling, if item is a hysteresys item (has a hysteresis_input attribute)
         if self._hysteresis_input is not None:
             if self._hysteresis_upper_timer_active:
@@ -2227,7 +2345,7 @@ class Item():
                     logger.warning(f'Item {self._path}: value "{value}" does not match type {self._type}. Via caller {caller}, source {source}')
                 except:
                     pass
-                return
+                return None
 
         self._lock.acquire()
         _changed = False
@@ -2241,11 +2359,14 @@ class Item():
             # Update a list item element (selected by index)
             value = self.__set_listentry(value, index)
 
+        _metric_updates.inc()
         if value != self._value or self._enforce_change:
             _changed = True
+            _metric_changes.inc()
             self._set_value(value, caller, source, dest, prev_change=None, last_change=None)
             trigger_source_details = self.__changed_by
-            if caller != "fader":
+            if caller != "fader" and self._fading:
+                # a write from anyone else cancels an active fade
                 self._fading = False
                 self._lock.notify_all()
         else:
@@ -2254,17 +2375,25 @@ class Item():
             self.__prev_update_by = self.__updated_by
             self.__updated_by = "{0}:{1}".format(caller, source)
         self._lock.release()
+        return (value, _changed, trigger_source_details)
 
+
+    def __update_triggers(self, caller, source, dest, value, _changed, trigger_source_details):
+        """
+        Second part of an update: Run the triggers, write the cache and start the autotimer
+        """
         # ms: call run_on_update() from here
         self.__run_on_update(value)
         if _changed or self._enforce_updates or self._type == 'scene':
             # ms: call run_on_change() from here -> noved down
             #self.__run_on_change(value)
             for method in self.__methods_to_trigger:
+                method_start = time.perf_counter()
                 try:
                     method(self, caller, source, dest)
                 except Exception as e:
                     logger.exception("Item {}: problem running {}: {}".format(self._path, method, e))
+                _get_method_metric(method).observe(time.perf_counter() - method_start)
             if self._threshold and self.__logics_to_trigger:
                 if self.__th_crossed and self._value <= self.__th_low:  # cross lower bound
                     self.__th_crossed = False
@@ -2292,21 +2421,22 @@ class Item():
                 logger.warning("Item: {}: could not update cache {}".format(self._path, e))
 
         if self._autotimer_time and caller != 'Autotimer' and not self._fading:
-            # cast_duration for fixed attribute
-            _time = self._cast_duration(self._autotimer_time, test=True)
-            if _time == False:
-                _time = self._autotimer_time
-            # cast_duration for result of eval expression
-            _time = self._cast_duration(self.__run_attribute_eval(_time, 'str'))
+            if self._autotimer_duration is not None:
+                # duration has been pre-parsed (fixed attribute)
+                _time = self._autotimer_duration
+            else:
+                # cast_duration for result of eval expression
+                _time = self._cast_duration(self.__run_attribute_eval(self._autotimer_time, 'str'))
             if self._autotimer_value is None:
                 _value = self._value
+            elif self._autotimer_value_is_const:
+                _value = self._autotimer_const_value
             else:
                 _value = self.__run_attribute_eval(self._autotimer_value, 'str')
 
             #logger.notice(f"Item {self._path} __update: _time={_time}, _value={_value}")
 
-            next = self.shtime.now() + datetime.timedelta(seconds=_time)
-            self._sh.scheduler.add(self._itemname_prefix+self.id() + '-Timer', self.__call__, value={'value': _value, 'caller': 'Autotimer'}, next=next)
+            _items_instance.timers.arm(self._itemname_prefix+self.id() + '-Timer', self.__call__, _time, value={'value': _value, 'caller': 'Autotimer'})
 
 
     def add_logic_trigger(self, logic):
@@ -2385,24 +2515,34 @@ class Item():
                 caller = 'Autotimer'
                 self._autotimer_time = time
                 self._autotimer_value = value
+                self._preparse_autotimer()
             else:
                 caller = 'Timer'
-        next = self.shtime.now() + datetime.timedelta(seconds=time)
         if source is None:
-            self._sh.scheduler.add(self._itemname_prefix+self.id() + '-Timer', self.__call__, value={'value': value, 'caller': caller}, next=next)
+            _items_instance.timers.arm(self._itemname_prefix+self.id() + '-Timer', self.__call__, time, value={'value': value, 'caller': caller})
         else:
-            self._sh.scheduler.add(self._itemname_prefix+self.id() + '-Timer', self.__call__, value={'value': value, 'caller': caller, 'source': source}, next=next)
+            _items_instance.timers.arm(self._itemname_prefix+self.id() + '-Timer', self.__call__, time, value={'value': value, 'caller': caller, 'source': source})
         return
 
 
     def remove_timer(self):
         """
-        Remove a running timer for this item from the scheduler
+        Remove a running timer for this item
         """
-        self._sh.scheduler.remove(self._itemname_prefix+self.id() + '-Timer')
+        _items_instance.timers.cancel(self._itemname_prefix+self.id() + '-Timer')
         return
 
 
+    def get_timer_remaining(self):
+        """
+        Returns the remaining time of a running timer (timer or autotimer) for this item
+
+        :return: remaining time in seconds or None, if no timer is running
+        :rtype: float | None
+        """
+        return _items_instance.timers.remaining(self._itemname_prefix+self.id() + '-Timer')
+
+
     def autotimer(self, time=None, value=None, compat=ATTRIB_COMPAT_LATEST):
         """
         Defines or removes an autotimer for the item
@@ -2420,11 +2560,34 @@ class Item():
         else:
             self._autotimer_time = None
             self._autotimer_value = None
+        self._preparse_autotimer()
 
 
-    def fade(self, dest, step=1, delta=1):
+    def fade(self, dest, step=1, delta=1, duration=None, update_rate=None, easing='linear'):
+        """
+        Fades the item to a destination value
+
+        If no duration is given, the item is faded in steps of size 'step' every 'delta' seconds.
+        Otherwise the fade takes 'duration' seconds and the value is updated 'update_rate' times per second.
+        All fades are driven by the fade engine of the items (no worker thread is blocked). The fade is
+        cancelled, if the item is set by anyone else.
+
+        :param dest: destination value
+        :param step: step size (used, if no duration is given)
+        :param delta: time between two steps in seconds (used, if no duration is given)
+        :param duration: Optional: duration of the fade in seconds
+        :param update_rate: Optional: number of updates per second (default: fade_update_rate from smarthome.yaml)
+        :param easing: Optional: easing function (linear, ease_in, ease_out, ease_in_out, sine)
+
+        :return: True, if the fade has been started
+        :rtype: bool
+        """
         dest = float(dest)
-        self._sh.trigger(self._path, fadejob, value={'item': self, 'dest': dest, 'step': step, 'delta': delta})
+        if duration is None:
+            duration = fade_duration(self._value, dest, float(step), float(delta))
+            if update_rate is None and float(delta) > 0:
+                update_rate = 1 / float(delta)
+        return _items_instance.fader.fade(self, dest, duration, update_rate=update_rate, easing=easing)
 
     def return_children(self):
         for child in self.__children:
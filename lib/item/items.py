@@ -57,6 +57,8 @@ import lib.utils
 
 from .item import Item
 from .structs import Structs
+from .timerwheel import TimerWheel
+from .fader import FadeEngine
 
 
 _items_instance = None    # Pointer to the initialized instance of the Items class (for use by static methods)
@@ -78,6 +80,8 @@ class Items():
 
     _children = []                   # List of top level items
 
+    _structure_version = 0           # incremented, whenever items are added or removed
+
     plugin_attributes = {}           # dict with all item attributes, that are defined by plugins
     plugin_attribute_prefixes = {}   # dict with all item attribute-prefixes, that are defined by plugins
     plugin_prefixes_tuple = None     # tuple for finding if an attribute name starts with one of the prefixes
@@ -97,6 +101,8 @@ class Items():
 
         _items_instance = self
         self.structs = Structs(self._sh)
+        self.timers = TimerWheel(self._sh)
+        self.fader = FadeEngine(self._sh)
 
 
     # -----------------------------------------------------------------------------------------
@@ -256,9 +262,10 @@ class Items():
         :type item: object
         """
 
-        if path not in self.__items:
+        if path not in self.__item_dict:
             self.__items.append(path)
         self.__item_dict[path] = item
+        Items._structure_version += 1
 
     # aus bin/smarthome.py
     #    def __iter__(self):
@@ -274,7 +281,7 @@ class Items():
         :type item: object
         """
 
-        if item.path() not in self.__items:
+        if item.path() not in self.__item_dict:
             return
         
         # remove item from Items data
@@ -283,6 +290,7 @@ class Items():
             self.__items.remove(item.path())
         except Exception as e:
             self.logger.warning(f"Error occured while trying to remove item {item.path()}: {e}")
+        Items._structure_version += 1
 
         # remove item bindings in plugins
         if item.remove():
@@ -293,6 +301,19 @@ class Items():
             self.logger.warning(f"Item {item.path()} could not be removed due to incompatible plugins.")
 
 
+    def get_structure_version(self):
+        """
+        Returns a counter, that is incremented whenever an item is added or removed
+
+        It can be used to find out, if data derived from the item structure (e.g. the
+        item tree for the admin interface) has to be rebuilt
+
+        :return: structure version
+        :rtype: int
+        """
+        return Items._structure_version
+
+
     def get_toplevel_items(self):
         """
         Returns a list with all items defined at the top level
@@ -465,10 +486,22 @@ class Items():
         """
         Stop what all items are doing
 
-        At the moment, it stops fading of all items
+        At the moment, it stops fading of all items and the timers of the items
         """
         for item in self.__items:
             self.__item_dict[item]._fading = False
+        self.fader.stop()
+        self.timers.stop()
+
+
+    def get_pending_timers(self):
+        """
+        Returns a list of the pending one-shot timers of all items (autotimer, timer, hysteresis)
+
+        :return: list of dicts with the keys name, obj, next, remaining and value
+        :rtype: list
+        """
+        return self.timers.pending()
 
 
     def add_plugin_attribute(self, plugin_name, attribute_name, attribute):
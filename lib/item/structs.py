@@ -241,7 +241,7 @@ class Structs():
             self.logger.info(f"Loading struct file '{fn}' with key-prefix '{key_prefix}'")
 
         # Read in item structs from ../source_dir/<fn>.yaml
-        struct_definitions = shyaml.yaml_load(os.path.join(source_dir, fn), ordered=True, ignore_notfound=True)
+        struct_definitions = shyaml.yaml_load_cached(os.path.join(source_dir, fn), ordered=True, ignore_notfound=True)
 
         # if valid struct definition file etc/<fn>.yaml ist found
         if struct_definitions is not None:
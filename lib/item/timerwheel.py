@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+
+"""
+This library implements a hierarchical timer wheel for the one-shot timers of items
+(autotimer, timer(), hysteresis up-/lo-timers).
+
+Arming, re-arming and cancelling a timer are O(1) operations, which do not touch the
+scheduler. Only when a timer expires, the item call is handed over to the scheduler
+run queue to be executed by a worker thread.
+"""
+
+import logging
+import threading
+import time
+import datetime
+
+logger = logging.getLogger(__name__)
+
+_timerwheel_instance = None    # Pointer to the initialized instance of the TimerWheel class
+
+
+class _WheelTimer():
+    """
+    A single timer within the timer wheel
+    """
+    __slots__ = ('name', 'obj', 'value', 'expires', 'due', 'level', 'slot')
+
+    def __init__(self, name, obj, value, expires, due):
+        self.name = name
+        self.obj = obj
+        self.value = value
+        self.expires = expires      # expiry in ticks of the wheel
+        self.due = due              # expiry as timestamp (for display purposes)
+        self.level = None
+        self.slot = None
+
+
+class TimerWheel():
+    """
+    Hierarchical timer wheel for one-shot item timers
+
+    Level 0 has a resolution of one tick, each further level covers `slots` ticks of the level below.
+    With the default settings (tick=0.1s, 64 slots, 4 levels) timers up to about 19 days are
+    held in the wheel, longer timers are kept in an overflow dict.
+
+    :param smarthome: Instance of the smarthome master-object
+    :param tick: resolution of the wheel in seconds
+    :param slot_bits: number of bits for the slots of a level (slots per level = 2**slot_bits)
+    :param levels: number of levels of the wheel
+    :type smarthome: object
+    :type tick: float
+    :type slot_bits: int
+    :type levels: int
+    """
+
+    def __init__(self, smarthome, tick=0.1, slot_bits=6, levels=4):
+        self._sh = smarthome
+        global _timerwheel_instance
+        _timerwheel_instance = self
+
+        self._tick = tick
+        self._bits = slot_bits
+        self._slots = 1 << slot_bits
+        self._mask = self._slots - 1
+        self._levels = levels
+        self._span = 1 << (slot_bits * levels)    # number of ticks, the wheel can hold
+
+        self._wheel = [[{} for _ in range(self._slots)] for _ in range(levels)]
+        self._overflow = {}
+        self._timers = {}           # dict of all pending timers: {name: _WheelTimer}
+
+        self._start = time.monotonic()
+        self._current = 0           # last tick that has been processed
+
+        self._lock = threading.Condition(threading.Lock())
+        self._thread = None
+        self._alive = False
+        self._stopped = False
+
+        self._stats = {'armed': 0, 'rearmed': 0, 'cancelled': 0, 'fired': 0, 'cascaded': 0}
+
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the instance of the TimerWheel class
+
+        :return: timerwheel instance
+        :rtype: object
+        """
+        return _timerwheel_instance
+
+
+    def start(self):
+        """
+        Start the thread of the timer wheel (if it is not running yet)
+        """
+        with self._lock:
+            if self._alive:
+                return
+            self._alive = True
+            self._thread = threading.Thread(target=self._run, name='_item_timers', daemon=True)
+            self._thread.start()
+
+
+    def stop(self):
+        """
+        Stop the thread of the timer wheel. Pending timers are discarded
+        """
+        with self._lock:
+            self._alive = False
+            self._stopped = True
+            self._lock.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2)
+        self._thread = None
+
+
+    def _now_tick(self):
+        return int((time.monotonic() - self._start) / self._tick)
+
+
+    def arm(self, name, obj, delay, value=None):
+        """
+        Arm (or re-arm) a one-shot timer
+
+        If a timer with the same name is pending, it is replaced.
+
+        :param name: name of the timer (e.g. 'items.<item-path>-Timer')
+        :param obj: callable, which is handed over to the scheduler, when the timer expires
+        :param delay: delay in seconds
+        :param value: value (dict of keyword arguments) for the call of obj
+        :type name: str
+        :type delay: int | float
+
+        :return: timestamp of the expiry
+        :rtype: float
+        """
+        if delay < 0:
+            delay = 0
+        due = time.time() + delay
+        expires = int((time.monotonic() - self._start + delay) / self._tick + 0.999999)
+        with self._lock:
+            old = self._timers.pop(name, None)
+            if old is None:
+                self._stats['armed'] += 1
+            else:
+                self._unlink(old)
+                self._stats['rearmed'] += 1
+            was_empty = not self._timers
+            if was_empty:
+                # the wheel has been empty, nothing to process for elapsed ticks
+                self._current = max(self._current, self._now_tick())
+            timer = _WheelTimer(name, obj, value, max(expires, self._current + 1), due)
+            self._timers[name] = timer
+            self._link(timer)
+            if was_empty or timer.level == 0:
+                # timers on higher levels are picked up at the next cascade, the thread wakes up for anyway
+                self._lock.notify()
+        if not self._alive and not self._stopped:
+            self.start()
+        return due
+
+
+    def cancel(self, name):
+        """
+        Cancel a pending timer
+
+        :param name: name of the timer
+        :type name: str
+
+        :return: True, if a pending timer has been cancelled
+        :rtype: bool
+        """
+        with self._lock:
+            timer = self._timers.pop(name, None)
+            if timer is None:
+                return False
+            self._unlink(timer)
+            self._stats['cancelled'] += 1
+        return True
+
+
+    def remaining(self, name):
+        """
+        Return the remaining time of a pending timer
+
+        :param name: name of the timer
+        :type name: str
+
+        :return: remaining time in seconds or None, if no timer is pending
+        :rtype: float | None
+        """
+        timer = self._timers.get(name, None)
+        if timer is None:
+            return None
+        return max(0.0, timer.due - time.time())
+
+
+    def pending(self):
+        """
+        Return a list of all pending timers, sorted by expiry
+
+        :return: list of dicts with the keys name, next (datetime), remaining (seconds) and value
+        :rtype: list
+        """
+        with self._lock:
+            timers = list(self._timers.values())
+        now = time.time()
+        tz = self._sh.shtime.tzinfo() if getattr(self._sh, 'shtime', None) is not None else None
+        result = []
+        for timer in sorted(timers, key=lambda t: t.due):
+            result.append({'name': timer.name,
+                           'obj': timer.obj,
+                           'next': datetime.datetime.fromtimestamp(timer.due, tz),
+                           'remaining': max(0.0, timer.due - now),
+                           'value': timer.value})
+        return result
+
+
+    def get_stats(self):
+        """
+        Return statistics of the timer wheel
+
+        :return: dict with the counters and the number of pending timers
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        stats['pending'] = len(self._timers)
+        stats['overflow'] = len(self._overflow)
+        return stats
+
+
+    def _link(self, timer):
+        """
+        Put a timer into the slot that matches its expiry (lock must be held)
+        """
+        delta = timer.expires - self._current
+        if delta >= self._span:
+            timer.level = -1
+            timer.slot = None
+            self._overflow[timer.name] = timer
+            return
+        level = 0
+        while delta >= (1 << (self._bits * (level + 1))):
+            level += 1
+        slot = (timer.expires >> (self._bits * level)) & self._mask
+        timer.level = level
+        timer.slot = slot
+        self._wheel[level][slot][timer.name] = timer
+
+
+    def _unlink(self, timer):
+        """
+        Remove a timer from its slot (lock must be held)
+        """
+        if timer.level == -1:
+            self._overflow.pop(timer.name, None)
+        else:
+            self._wheel[timer.level][timer.slot].pop(timer.name, None)
+
+
+    def _advance(self, now_tick):
+        """
+        Process all ticks up to now_tick and return the expired timers (lock must be held)
+        """
+        expired = []
+        while self._current < now_tick and self._timers:
+            self._current += 1
+            tick = self._current
+
+            # cascade timers of the higher levels down, highest level first
+            for level in range(self._levels - 1, 0, -1):
+                if tick & ((1 << (self._bits * level)) - 1) == 0:
+                    if level == self._levels - 1 and self._overflow:
+                        cascading = list(self._overflow.values())
+                        self._overflow.clear()
+                        for timer in cascading:
+                            self._link(timer)
+                    slot = self._wheel[level][(tick >> (self._bits * level)) & self._mask]
+                    if slot:
+                        cascading = list(slot.values())
+                        slot.clear()
+                        self._stats['cascaded'] += len(cascading)
+                        for timer in cascading:
+                            self._link(timer)
+
+            slot = self._wheel[0][tick & self._mask]
+            if slot:
+                for timer in slot.values():
+                    del self._timers[timer.name]
+                    expired.append(timer)
+                slot.clear()
+
+        if not self._timers:
+            self._current = max(self._current, now_tick)
+        return expired
+
+
+    def _next_wakeup(self):
+        """
+        Return the number of seconds until the next tick that needs processing (lock must be held)
+        """
+        if not self._timers:
+            return None
+        # next occupied slot of level 0 or next cascade point, whichever comes first
+        ticks = self._slots - (self._current & self._mask)
+        for offset in range(1, ticks):
+            if self._wheel[0][(self._current + offset) & self._mask]:
+                ticks = offset
+                break
+        wakeup = self._start + (self._current + ticks) * self._tick
+        return max(0.0, wakeup - time.monotonic())
+
+
+    def _run(self):
+        while self._alive:
+            with self._lock:
+                expired = self._advance(self._now_tick())
+                if not expired:
+                    wait = self._next_wakeup()
+                    if self._alive:
+                        self._lock.wait(wait)
+                    continue
+            self._stats['fired'] += len(expired)
+            for timer in expired:
+                self._dispatch(timer)
+
+
+    def _dispatch(self, timer):
+        """
+        Hand over an expired timer to the scheduler to be executed by a worker thread
+        """
+        try:
+            self._sh.scheduler.queue_task(timer.name, timer.obj, by='Timer', value=timer.value)
+        except Exception as e:
+            logger.exception(f"Timer {timer.name}: Exception while dispatching: {e}")
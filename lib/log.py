@@ -26,13 +26,18 @@ import logging.handlers
 import logging.config
 import os
 import datetime
+import json
 import pickle
+import queue
 import re
+import threading
+import atexit
 from pathlib import Path
 
 import collections
 
 import lib.shyaml as shyaml
+import lib.metrics as metrics
 
 logs_instance = None
 
@@ -51,6 +56,10 @@ class Logs():
     _all_handlers_logger_name = '_shng_all_handlers_logger'
     _all_handlers = {}
 
+    _queue_handler = None
+    _queue_listener = None
+    _internal_handler_names = ('_shng_root_queue', '_shng_log_metrics')    # handlers, which are not configured in logging.yaml
+
 
     def __init__(self, sh):
 
@@ -78,6 +87,8 @@ class Logs():
             exit(1)
 
         config_dict = self.add_all_handlers_logger(config_dict)
+        # SmartHomeNG specific configuration of the logging queue (not part of the dictConfig schema)
+        queue_config = config_dict.pop('shng_queue_logging', None)
 
         # Default loglevels are:
         #  - CRITICAL     50
@@ -150,10 +161,90 @@ class Logs():
 
         # Initialize MemLog Handler to output root log entries to smartVISU
         self.initMemLog()
+        self.initMetricsLog()
+
+        if isinstance(queue_config, dict) and str(queue_config.get('enabled', False)).lower() == 'true':
+            self.start_queue_logging(queue_config.get('queue_size', 10000), queue_config.get('overflow', 'drop'))
 
         return True
 
 
+    def start_queue_logging(self, queue_size=10000, overflow='drop'):
+        """
+        Route the log records of the handlers of the root logger through a queue
+
+        The handlers of the root logger are replaced by a ShngQueueHandler. The log records are
+        passed to the original handlers by a single background thread (QueueListener), so the
+        threads which are logging are not blocked by disk I/O of the handlers.
+
+        :param queue_size: maximum number of log records in the queue
+        :param overflow: policy, if the queue is full: 'drop', 'drop_oldest' or 'block'
+        :type queue_size: int
+        :type overflow: str
+        """
+        if self._queue_listener is not None:
+            return
+        if not overflow in ShngQueueHandler.OVERFLOW_POLICIES:
+            self.logger.warning(f"start_queue_logging: Invalid overflow policy '{overflow}', using 'drop'")
+            overflow = 'drop'
+        try:
+            queue_size = max(int(queue_size), 100)
+        except (TypeError, ValueError):
+            queue_size = 10000
+
+        root_logger = logging.getLogger('')
+        # the log records are counted before they are queued (dropped records are counted too)
+        handlers = [h for h in root_logger.handlers if h.name != ShngMetricsHandler.handler_name]
+        queue_handler = ShngQueueHandler(queue.Queue(queue_size), overflow=overflow)
+        queue_handler.set_name(ShngQueueHandler.handler_name)
+        listener = ShngQueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        # QueueListener starts an unnamed thread, name it for the thread list of the admin interface
+        listener._thread.name = '_shng_log_queue'
+        root_logger.addHandler(queue_handler)
+        for handler in handlers:
+            root_logger.removeHandler(handler)
+        Logs._queue_handler = queue_handler
+        Logs._queue_listener = listener
+        metrics.gauge('shng_log_queue_length', 'Number of log records waiting in the logging queue').set_function(queue_handler.queue.qsize)
+        metrics.counter('shng_log_records_dropped_total', 'Number of log records dropped because the logging queue was full').set_function(lambda: queue_handler.dropped_total)
+        atexit.register(self.stop_queue_logging)
+        self.logger.info(f"Logging of root handlers {[h.name for h in handlers]} through queue (size={queue_size}, overflow={overflow})")
+
+
+    def stop_queue_logging(self):
+        """
+        Write all queued log records and restore the handlers of the root logger
+
+        Called when SmartHomeNG stops (and at exit of the interpreter)
+        """
+        listener = self._queue_listener
+        if listener is None:
+            return
+        Logs._queue_listener = None
+        root_logger = logging.getLogger('')
+        root_logger.removeHandler(self._queue_handler)
+        for handler in listener.handlers:
+            root_logger.addHandler(handler)
+        # processes the records still in the queue and stops the thread
+        listener.stop()
+        if self._queue_handler.dropped_total:
+            self.logger.warning(f"{self._queue_handler.dropped_total} log records have been dropped because the logging queue was full")
+
+
+    def get_queue_logging_stats(self):
+        """
+        Returns statistics of the logging queue
+
+        :return: dict with the state of the queue or None, if logging is not queued
+        :rtype: dict | None
+        """
+        if self._queue_listener is None:
+            return None
+        return {'queued': self._queue_handler.queue.qsize(), 'queue_size': self._queue_handler.queue.maxsize,
+                'overflow': self._queue_handler.overflow, 'dropped': self._queue_handler.dropped_total}
+
+
     def add_logging_level(self, description, value):
         """
         Adds a new Logging level to the standard python logging
@@ -215,6 +306,18 @@ class Logs():
         return
 
 
+    def initMetricsLog(self):
+        """
+        Adds the handler counting the log records per level (metric 'shng_log_records_total') to the root logger
+        """
+        root_logger = logging.getLogger('')
+        for handler in root_logger.handlers:
+            if handler.name == ShngMetricsHandler.handler_name:
+                return
+        root_logger.addHandler(ShngMetricsHandler())
+        return
+
+
 
 
     def add_log(self, name, log):
@@ -315,6 +418,53 @@ class Logs():
         return self._all_handlers[handlername]
 
 
+    def get_logger_handlers(self, logger):
+        """
+        Returns the handlers of a logger, which are configurable in logging.yaml
+
+        If logging is queued, the handlers of the root logger are attached to the queue listener
+        and are returned instead of the queue handler. Internal handlers of SmartHomeNG (queue and
+        metrics handler) are not returned.
+
+        :param logger: logger object
+        :return: list of handlers
+        :rtype: list
+        """
+        handlers = [h for h in logger.handlers if h.name not in self._internal_handler_names]
+        if logger is logging.getLogger('') and self._queue_listener is not None:
+            handlers += list(self._queue_listener.handlers)
+        return handlers
+
+
+    def add_logger_handler(self, logger, handler):
+        """
+        Add a handler to a logger (to the queue listener, if the handlers of the root logger are queued)
+
+        :param logger: logger object
+        :param handler: handler to add
+        """
+        listener = self._queue_listener
+        if logger is logging.getLogger('') and listener is not None:
+            if not handler in listener.handlers:
+                listener.handlers = listener.handlers + (handler,)
+        else:
+            logger.addHandler(handler)
+
+
+    def remove_logger_handler(self, logger, handler):
+        """
+        Remove a handler from a logger (from the queue listener, if the handlers of the root logger are queued)
+
+        :param logger: logger object
+        :param handler: handler to remove
+        """
+        listener = self._queue_listener
+        if logger is logging.getLogger('') and listener is not None and handler in listener.handlers:
+            listener.handlers = tuple(h for h in listener.handlers if h is not handler)
+        else:
+            logger.removeHandler(handler)
+
+
 # -------------------------------------------------------------------------------
 
 class Log(collections.deque):
@@ -346,14 +496,17 @@ class Log(collections.deque):
         # Add this log to dict of defined memory logs
         logs_instance.add_log(name, self)
 
-    def add(self, entry):
+    def add(self, entry, logger_name=None):
         """
         Adds a log entry to the memory log. If the log already has reached the maximum length, the oldest
         entry is removed from the log automatically.
+
+        :param entry: log entry (list with the fields of the mapping)
+        :param logger_name: name of the logger, that created the entry (passed to the listeners for filtering)
         """
         self.appendleft(entry)
         for listener in self._sh.return_event_listeners('log'):
-            listener('log', {'name': self._name, 'log': [dict(zip(self.mapping, entry))]})
+            listener('log', {'name': self._name, 'logger': logger_name, 'log': [dict(zip(self.mapping, entry))]})
 
     def last(self, number):
         """
@@ -389,6 +542,150 @@ class Log(collections.deque):
                 self.append(entry)
                 return
 
+class LogFilter():
+    """
+    Server side filter for the subscription of a memory log (e.g. by the admin GUI)
+
+    :param logger: prefix of the logger name (e.g. 'plugins.knx')
+    :param level: minimum level (name or number)
+    :param text: text, the message has to contain (case insensitive)
+    """
+    __slots__ = ('logger', 'level', 'text')
+
+    def __init__(self, logger='', level=None, text=''):
+        self.logger = logger or ''
+        self.level = self.get_levelno(level)
+        self.text = str(text or '').lower()
+
+    @staticmethod
+    def get_levelno(level):
+        """
+        Returns the number of a log level
+
+        :param level: name or number of the level
+        :return: number of the level (0, if the level is unknown)
+        :rtype: int
+        """
+        if level is None or level == '':
+            return 0
+        if isinstance(level, int):
+            return level
+        level = str(level).strip().upper()
+        if level.isdigit():
+            return int(level)
+        levelno = logging.getLevelName(level)
+        return levelno if isinstance(levelno, int) else 0
+
+    def is_active(self):
+        """
+        Returns True, if the filter restricts anything
+        """
+        return bool(self.logger or self.level or self.text)
+
+    def matches(self, logger_name, entry):
+        """
+        Returns True, if the entry of a memory log passes the filter
+
+        :param logger_name: name of the logger, that created the entry (or None, if unknown)
+        :param entry: log entry as dict with the keys time, thread, level and message
+        :rtype: bool
+        """
+        if self.logger and logger_name is not None and not logger_name.startswith(self.logger):
+            return False
+        if self.level and self.get_levelno(entry.get('level')) < self.level:
+            return False
+        if self.text and self.text not in str(entry.get('message', '')).lower():
+            return False
+        return True
+
+
+class LogStream():
+    """
+    Rate limited stream of memory log entries to one client
+
+    Entries are added already serialized (as JSON), buffered and returned as batches (one message per log)
+    by get_messages(), which is called every `interval` seconds. At most `rate` entries per second are passed on,
+    additional entries are dropped. Dropped entries are reported by a marker entry in the next message.
+
+    :param rate: maximum number of entries per second (0 = unlimited)
+    :param interval: interval (in seconds), in which get_messages() is called
+    """
+
+    def __init__(self, rate=200, interval=0.25):
+        self.rate = rate
+        self.interval = interval
+        self.limit = max(1, int(rate * interval)) if rate > 0 else None
+        self._entries = []          # list of tuples (log name, serialized entry)
+        self._dropped = {}          # number of dropped entries per log name
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+
+    def add(self, name, serialized_entry):
+        """
+        Add a serialized log entry to the stream
+
+        :param name: name of the memory log
+        :param serialized_entry: log entry, serialized as JSON
+        :return: False, if the entry has been dropped because of the rate limit
+        :rtype: bool
+        """
+        with self._lock:
+            if self.limit is not None and len(self._entries) >= self.limit:
+                self._dropped[name] = self._dropped.get(name, 0) + 1
+                self.dropped += 1
+                return False
+            self._entries.append((name, serialized_entry))
+        return True
+
+    def drop(self, name, count=1):
+        """
+        Count entries, that have been dropped before they reached the stream
+        """
+        with self._lock:
+            self._dropped[name] = self._dropped.get(name, 0) + count
+            self.dropped += count
+
+    def pending(self):
+        """
+        Returns True, if entries or drop markers are waiting to be sent
+        """
+        return bool(self._entries or self._dropped)
+
+    def get_messages(self):
+        """
+        Returns the buffered entries as messages for the client and empties the buffer
+
+        The entries of each log are sent as one message (newest entry first, like the initial data of a log).
+
+        :return: list of messages (JSON strings)
+        :rtype: list
+        """
+        with self._lock:
+            entries = self._entries
+            dropped = self._dropped
+            self._entries = []
+            self._dropped = {}
+        by_name = {}
+        for name, serialized_entry in entries:
+            by_name.setdefault(name, []).append(serialized_entry)
+        for name in dropped:
+            by_name.setdefault(name, [])
+        messages = []
+        for name, serialized_entries in by_name.items():
+            serialized_entries.reverse()
+            self.sent += len(serialized_entries)
+            message = '{"cmd": "log", "name": ' + json.dumps(name)
+            if name in dropped:
+                marker = {'time': datetime.datetime.now().astimezone().isoformat(), 'thread': '', 'level': 'WARNING',
+                          'message': f"{dropped[name]} log entries dropped (rate limit of {self.rate} entries/sec)"}
+                serialized_entries.insert(0, json.dumps(marker))
+                message += ', "dropped": ' + str(dropped[name])
+            message += ', "log": [' + ', '.join(serialized_entries) + ']}'
+            messages.append(message)
+        return messages
+
+
 class DateTimeRotatingFileHandler(logging.StreamHandler):
     """
     Handler for logging to file using current date and time information in
@@ -741,12 +1038,115 @@ class ShngTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
         self.rolloverAt = newRolloverAt
 
 
+class ShngQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler with a bounded queue and a policy for a full queue
+
+    Overflow policies:
+      - 'drop': records below level WARNING are dropped, records of level WARNING and above wait for space in the queue
+      - 'drop_oldest': the oldest record in the queue is dropped
+      - 'block': the logging thread waits for space in the queue
+
+    The number of dropped records is logged as a warning as soon as the queue accepts records again.
+    """
+
+    OVERFLOW_POLICIES = ['drop', 'drop_oldest', 'block']
+    handler_name = '_shng_root_queue'
+
+    def __init__(self, queue, overflow='drop'):
+        super().__init__(queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self.dropped_total = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self.dropped:
+            self._enqueue_dropped_warning()
+        if self.overflow == 'block' or (self.overflow == 'drop' and record.levelno >= logging.WARNING):
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.overflow == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        self._count_dropped()
+
+    def _count_dropped(self):
+        with self._dropped_lock:
+            self.dropped += 1
+            self.dropped_total += 1
+
+    def _enqueue_dropped_warning(self):
+        with self._dropped_lock:
+            dropped = self.dropped
+            self.dropped = 0
+        if dropped:
+            record = logging.makeLogRecord({'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                            'msg': f"{dropped} log records have been dropped because the logging queue was full"})
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                with self._dropped_lock:
+                    self.dropped += dropped
+
+
+class ShngQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener, which waits for space in a full queue when it is stopped
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class ShngMetricsHandler(logging.Handler):
+    """
+    Handler, which counts the log records per level for the metrics endpoint (metric 'shng_log_records_total')
+
+    The handler does not format or output the records, so it does not use the lock of the handler.
+    """
+
+    handler_name = '_shng_log_metrics'
+
+    def __init__(self):
+        super().__init__()
+        self.set_name(self.handler_name)
+        self._counter = metrics.counter('shng_log_records_total', 'Number of log records by level', ['level'])
+        self._children = {}
+
+    def handle(self, record):
+        child = self._children.get(record.levelname)
+        if child is None:
+            child = self._counter.labels(record.levelname)
+            self._children[record.levelname] = child
+        child.inc()
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+
 class ShngMemLogHandler(logging.StreamHandler):
     """
     LogHandler used by MemLog
     """
+
+    # cached memory logs are persisted by a single background thread
+    _cache_handlers = []
+    _cache_lock = threading.Lock()
+    _cache_event = threading.Event()
+    _cache_thread = None
+
     def __init__(self, logname='undefined', maxlen=35, level=logging.NOTSET,
-            mapping=['time', 'thread', 'level', 'message'], cache=False):
+            mapping=['time', 'thread', 'level', 'message'], cache=False, cache_interval=10):
         super().__init__()
         self.setLevel(level)
 
@@ -762,6 +1162,12 @@ class ShngMemLogHandler(logging.StreamHandler):
         self.baseFilename = "'" + self._log._name + "'"
         self._cache = cache
         self._maxlen = maxlen
+        self._cache_dirty = False
+        try:
+            self._cache_interval = max(float(cache_interval), 0.5)
+        except (TypeError, ValueError):
+            self._cache_interval = 10
+        self._cache_last_write = time.time()
         # save cache files in var/log/cache directory
         cache_directory = os.path.join(logs_instance._sh.get_vardir(), 'log'+os.path.sep, 'cache'+os.path.sep)
         if cache is True:
@@ -780,6 +1186,7 @@ class ShngMemLogHandler(logging.StreamHandler):
                 except Exception as e:
                     pass
                     logs_instance.logger.warning(f"Memory Log: problem reading cache: {e}")
+            self._cache_register()
 
     def emit(self, record):
         #logs_instance.logger.info(f"ShngMemLogHandler.emit() #1: logname={self._log._name}, handlername={self.get_name()}, level={self.level}, record.levelno={record.levelno}, record.levelname={record.levelname}, record={record}")
@@ -787,14 +1194,22 @@ class ShngMemLogHandler(logging.StreamHandler):
         try:
             self.format(record)
             timestamp = datetime.datetime.fromtimestamp(record.created, self._shtime.tzinfo())
-            self._log.add([timestamp, record.threadName, record.levelname, record.message])
+            self._log.add([timestamp, record.threadName, record.levelname, record.message], record.name)
+            # the cache file is written by the background flusher (see _cache_flush)
+            self._cache_dirty = True
         except Exception:
             self.handleError(record)
+
+    def close(self):
+        """
+        Writes pending changes to the cache file and closes the handler
+
+        Called by logging.shutdown() when SmartHomeNG stops
+        """
         if self._cache is True:
-            try:
-                self._cache_write(logs_instance.logger, self._cachefile, self._log.export(int(self._maxlen)))
-            except Exception as e:
-                logs_instance.logger.warning(f"Memory Log {self._log._name}: could not update cache {e}")
+            self._cache_unregister()
+            self._cache_flush()
+        super().close()
 
 
     ##############################################################################################
@@ -837,7 +1252,75 @@ class ShngMemLogHandler(logging.StreamHandler):
 
     def _cache_write(self, logger, filename, value):
         try:
-            with open(filename, 'wb') as f:
+            # write to a temporary file first, so an interrupted write does not destroy the cache
+            with open(filename + '.tmp', 'wb') as f:
                 pickle.dump(value, f)
+            os.replace(filename + '.tmp', filename)
         except IOError:
             logger.warning("Could not write to {}".format(filename))
+
+    def _cache_flush(self, force=False):
+        """
+        Writes the memory log to the cache file, if it has changed since the last write
+
+        :param force: write even if the log has not changed
+        :type force: bool
+        """
+        if not (self._cache_dirty or force):
+            return
+        # export under the handler lock, so emit() cannot modify the deque while it is exported
+        with self.lock:
+            self._cache_dirty = False
+            value = self._log.export(int(self._maxlen))
+        self._cache_last_write = time.time()
+        try:
+            self._cache_write(logs_instance.logger, self._cachefile, value)
+        except Exception as e:
+            logs_instance.logger.warning(f"Memory Log {self._log._name}: could not update cache {e}")
+
+    def _cache_register(self):
+        """
+        Adds this handler to the handlers served by the cache flusher thread and starts the thread if needed
+        """
+        cls = ShngMemLogHandler
+        with cls._cache_lock:
+            if self not in cls._cache_handlers:
+                cls._cache_handlers.append(self)
+            if cls._cache_thread is None or not cls._cache_thread.is_alive():
+                cls._cache_event.clear()
+                cls._cache_thread = threading.Thread(target=cls._cache_flusher, name='_shng_memlog_cache', daemon=True)
+                cls._cache_thread.start()
+            else:
+                # wake up the flusher, so it picks up the interval of the new handler
+                cls._cache_event.set()
+
+    def _cache_unregister(self):
+        cls = ShngMemLogHandler
+        with cls._cache_lock:
+            if self in cls._cache_handlers:
+                cls._cache_handlers.remove(self)
+            if not cls._cache_handlers:
+                cls._cache_event.set()
+
+    @classmethod
+    def _cache_flusher(cls):
+        """
+        Thread that periodically writes the cache files of all changed memory logs
+        """
+        while True:
+            with cls._cache_lock:
+                handlers = list(cls._cache_handlers)
+                if not handlers:
+                    cls._cache_thread = None
+                    return
+            now = time.time()
+            wait = min(h._cache_interval for h in handlers)
+            for handler in handlers:
+                due = handler._cache_last_write + handler._cache_interval
+                if due <= now:
+                    handler._cache_flush()
+                    handler._cache_last_write = now
+                    due = now + handler._cache_interval
+                wait = min(wait, due - now)
+            cls._cache_event.wait(max(wait, 0.1))
+            cls._cache_event.clear()
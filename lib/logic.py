@@ -48,6 +48,10 @@ They can be used the following way: To call eg. **enable_logic(name)**, use the
 """
 import logging
 import os
+import hashlib
+import marshal
+import threading
+import importlib.util
 
 from collections import OrderedDict
 
@@ -70,6 +74,125 @@ logger = logging.getLogger(__name__)
 
 _logics_instance = None    # Pointer to the initialized instance of the Logics class (for use by static methods)
 
+_bytecode_cache_dir = None     # directory for the compiled bytecode of logics (None = no persistent cache)
+_bytecode_cache_lock = threading.Lock()
+_bytecode_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def set_bytecode_cache_dir(directory):
+    """
+    Set the directory for the cache of compiled logics
+
+    :param directory: directory for the cache files or None to disable the cache
+    :type directory: str | None
+    """
+    global _bytecode_cache_dir
+    _bytecode_cache_dir = directory
+
+
+def _get_source_stamp(pathname):
+    """
+    Return the stamp of a logic file, which is used to validate the cached bytecode
+
+    :param pathname: pathname of the logic file
+    :return: tuple of absolute pathname, modification time and size of the file
+    :rtype: tuple
+    """
+    st = os.stat(pathname)
+    return (os.path.abspath(pathname), st.st_mtime_ns, st.st_size)
+
+
+def _get_cache_filename(pathname):
+    """
+    Return the name of the cache file for a logic file
+
+    :param pathname: pathname of the logic file
+    :return: filename of the cache file
+    :rtype: str
+    """
+    name = os.path.splitext(os.path.basename(pathname))[0]
+    return os.path.join(_bytecode_cache_dir, name + '.' + hashlib.sha1(os.path.abspath(pathname).encode()).hexdigest()[:16] + '.pyc')
+
+
+def _compile_logic(pathname):
+    """
+    Read and compile the source of a logic
+
+    :param pathname: pathname of the logic file
+    :return: code object
+    """
+    with open(pathname, encoding='UTF-8') as f:
+        code = f.read()
+    code = code.lstrip('\ufeff')  # remove BOM
+    return compile(code, pathname, 'exec')
+
+
+def _read_cached_bytecode(pathname, stamp):
+    """
+    Return the cached bytecode of a logic, if the cache entry is valid
+
+    :param pathname: pathname of the logic file
+    :param stamp: stamp of the logic file (see _get_source_stamp())
+    :return: code object or None
+    """
+    if _bytecode_cache_dir is None:
+        return None
+    try:
+        with open(_get_cache_filename(pathname), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    magic = importlib.util.MAGIC_NUMBER
+    if data[:len(magic)] != magic:
+        return None
+    try:
+        cached_stamp, code = marshal.loads(data[len(magic):])
+    except Exception as e:
+        logger.info(f"Ignoring invalid bytecode cache entry for logic file '{pathname}': {e}")
+        return None
+    if tuple(cached_stamp) != stamp:
+        return None
+    return code
+
+
+def _write_cached_bytecode(pathname, stamp, code):
+    """
+    Write the bytecode of a logic to the cache
+
+    :param pathname: pathname of the logic file
+    :param stamp: stamp of the logic file (see _get_source_stamp())
+    :param code: code object
+    """
+    if _bytecode_cache_dir is None:
+        return
+    cachefile = _get_cache_filename(pathname)
+    tmpfile = f"{cachefile}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(_bytecode_cache_dir, exist_ok=True)
+        with open(tmpfile, 'wb') as f:
+            f.write(importlib.util.MAGIC_NUMBER + marshal.dumps((stamp, code)))
+        os.replace(tmpfile, cachefile)
+    except Exception as e:
+        logger.warning(f"Could not write bytecode cache entry for logic file '{pathname}': {e}")
+
+
+def load_bytecode(pathname):
+    """
+    Return the compiled code of a logic file, using the bytecode cache
+
+    :param pathname: pathname of the logic file
+    :return: code object and stamp of the compiled logic file
+    :rtype: tuple
+    """
+    stamp = _get_source_stamp(pathname)
+    code = _read_cached_bytecode(pathname, stamp)
+    with _bytecode_cache_lock:
+        _bytecode_cache_stats['hits' if code is not None else 'misses'] += 1
+    if code is None:
+        code = _compile_logic(pathname)
+        _write_cached_bytecode(pathname, stamp, code)
+    return code, stamp
+
 
 class Logics():
     """
@@ -340,14 +463,25 @@ class Logics():
         """
         Function to reload all logics
 
-        It generates new bytecode for every logic that is loaded. The configured triggers
-        are not loaded from the configuration, so the triggers that where active before the
-        reload remain active.
+        It generates new bytecode for every logic that is loaded and whose code file has been
+        changed. The configured triggers are not loaded from the configuration, so the triggers
+        that where active before the reload remain active.
         """
         for logic in self:
             self[logic]._generate_bytecode()
 
 
+    def get_bytecode_cache_stats(self):
+        """
+        Returns statistics of the bytecode cache of logics
+
+        :return: dict with the number of cache hits and misses
+        :rtype: dict
+        """
+        with _bytecode_cache_lock:
+            return dict(_bytecode_cache_stats)
+
+
     def is_logic_loaded(self, name):
         """
         Test if a logic is loaded. Given is the name of the section in /etc/logic.yaml
@@ -1335,11 +1469,10 @@ class Logic():
                 self.logger.warning("{}: Could not access logic file ({}) => ignoring.".format(self._name, self._pathname))
                 return
             try:
-                f = open(self._pathname, encoding='UTF-8')
-                code = f.read()
-                f.close()
-                code = code.lstrip('\ufeff')  # remove BOM
-                self._bytecode = compile(code, self._pathname, 'exec')
+                if hasattr(self, '_bytecode') and self._source_stamp == _get_source_stamp(self._pathname):
+                    self.logger.debug("{}: Logic file ({}) is unchanged => bytecode not regenerated.".format(self._name, self._pathname))
+                    return
+                self._bytecode, self._source_stamp = load_bytecode(self._pathname)
             except Exception as e:
                 self.logger.exception("Exception: {}".format(e))
         else:
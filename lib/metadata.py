@@ -55,7 +55,7 @@ class Metadata():
     _version = '?'
 
 
-    def __init__(self, sh, addon_name, addon_type, classpath=''):
+    def __init__(self, sh, addon_name, addon_type, classpath='', definitions=None):
         """
         Initialzes the metadata for an addon (plugin or module) from the definition file
 
@@ -63,10 +63,12 @@ class Metadata():
         :param addon_name:
         :param addon_type: 'plugin' or 'module'
         :param classpath:
+        :param definitions: already loaded content of the definition file (see load_definitions())
         :type sh: object
         :type addon_name: str
         :type addon_type: str
         :type classpath: str
+        :type definitions: OrderedDict
         """
         global all_itemdefinitions
         global all_itemprefixdefinitions
@@ -78,21 +80,15 @@ class Metadata():
         self._log_premsg = "{} '{}': ".format(addon_type, self._addon_name)
 
 #        logger.warning(self._log_premsg+"classpath = '{}'".format( classpath ) )
-        if classpath == '':
-            if addon_type == 'plugin':
-                addon_type_dir = 'plugins'
-            elif addon_type == 'module':
-                addon_type_dir = 'modules'
-            else:
-                return
-            self.relative_filename = os.path.join( addon_type_dir, self._addon_name, addon_type+YAML_FILE )
-        else:
-            self.relative_filename = os.path.join( classpath.replace('.', os.sep), addon_type+YAML_FILE )
+        self.relative_filename = self.get_relative_filename(self._addon_name, addon_type, classpath)
+        if self.relative_filename is None:
+            return
 #        logger.warning(self._log_premsg+"relative_filename = '{}'".format( self.relative_filename ) )
 
         # read complete definitions from metadata file
-        filename = os.path.join( self._sh.get_basedir(), self.relative_filename )
-        self.meta = shyaml.yaml_load(filename, ordered=True)
+        if definitions is None:
+            definitions = self.load_definitions(sh, addon_name, addon_type, classpath)
+        self.meta = definitions
 
         self.parameters = None
         self._paramlist = []
@@ -331,6 +327,49 @@ class Metadata():
         return docstr_list
 
 
+    @staticmethod
+    def get_relative_filename(addon_name, addon_type, classpath=''):
+        """
+        Return the name of the definition file of an addon relative to the base directory of SmartHomeNG
+
+        :param addon_name: name of the addon
+        :param addon_type: 'plugin' or 'module'
+        :param classpath: classpath of the addon
+        :return: relative filename or None, if the addon type is unknown
+        :rtype: str | None
+        """
+        if classpath == '':
+            if addon_type == 'plugin':
+                addon_type_dir = 'plugins'
+            elif addon_type == 'module':
+                addon_type_dir = 'modules'
+            else:
+                return None
+            return os.path.join( addon_type_dir, addon_name, addon_type+YAML_FILE )
+        return os.path.join( classpath.replace('.', os.sep), addon_type+YAML_FILE )
+
+    @classmethod
+    def load_definitions(cls, sh, addon_name, addon_type, classpath=''):
+        """
+        Load the definition file of an addon
+
+        This method does not modify any global data and may be called in parallel for multiple addons.
+        The result can be passed as parameter 'definitions' when creating the Metadata instance.
+
+        :param sh: SmartHomeNG main object
+        :param addon_name: name of the addon
+        :param addon_type: 'plugin' or 'module'
+        :param classpath: classpath of the addon
+        :return: content of the definition file (or None if an error occured)
+        :rtype: OrderedDict | None
+        """
+        # the addon name is used like in the constructor of Metadata (self._addon_name)
+        relative_filename = cls.get_relative_filename(addon_name.lower(), addon_type, classpath)
+        if relative_filename is None:
+            return None
+        return shyaml.yaml_load_cached(os.path.join(sh.get_basedir(), relative_filename), ordered=True)
+
+
     def _test_definitions(self, definition_list, definition_dict):
         """
         Test parameter or item-attribute definitions for validity
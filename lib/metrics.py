@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+
+"""
+This library implements the registry for runtime metrics of SmartHomeNG (counters, gauges and histograms).
+
+Metrics are created once (e.g. at module level) and updated on the hot paths of the core, the modules
+and the plugins. An update costs a lock and an addition, so the metrics stay enabled in production.
+Values, that are already known somewhere else (e.g. the length of a queue), are not updated at all:
+A function is registered for them, which is called when the metrics are exported.
+
+The registry is exported in the text format of Prometheus / OpenMetrics by the http module (url /metrics).
+
+Example::
+
+    import lib.metrics as metrics
+
+    _item_updates = metrics.counter('shng_item_updates_total', 'Number of item updates')
+    _logic_duration = metrics.histogram('shng_logic_duration_seconds', 'Duration of logic runs', ['logic'])
+
+    _item_updates.inc()
+    _logic_duration.labels(logic.name).observe(duration)
+"""
+
+import bisect
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# buckets (in seconds) suited for the durations of evals, logics, plugin methods and database queries
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE_TEXT = 'text/plain; version=0.0.4; charset=utf-8'
+CONTENT_TYPE_OPENMETRICS = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+_METRIC_NAME = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*$')
+_LABEL_NAME = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+
+def _format_value(value):
+    """
+    Format a sample value for the text format
+    """
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape_label(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+class _Value():
+    """
+    Value of a counter or a gauge (one series of a metric)
+    """
+    __slots__ = ('_value', '_lock', '_function')
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+        self._function = None
+
+    def set_function(self, function):
+        """
+        Let the value be determined by a function, which is called when the metrics are exported
+
+        :param function: function without parameters, returning the value
+        :type function: callable
+        """
+        self._function = function
+
+    def get(self):
+        """
+        Returns the current value
+
+        :rtype: int | float
+        """
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+
+class _CounterValue(_Value):
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        """
+        Increment the counter
+
+        :param amount: amount to add (must not be negative)
+        """
+        if amount < 0:
+            raise ValueError('Counters can only be incremented by non-negative amounts')
+        # acquire/release is noticeably cheaper than a with statement
+        self._lock.acquire()
+        self._value += amount
+        self._lock.release()
+
+
+class _GaugeValue(_Value):
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        """
+        Increment the gauge
+        """
+        self._lock.acquire()
+        self._value += amount
+        self._lock.release()
+
+    def dec(self, amount=1):
+        """
+        Decrement the gauge
+        """
+        self._lock.acquire()
+        self._value -= amount
+        self._lock.release()
+
+    def set(self, value):
+        """
+        Set the gauge to the given value
+        """
+        self._value = value
+
+
+class _HistogramValue():
+    """
+    Buckets and sum of a histogram (one series of a metric)
+    """
+    __slots__ = ('_upper_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, upper_bounds):
+        self._upper_bounds = upper_bounds
+        self._counts = [0] * len(upper_bounds)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        Record an observation (e.g. a duration in seconds)
+
+        :param value: observed value
+        :type value: int | float
+        """
+        i = bisect.bisect_left(self._upper_bounds, value)
+        self._lock.acquire()
+        self._counts[i] += 1
+        self._sum += value
+        self._lock.release()
+
+    def get(self):
+        """
+        Returns the cumulative bucket counts, the count and the sum of the observations
+
+        :return: tuple (list of (upper bound, cumulative count), count, sum)
+        :rtype: tuple
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        buckets = []
+        cumulative = 0
+        for bound, count in zip(self._upper_bounds, counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return (buckets, cumulative, total)
+
+
+class Metric():
+    """
+    Base class of the metrics. A metric has one series (value) for each combination of label values
+
+    If the metric has no labels, the methods of its single value (inc, set, observe, ...) can be
+    called on the metric itself.
+
+    :param name: name of the metric
+    :param documentation: description of the metric (HELP)
+    :param labelnames: names of the labels
+    :type name: str
+    :type documentation: str
+    :type labelnames: list | tuple
+    """
+
+    type = 'untyped'
+    _value_methods = ()
+
+    def __init__(self, name, documentation='', labelnames=()):
+        if not _METRIC_NAME.match(name):
+            raise ValueError(f"Invalid metric name '{name}'")
+        for labelname in labelnames:
+            if not _LABEL_NAME.match(labelname) or labelname.startswith('__'):
+                raise ValueError(f"Invalid label name '{labelname}' for metric '{name}'")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}         # {label values (as given): value}
+        self._series = {}           # {label values (as str): value}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            value = self._new_value()
+            self._children[()] = value
+            self._series[()] = value
+            for method in self._value_methods:
+                setattr(self, method, getattr(value, method))
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *labelvalues):
+        """
+        Returns the series (value) of the metric for the given label values
+
+        The series is created on first use. Keep the returned object, if it is used on a hot path.
+
+        :param labelvalues: values of the labels (in the order of the labelnames)
+        :return: value object with the update methods of the metric (inc, set, observe, ...)
+        """
+        value = self._children.get(labelvalues)
+        if value is not None:
+            return value
+        if len(labelvalues) != len(self.labelnames) or not self.labelnames:
+            raise ValueError(f"Metric '{self.name}': Expected {len(self.labelnames)} label values, got {len(labelvalues)}")
+        key = tuple(str(v) for v in labelvalues)
+        with self._lock:
+            value = self._series.get(key)
+            if value is None:
+                value = self._new_value()
+                self._series[key] = value
+            self._children[labelvalues] = value
+        return value
+
+    def remove(self, *labelvalues):
+        """
+        Remove the series of the metric for the given label values (e.g. when a plugin is unloaded)
+        """
+        key = tuple(str(v) for v in labelvalues)
+        with self._lock:
+            self._series.pop(key, None)
+            for children_key in [k for k, v in self._children.items() if tuple(str(x) for x in k) == key]:
+                del self._children[children_key]
+
+    def _family_name(self, openmetrics):
+        return self.name
+
+    def _label_text(self, labelvalues, extra=''):
+        labels = [f'{name}="{_escape_label(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+        if extra:
+            labels.append(extra)
+        if not labels:
+            return ''
+        return '{' + ','.join(labels) + '}'
+
+    def _sample_lines(self, labelvalues, value):
+        return [f'{self.name}{self._label_text(labelvalues)} {_format_value(value.get())}']
+
+    def export(self, lines, openmetrics=False):
+        """
+        Append the metric in the text format to the given list of lines
+
+        :param lines: list of lines
+        :param openmetrics: use the OpenMetrics format instead of the Prometheus text format
+        :type lines: list
+        :type openmetrics: bool
+        """
+        family = self._family_name(openmetrics)
+        lines.append(f'# HELP {family} {_escape_help(self.documentation)}')
+        lines.append(f'# TYPE {family} {self.type}')
+        with self._lock:
+            series = list(self._series.items())
+        for labelvalues, value in series:
+            try:
+                lines.extend(self._sample_lines(labelvalues, value))
+            except Exception as e:
+                logger.debug(f"Metric '{self.name}': Cannot get value for labels {labelvalues}: {e}")
+
+
+class Counter(Metric):
+    """
+    A counter is a value, that only goes up (e.g. number of processed messages)
+
+    The name of a counter should end with '_total'.
+    """
+
+    type = 'counter'
+    _value_methods = ('inc', 'get', 'set_function')
+
+    def _new_value(self):
+        return _CounterValue()
+
+    def _family_name(self, openmetrics):
+        if openmetrics and self.name.endswith('_total'):
+            return self.name[:-6]
+        return self.name
+
+
+class Gauge(Metric):
+    """
+    A gauge is a value, that can go up and down (e.g. length of a queue)
+    """
+
+    type = 'gauge'
+    _value_methods = ('inc', 'dec', 'set', 'get', 'set_function')
+
+    def _new_value(self):
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    """
+    A histogram counts observations (e.g. durations) in buckets and sums them up
+
+    :param buckets: upper bounds of the buckets (+Inf is added automatically)
+    :type buckets: list | tuple
+    """
+
+    type = 'histogram'
+    _value_methods = ('observe', 'get')
+
+    def __init__(self, name, documentation='', labelnames=(), buckets=DEFAULT_BUCKETS):
+        if 'le' in labelnames:
+            raise ValueError(f"Metric '{name}': 'le' is a reserved label name for histograms")
+        upper_bounds = sorted(float(b) for b in buckets)
+        if not upper_bounds or upper_bounds[-1] != math.inf:
+            upper_bounds.append(math.inf)
+        self.upper_bounds = tuple(upper_bounds)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_value(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def _sample_lines(self, labelvalues, value):
+        buckets, count, total = value.get()
+        lines = []
+        for bound, cumulative in buckets:
+            le = 'le="' + _format_bound(bound) + '"'
+            lines.append(f'{self.name}_bucket{self._label_text(labelvalues, le)} {cumulative}')
+        labels = self._label_text(labelvalues)
+        lines.append(f'{self.name}_count{labels} {count}')
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        return lines
+
+
+def _format_bound(bound):
+    if math.isinf(bound):
+        return '+Inf'
+    return repr(float(bound))
+
+
+class MetricsRegistry():
+    """
+    Registry of all metrics of SmartHomeNG
+    """
+
+    _types = {'counter': Counter, 'gauge': Gauge, 'histogram': Histogram}
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_type, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._types[metric_type](name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+                return metric
+        if metric.type != metric_type or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric '{name}' is already registered as {metric.type} with labels {metric.labelnames}")
+        return metric
+
+    def counter(self, name, documentation='', labelnames=()):
+        """
+        Returns the counter with the given name (it is created, if it does not exist yet)
+
+        :param name: name of the metric (should end with '_total')
+        :param documentation: description of the metric
+        :param labelnames: names of the labels
+        :rtype: Counter
+        """
+        return self._get_or_create('counter', name, documentation, labelnames)
+
+    def gauge(self, name, documentation='', labelnames=()):
+        """
+        Returns the gauge with the given name (it is created, if it does not exist yet)
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param labelnames: names of the labels
+        :rtype: Gauge
+        """
+        return self._get_or_create('gauge', name, documentation, labelnames)
+
+    def histogram(self, name, documentation='', labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Returns the histogram with the given name (it is created, if it does not exist yet)
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param labelnames: names of the labels
+        :param buckets: upper bounds of the buckets
+        :rtype: Histogram
+        """
+        return self._get_or_create('histogram', name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        """
+        Returns the metric with the given name or None, if it is not registered
+        """
+        return self._metrics.get(name)
+
+    def unregister(self, name):
+        """
+        Remove the metric with the given name from the registry
+        """
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def get_names(self):
+        """
+        Returns the names of all registered metrics
+
+        :rtype: list
+        """
+        return sorted(self._metrics.keys())
+
+    def generate_text(self, openmetrics=False):
+        """
+        Returns all metrics in the Prometheus text format (or the OpenMetrics format)
+
+        :param openmetrics: use the OpenMetrics format
+        :type openmetrics: bool
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        for metric in metrics:
+            metric.export(lines, openmetrics)
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """
+    Returns the registry of SmartHomeNG
+
+    :rtype: MetricsRegistry
+    """
+    return _registry
+
+
+def counter(name, documentation='', labelnames=()):
+    """
+    Returns the counter with the given name from the registry of SmartHomeNG (see MetricsRegistry.counter)
+    """
+    return _registry.counter(name, documentation, labelnames)
+
+
+def gauge(name, documentation='', labelnames=()):
+    """
+    Returns the gauge with the given name from the registry of SmartHomeNG (see MetricsRegistry.gauge)
+    """
+    return _registry.gauge(name, documentation, labelnames)
+
+
+def histogram(name, documentation='', labelnames=(), buckets=DEFAULT_BUCKETS):
+    """
+    Returns the histogram with the given name from the registry of SmartHomeNG (see MetricsRegistry.histogram)
+    """
+    return _registry.histogram(name, documentation, labelnames, buckets)
+
+
+def generate_text(openmetrics=False):
+    """
+    Returns all metrics of SmartHomeNG in the Prometheus text format (or the OpenMetrics format)
+    """
+    return _registry.generate_text(openmetrics)
@@ -34,7 +34,7 @@ from contextlib import contextmanager
 import json
 from importlib import import_module
 
-from lib.network import Tcp_client
+from lib.network import Framer, Network, Tcp_client
 
 from lib.model.sdp.globals import (
     sanitize_param, CONN_NET_TCP_REQ, CONN_NULL, CONN_SER_DIR, CONNECTION_TYPES,
@@ -42,6 +42,8 @@ from lib.model.sdp.globals import (
     PLUGIN_ATTR_CONN_AUTO_CONN, PLUGIN_ATTR_CONN_AUTO_RECONN, PLUGIN_ATTR_CONN_BINARY,
     PLUGIN_ATTR_CONN_CYCLE, PLUGIN_ATTR_CONN_RETRIES, PLUGIN_ATTR_CONN_RETRY_CYCLE,
     PLUGIN_ATTR_CONN_RETRY_SUSPD, PLUGIN_ATTR_CONN_TERMINATOR, PLUGIN_ATTR_CB_SUSPEND,
+    PLUGIN_ATTR_CONN_POOL_SIZE, PLUGIN_ATTR_CONN_KEEPALIVE, PLUGIN_ATTR_CONN_REQ_RETRIES, PLUGIN_ATTR_CONN_REQ_BACKOFF,
+    PLUGIN_ATTR_CONN_CONCURRENCY, PLUGIN_ATTR_CONN_REACTOR,
     PLUGIN_ATTR_CONN_TIMEOUT, PLUGIN_ATTR_NET_HOST, PLUGIN_ATTR_NET_PORT,
     PLUGIN_ATTR_PROTOCOL, PLUGIN_ATTR_SERIAL_BAUD, PLUGIN_ATTR_SERIAL_BSIZE,
     PLUGIN_ATTR_SERIAL_PARITY, PLUGIN_ATTR_SERIAL_PORT, PLUGIN_ATTR_SERIAL_STOP,
@@ -68,6 +70,8 @@ class SDPConnection(object):
     dummy = None
     _send_lock = None
     use_send_lock = False
+    # set to True if the connection can handle concurrent send() calls
+    concurrent_send = False
     _params = None
 
     def __init__(self, data_received_callback, name=None, **kwargs):
@@ -105,6 +109,12 @@ class SDPConnection(object):
                         PLUGIN_ATTR_CONN_CYCLE: 5,
                         PLUGIN_ATTR_CONN_RETRY_CYCLE: 30,
                         PLUGIN_ATTR_CONN_RETRY_SUSPD: 0,
+                        PLUGIN_ATTR_CONN_CONCURRENCY: 1,
+                        PLUGIN_ATTR_CONN_REACTOR: False,
+                        PLUGIN_ATTR_CONN_POOL_SIZE: 1,
+                        PLUGIN_ATTR_CONN_KEEPALIVE: True,
+                        PLUGIN_ATTR_CONN_REQ_RETRIES: 0,
+                        PLUGIN_ATTR_CONN_REQ_BACKOFF: 0,
                         PLUGIN_ATTR_CONN_TERMINATOR: '',
                         PLUGIN_ATTR_CB_ON_CONNECT: None,
                         PLUGIN_ATTR_CB_ON_DISCONNECT: None,
@@ -188,6 +198,20 @@ class SDPConnection(object):
         """ getter for self._is_connected """
         return self._is_connected
 
+    def get_concurrency(self):
+        """
+        Return the number of commands which may be sent concurrently
+
+        :return: number of concurrent send() calls, 1 if not supported by connection
+        :rtype: int
+        """
+        if not self.concurrent_send:
+            return 1
+        try:
+            return max(1, int(self._params.get(PLUGIN_ATTR_CONN_CONCURRENCY, 1)))
+        except (TypeError, ValueError):
+            return 1
+
     def on_data_received(self, by, data):
         """ callback for on_data_received event """
         if data:
@@ -419,13 +443,30 @@ class SDPConnectionNetTcpRequest(SDPConnection):
     - data is encoded in the url for GET or sent as dict for POST
 
     Response data is returned as text. Errors raise HTTPException
+
+    All requests use a persistent session, so connections are kept alive
+    between requests (configurable with pool_size, keepalive, request_retries,
+    request_backoff and timeout). Requests can be sent concurrently, limited
+    by concurrent_requests.
     """
+    _session = None
+    concurrent_send = True
+
     def _open(self):
         self.logger.debug(f'{self.__class__.__name__} opening connection as {__name__} with params {self._params}')
+        if self._session is None:
+            self._session = Network.create_session(pool_maxsize=max(self._params[PLUGIN_ATTR_CONN_POOL_SIZE], self.get_concurrency()),
+                                                   keepalive=self._params[PLUGIN_ATTR_CONN_KEEPALIVE],
+                                                   retries=self._params[PLUGIN_ATTR_CONN_REQ_RETRIES],
+                                                   backoff_factor=self._params[PLUGIN_ATTR_CONN_REQ_BACKOFF])
+        self._is_connected = True
         return True
 
     def _close(self):
         self.logger.debug(f'{self.__class__.__name__} closing connection as {__name__} with params {self._params}')
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     def _send(self, data_dict):
         url = data_dict.get('payload', None)
@@ -450,13 +491,17 @@ class SDPConnectionNetTcpRequest(SDPConnection):
         # needed for LMS, Requests does funny things converting data dict to json...
         par['data'] = json.dumps(par['data'])
 
+        if self._session is None:
+            self._open()
+
         # send data
-        response = requests.request(request_method, url,
-                                    params=par['params'],
-                                    headers=par['headers'],
-                                    data=par['data'],
-                                    cookies=par['cookies'],
-                                    files=par['files'])
+        response = self._session.request(request_method, url,
+                                         params=par['params'],
+                                         headers=par['headers'],
+                                         data=par['data'],
+                                         cookies=par['cookies'],
+                                         files=par['files'],
+                                         timeout=self._params[PLUGIN_ATTR_CONN_TIMEOUT] or None)
 
         self.logger.debug(f'{self.__class__.__name__} received response {response.text} with code {response.status_code}')
 
@@ -504,7 +549,8 @@ class SDPConnectionNetTcpClient(SDPConnection):
                                retry_cycle=self._params[PLUGIN_ATTR_CONN_RETRY_CYCLE],
                                retry_abort=self._params[PLUGIN_ATTR_CONN_RETRY_SUSPD],
                                abort_callback=self._on_abort,
-                               terminator=self._params[PLUGIN_ATTR_CONN_TERMINATOR])
+                               terminator=self._params[PLUGIN_ATTR_CONN_TERMINATOR],
+                               reactor=self._params[PLUGIN_ATTR_CONN_REACTOR])
         self._tcp.set_callbacks(data_received=self.on_data_received,
                                 disconnected=self.on_disconnect,
                                 connected=self.on_connect)
@@ -939,7 +985,7 @@ class SDPConnectionSerialAsync(SDPConnectionSerial):
 
     def __receive_thread_worker(self):
         """ thread worker to handle receiving """
-        __buffer = b''
+        framer = Framer(self._params[PLUGIN_ATTR_CONN_TERMINATOR])
 
         msg = None
         self._is_receiving = True
@@ -953,26 +999,13 @@ class SDPConnectionSerialAsync(SDPConnectionSerial):
 
                 if msg:
 
-                    self.logger.debug(f'received raw data {msg}, buffer is {__buffer}')
+                    self.logger.debug(f'received raw data {msg}, buffer holds {len(framer)} bytes')
                     # If we work in line mode (with a terminator) slice buffer into single chunks based on terminator
                     if self._params[PLUGIN_ATTR_CONN_TERMINATOR]:
-                        __buffer += msg
-                        while True:
-                            # terminator = int means fixed size chunks
-                            if isinstance(self._params[PLUGIN_ATTR_CONN_TERMINATOR], int):
-                                i = self._params[PLUGIN_ATTR_CONN_TERMINATOR]
-                                if i > len(__buffer):
-                                    break
-                            # terminator is str or bytes means search for it
-                            else:
-                                i = __buffer.find(self._params[PLUGIN_ATTR_CONN_TERMINATOR])
-                                if i == -1:
-                                    break
-                                i += len(self._params[PLUGIN_ATTR_CONN_TERMINATOR])
-                            line = __buffer[:i]
-                            __buffer = __buffer[i:]
+                        framer.feed(msg)
+                        for line in framer.frames():
                             if self._data_received_callback:
-                                self._data_received_callback(self, line if self._params[PLUGIN_ATTR_CONN_BINARY] else str(line, 'utf-8').strip())
+                                self._data_received_callback(self, bytes(line) if self._params[PLUGIN_ATTR_CONN_BINARY] else str(line, 'utf-8').strip())
                     # If not in terminator mode just forward what we received
 
                 if not self._listener_active:
@@ -79,7 +79,8 @@ class WebInterface(SmartPluginWebIf):
                            plgitems=plgitems,
                            running={dev: self.plugin._devices[dev]['device'].alive for dev in self.plugin._devices},
                            devices=self.plugin._devices,
-                           lookups={dev: self.plugin._devices[dev]['device']._commands._lookups for dev in self.plugin._devices})
+                           lookups={dev: self.plugin._devices[dev]['device']._commands._lookups for dev in self.plugin._devices},
+                           cyclic_stats={dev: self.plugin._devices[dev]['device'].get_cyclic_stats() for dev in self.plugin._devices})
 
     @cherrypy.expose
     def submit(self, button=None, param=None):
@@ -59,6 +59,14 @@ PLUGIN_ATTR_CONN_AUTO_RECONN = 'autoreconnect'           # (re)connect automatic
 PLUGIN_ATTR_CONN_AUTO_CONN   = 'autoconnect'             # (re)connect automatically on send
 PLUGIN_ATTR_CONN_RETRY_CYCLE = 'retry_cycle'             # if autoreconnect: how many seconds to wait between retry rounds
 PLUGIN_ATTR_CONN_RETRY_SUSPD = 'retry_suspend'           # after this number of failed connect cycles, activate suspend mode (if enabled)
+PLUGIN_ATTR_CONN_CONCURRENCY = 'concurrent_requests'     # max number of concurrent cyclic reads (if supported by connection)
+PLUGIN_ATTR_CONN_REACTOR     = 'network_reactor'         # use shared network reactor instead of own threads (TCP client only)
+
+# http request attributes
+PLUGIN_ATTR_CONN_POOL_SIZE   = 'pool_size'               # maximum number of kept-alive connections per host
+PLUGIN_ATTR_CONN_KEEPALIVE   = 'keepalive'               # keep connections open between requests
+PLUGIN_ATTR_CONN_REQ_RETRIES = 'request_retries'         # how often to retry a failed request
+PLUGIN_ATTR_CONN_REQ_BACKOFF = 'request_backoff'         # backoff factor between request retries
 
 # network attributes
 PLUGIN_ATTR_NET_HOST         = 'host'                    # hostname / IP for network connection
@@ -85,7 +93,9 @@ PLUGIN_ATTRS = (PLUGIN_ATTR_MODEL, PLUGIN_ATTR_CMD_CLASS, PLUGIN_ATTR_RECURSIVE,
                 PLUGIN_ATTR_SUSPEND_ITEM, PLUGIN_ATTR_CONNECTION,
                 PLUGIN_ATTR_CONN_TIMEOUT, PLUGIN_ATTR_CONN_TERMINATOR, PLUGIN_ATTR_CONN_BINARY,
                 PLUGIN_ATTR_CONN_RETRIES, PLUGIN_ATTR_CONN_CYCLE, PLUGIN_ATTR_CONN_AUTO_RECONN, PLUGIN_ATTR_CONN_AUTO_CONN,
-                PLUGIN_ATTR_CONN_RETRY_CYCLE, PLUGIN_ATTR_CONN_RETRY_SUSPD, PLUGIN_ATTR_NET_HOST, PLUGIN_ATTR_NET_PORT,
+                PLUGIN_ATTR_CONN_RETRY_CYCLE, PLUGIN_ATTR_CONN_RETRY_SUSPD, PLUGIN_ATTR_CONN_CONCURRENCY, PLUGIN_ATTR_CONN_REACTOR,
+                PLUGIN_ATTR_CONN_POOL_SIZE, PLUGIN_ATTR_CONN_KEEPALIVE,
+                PLUGIN_ATTR_CONN_REQ_RETRIES, PLUGIN_ATTR_CONN_REQ_BACKOFF, PLUGIN_ATTR_NET_HOST, PLUGIN_ATTR_NET_PORT,
                 PLUGIN_ATTR_SERIAL_PORT, PLUGIN_ATTR_SERIAL_BAUD, PLUGIN_ATTR_SERIAL_BSIZE, PLUGIN_ATTR_SERIAL_PARITY,
                 PLUGIN_ATTR_SERIAL_STOP, PLUGIN_ATTR_PROTOCOL, PLUGIN_ATTR_MSG_TIMEOUT, PLUGIN_ATTR_MSG_REPEAT,
                 PLUGIN_ATTR_CB_ON_CONNECT, PLUGIN_ATTR_CB_ON_DISCONNECT, PLUGIN_ATTR_CB_SUSPEND)
@@ -31,7 +31,7 @@ from lib.model.sdp.globals import (
     PLUGIN_ATTR_CB_ON_DISCONNECT, PLUGIN_ATTR_CONNECTION,
     PLUGIN_ATTR_CONN_AUTO_CONN, PLUGIN_ATTR_CONN_CYCLE, PLUGIN_ATTR_CONN_RETRIES,
     PLUGIN_ATTR_CONN_TIMEOUT, PLUGIN_ATTR_MSG_REPEAT, PLUGIN_ATTR_MSG_TIMEOUT,
-    PLUGIN_ATTR_NET_HOST, PLUGIN_ATTR_NET_PORT)
+    PLUGIN_ATTR_NET_HOST, PLUGIN_ATTR_NET_PORT, PLUGIN_ATTR_CONN_CONCURRENCY)
 from lib.model.sdp.connection import SDPConnection
 
 from collections import OrderedDict
@@ -111,6 +111,10 @@ class SDPProtocol(SDPConnection):
         self.logger.debug(f'{self.__class__.__name__} _send called with {data_dict}')
         return self._connection.send(data_dict)
 
+    def get_concurrency(self):
+        """ pass on the concurrency of the underlying connection """
+        return self._connection.get_concurrency()
+
     def _get_connection(self, use_callbacks=False, name=None):
         conn_params = self._params.copy()
 
@@ -143,7 +147,10 @@ class SDPProtocolJsonrpc(SDPProtocol):
         def data_received_callback(by, message, command=None)
     If callbacks are class members, they need the additional first parameter 'self'
 
+    As replies are matched by message id, commands can be sent concurrently.
     """
+    concurrent_send = True
+
     def __init__(self, data_received_callback, name=None, **kwargs):
 
         self.logger = logging.getLogger(__name__)
@@ -176,6 +183,7 @@ class SDPProtocolJsonrpc(SDPProtocol):
                         PLUGIN_ATTR_CB_ON_DISCONNECT: None,
                         PLUGIN_ATTR_CB_ON_CONNECT: None,
                         PLUGIN_ATTR_CONNECTION: CONN_NET_TCP_CLI,
+                        PLUGIN_ATTR_CONN_CONCURRENCY: 1,
                         JSON_MOVE_KEYS: []}
         self._params.update(kwargs)
 
@@ -197,6 +205,10 @@ class SDPProtocolJsonrpc(SDPProtocol):
         # tell someone about our actual class
         self.logger.debug(f'protocol initialized from {self.__class__.__name__}')
 
+    def get_concurrency(self):
+        """ replies are matched by message id, so use own setting instead of the connection's """
+        return SDPConnection.get_concurrency(self)
+
     def on_connect(self, by=None):
         self.logger.info(f'onconnect called by {by}, send queue contains {self._send_queue.qsize()} commands')
         super().on_connect(by)
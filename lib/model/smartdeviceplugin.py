@@ -30,7 +30,11 @@ import os
 import sys
 import time
 import json
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from datetime import timedelta
 from ast import literal_eval
 from collections import OrderedDict
 
@@ -161,7 +165,17 @@ class SmartDevicePlugin(SmartPlugin):
         # if not discarding data, set this command instead
         self._unknown_command = '.notify.'
         self._initial_value_read_done = False
-        self._cyclic_update_active = False
+        # heap of cyclic reads, ordered by the time they are due next
+        # [<next>, <command or group>, <is_group>]
+        self._cyclic_heap = []
+        self._cyclic_lock = threading.Lock()
+        # commands/groups currently being read
+        self._cyclic_pending = set()
+        # executor for concurrent cyclic reads, if the connection allows it
+        self._cyclic_executor = None
+        # statistics for cyclic reads
+        # <command or group>: {'cycle': <cycle>, 'count': <n>, 'last': <s>, 'avg': <s>, 'max': <s>, 'delay': <s>, 'overruns': <n>}
+        self._cyclic_stats = {}
         # plugin-wide cycle interval, -1 is undefined
         self._cycle = self.get_parameter_value(PLUGIN_ATTR_CYCLE)
         if self._cycle is None:
@@ -326,8 +340,7 @@ class SmartDevicePlugin(SmartPlugin):
             self.resume(by)
 
         if suspend_active:
-            if self.scheduler_get(self.get_shortname() + '_cyclic'):
-                self.scheduler_remove(self.get_shortname() + '_cyclic')
+            self._remove_cyclic_scheduler()
 
         else:
             if self._connection.connected() and not SDP_standalone:
@@ -356,8 +369,7 @@ class SmartDevicePlugin(SmartPlugin):
         self.logger.dbghigh(self.translate("Methode '{method}' aufgerufen", {'method': 'stop()'}))
 
         self.alive = False
-        if self.scheduler_get(self.get_shortname() + '_cyclic'):
-            self.scheduler_remove(self.get_shortname() + '_cyclic')
+        self._remove_cyclic_scheduler()
         self.disconnect()
 
     def connect(self):
@@ -1009,34 +1021,81 @@ class SmartDevicePlugin(SmartPlugin):
 
     def _create_cyclic_scheduler(self):
         """
-        Setup the scheduler to handle cyclic read commands and find the proper
-        time for the cycle.
+        Setup the heap of cyclic read commands and read group triggers and
+        arm the scheduler for the first due entry.
+
+        Every command / group is scheduled from its own next due time. If the
+        connection allows concurrent requests, reads are dispatched to a thread
+        pool limited to the number of concurrent requests of the connection.
         """
         if not self.alive:
             return
 
-        # find shortest cycle
-        shortestcycle = -1
-        for cmd in self._commands_cyclic:
-            cycle = self._commands_cyclic[cmd]['cycle']
-            if shortestcycle == -1 or cycle < shortestcycle:
-                shortestcycle = cycle
-        for grp in self._triggers_cyclic:
-            cycle = self._triggers_cyclic[grp]['cycle']
-            if shortestcycle == -1 or cycle < shortestcycle:
-                shortestcycle = cycle
-
-        # Start the worker thread
-        if shortestcycle != -1:
-
-            # Balance unnecessary calls and precision
-            workercycle = int(shortestcycle / 2)
-
-            # just in case it already exists...
-            if self.scheduler_get(self.get_shortname() + '_cyclic'):
-                self.scheduler_remove(self.get_shortname() + '_cyclic')
-            self.scheduler_add(self.get_shortname() + '_cyclic', self._read_cyclic_values, cycle=workercycle, prio=5, offset=0)
-            self.logger.info(f'Added cyclic worker thread {self.get_shortname()}_cyclic with {workercycle} s cycle. Shortest item update cycle found was {shortestcycle} s')
+        # entries not read yet are due immediately
+        currenttime = time.time()
+        with self._cyclic_lock:
+            self._cyclic_heap = []
+            for cmd in self._commands_cyclic:
+                if cmd not in self._cyclic_pending:
+                    self._cyclic_heap.append([self._commands_cyclic[cmd]['next'] or currenttime, cmd, False])
+            for grp in self._triggers_cyclic:
+                if grp not in self._cyclic_pending:
+                    self._cyclic_heap.append([self._triggers_cyclic[grp]['next'] or currenttime, grp, True])
+            heapq.heapify(self._cyclic_heap)
+
+        if not self._cyclic_heap:
+            return
+
+        concurrency = self._connection.get_concurrency()
+        if concurrency > 1 and self._cyclic_executor is None:
+            self._cyclic_executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=self.get_shortname() + '_cyclic')
+
+        self._schedule_cyclic()
+        self.logger.info(f'Added cyclic reading of {len(self._commands_cyclic)} commands and {len(self._triggers_cyclic)} read groups with up to {concurrency} concurrent reads')
+
+    def _remove_cyclic_scheduler(self):
+        """
+        Remove the scheduler for cyclic reads and the executor for concurrent reads
+
+        Reads still running are not requeued when they finish, all entries are
+        added to the heap again by _create_cyclic_scheduler()
+        """
+        if self.scheduler_get(self.get_shortname() + '_cyclic'):
+            self.scheduler_remove(self.get_shortname() + '_cyclic')
+        executor = self._cyclic_executor
+        self._cyclic_executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        with self._cyclic_lock:
+            self._cyclic_pending.clear()
+
+    def _schedule_cyclic(self):
+        """
+        (Re-)arm the scheduler for the next due cyclic read
+        """
+        if not self.alive or self.suspended:
+            return
+
+        with self._cyclic_lock:
+            if not self._cyclic_heap:
+                return
+            delay = max(0, self._cyclic_heap[0][0] - time.time())
+
+        next_time = self.shtime.now() + timedelta(seconds=delay)
+        if self.scheduler_get(self.get_shortname() + '_cyclic'):
+            self.scheduler_change(self.get_shortname() + '_cyclic', next=next_time)
+        else:
+            self.scheduler_add(self.get_shortname() + '_cyclic', self._read_cyclic_values, prio=5, next=next_time)
+
+    def get_cyclic_stats(self):
+        """
+        Return statistics for cyclic reads, e.g. for display in the web interface
+
+        :return: dict with cycle, read count, last/avg/max latency and delay in seconds and number of overruns per command / read group
+        :rtype: dict
+        """
+        with self._cyclic_lock:
+            return {name: dict(stats) for name, stats in self._cyclic_stats.items()}
 
     def _read_initial_values(self):
         """
@@ -1062,74 +1121,122 @@ class SmartDevicePlugin(SmartPlugin):
     def _read_cyclic_values(self):
         """
         Recall function for cyclic scheduler.
-        Reads all values configured to be read cyclically.
+        Reads all values configured to be read cyclically which are due.
         """
-        # check if another cyclic cmd run is still active
-        if self._cyclic_update_active:
-            self.logger.warning('Triggered cyclic command read, but previous cyclic run is still active. Check device and cyclic configuration (too much/too short?)')
-            return
-        else:
-            self.logger.info('Triggering cyclic command read')
-
-        # set lock
-        self._cyclic_update_active = True
         currenttime = time.time()
-        read_cmds = 0
+        # the executor may be removed by set_suspend() / stop() while reading
+        executor = self._cyclic_executor
         todo = []
-        for cmd in self._commands_cyclic:
+        with self._cyclic_lock:
+            while self._cyclic_heap and self._cyclic_heap[0][0] <= currenttime:
+                entry = heapq.heappop(self._cyclic_heap)
+                self._cyclic_pending.add(entry[1])
+                todo.append(entry)
 
-            # Is the command already due?
-            if self._commands_cyclic[cmd]['next'] <= currenttime:
-                todo.append(cmd)
+        if todo:
+            self.logger.info(f'Triggering cyclic read of {len(todo)} commands / read groups')
 
-        for cmd in todo:
+        for index, entry in enumerate(todo):
             # repeatedly check if shng wants to stop to prevent stalling shng
             if not self.alive:
                 self.logger.info('Stop command issued, cancelling cyclic read')
+                self._requeue_cyclic(todo[index:], currenttime)
                 return
 
             # also leave early on disconnect
             if not self._connection.connected():
                 self.logger.info('Disconnect detected, cancelling cyclic read')
-                return
+                self._requeue_cyclic(todo[index:], currenttime)
+                break
 
-            self.logger.debug(f'Triggering cyclic read of command {cmd}')
-            self.send_command(cmd)
-            self._commands_cyclic[cmd]['next'] = currenttime + self._commands_cyclic[cmd]['cycle']
-            read_cmds += 1
+            if executor is not None:
+                try:
+                    executor.submit(self._read_cyclic_entry, *entry)
+                except RuntimeError:
+                    self.logger.info('Concurrent reads have been stopped, cancelling cyclic read')
+                    self._requeue_cyclic(todo[index:], currenttime)
+                    break
+            else:
+                self._read_cyclic_entry(*entry, schedule=False)
 
-        if read_cmds:
-            self.logger.debug(f'Cyclic command read took {(time.time() - currenttime):.1f} seconds for {read_cmds} items')
+        if todo and executor is None:
+            self.logger.debug(f'Cyclic read took {(time.time() - currenttime):.1f} seconds for {len(todo)} commands / read groups')
+        self._schedule_cyclic()
 
-        currenttime = time.time()
-        read_grps = 0
-        todo = []
-        for grp in self._triggers_cyclic:
+    def _read_cyclic_entry(self, due, name, is_group, schedule=True):
+        """
+        Read single cyclic command or trigger read group, update statistics and
+        requeue for next read
 
-            # Is the trigger already due?
-            if self._triggers_cyclic[grp]['next'] <= currenttime:
-                todo.append(grp)
+        :param due: time the read was due
+        :param name: command or read group
+        :param is_group: True if name is a read group
+        :param schedule: re-arm scheduler after reading
+        """
+        cyclic = self._triggers_cyclic if is_group else self._commands_cyclic
+        start = time.time()
+        try:
+            if is_group:
+                self.logger.debug(f'Triggering cyclic read of group {name}')
+                self.read_all_commands(name)
+            else:
+                self.logger.debug(f'Triggering cyclic read of command {name}')
+                self.send_command(name)
+        except Exception as e:
+            self.logger.warning(f'Cyclic read of {name} failed, error was: {e}')
+        end = time.time()
 
-        for grp in todo:
-            # repeatedly check if shng wants to stop to prevent stalling shng
-            if not self.alive:
-                self.logger.info('Stop command issued, cancelling cyclic trigger')
-                return
+        with self._cyclic_lock:
+            # not pending any more, if cyclic reads have been removed in the meantime
+            # (the entry is added again by _create_cyclic_scheduler())
+            requeue = name in self._cyclic_pending
+            self._cyclic_pending.discard(name)
 
-            # also leave early on disconnect
-            if not self._connection.connected():
-                self.logger.info('Disconnect detected, cancelling cyclic trigger')
+            # command or group removed in the meantime
+            if name not in cyclic:
                 return
-
-            self.logger.debug(f'Triggering cyclic read of group {grp}')
-            self.read_all_commands(grp)
-            self._triggers_cyclic[grp]['next'] = currenttime + self._triggers_cyclic[grp]['cycle']
-            read_grps += 1
-
-        if read_grps:
-            self.logger.debug(f'Cyclic triggers took {(time.time() - currenttime):.1f} seconds for {read_grps} groups')
-
-        self._cyclic_update_active = False
+            cycle = cyclic[name]['cycle']
+
+            # next read is due one cycle after the previous due time. If reading took
+            # longer than that (overrun), skip the missed cycles
+            next_due = due + cycle
+            overrun = next_due <= end
+            if overrun:
+                next_due += cycle * int((end - next_due) / cycle + 1)
+            cyclic[name]['next'] = next_due
+            if requeue:
+                heapq.heappush(self._cyclic_heap, [next_due, name, is_group])
+
+            stats = self._cyclic_stats.setdefault(name, {'cycle': cycle, 'count': 0, 'last': 0, 'avg': 0, 'max': 0, 'delay': 0, 'overruns': 0})
+            latency = end - start
+            stats['cycle'] = cycle
+            stats['count'] += 1
+            stats['last'] = latency
+            stats['avg'] += (latency - stats['avg']) / stats['count']
+            stats['max'] = max(stats['max'], latency)
+            stats['delay'] = max(0, start - due)
+            if overrun:
+                stats['overruns'] += 1
+
+        if overrun:
+            self.logger.warning(f'Cyclic read of {name} took {latency:.1f} seconds, which exceeds its cycle of {cycle} seconds. Check device and cyclic configuration (too much/too short?)')
+
+        if schedule:
+            self._schedule_cyclic()
+
+    def _requeue_cyclic(self, entries, currenttime):
+        """
+        Put back cyclic reads which could not be dispatched, retry after their cycle
+        """
+        with self._cyclic_lock:
+            for due, name, is_group in entries:
+                if name not in self._cyclic_pending:
+                    # cyclic reads have been removed in the meantime
+                    continue
+                self._cyclic_pending.discard(name)
+                cyclic = self._triggers_cyclic if is_group else self._commands_cyclic
+                if name in cyclic:
+                    heapq.heappush(self._cyclic_heap, [currenttime + cyclic[name]['cycle'], name, is_group])
 
     def _read_configuration(self):
         """
@@ -29,28 +29,44 @@ These classes, functions and methods are mainly meant to be used by plugin devel
 
 - class Network provides utility methods for network-related tasks
 - class Html provides methods for communication with resp. requests to a HTTP server
+- class AsyncHttp provides asyncio-based HTTP requests for concurrent polling (needs aiohttp)
 - class Tcp_client provides a two-way TCP client implementation
+- class Tcp_reactor provides a shared selector loop for Tcp_client instances
+- class Framer splits a received byte stream into frames by terminator or fixed size
 - class Tcp_server provides a TCP listener with connection / data callbacks
 - class Udp_server provides a UDP listener with data callbacks
 """
 
 from lib.utils import Utils
+import os
 import sys
 import traceback
 from inspect import signature
 import re
 import asyncio
+import errno
+import heapq
+import itertools
+import selectors
 import logging
+import json
 import requests
+from urllib3.util.retry import Retry
 from iowait import IOWait
 import socket
 import struct
 import subprocess
 import threading
 import time
+from collections import deque
 from contextlib import suppress
 from . import aioudp
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # noqa
+
 
 # Turn off ssl warnings from urllib
 requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
@@ -240,6 +256,38 @@ class Network(object):
         return pattern.sub(replacement[mode], uri)
 
 
+    @staticmethod
+    def create_session(pool_maxsize=10, keepalive=True, retries=0, backoff_factor=0):
+        """
+        Create a requests session with a connection pool for persistent (keep-alive) connections.
+
+        Reusing a session avoids establishing a new TCP (and TLS) connection for every
+        request, which is noticeable for devices polled every few seconds.
+
+        :param pool_maxsize: Maximum number of kept-alive connections per host
+        :param keepalive: Keep connections open between requests
+        :param retries: Number of retries on connection errors and 502/503/504 responses
+        :param backoff_factor: Backoff factor between retries
+
+        :type pool_maxsize: int
+        :type keepalive: bool
+        :type retries: int
+        :type backoff_factor: float
+
+        :return: configured session
+        :rtype: requests.Session
+        """
+        session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff_factor,
+                      status_forcelist=(502, 503, 504), raise_on_status=False)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not keepalive:
+            session.headers['Connection'] = 'close'
+        return session
+
+
 class Connections(object):
     """
     Within SmartHome.py there is one instance of this class
@@ -275,23 +323,37 @@ class Http(object):
     :param baseurl: base URL used everywhere in this instance (example: http://www.myserver.tld)
     :param timeout: Set a maximum amount of seconds the class should try to establish a connection
     :param hide_login: Hide or mask login data in logged http(s) requests (see ``Network.clean_uri()``)
+    :param pool_maxsize: Maximum number of kept-alive connections per host
+    :param keepalive: Keep connections open between requests (set False to close after each request)
+    :param retries: Number of retries on connection errors and 502/503/504 responses
+    :param backoff_factor: Backoff factor between retries (0, 2x, 4x, ... seconds)
 
     :type baseurl: str
     :type timeout: int
     :type hide_login: str
+    :type pool_maxsize: int
+    :type keepalive: bool
+    :type retries: int
+    :type backoff_factor: float
     """
 
-    def __init__(self, baseurl='', timeout=10, hide_login='show', name=None):
+    def __init__(self, baseurl='', timeout=10, hide_login='show', name=None, pool_maxsize=10, keepalive=True, retries=0, backoff_factor=0):
         self.logger = logging.getLogger(__name__)
 
         self.baseurl = baseurl
         self._response = None
         self.timeout = timeout
-        self._session = requests.Session()
+        self._session = Network.create_session(pool_maxsize=pool_maxsize, keepalive=keepalive, retries=retries, backoff_factor=backoff_factor)
         self._hide_login = hide_login
 
         self._id = f'({name if name else "HTTP"}_{self.baseurl})'
 
+    def close(self):
+        """
+        Close the underlying session and all kept-alive connections.
+        """
+        self._session.close()
+
     def HTTPDigestAuth(self, user=None, password=None):
         """
         Create a HTTPDigestAuth instance and returns it to the caller.
@@ -522,6 +584,320 @@ class Http(object):
         return True
 
 
+class AsyncHttp(object):
+    """
+    Provide asyncio-based HTTP requests, e.g. to poll many devices concurrently from one event loop.
+
+    All requests of one instance share a connection pool with kept-alive connections.
+    This class needs the ``aiohttp`` package, which is not installed by default.
+
+    :param baseurl: base URL used everywhere in this instance (example: http://www.myserver.tld)
+    :param timeout: Set a maximum amount of seconds for a request
+    :param hide_login: Hide or mask login data in logged http(s) requests (see ``Network.clean_uri()``)
+    :param pool_maxsize: Maximum number of concurrent connections
+    :param keepalive: Keep connections open between requests
+
+    :type baseurl: str
+    :type timeout: int
+    :type hide_login: str
+    :type pool_maxsize: int
+    :type keepalive: bool
+    """
+
+    def __init__(self, baseurl='', timeout=10, hide_login='show', name=None, pool_maxsize=10, keepalive=True):
+        self.logger = logging.getLogger(__name__)
+
+        if aiohttp is None:
+            raise ImportError('AsyncHttp needs the python package aiohttp, please install it')
+
+        self.baseurl = baseurl
+        self.timeout = timeout
+        self._hide_login = hide_login
+        self._pool_maxsize = pool_maxsize
+        self._keepalive = keepalive
+        self._session = None
+
+        self._id = f'({name if name else "AsyncHTTP"}_{self.baseurl})'
+
+    def _get_session(self):
+        # the session needs to be created from within the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_maxsize, force_close=not self._keepalive)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        """
+        Close the underlying session and all kept-alive connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method='get', url=None, params=None, verify=True, **kwargs):
+        """
+        Launch a request and return the status code and the answer as string.
+
+        :param method: request method, e.g. 'get' or 'post'
+        :param url: Optional URL to fetch from. If None (default) use baseurl given on init.
+        :param params: Optional dict of parameters to add to URL query string.
+        :param verify: Set to false to ignore SSL certificate verification errors (for self-signed for example)
+
+        :type method: str
+        :type url: str
+        :type params: dict
+        :type verify: bool
+
+        :return: tuple of status code and text, status code is 0 and text is None on error
+        :rtype: tuple(int, str | None)
+        """
+        url = self.baseurl + url if url else self.baseurl
+        self.logger.info(f'{self._id} sending {method.upper()} request to {Network.clean_uri(url, self._hide_login)}')
+        try:
+            async with self._get_session().request(method, url, params=params, ssl=None if verify else False, **kwargs) as response:
+                text = await response.text()
+                self.logger.debug(f'{self._id} ({response.status}, {response.reason}) fetched URL {Network.clean_uri(url, self._hide_login)}')
+                return response.status, text
+        except Exception as e:
+            self.logger.warning(f'{self._id} error sending {method.upper()} request to {Network.clean_uri(url, self._hide_login)}: {e}')
+            return 0, None
+
+    async def get_text(self, url=None, params=None, verify=True):
+        """
+        Launch a GET request and return answer as string or None on error.
+
+        :param url: Optional URL to fetch from. Default is to use baseurl given to constructor.
+        :param params: Optional dict of parameters to add to URL query string.
+
+        :type url: str
+        :type params: dict
+
+        :return: Answer decoded into a string or None on whatever error occured
+        :rtype: str | None
+        """
+        status, text = await self.request('get', url=url, params=params, verify=verify)
+        return text if status else None
+
+    async def get_json(self, url=None, params=None, verify=True):
+        """
+        Launch a GET request and return JSON answer as a dict or None on error.
+
+        :param url: Optional URL to fetch from. If None (default) use baseurl given on init.
+        :param params: Optional dict of parameters to add to URL query string.
+
+        :type url: str
+        :type params: dict
+
+        :return: JSON answer decoded into a dict or None on whatever error occured
+        :rtype: dict | None
+        """
+        text = await self.get_text(url=url, params=params, verify=verify)
+        return self._decode_json(text, url)
+
+    async def post_json(self, url=None, params=None, verify=True, json=None):
+        """
+        Launch a POST request with JSON data and return JSON answer as a dict or None on error.
+
+        :param url: Optional URL to post to. If None (default) use baseurl given on init.
+        :param params: Optional dict of parameters to add to URL query string.
+        :param json: data to send as JSON
+
+        :type url: str
+        :type params: dict
+
+        :return: JSON answer decoded into a dict or None on whatever error occured
+        :rtype: dict | None
+        """
+        status, text = await self.request('post', url=url, params=params, verify=verify, json=json)
+        return self._decode_json(text if status else None, url)
+
+    def _decode_json(self, text, url):
+        if text is None:
+            return None
+        try:
+            return json.loads(text)
+        except Exception:
+            self.logger.warning(f'{self._id} invalid JSON received from {Network.clean_uri(url if url else self.baseurl, self._hide_login)}')
+        return None
+
+
+class Framer(object):
+    """
+    Incremental framing of a received byte stream.
+
+    Received data is collected in a bytearray with a read offset. Complete frames
+    are returned as memoryview slices of this buffer, so no data is copied until
+    the consumer converts a frame (e.g. with ``bytes(frame)`` or ``str(frame, 'utf-8')``).
+    Frames are only valid until the next call of ``feed()``.
+
+    :param terminator: bytes or str to split at, int for fixed size frames, None or empty to pass data through unchanged
+    :param include_terminator: include terminator in returned frames
+
+    :type terminator: bytes | str | int | None
+    :type include_terminator: bool
+    """
+
+    def __init__(self, terminator=None, include_terminator=True):
+        self._buffer = bytearray()
+        self._offset = 0
+        self._search = 0
+        self._balance_search = 0
+        self._balance_depth = 0
+        self._terminator = None
+        self.include_terminator = include_terminator
+        self.terminator = terminator
+
+    @property
+    def terminator(self):
+        return self._terminator
+
+    @terminator.setter
+    def terminator(self, terminator):
+        if isinstance(terminator, str):
+            terminator = terminator.encode('utf-8')
+        if terminator is False or terminator == b'':
+            terminator = None
+        self._terminator = terminator
+        self._search = self._balance_search = self._offset
+        self._balance_depth = 0
+
+    def feed(self, data):
+        """
+        Add received data to buffer
+
+        :param data: received data
+        :type data: bytes | bytearray | memoryview
+        """
+        if self._offset:
+            try:
+                # drop consumed data
+                del self._buffer[:self._offset]
+            except BufferError:
+                # frames returned earlier are still in use, so leave old buffer to them
+                self._buffer = bytearray(memoryview(self._buffer)[self._offset:])
+            self._search -= self._offset
+            self._balance_search -= self._offset
+            self._offset = 0
+        try:
+            self._buffer += data
+        except BufferError:
+            self._buffer = self._buffer + data
+
+    def next_frame(self):
+        """
+        Return next complete frame from buffer
+
+        :return: next frame or None, if no complete frame is available
+        :rtype: memoryview | None
+        """
+        terminator = self._terminator
+        start = self._offset
+        length = len(self._buffer)
+        if start >= length:
+            return None
+
+        if terminator is None:
+            end = cut = length
+        elif isinstance(terminator, int):
+            if terminator <= 0 or length - start < terminator:
+                return None
+            end = cut = start + terminator
+        else:
+            index = self._buffer.find(terminator, max(start, self._search))
+            if index == -1:
+                # don't search the same data again on next call
+                self._search = max(start, length - len(terminator) + 1)
+                return None
+            cut = index + len(terminator)
+            end = cut if self.include_terminator else index
+
+        self._offset = self._search = self._balance_search = cut
+        self._balance_depth = 0
+        return memoryview(self._buffer)[start:end]
+
+    def next_balanced(self, balance_open, balance_close):
+        """
+        Return next balanced frame from buffer (e.g. a complete JSON object)
+
+        A frame is complete, when as many closing as opening chars have been received.
+        Scan position and nesting depth are kept between calls, so each received byte
+        is only scanned once.
+
+        :param balance_open: opening char
+        :param balance_close: closing char
+        :type balance_open: int | bytes | str
+        :type balance_close: int | bytes | str
+
+        :return: next frame or None, if no balanced frame is complete yet
+        :rtype: memoryview | None
+        :raises ValueError: if more closing than opening chars have been received
+        """
+        balance_open = self._to_byte(balance_open)
+        balance_close = self._to_byte(balance_close)
+        buffer = self._buffer
+        start = self._offset
+        depth = self._balance_depth
+        index = max(start, self._balance_search)
+        length = len(buffer)
+        while index < length:
+            char = buffer[index]
+            index += 1
+            if char == balance_open:
+                depth += 1
+            elif char == balance_close:
+                depth -= 1
+                if depth < 0:
+                    self._balance_search = index - 1
+                    self._balance_depth = 0
+                    raise ValueError('unbalanced input')
+                if depth == 0:
+                    self._offset = self._search = self._balance_search = index
+                    self._balance_depth = 0
+                    return memoryview(buffer)[start:index]
+        self._balance_search = index
+        self._balance_depth = depth
+        return None
+
+    @staticmethod
+    def _to_byte(char):
+        if isinstance(char, str):
+            char = char.encode('utf-8')
+        if isinstance(char, (bytes, bytearray)):
+            return char[0]
+        return char
+
+    def frames(self):
+        """
+        Generator returning all complete frames from buffer
+
+        :return: frames as memoryview slices
+        """
+        frame = self.next_frame()
+        while frame is not None:
+            yield frame
+            frame = self.next_frame()
+
+    def remaining(self):
+        """
+        Return data not yet returned as frame
+
+        :return: unconsumed data
+        :rtype: bytes
+        """
+        return bytes(memoryview(self._buffer)[self._offset:])
+
+    def clear(self):
+        """
+        Discard all buffered data
+        """
+        self._buffer = bytearray()
+        self._offset = self._search = self._balance_search = 0
+        self._balance_depth = 0
+
+    def __len__(self):
+        return len(self._buffer) - self._offset
+
+
 class Tcp_client(object):
     """
     Structured class to handle locally initiated TCP connections with two-way communication.
@@ -549,6 +925,8 @@ class Tcp_client(object):
     :param binary: Switch between binary and text mode. Text will be encoded / decoded using encoding parameter.
     :param terminator: Terminator to use to split received data into chunks (split lines <cr> for example). If integer then split into n bytes. Default is None means process chunks as received.
     :param timeout: Timeout to set for connected socket. Don't change without reason
+    :param reactor: Use the shared network reactor instead of own connect and receive threads. Callbacks are then run in the reactor thread and must not block.
+    :param batch: In terminator mode, call data_received_callback once per received packet with a list of all complete chunks
 
     :type host: str
     :type port: int
@@ -563,13 +941,15 @@ class Tcp_client(object):
     :type binary: bool
     :type terminator: int | bytes | str
     :type timeout: int
+    :type reactor: bool
+    :type batch: bool
     """
 
     def __init__(self, host, port, name=None,
                  autoreconnect=True, autoconnect=None, connect_retries=5,
                  connect_cycle=5, retry_cycle=30, retry_abort=0,
                  abort_callback=None, binary=False, terminator=False, timeout=1,
-                 rate_limit=1, max_rate_connects=10):
+                 rate_limit=1, max_rate_connects=10, reactor=False, batch=False):
         self.logger = logging.getLogger(__name__)
 
         # public properties
@@ -615,6 +995,16 @@ class Tcp_client(object):
         self.__receive_thread = None
         self.__running = False
 
+        # properties for operation with the shared reactor
+        self._reactor = Tcp_reactor.attach(self) if reactor else None
+        self._framer = Framer(terminator)
+        self._batch = batch
+        self._send_queue = deque()
+        self._send_queue_lock = threading.Lock()
+        self._connecting = False
+        self._reactor_timer = None
+        self._reactor_closed = threading.Event()
+
         # self.logger.setLevel(logging.DEBUG)   # Das sollte hier NICHT gesetzt werden, sondern in etc/logging.yaml im Logger lib.network konfiguriert werden!
 
         self._host = host
@@ -675,6 +1065,13 @@ class Tcp_client(object):
             self._is_connected = False
             return False
 
+        if self._reactor:
+            self.__running = True
+            # the reactor has been stopped, if this client has been closed before
+            self._reactor = Tcp_reactor.attach(self)
+            self._reactor.call_soon(self._reactor_start_connect)
+            return True
+
         # prevent starting connect thread twice
         with self.__connect_threadlock:
             self.logger.debug(f'Starting connect to {self._host}:{self._port}')
@@ -744,6 +1141,14 @@ class Tcp_client(object):
                 self.logger.warning(f'{self._id} trying to send {message}, but not connected and autoconnect not active. Aborting.')
                 return False
 
+        if self._reactor:
+            if not self._is_connected:
+                return False
+            with self._send_queue_lock:
+                self._send_queue.append(message)
+            self._reactor.call_soon(self._reactor_flush)
+            return True
+
         try:
             if self._is_connected:
                 bytes_sent = self._socket.send(message)
@@ -847,7 +1252,7 @@ class Tcp_client(object):
         self.logger.debug(f'{self._id} started receive thread')
         waitobj = IOWait()
         waitobj.watch(self._socket, read=True)
-        __buffer = b''
+        self._framer.clear()
 
         self._is_receiving = True
         if self._receiving_callback:
@@ -878,35 +1283,7 @@ class Tcp_client(object):
                             # # if not self._binary:
                             # #     msg = str.rstrip(str(msg, 'utf-8')).encode('utf-8')
 
-                            # If we work in line mode (with a terminator) slice buffer into single chunks based on terminator
-                            if self.terminator:
-                                __buffer += msg
-                                while True:
-                                    # terminator = int means fixed size chunks
-                                    if isinstance(self.terminator, int):
-                                        i = self.terminator
-                                        if i > len(__buffer):
-                                            break
-                                    # terminator is str or bytes means search for it
-                                    else:
-                                        i = __buffer.find(self.terminator)
-                                        if i == -1:
-                                            break
-                                        i += len(self.terminator)
-                                    line = __buffer[:i]
-                                    __buffer = __buffer[i:]
-                                    if self._data_received_callback is not None:
-                                        try:
-                                            self._data_received_callback(self, line if self._binary else str(line, 'utf-8').strip())
-                                        except Exception as iex:
-                                            self._log_exception(iex, f'lib.network {self._id} receive in terminator mode calling data_received_callback {self._data_received_callback} failed: {iex}')
-                            # If not in terminator mode just forward what we received
-                            else:
-                                if self._data_received_callback is not None:
-                                    try:
-                                        self._data_received_callback(self, msg)
-                                    except Exception as iex:
-                                        self._log_exception(iex, f'lib.network {self._id} calling data_received_callback {self._data_received_callback} failed: {iex}')
+                            self._process_received(msg)
                         # If empty peer has closed the connection
                         else:
                             if self.__running:
@@ -947,6 +1324,232 @@ class Tcp_client(object):
                 self._log_exception(ex, f'lib.network {self._id} receive thread died with unexpected error: {ex}. Go tell...')
         self._is_receiving = False
 
+    def _process_received(self, msg):
+        """
+        Split received data into chunks (if in terminator mode) and dispatch to data_received_callback.
+
+        :param msg: data received from socket
+        :type msg: bytes
+        """
+        # If we work in line mode (with a terminator) slice buffer into single chunks based on terminator
+        if self.terminator:
+            framer = self._framer
+            if framer.terminator != self.terminator:
+                framer.terminator = self.terminator
+            framer.feed(msg)
+            chunks = []
+            for chunk in framer.frames():
+                try:
+                    chunk = bytes(chunk) if self._binary else str(chunk, 'utf-8').strip()
+                    if self._batch:
+                        chunks.append(chunk)
+                    elif self._data_received_callback is not None:
+                        self._data_received_callback(self, chunk)
+                except Exception as iex:
+                    self._log_exception(iex, f'lib.network {self._id} receive in terminator mode calling data_received_callback {self._data_received_callback} failed: {iex}')
+            if chunks and self._data_received_callback is not None:
+                try:
+                    self._data_received_callback(self, chunks)
+                except Exception as iex:
+                    self._log_exception(iex, f'lib.network {self._id} receive in terminator mode calling data_received_callback {self._data_received_callback} failed: {iex}')
+        # If not in terminator mode just forward what we received
+        else:
+            if self._data_received_callback is not None:
+                try:
+                    self._data_received_callback(self, msg)
+                except Exception as iex:
+                    self._log_exception(iex, f'lib.network {self._id} calling data_received_callback {self._data_received_callback} failed: {iex}')
+
+    #
+    # methods for operation with the shared reactor, these are only called in the reactor thread
+    #
+
+    def _reactor_start_connect(self):
+        """
+        Start a new connect round
+        """
+        if self._is_connected or self._connecting or not self.__running:
+            return
+        self.logger.debug(f'{self._id} starting connection cycle')
+        self._connect_counter = 0
+        self._retry_round_counter = 0
+        self._reactor_connect()
+
+    def _reactor_connect(self):
+        """
+        Initiate a non-blocking connection attempt
+        """
+        self._reactor_timer = None
+        if self._is_connected or not self.__running:
+            return
+        self.logger.debug(f'{self._id} connecting using TCP/{"IPv6" if self._family == socket.AF_INET6 else "IPv4"} {"with" if self._autoreconnect else "without"} autoreconnect')
+        try:
+            self._socket = socket.socket(self._family, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self._socket.setblocking(False)
+            err = self._socket.connect_ex((f'{self._hostip}', int(self._port)))
+        except Exception as e:
+            self._reactor_connect_failed(e)
+            return
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            self._reactor_connect_failed(os.strerror(err))
+            return
+        self._connecting = True
+        self._reactor.register(self._socket, selectors.EVENT_WRITE, self)
+        self._reactor_timer = self._reactor.call_later(5, self._reactor_connect_failed, 'timeout')
+
+    def _reactor_connect_failed(self, err):
+        """
+        Handle a failed connection attempt, schedule next attempt or round
+        """
+        self._reactor_timer = None
+        self._reactor_release_socket()
+        self._connect_counter += 1
+        self.logger.warning(f'{self._id} TCP connection failed {self._connect_counter}/{int(self._connect_retries)} times, last error was: {err}')
+        if not self.__running:
+            return
+        if self._connect_counter < self._connect_retries:
+            self._reactor_timer = self._reactor.call_later(self._connect_cycle, self._reactor_connect)
+        elif self._autoreconnect:
+            self._retry_round_counter += 1
+            if self._retry_abort and self._retry_round_counter >= self._retry_abort and self._abort_callback:
+                self._abort_callback()
+                return
+            self.logger.debug(f'waiting {self._retry_cycle} seconds before next connection attempt')
+            self._connect_counter = 0
+            self._reactor_timer = self._reactor.call_later(self._retry_cycle, self._reactor_connect)
+
+    def _reactor_connected(self):
+        """
+        Connection attempt succeeded
+        """
+        self._connecting = False
+        self._is_connected = True
+        self._last_connect = time.time()
+        self.logger.info(f'{self._id} connected')
+        self._framer.clear()
+        self._reactor.modify(self._socket, selectors.EVENT_READ, self)
+        if self._connected_callback:
+            try:
+                self._connected_callback(self)
+            except Exception as iex:
+                self._log_exception(iex, f'lib.network {self._id} calling connected_callback {self._connected_callback} failed: {iex}')
+        self._is_receiving = True
+        if self._receiving_callback:
+            try:
+                self._receiving_callback(self)
+            except Exception as iex:
+                self._log_exception(iex, f'lib.network {self._id} calling receiving_callback {self._receiving_callback} failed: {iex}')
+        self._reactor_flush()
+
+    def _reactor_writable(self):
+        """
+        Socket is writable: connection established / failed or send buffer available
+        """
+        if self._connecting:
+            if self._reactor_timer:
+                self._reactor.cancel(self._reactor_timer)
+                self._reactor_timer = None
+            err = self._socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self._reactor_connect_failed(os.strerror(err))
+            else:
+                self._reactor_connected()
+        else:
+            self._reactor_flush()
+
+    def _reactor_flush(self):
+        """
+        Send queued data without blocking, wait for socket to become writable for the rest
+        """
+        if not self._is_connected or self._socket is None:
+            return
+        with self._send_queue_lock:
+            try:
+                while self._send_queue:
+                    message = self._send_queue[0]
+                    bytes_sent = self._socket.send(message)
+                    if bytes_sent < len(message):
+                        self._send_queue[0] = message[bytes_sent:]
+                        break
+                    self._send_queue.popleft()
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                self.logger.warning(f'{self._id} detected disconnect, send failed: {e}')
+                self._reactor.call_soon(self._reactor_disconnect, False)
+                return
+            pending = bool(self._send_queue)
+        self._reactor.modify(self._socket, selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0), self)
+
+    def _reactor_readable(self):
+        """
+        Socket is readable: receive data or detect closed connection
+        """
+        if not self._is_connected:
+            return
+        try:
+            msg = self._socket.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.logger.warning(f'{self._id} error receiving data, disconnecting: {e}')
+            self._reactor_disconnect(False)
+            return
+        if msg:
+            self._process_received(msg)
+        else:
+            self.logger.warning(f'{self._id} connection closed by peer')
+            self._reactor_disconnect(False)
+
+    def _reactor_disconnect(self, timeout=False):
+        """
+        Handle lost connection, reconnect if enabled
+        """
+        if not self._is_connected:
+            return
+        self._is_receiving = False
+        self._is_connected = False
+        self._reactor_release_socket()
+        with self._send_queue_lock:
+            self._send_queue.clear()
+        if self._disconnected_callback is not None:
+            try:
+                self._disconnected_callback(self)
+            except Exception as iex:
+                self._log_exception(iex, f'lib.network {self._id} calling disconnected_callback {self._disconnected_callback} failed: {iex}')
+        if self._autoreconnect and self.__running:
+            self.logger.debug(f'{self._id} autoreconnect enabled')
+            self._reactor_start_connect()
+
+    def _reactor_release_socket(self):
+        """
+        Unregister and close socket
+        """
+        self._connecting = False
+        if self._socket is not None:
+            self._reactor.unregister(self._socket)
+            with suppress(Exception):
+                self._socket.close()
+            self._socket = None
+
+    def _reactor_close(self):
+        """
+        Close connection on request
+        """
+        if self._reactor_timer:
+            self._reactor.cancel(self._reactor_timer)
+            self._reactor_timer = None
+        if self._is_connected:
+            with suppress(Exception):
+                self._socket.shutdown(socket.SHUT_RDWR)
+        self._is_receiving = False
+        self._is_connected = False
+        self._reactor_release_socket()
+        with self._send_queue_lock:
+            self._send_queue.clear()
+        self._reactor_closed.set()
+
     def _log_exception(self, ex, msg):
         self.logger.error(msg + ' -- If stack trace is necessary, enable/check debug log')
 
@@ -988,6 +1591,16 @@ class Tcp_client(object):
         """
         self.__running = False
         self.logger.info(f'{self._id} closing connection')
+        if self._reactor:
+            # the reactor is only stopped, after this client has been closed
+            if self._reactor.is_running():
+                self._reactor_closed.clear()
+                self._reactor.call_soon(self._reactor_close)
+                if not self._reactor.in_reactor_thread():
+                    self._reactor_closed.wait(2)
+                Tcp_reactor.detach(self)
+            self._is_connected = False
+            return
         if self._is_connected:
             try:
                 self._socket.shutdown(socket.SHUT_RD)
@@ -1017,6 +1630,227 @@ class Tcp_client(object):
             return super().__str__()
 
 
+class Tcp_reactor(object):
+    """
+    Shared selector loop for Tcp_client instances created with ``reactor=True``.
+
+    Instead of one connect and one receive thread per client, all sockets are
+    multiplexed in one thread. Data to send is queued and written without
+    blocking, reconnects are handled by timers.
+
+    Only one instance is created, use ``Tcp_reactor.get_instance()``. Clients attach to
+    the reactor when they are created or connected and detach when they are closed. The
+    reactor thread is stopped, when the last client has detached.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+        self._wakeup_read.setblocking(False)
+        self._wakeup_write.setblocking(False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+
+        # heap of timers [<time>, <seq>, <func>, <args>, <cancelled>]
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+        self._thread = None
+        self._running = False
+
+        # clients using the reactor
+        self._clients = set()
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Return the shared reactor, start it if necessary
+
+        :return: reactor instance
+        :rtype: Tcp_reactor
+        """
+        with cls._instance_lock:
+            return cls._get_running_instance()
+
+    @classmethod
+    def _get_running_instance(cls):
+        if cls._instance is None or not cls._instance._running:
+            cls._instance = cls()
+            cls._instance.start()
+        return cls._instance
+
+    @classmethod
+    def attach(cls, client):
+        """
+        Register a client as user of the shared reactor, start the reactor if necessary
+
+        :param client: Tcp_client instance
+        :return: reactor instance
+        :rtype: Tcp_reactor
+        """
+        with cls._instance_lock:
+            reactor = cls._get_running_instance()
+            reactor._clients.add(client)
+            return reactor
+
+    @classmethod
+    def detach(cls, client):
+        """
+        Unregister a client from the shared reactor, stop the reactor if it was the last client
+
+        :param client: Tcp_client instance
+        """
+        with cls._instance_lock:
+            reactor = cls._instance
+            if reactor is None or client not in reactor._clients:
+                return
+            reactor._clients.discard(client)
+            if reactor._clients:
+                return
+            cls._instance = None
+        reactor.stop()
+
+    def start(self):
+        """
+        Start the reactor thread
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='TCP_Reactor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the reactor thread
+        """
+        self._running = False
+        self._wakeup()
+        if self._thread is not None and not self.in_reactor_thread():
+            self._thread.join(2)
+
+    def is_running(self):
+        return self._running
+
+    def in_reactor_thread(self):
+        return threading.current_thread() is self._thread
+
+    def call_soon(self, func, *args):
+        """
+        Run func(*args) in the reactor thread
+
+        :param func: function to call
+        """
+        self._calls.append((func, args))
+        if not self.in_reactor_thread():
+            self._wakeup()
+
+    def call_later(self, delay, func, *args):
+        """
+        Run func(*args) in the reactor thread after delay seconds
+
+        :param delay: delay in seconds
+        :param func: function to call
+        :return: timer handle to cancel the call
+        """
+        timer = [time.monotonic() + delay, next(self._timer_seq), func, args, False]
+        with self._lock:
+            heapq.heappush(self._timers, timer)
+        if not self.in_reactor_thread():
+            self._wakeup()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel timer created by call_later()
+
+        :param timer: timer handle
+        """
+        timer[4] = True
+
+    def register(self, sock, events, client):
+        try:
+            self._selector.register(sock, events, client)
+        except KeyError:
+            self._selector.modify(sock, events, client)
+
+    def modify(self, sock, events, client):
+        try:
+            self._selector.modify(sock, events, client)
+        except (KeyError, ValueError):
+            self.register(sock, events, client)
+
+    def unregister(self, sock):
+        with suppress(KeyError, ValueError):
+            self._selector.unregister(sock)
+
+    def _wakeup(self):
+        with suppress(OSError):
+            self._wakeup_write.send(b'\0')
+
+    def _run(self):
+        self.logger.debug('network reactor started')
+        while self._running:
+            with self._lock:
+                timeout = max(0, self._timers[0][0] - time.monotonic()) if self._timers else None
+            if self._calls:
+                timeout = 0
+            try:
+                events = self._selector.select(timeout)
+            except OSError as e:
+                self.logger.error(f'network reactor select failed: {e}')
+                time.sleep(1)
+                continue
+
+            for key, mask in events:
+                client = key.data
+                if client is None:
+                    with suppress(OSError):
+                        while self._wakeup_read.recv(4096):
+                            pass
+                    continue
+                try:
+                    if mask & selectors.EVENT_WRITE:
+                        client._reactor_writable()
+                    if mask & selectors.EVENT_READ:
+                        client._reactor_readable()
+                except Exception as e:
+                    self.logger.error(f'network reactor: error handling event for {client}: {e}')
+
+            while self._calls:
+                func, args = self._calls.popleft()
+                self._run_call(func, args)
+
+            now = time.monotonic()
+            while True:
+                with self._lock:
+                    if not self._timers or self._timers[0][0] > now:
+                        break
+                    timer = heapq.heappop(self._timers)
+                if not timer[4]:
+                    self._run_call(timer[2], timer[3])
+
+        # run calls queued before the reactor has been stopped (e.g. closing of the last client)
+        while self._calls:
+            func, args = self._calls.popleft()
+            self._run_call(func, args)
+        self._selector.close()
+        self._wakeup_read.close()
+        self._wakeup_write.close()
+        self.logger.debug('network reactor stopped')
+
+    def _run_call(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            self.logger.error(f'network reactor: error calling {func}: {e}')
+
+
 class ConnectionClient(object):
     """
     Client object that represents a connected client returned by a Tcp_server instance on incoming connection.
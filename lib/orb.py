@@ -24,6 +24,7 @@
 import logging
 import datetime
 import math
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +34,7 @@ except ImportError as e:
     ephem = None  # noqa
 
 import dateutil.relativedelta
-from dateutil.tz import tzutc
+from dateutil.tz import tzutc, gettz
 
 """
 This library contains a class Orb for calculating sun or moon related events.
@@ -60,7 +61,7 @@ class Orb():
         `pressure` - 1010 mBar
     """
 
-    def __init__(self, orb, lon, lat, elev=False):
+    def __init__(self, orb, lon, lat, elev=False, use_cache=True):
         """
         Save location and celestial body
         
@@ -68,6 +69,7 @@ class Orb():
         :param lon: longitude of observer in degrees
         :param lat: latitude of observer in degrees
         :param elev: elevation of observer in meters
+        :param use_cache: if True, computed rise/set/transit times and positions are cached
         """
         if ephem is None:
             logger.warning("Could not find/use ephem!")
@@ -78,6 +80,17 @@ class Orb():
         self.lon = lon
         self.elev = elev
 
+        self.use_cache = use_cache
+        self._cache_lock = threading.Lock()
+        # (event, doff, center) -> {ephem date of event: ephem date of earliest known search start}
+        self._event_cache = {}
+        # ephem date -> (azimuth, elevation) in radians
+        self._pos_cache = {}
+        # (start of local day, timezone, step) -> tuple of (datetime, azimuth, elevation)
+        self._pos_table_cache = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+
     def get_observer_and_orb(self):
         """
         Return a tuple of an instance of an observer with location information
@@ -145,37 +158,98 @@ class Orb():
             logger.notice(f"offset {originaldoff} truncated to {doff}")
         return doff
 
-    def noon(self, doff=0, moff=0, dt=None):
-        observer, orb = self.get_observer_and_orb()
+    def _start_date(self, moff, dt):
+        """
+        Return the (ephem) date to start the search for the next event
+
+        :param moff: minutes offset of the event
+        :param dt: start time for the search, if not given the current time will be used
+        :return: ephem date of the start of the search
+        """
         if dt is not None:
-            observer.date = dt - dt.utcoffset() - dateutil.relativedelta.relativedelta(minutes=moff)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        else:
-            observer.date = datetime.datetime.utcnow() - dateutil.relativedelta.relativedelta(minutes=moff) + dateutil.relativedelta.relativedelta(seconds=2)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
+            return ephem.Date(dt - dt.utcoffset() - datetime.timedelta(minutes=moff))
+        # workaround if event is 0.001 seconds in the past
+        return ephem.Date(datetime.datetime.utcnow() - datetime.timedelta(minutes=moff, seconds=-2))
+
+    def _next_event(self, event, doff, moff, center, dt):
+        """
+        Compute the next rising, setting, transit or antitransit of the orb
+
+        The result of a search is valid for every search starting between the start of a previous
+        search and the found event, since there is no other event in between. Therefore results
+        are cached as (event, start) pairs, entries for events older than a day are discarded.
+
+        :param event: 'rising', 'setting', 'transit' or 'antitransit'
+        :param doff: degrees offset for the observers horizon
+        :param moff: minutes offset from time of the event
+        :param center: if True then the centerpoint of the orb is considered, otherwise the upper limb
+        :param dt: start time for the search, if not given the current time will be used
+        :return: tuple of time of event (shifted by moff) and the horizon offset used
+        :rtype: tuple
+        """
+        date = self._start_date(moff, dt)
         if not doff == 0:
-            doff = self._avoid_neverup(dt, date_utc, doff)
-        observer.horizon = str(doff)
-        next_transit = observer.next_transit(orb).datetime()
-        next_transit = next_transit + dateutil.relativedelta.relativedelta(minutes=moff)
-        next_transit = next_transit.replace(tzinfo=tzutc())
+            doff = self._avoid_neverup(dt, date.datetime().replace(tzinfo=tzutc()), doff)
+        if doff == 0 or event in ('transit', 'antitransit'):
+            center = None
+        key = (event, doff, center)
+
+        next_event = None
+        if self.use_cache:
+            with self._cache_lock:
+                for event_date, start_date in self._event_cache.get(key, {}).items():
+                    if start_date <= date < event_date:
+                        next_event = event_date
+                        self._cache_hits += 1
+                        break
+
+        if next_event is None:
+            observer, orb = self.get_observer_and_orb()
+            observer.date = date
+            observer.horizon = str(doff)
+            if center is None:
+                next_event = getattr(observer, 'next_' + event)(orb)
+            else:
+                next_event = getattr(observer, 'next_' + event)(orb, use_center=center)
+            next_event = float(next_event)
+            if self.use_cache:
+                with self._cache_lock:
+                    self._cache_misses += 1
+                    events = self._event_cache.setdefault(key, {})
+                    for event_date in [e for e in events if e < date - 1]:
+                        del events[event_date]
+                    events[next_event] = min(date, events.get(next_event, date))
+
+        next_event = ephem.Date(next_event).datetime() + datetime.timedelta(minutes=moff)
+        return next_event.replace(tzinfo=tzutc()), doff
+
+    def get_cache_stats(self):
+        """
+        Return statistics of the cache for computed events
+
+        :return: dict with number of cache hits, misses and cached events
+        :rtype: dict
+        """
+        with self._cache_lock:
+            return {'hits': self._cache_hits, 'misses': self._cache_misses,
+                    'events': sum(len(events) for events in self._event_cache.values())}
+
+    def clear_cache(self):
+        """
+        Clear cached events and positions (e.g. after the location of the observer has been changed)
+        """
+        with self._cache_lock:
+            self._event_cache.clear()
+            self._pos_cache.clear()
+            self._pos_table_cache.clear()
+
+    def noon(self, doff=0, moff=0, dt=None):
+        next_transit, doff = self._next_event('transit', doff, moff, None, dt)
         logger.debug(f"ephem: noon for {self.orb} with doff={doff}, moff={moff}, dt={dt} will be {next_transit}")
         return next_transit
 
     def midnight(self, doff=0, moff=0, dt=None):
-        observer, orb = self.get_observer_and_orb()
-        if dt is not None:
-            observer.date = dt - dt.utcoffset() - dateutil.relativedelta.relativedelta(minutes=moff)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        else:
-            observer.date = datetime.datetime.utcnow() - dateutil.relativedelta.relativedelta(minutes=moff) + dateutil.relativedelta.relativedelta(seconds=2)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        if not doff == 0:
-            doff = self._avoid_neverup(dt, date_utc, doff)
-        observer.horizon = str(doff)
-        next_antitransit = observer.next_antitransit(orb).datetime()
-        next_antitransit = next_antitransit + dateutil.relativedelta.relativedelta(minutes=moff)
-        next_antitransit = next_antitransit.replace(tzinfo=tzutc())
+        next_antitransit, doff = self._next_event('antitransit', doff, moff, None, dt)
         logger.debug(f"ephem: midnight for {self.orb} with doff={doff}, moff={moff}, dt={dt} will be {next_antitransit}")
         return next_antitransit
 
@@ -188,23 +262,7 @@ class Orb():
         :param dt:      start time for the search for a rise, if not given the current time will be used
         :return:
         """
-        observer, orb = self.get_observer_and_orb()
-        # workaround if rise is 0.001 seconds in the past
-        if dt is not None:
-            observer.date = dt - dt.utcoffset() - dateutil.relativedelta.relativedelta(minutes=moff)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        else:
-            observer.date = datetime.datetime.utcnow() - dateutil.relativedelta.relativedelta(minutes=moff) + dateutil.relativedelta.relativedelta(seconds=2)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        if not doff == 0:
-            doff = self._avoid_neverup(dt, date_utc, doff)
-        observer.horizon = str(doff)
-        if not doff == 0:
-            next_rising = observer.next_rising(orb, use_center=center).datetime()
-        else:
-            next_rising = observer.next_rising(orb).datetime()
-        next_rising = next_rising + dateutil.relativedelta.relativedelta(minutes=moff)
-        next_rising = next_rising.replace(tzinfo=tzutc())
+        next_rising, doff = self._next_event('rising', doff, moff, center, dt)
         logger.debug(f"ephem: next_rising for {self.orb} with doff={doff}, moff={moff}, center={center}, dt={dt} will be {next_rising}")
         return next_rising
 
@@ -217,24 +275,8 @@ class Orb():
         :param dt:      start time for the search for a setting, if not given the current time will be used
         :return:
         """
-        observer, orb = self.get_observer_and_orb()
-        # workaround if set is 0.001 seconds in the past
-        if dt is not None:
-            observer.date = dt - dt.utcoffset() - dateutil.relativedelta.relativedelta(minutes=moff)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        else:
-            observer.date = datetime.datetime.utcnow() - dateutil.relativedelta.relativedelta(minutes=moff) + dateutil.relativedelta.relativedelta(seconds=2)
-            date_utc = (observer.date.datetime()).replace(tzinfo=tzutc())
-        # avoid NeverUp error
-        if not doff == 0:
-            doff = self._avoid_neverup(dt, date_utc, doff)
-        observer.horizon = str(doff)
-        if not doff == 0:
-            next_setting = observer.next_setting(orb, use_center=center).datetime()
-        else:
-            next_setting = observer.next_setting(orb).datetime()
-        next_setting = next_setting + dateutil.relativedelta.relativedelta(minutes=moff)
-        next_setting = next_setting.replace(tzinfo=tzutc())
+        # avoid NeverUp error is done by _next_event
+        next_setting, doff = self._next_event('setting', doff, moff, center, dt)
         logger.debug(f"ephem: next_setting for {self.orb} with doff={doff}, moff={moff}, center={center}, dt={dt} will be {next_setting}")
         return next_setting
 
@@ -246,19 +288,86 @@ class Orb():
         :param dt:      time for which the position needs to be calculated
         :return:        a tuple with azimuth and elevation
         """
-        observer, orb = self.get_observer_and_orb()
         if dt is None:
             date = datetime.datetime.utcnow()
         else:
             date = dt.replace(tzinfo=tzutc())
         if offset:
             date += dateutil.relativedelta.relativedelta(minutes=offset)
-        observer.date = date
-        orb.compute(observer)
+
+        # positions for the current time are not cached, they are (almost) never requested twice
+        position = None
+        if dt is not None and self.use_cache:
+            date = float(ephem.Date(date))
+            with self._cache_lock:
+                position = self._pos_cache.get(date)
+        if position is None:
+            observer, orb = self.get_observer_and_orb()
+            observer.date = date
+            orb.compute(observer)
+            position = (orb.az, orb.alt)
+            if dt is not None and self.use_cache:
+                with self._cache_lock:
+                    if len(self._pos_cache) >= 256:
+                        self._pos_cache.clear()
+                    self._pos_cache[date] = position
         if degree:
-            return (math.degrees(orb.az), math.degrees(orb.alt))
+            return (math.degrees(position[0]), math.degrees(position[1]))
         else:
-            return (orb.az, orb.alt)
+            return position
+
+    def pos_table(self, dt=None, step=5, degree=False):
+        """
+        Calculates the positions of either sun or moon for a whole (local) day
+
+        The table is computed with one observer for all points in time and cached per day.
+
+        :param dt:      time within the day for which the table should be calculated, the timezone of dt is used
+                        to determine the day. If not given, the current day is used.
+        :param step:    resolution of the table in minutes
+        :param degree:  if True: return the positions as degrees, otherwise as radians
+        :return:        tuple of tuples with (local) time, azimuth and elevation
+        :rtype: tuple
+        """
+        if dt is None:
+            try:
+                from lib.shtime import Shtime
+                shtime = Shtime.get_instance()
+            except ImportError:
+                shtime = None
+            dt = shtime.now() if shtime is not None else datetime.datetime.now(gettz())
+        elif dt.tzinfo is None:
+            dt = dt.replace(tzinfo=tzutc())
+        step = max(1, int(step))
+        day_start = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+        key = (day_start, repr(dt.tzinfo), step)
+
+        table = None
+        if self.use_cache:
+            with self._cache_lock:
+                table = self._pos_table_cache.get(key)
+        if table is None:
+            # day may be shorter or longer than 24 hours when changing daylight saving time
+            start = day_start.astimezone(tzutc())
+            end = (day_start + datetime.timedelta(days=1)).replace(hour=0).astimezone(tzutc())
+            observer, orb = self.get_observer_and_orb()
+            table = []
+            date = start
+            while date < end:
+                observer.date = date
+                orb.compute(observer)
+                table.append((date.astimezone(dt.tzinfo), orb.az, orb.alt))
+                date += datetime.timedelta(minutes=step)
+            table = tuple(table)
+            if self.use_cache:
+                with self._cache_lock:
+                    # only keep tables of a few days
+                    if len(self._pos_table_cache) >= 4:
+                        self._pos_table_cache.clear()
+                    self._pos_table_cache[key] = table
+        if degree:
+            return tuple((t, math.degrees(az), math.degrees(alt)) for t, az, alt in table)
+        return table
 
     def _light(self, offset=None):
         """
@@ -47,6 +47,9 @@ They can be used the following way: To call eg. **xxx()**, use the following syn
 import gc
 import ctypes
 import sys
+import time
+import queue
+import concurrent.futures
 
 import json
 import logging
@@ -69,6 +72,7 @@ logger = logging.getLogger(__name__)
 
 _plugins_instance = None    # Pointer to the initialized instance of the Plugins class (for use by static methods)
 _SH = None
+_import_lock = threading.RLock()    # serializes the imports of plugin packages
 
 def namestr(obj, namespace):
     return [name for name in namespace if namespace[name] is obj]
@@ -115,13 +119,23 @@ class Plugins():
             return
 
         logger.info('Load plugins')
+        start = time.perf_counter()
+        workers = max(1, int(getattr(self._sh, '_plugin_load_threads', 1)))
         threads_early = []
         threads_late = []
 
+        # read the metadata files of all plugins concurrently (reading does not modify global data),
+        # evaluation of the metadata is done in order below
+        sections = list(_conf)
+        meta_args = [self._get_pluginname_and_metadata_args(plugin, _conf[plugin]) for plugin in sections]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 4), thread_name_prefix='plugin_meta') as executor:
+            meta_definitions = list(executor.map(lambda a: Metadata.load_definitions(self._sh, a[1], 'plugin', a[2]), meta_args))
+
+        load_jobs = []
         # for every section (plugin) in the plugin.yaml file
-        for plugin in _conf:
+        for plugin, (plugin_name, meta_name, meta_classpath), definitions in zip(sections, meta_args, meta_definitions):
             logger.debug("Plugins, section: {}".format(plugin))
-            plugin_name, self.meta = self._get_pluginname_and_metadata(plugin, _conf[plugin])
+            self.meta = Metadata(self._sh, meta_name, 'plugin', meta_classpath, definitions=definitions)
             self._sh.shng_status['details'] = plugin_name   # Namen des Plugins übertragen
             #self._sh.shng_status['details'] = plugin        # Namen der Plugin Section übertragen
 
@@ -167,40 +181,41 @@ class Plugins():
                         plugin_version = 'v' + plugin_version
                     except Exception as e:
                         plugin_version = 'version unknown'
-                    dummy = self._test_duplicate_pluginconfiguration(plugin, classname, instance)
-                    os.chdir((self._sh._base_dir))
                     try:
-                        plugin_thread = PluginWrapper(smarthome, plugin, classname, classpath, args, instance, self.meta, self._configfile)
-                        if plugin_thread._init_complete == True:
-                            try:
-                                try:
-                                    startorder = self.meta.pluginsettings.get('startorder', 'normal').lower()
-                                except Exception as e:
-                                    logger.warning(f"Plugin {str(classpath).split('.')[1]} error on getting startorder: {e}")
-                                    startorder = 'normal'
-                                self._plugins.append(plugin_thread.plugin)
-                                # dict to get a handle to the plugin code by plugin name:
-                                if self._plugindict.get(classpath.split('.')[1], None) is None:
-                                    self._plugindict[classpath.split('.')[1]] = plugin_thread.plugin
-                                self._plugindict[classpath.split('.')[1]+'#'+instance] = plugin_thread.plugin
-                                if startorder == 'early':
-                                    threads_early.append(plugin_thread)
-                                elif startorder == 'late':
-                                    threads_late.append(plugin_thread)
-                                else:
-                                    self._threads.append(plugin_thread)
-                                if instance == '':
-                                    logger.info(f"Initialized plugin '{str(classpath).split('.')[1]}' from section '{plugin}'")
-                                else:
-                                    logger.info(f"Initialized plugin '{str(classpath).split('.')[1]}' instance '{instance}' from section '{plugin}'")
-                            except Exception as e:
-                                logger.warning(f"Plugin '{str(classpath).split('.')[1]}' from section '{plugin}' not loaded - exception {e}" )
+                        startorder = self.meta.pluginsettings.get('startorder', 'normal').lower()
                     except Exception as e:
-                        logger.exception(f"Plugin '{str(classpath).split('.')[1]}' {plugin_version} from section '{plugin}'\nException: {e}\nrunning SmartHomeNG {self._sh.version} / plugins {self._sh.plugins_version}")
+                        logger.warning(f"Plugin {str(classpath).split('.')[1]} error on getting startorder: {e}")
+                        startorder = 'normal'
+                    if not startorder in ['early', 'late']:
+                        startorder = 'normal'
+                    load_jobs.append({'section': plugin, 'classname': classname, 'classpath': classpath, 'args': args,
+                                      'instance': instance, 'meta': self.meta, 'version': plugin_version, 'startorder': startorder})
+
+        self._register_lock = threading.Lock()
+        if workers == 1:
+            # initialize the plugins one after the other in the order of the configuration (as before)
+            for job in load_jobs:
+                self._load_plugin(job, threads_early, threads_late)
+        else:
+            # opt-in (plugin_load_threads > 1): initialize the plugins concurrently in groups by startorder,
+            # plugins of an earlier group can be used by plugins of a later group. The startorder is no
+            # dependency information: the constructors of the plugins in one group must not use each other
+            # or depend on the current directory. Each plugin is registered as soon as it is initialized.
+            for startorder in ['early', 'normal', 'late']:
+                jobs = [job for job in load_jobs if job['startorder'] == startorder]
+                # the current directory is process-global, it is only set in the main thread
+                os.chdir((self._sh._base_dir))
+                self._init_plugins(jobs, workers, float(getattr(self._sh, '_plugin_init_timeout', 60)), threads_early, threads_late)
+            # keep the order of the configuration for the plugin list and the start of the plugins
+            order = {id(job['wrapper'].plugin): index for index, job in enumerate(load_jobs) if job.get('registered')}
+            self._plugins.sort(key=lambda plg: order.get(id(plg), len(order)))
+            for threads in [threads_early, self._threads, threads_late]:
+                threads.sort(key=lambda thread: order.get(id(thread.plugin), len(order)))
 
         # join the start_early and start_late lists with the main thread list
         self._threads = threads_early + self._threads + threads_late
-        logger.info('Load of plugins finished')
+        durations = sorted([job for job in load_jobs if 'duration' in job], key=lambda job: job['duration'], reverse=True)
+        logger.info("Load of plugins finished in {:.0f} ms, slowest initializations: {}".format((time.perf_counter()-start)*1000, ', '.join("{} {:.0f} ms".format(job['section'], job['duration']*1000) for job in durations[:5])))
         del(_conf)  # clean up
         os.chdir((self._sh._base_dir))
 
@@ -218,6 +233,166 @@ class Plugins():
         return
 
 
+    def _init_plugins(self, jobs, workers, timeout, threads_early, threads_late):
+        """
+        Initialize and register the plugins of a list of load jobs concurrently
+
+        Instances of the same plugin are initialized one after the other. If the initialization of a
+        plugin does not finish within the timeout, the plugin (and further instances of it) are not loaded.
+        The constructor of the plugin cannot be interrupted: If it finishes later, the plugin is
+        de-initialized (see _discard_plugin).
+
+        :param jobs: list of load jobs (dicts), the result is stored in the job ('wrapper', 'duration')
+        :param workers: number of plugins to initialize concurrently
+        :param timeout: timeout for the initialization of a single plugin in seconds
+        :param threads_early: list of plugin threads to be started early
+        :param threads_late: list of plugin threads to be started late
+        :type jobs: list
+        :type workers: int
+        :type timeout: float
+        :type threads_early: list
+        :type threads_late: list
+        """
+        chains = collections.OrderedDict()
+        for job in jobs:
+            chains.setdefault(job['classpath'], []).append(job)
+        pending = list(chains.values())
+        running = {}
+        done = queue.Queue()
+
+        while pending or running:
+            while pending and len(running) < workers:
+                state = {'chain': pending.pop(0), 'job': None, 'start': time.monotonic(), 'abandoned': False}
+                thread = threading.Thread(target=self._init_plugin_chain, args=(state, done, threads_early, threads_late), name='plugin_init', daemon=True)
+                running[thread] = state
+                thread.start()
+            deadline = min(state['start'] for state in running.values()) + timeout
+            try:
+                running.pop(done.get(timeout=max(0.0, deadline - time.monotonic())), None)
+            except queue.Empty:
+                for thread, state in list(running.items()):
+                    with self._register_lock:
+                        if time.monotonic() - state['start'] < timeout or state['job'] is None or state['job'].get('registered'):
+                            continue
+                        state['abandoned'] = True
+                        state['job']['timed_out'] = True
+                    del running[thread]
+                    logger.error(f"Plugin section '{state['job']['section']}': Initialization did not finish within {timeout:.0f} seconds, plugin not loaded")
+        return
+
+    def _init_plugin_chain(self, state, done, threads_early, threads_late):
+        """
+        Initialize plugins one after the other (executed in a separate thread)
+
+        :param state: dict with the list of load jobs ('chain'), the current job and its start time
+        :param done: queue to signal the end of the initializations
+        """
+        try:
+            for job in state['chain']:
+                if state['abandoned']:
+                    logger.error(f"Plugin section '{job['section']}': Not initialized, because the initialization of another instance timed out")
+                    break
+                state['start'] = time.monotonic()
+                state['job'] = job
+                self._load_plugin(job, threads_early, threads_late, state)
+        finally:
+            done.put(threading.current_thread())
+
+    def _load_plugin(self, job, threads_early, threads_late, state=None):
+        """
+        Initialize a plugin and register it
+
+        :param job: load job of the plugin, the result is stored in the job ('wrapper', 'duration')
+        :param threads_early: list of plugin threads to be started early
+        :param threads_late: list of plugin threads to be started late
+        :param state: state of the initialization thread (if plugins are initialized concurrently)
+        :type job: dict
+        :type threads_early: list
+        :type threads_late: list
+        :type state: dict
+        """
+        with self._register_lock:
+            dummy = self._test_duplicate_pluginconfiguration(job['section'], job['classname'], job['instance'])
+        if state is None:
+            os.chdir((self._sh._base_dir))
+        start = time.monotonic()
+        try:
+            job['wrapper'] = PluginWrapper(self._sh, job['section'], job['classname'], job['classpath'], job['args'], job['instance'], job['meta'], self._configfile)
+        except Exception as e:
+            logger.exception(f"Plugin '{str(job['classpath']).split('.')[1]}' {job['version']} from section '{job['section']}'\nException: {e}\nrunning SmartHomeNG {self._sh.version} / plugins {self._sh.plugins_version}")
+        job['duration'] = time.monotonic() - start
+        with self._register_lock:
+            if state is None or not state['abandoned']:
+                self._register_plugin(job, threads_early, threads_late)
+                return
+        logger.warning(f"Plugin section '{job['section']}': Initialization finished after {job['duration']:.1f} seconds, but the plugin is not loaded due to the timeout")
+        self._discard_plugin(job)
+
+    def _register_plugin(self, job, threads_early, threads_late):
+        """
+        Register an initialized plugin (the register lock must be held)
+
+        :param job: load job of the plugin
+        :param threads_early: list of plugin threads to be started early
+        :param threads_late: list of plugin threads to be started late
+        :type job: dict
+        :type threads_early: list
+        :type threads_late: list
+        """
+        plugin_thread = job.get('wrapper')
+        if plugin_thread is None:
+            return
+        plugin = job['section']
+        classpath = job['classpath']
+        instance = job['instance']
+        if plugin_thread._init_complete == True:
+            try:
+                plugin_thread.plugin._init_duration = job['duration']
+                self._plugins.append(plugin_thread.plugin)
+                # dict to get a handle to the plugin code by plugin name:
+                if self._plugindict.get(classpath.split('.')[1], None) is None:
+                    self._plugindict[classpath.split('.')[1]] = plugin_thread.plugin
+                self._plugindict[classpath.split('.')[1]+'#'+instance] = plugin_thread.plugin
+                if job['startorder'] == 'early':
+                    threads_early.append(plugin_thread)
+                elif job['startorder'] == 'late':
+                    threads_late.append(plugin_thread)
+                else:
+                    self._threads.append(plugin_thread)
+                job['registered'] = True
+                if instance == '':
+                    logger.info(f"Initialized plugin '{str(classpath).split('.')[1]}' from section '{plugin}' in {job['duration']*1000:.0f} ms")
+                else:
+                    logger.info(f"Initialized plugin '{str(classpath).split('.')[1]}' instance '{instance}' from section '{plugin}' in {job['duration']*1000:.0f} ms")
+            except Exception as e:
+                logger.warning(f"Plugin '{str(classpath).split('.')[1]}' from section '{plugin}' not loaded - exception {e}" )
+
+    def _discard_plugin(self, job):
+        """
+        Undo the initialization of a plugin, whose initialization finished after the timeout
+
+        The plugin is de-initialized, its scheduler entries are removed and it is removed
+        from the main smarthome object.
+
+        :param job: load job of the plugin
+        :type job: dict
+        """
+        plugin_thread = job.get('wrapper')
+        if plugin_thread is None or not plugin_thread._init_complete:
+            return
+        implementation = plugin_thread.get_implementation()
+        try:
+            if isinstance(implementation, SmartPlugin):
+                implementation.deinit()
+                prefix = implementation._pluginname_prefix + implementation.get_fullname()
+                for name in [name for name in list(self._sh.scheduler._scheduler) if name == prefix or name.startswith(prefix + '.')]:
+                    self._sh.scheduler.remove(name, from_smartplugin=True)
+        except Exception as e:
+            logger.warning(f"Plugin section '{job['section']}': Exception while de-initializing the plugin: {e}")
+        if getattr(self._sh, plugin_thread.name, None) is plugin_thread.plugin:
+            delattr(self._sh, plugin_thread.name)
+
+
     def get(self, plugin_name, instance=None):
         """
         Get plugin object by plugin name and instance (optional)
@@ -255,24 +430,35 @@ class Plugins():
         :return: plugin_name and metadata_instance
         :rtype: string, object
         """
+        plugin_name, meta_name, meta_classpath = self._get_pluginname_and_metadata_args(plg_section, plg_conf)
+        return (plugin_name, Metadata(self._sh, meta_name, 'plugin', meta_classpath))
+
+
+    def _get_pluginname_and_metadata_args(self, plg_section, plg_conf):
+        """
+        Return the actual plugin name and the arguments to create the metadata instance
+
+        :param plg_conf: loaded section of the plugin.yaml for the actual plugin
+        :type plg_conf: dict
+
+        :return: plugin_name, addon name and classpath for the metadata instance
+        :rtype: string, string, string
+        """
         plugin_name = plg_conf.get('plugin_name','').lower()
         plugin_version = plg_conf.get('plugin_version','').lower()
         if plugin_version != '':
             plugin_version = '._pv_' + plugin_version.replace('.','_')
         if plugin_name != '':
-            meta = Metadata(self._sh, (plugin_name+plugin_version).replace('.',os.sep), 'plugin')
-        else:
-            classpath = plg_conf.get(KEY_CLASS_PATH,'')
-            if classpath != '':
-                plugin_name = classpath.split('.')[len(classpath.split('.'))-1].lower()
-                if plugin_name.startswith('_pv'):
-                    plugin_name = classpath.split('.')[len(classpath.split('.'))-2].lower()
-                logger.debug("Plugins __init__: pluginname = '{}', classpath '{}'".format(plugin_name, classpath))
-                meta = Metadata(self._sh, plugin_name, 'plugin', (classpath+plugin_version).replace('.',os.sep))
-            else:
-                logger.error("Plugin configuration section '{}': Neither 'plugin_name' nor '{}' are defined.".format( plg_section, KEY_CLASS_PATH ))
-                meta = Metadata(self._sh, plugin_name, 'plugin', classpath)
-        return (plugin_name+plugin_version, meta)
+            return (plugin_name+plugin_version, (plugin_name+plugin_version).replace('.',os.sep), '')
+        classpath = plg_conf.get(KEY_CLASS_PATH,'')
+        if classpath != '':
+            plugin_name = classpath.split('.')[len(classpath.split('.'))-1].lower()
+            if plugin_name.startswith('_pv'):
+                plugin_name = classpath.split('.')[len(classpath.split('.'))-2].lower()
+            logger.debug("Plugins __init__: pluginname = '{}', classpath '{}'".format(plugin_name, classpath))
+            return (plugin_name+plugin_version, plugin_name, (classpath+plugin_version).replace('.',os.sep))
+        logger.error("Plugin configuration section '{}': Neither 'plugin_name' nor '{}' are defined.".format( plg_section, KEY_CLASS_PATH ))
+        return (plugin_name+plugin_version, plugin_name, classpath)
 
 
     def _get_conf_args(self, plg_conf):
@@ -619,22 +805,24 @@ class PluginWrapper(threading.Thread):
         self._sh = smarthome
         self._init_complete = False
         self.meta = meta
-        # Load an instance of the plugin
-        try:
-            exec("import {0}".format(classpath))
-        except ImportError as e:
-            logger.error("Plugin '{}' error importing Python package: {}".format(name, e))
-            logger.error("Plugin '{}' initialization failed, plugin not loaded".format(name))
-            return
-        except Exception as e:
-            logger.exception("Plugin '{}' exception during import of __init__.py: {}".format(name, e))
-            return
-        try:
-            exec("self.plugin = {0}.{1}.__new__({0}.{1})".format(classpath, classname))
-        except Exception as e:
-            logger.error("Plugin '{}' class name '{}' defined in metadata, but not found in plugin code".format(name, classname))
-            logger.error("Plugin '{}' initialization failed, plugin not loaded".format(name))
-            return
+        # Load an instance of the plugin. The plugin packages are imported one after the other,
+        # even if the plugins are initialized concurrently (only the constructors run concurrently)
+        with _import_lock:
+            try:
+                exec("import {0}".format(classpath))
+            except ImportError as e:
+                logger.error("Plugin '{}' error importing Python package: {}".format(name, e))
+                logger.error("Plugin '{}' initialization failed, plugin not loaded".format(name))
+                return
+            except Exception as e:
+                logger.exception("Plugin '{}' exception during import of __init__.py: {}".format(name, e))
+                return
+            try:
+                exec("self.plugin = {0}.{1}.__new__({0}.{1})".format(classpath, classname))
+            except Exception as e:
+                logger.error("Plugin '{}' class name '{}' defined in metadata, but not found in plugin code".format(name, classname))
+                logger.error("Plugin '{}' initialization failed, plugin not loaded".format(name))
+                return
 
         # load plugin-specific translations
         self._ptrans = translation.load_translations('plugin', classpath.replace('.', '/'), 'plugin/'+classpath.split('.')[1])
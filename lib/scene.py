@@ -27,10 +27,15 @@ This file implements scenes in SmartHomeNG
 import logging
 import os.path
 import csv
+import ast
+import math
+import threading
+import time
 
 from lib.translation import translate
 
 from lib.item import Items
+from lib.item.item import Item
 from lib.logic import Logics
 
 from lib.utils import Utils
@@ -54,6 +59,10 @@ class Scenes():
     :type smarthome: object
     """
 
+    _fanout_threshold = 20       # scenes setting at least this number of items run the item triggers in worker threads
+    _fanout_tasks = 4            # number of worker tasks for running the item triggers
+    _learned_save_delay = 2      # delay (in seconds) for saving learned values (write-behind)
+
     def __init__(self, smarthome):
         self._sh = smarthome
 
@@ -69,6 +78,11 @@ class Scenes():
         self.items = Items.get_instance()
         self.logics = Logics.get_instance()
 
+        self._learned_dirty = set()         # scenes with learned values, that have not been saved yet
+        self._learned_lock = threading.Lock()
+        self._stats = {'activations': 0, 'items_set': 0, 'last_duration': 0, 'learned_saves': 0}
+        self._stats_lock = threading.Lock()
+
         self._load_scenes()
         return
 
@@ -81,6 +95,7 @@ class Scenes():
         """
         self._scenes = {}
         self._learned_values = {}
+        self._eval_env = self._get_eval_env()
         self._scenes_dir = self._sh._scenes_dir
         if not os.path.isdir(self._scenes_dir):
             logger.warning(translate("Directory '{scenes_dir}' not found. Ignoring scenes.", {'scenes_dir': self._scenes_dir}))
@@ -132,6 +147,65 @@ class Scenes():
         return
 
 
+    def _get_eval_env(self):
+        """
+        Build the environment for evaluating compiled scene values
+
+        :return: globals for the evaluation
+        :rtype: dict
+        """
+        import lib.userfunctions as uf
+        env = dict(globals())
+        env.update({'sh': self._sh, 'shtime': Shtime.get_instance(), 'items': Items.get_instance(), 'math': math, 'uf': uf})
+        return env
+
+
+    def _compile_value(self, value):
+        """
+        Precompile a scene value expression
+
+        Constant values (literals of an immutable type) are stored as they are, other expressions are compiled.
+        Expressions that cannot be compiled are evaluated on each activation (with the resulting warning).
+
+        :param value: value expression
+        :type value: str
+
+        :return: tuple (kind, data) with kind 'const', 'code' or 'eval'
+        :rtype: tuple
+        """
+        try:
+            const = ast.literal_eval(value)
+            if const is None or isinstance(const, (bool, int, float, str, tuple)):
+                return ('const', const)
+        except Exception:
+            pass
+        try:
+            return ('code', compile(value, '<scene value>', 'eval'))
+        except Exception:
+            return ('eval', value)
+
+
+    def _eval_compiled(self, value, compiled):
+        """
+        Evaluate a precompiled scene value
+
+        :param value: value expression (for logging)
+        :param compiled: tuple returned by _compile_value()
+
+        :return: evaluated value
+        """
+        kind, data = compiled
+        if kind == 'const':
+            return data
+        if kind == 'code':
+            try:
+                return eval(data, self._eval_env)
+            except Exception as e:
+                logger.warning(" - " + translate("Problem evaluating: {value} - {exception}", {'value': value, 'exception': e}))
+                return value
+        return self._eval(value)
+
+
     def _eval(self, value):
         """
         Evaluate a scene value
@@ -214,41 +288,126 @@ class Scenes():
     def _trigger_setstate(self, item, state, caller, source, dest):
         """
         Trigger: set values for a scene state
+
+        All values are evaluated first and then written to the items as one bulk. The triggers of the
+        items (plugin methods, logics, on_change, ...) are run afterwards. For large scenes they are
+        fanned out to worker threads of the scheduler, so the triggering thread is not blocked.
         """
         logger.info("Triggered scene {} ({}) with state {} ({}):".format(item.id(), str(item), state, self.get_scene_action_name(item.id(), state)))
-        for ditem, value, name, learn in self._scenes[item.id()][str(state)]:
+        start = time.perf_counter()
+        actions = []
+        for ditem, value, name, learn, compiled in self._scenes[item.id()][str(state)]:
+            rvalue = None
             if learn:
-                lvalue = self._get_learned_value(item.id(), state, ditem)
-                if lvalue is not None:
-                    rvalue = lvalue
-                else:
-                    rvalue = value
-            else:
-                rvalue = self._eval(value)
+                rvalue = self._get_learned_value(item.id(), state, ditem)
+            if rvalue is None:
+                rvalue = value if learn else self._eval_compiled(value, compiled)
             if rvalue is not None:
-                if str(rvalue) == str(value):
-                    logger.info(" - Item {} set to {}".format(ditem, rvalue))
+                if logger.isEnabledFor(logging.INFO):
+                    if str(rvalue) == str(value):
+                        logger.info(" - Item {} set to {}".format(ditem, rvalue))
+                    else:
+                        logger.info(" - Item {} set to {} ( from {} )".format(ditem, rvalue, value))
+                actions.append((ditem, rvalue))
+
+        triggers = []
+        for ditem, rvalue in actions:
+            try:
+                if isinstance(ditem, Item):
+                    update_triggers = ditem._update_deferred(rvalue, caller='Scene', source=item.id())
+                    if update_triggers is not None:
+                        triggers.append(update_triggers)
                 else:
-                    logger.info(" - Item {} set to {} ( from {} )".format(ditem, rvalue, value))
-                try:
                     ditem(value=rvalue, caller='Scene', source=item.id())
-                except Exception as e:
-                    logger.warning(" - ditem '{}', value '{}', exception {}".format(ditem, rvalue, e))
+            except Exception as e:
+                logger.warning(" - ditem '{}', value '{}', exception {}".format(ditem, rvalue, e))
+
+        self._fan_out_triggers(item.id(), triggers)
+        with self._stats_lock:
+            self._stats['activations'] += 1
+            self._stats['items_set'] += len(actions)
+            self._stats['last_duration'] = time.perf_counter() - start
         return
 
 
+    def _fan_out_triggers(self, scene, triggers):
+        """
+        Run the deferred triggers of the items, that have been set by a scene activation
+
+        Small scenes are handled in the calling thread, for large scenes the triggers are split into
+        chunks which are handed to the run queue of the scheduler.
+
+        :Note: For scenes with at least 20 items (_fanout_threshold), the triggers are run by up to 4 tasks
+               (_fanout_tasks) in parallel. Their order is not the order of the items in the scene
+               definition. Smaller scenes run the triggers in order.
+        """
+        if len(triggers) < self._fanout_threshold or self._sh.scheduler is None:
+            self._run_triggers(triggers)
+            return
+        chunks = min(self._fanout_tasks, len(triggers))
+        for i in range(chunks):
+            self._sh.scheduler.queue_task('scenes.' + scene + '-' + str(i), self._run_triggers, by='Scene', value={'triggers': triggers[i::chunks]})
+
+
+    def _run_triggers(self, triggers):
+        for update_triggers in triggers:
+            try:
+                update_triggers()
+            except Exception as e:
+                logger.warning(" - exception while running item triggers for scene: {}".format(e))
+
+
     def _trigger_learnstate(self, item, state, caller, source, dest):
         """
         Trigger: learn values for a scene state
+
+        The learned values are saved write-behind: Multiple learns within a short time result in a single
+        write of the learned-values file.
         """
         logger.info("Triggered 'learn' for scene {} ({}), state {} ({}):".format(item.id(), str(item), state, self.get_scene_action_name(item.id(), state)))
-        for ditem, value, name, learn in self._scenes[item.id()][str(state)]:
+        for ditem, value, name, learn, compiled in self._scenes[item.id()][str(state)]:
             if learn:
                 self._set_learned_value(item.id(), state, ditem, ditem())
-        self._save_learned_values(str(item.id()))
+        self._schedule_save_learned_values(str(item.id()))
         return
 
 
+    def _schedule_save_learned_values(self, scene):
+        """
+        Mark the learned values of a scene as changed and schedule saving them to the file
+        """
+        with self._learned_lock:
+            self._learned_dirty.add(scene)
+        timers = getattr(self.items, 'timers', None)
+        if timers is None:
+            self.save_learned_values()
+        else:
+            timers.arm('scenes.' + scene + '-save_learned', self.save_learned_values, self._learned_save_delay, value={})
+
+
+    def save_learned_values(self):
+        """
+        Save the learned values of all scenes, that have changed since they have been saved last
+        """
+        with self._learned_lock:
+            dirty = sorted(self._learned_dirty)
+            self._learned_dirty.clear()
+        for scene in dirty:
+            try:
+                self._save_learned_values(scene)
+                with self._stats_lock:
+                    self._stats['learned_saves'] += 1
+            except Exception as e:
+                logger.error("Could not save learned values for scene {}: {}".format(scene, e))
+
+
+    def stop(self):
+        """
+        Save pending learned values
+        """
+        self.save_learned_values()
+
+
     def _trigger(self, item, caller, source, dest):
         """
         Trigger a scene
@@ -301,13 +460,14 @@ class Scenes():
                 logger.warning(translate("Could not find item or logic '{ditemname}' specified in {file}", {'ditemname': ditemname, 'file': self.scene_file}))
                 return
 
+        entry = [ditem, value, name, learn, self._compile_value(value)]
         if item.id() in self._scenes:
             if state in self._scenes[item.id()]:
-                self._scenes[item.id()][state].append([ditem, value, name, learn])
+                self._scenes[item.id()][state].append(entry)
             else:
-                self._scenes[item.id()][state] = [[ditem, value, name, learn]]
+                self._scenes[item.id()][state] = [entry]
         else:
-            self._scenes[item.id()] = {state: [[ditem, value, name, learn]]}
+            self._scenes[item.id()] = {state: [entry]}
         return
 
 
@@ -354,6 +514,19 @@ class Scenes():
         return sorted(scene_list)
 
 
+    def get_scene_stats(self):
+        """
+        Returns statistics about scene activations
+
+        :return: dict with number of activations, items set, duration of the last activation (in seconds) and saves of learned values
+        :rtype: dict
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['learned_pending'] = len(self._learned_dirty)
+        return stats
+
+
     def get_scene_actions(self, name):
         """
         Returns a list with the the defined actions for a scene
@@ -34,6 +34,7 @@ import copy
 
 from lib.shtime import Shtime
 import lib.env
+import lib.metrics as metrics
 from lib.item import Items
 from lib.model.smartplugin import SmartPlugin
 
@@ -63,6 +64,13 @@ tasks_logger = logging.getLogger(__name__ + '.tasks')
 
 _scheduler_instance = None    # Pointer to the initialized instance of the scheduler class  (for use by static methods)
 
+_task_duration = metrics.histogram('shng_scheduler_task_duration_seconds', 'Duration of the tasks executed by the worker threads', ['type'])
+_task_duration_logic = _task_duration.labels('logic')
+_task_duration_item = _task_duration.labels('item')
+_task_duration_method = _task_duration.labels('method')
+_logic_duration = metrics.histogram('shng_logic_duration_seconds', 'Duration of logic runs', ['logic'])
+_logic_errors = metrics.counter('shng_logic_errors_total', 'Number of logic runs, that ended with an exception', ['logic'])
+
 from lib.triggertimes import TriggerTimes
 
 class LeaveLogic(Exception): pass  # declare a label for 'raise LeaveLogic'
@@ -147,6 +155,7 @@ class Scheduler(threading.Thread):
         logger.info('Init Scheduler')
         self._sh = smarthome
         self._lock = threading.Lock()
+        self._worker_lock = threading.Lock()    # serializes the creation of the initial worker threads
         self._runc = threading.Condition()
 
         global _scheduler_instance
@@ -163,6 +172,11 @@ class Scheduler(threading.Thread):
         self.crontabs = TriggerTimes.get_instance()
         self.mqtt = None
 
+        metrics.gauge('shng_scheduler_queue_length', 'Number of tasks waiting in the run queue').set_function(self._runq.qsize)
+        metrics.gauge('shng_scheduler_trigger_queue_length', 'Number of triggered tasks waiting for their time').set_function(self._triggerq.qsize)
+        metrics.gauge('shng_scheduler_workers', 'Number of worker threads').set_function(self.get_worker_count)
+        metrics.gauge('shng_scheduler_workers_busy', 'Number of worker threads executing a task').set_function(lambda: self.get_worker_count() - self.get_idle_worker_count())
+
 
     # --------------------------------------------------------------------------------------------------
     #   Following (static) method of the class Scheduler implement the API for schedulers in SmartHomeNG
@@ -199,6 +213,23 @@ class Scheduler(threading.Thread):
         logger.info(f"Warn Level for maximum number of workers set to {self._worker_max}")
 
 
+    def set_worker_count(self, count):
+        """
+        Set the initial number of worker threads
+
+        If the scheduler is already running, worker threads are added up to the given number.
+
+        :param count: number of worker threads
+        :type count: int
+        """
+        with self._worker_lock:
+            self._worker_num = count
+            if getattr(self, 'alive', False):
+                while len(self._workers) < count:
+                    self._add_worker()
+        logger.info(f"Initial number of workers set to {self._worker_num}")
+
+
     def get_worker_count(self):
         """
         Get number of worker threads initialized by scheduler
@@ -236,9 +267,10 @@ class Scheduler(threading.Thread):
 
     def run(self):
         self.alive = True
-        logger.debug(f"creating {self._worker_num} workers")
-        for i in range(self._worker_num):
-            self._add_worker()
+        with self._worker_lock:
+            logger.debug(f"creating {self._worker_num} workers")
+            while len(self._workers) < self._worker_num:
+                self._add_worker()
         while self.alive:
             now = self.shtime.now()
             if self._runq.qsize() > len(self._workers):
@@ -355,10 +387,7 @@ class Scheduler(threading.Thread):
                 return
         if dt is None:
             logger.debug(f"Triggering {name} - by: {by} source: {source} dest: {dest} value: {value}")
-            self._runc.acquire()
-            self._runq.insert(prio, (name, obj, by, source, dest, value))
-            self._runc.notify()
-            self._runc.release()
+            self.queue_task(name, obj, by, source, dest, value, prio)
         else:
             if not isinstance(dt, datetime.datetime):
                 logger.warning(f"Trigger: Not a valid timezone aware datetime for {name}. Ignoring.")
@@ -369,6 +398,27 @@ class Scheduler(threading.Thread):
             logger.debug(f"Triggering {name} - by: {by} source: {source} dest: {dest} value: {value} at: {dt}")
             self._triggerq.insert((dt, prio), (name, obj, by, source, dest, value))
 
+    def queue_task(self, name, obj, by='Scheduler', source=None, dest=None, value=None, prio=3):
+        """
+        Puts a task directly into the run queue to be executed by a worker thread
+
+        Unlike trigger(), no lookup of the calling plugin instance is done. It is used for
+        internal callers like the timer wheel of the items, which already know the final name.
+
+        :param name: name of the task
+        :param obj: object to execute (logic, item or method)
+        :param by: name of the initiator
+        :param source: source of the task
+        :param dest: destination of the task
+        :param value: value for the execution of obj
+        :param prio: priority of the task
+        """
+        self._runc.acquire()
+        self._runq.insert(prio, (name, obj, by, source, dest, value))
+        self._runc.notify()
+        self._runc.release()
+
+
     def remove(self, name, from_smartplugin=False):
         """
         Remove a scheduler entry with given name. If a call is made from a SmartPlugin with an instance configuration
@@ -684,9 +734,13 @@ class Scheduler(threading.Thread):
     def _task(self, name, obj, by, source, dest, value):
         threading.current_thread().name = name
         #logger = logging.getLogger('_task.' + name)
+        start = time.perf_counter()
 
         if obj.__class__.__name__ == 'Logic':
             self._execute_logic_task(obj, by, source, dest, value)
+            duration = time.perf_counter() - start
+            _task_duration_logic.observe(duration)
+            _logic_duration.labels(obj.name).observe(duration)
 
         elif obj.__class__.__name__ == 'Item':
             try:
@@ -700,6 +754,7 @@ class Scheduler(threading.Thread):
                     obj(value, caller=("Scheduler"+scheduler_source))
             except Exception as e:
                 tasks_logger.exception(f"Item {name} exception: {e}")
+            _task_duration_item.observe(time.perf_counter() - start)
 
         else:  # method
             try:
@@ -713,6 +768,7 @@ class Scheduler(threading.Thread):
                     obj(**value)
             except Exception as e:
                 tasks_logger.exception(f"Method {name} exception: {e}")
+            _task_duration_method.observe(time.perf_counter() - start)
 
         threading.current_thread().name = 'idle'
 
@@ -803,6 +859,7 @@ class Scheduler(threading.Thread):
             else:
                 logic_method = 'function ' + tb[2] + '()'
             logger.error(f"In der Logik ist ein Fehler aufgetreten:\n   Logik '{logic.name}', Datei '{tb[0]}', Zeile {tb[1]}\n   {logic_method}, Exception: {e}")
+            _logic_errors.labels(logic.name).inc()
             #logger.exception(f"In der Logik ist ein Fehler aufgetreten:\n   Logik '{logic.name}', Datei '{tb[0]}', Zeile {tb[1]}\n   {logic_method}, Exception: '{e}'\n ")
 
         return
@@ -20,16 +20,9 @@
 #########################################################################
 
 
-try:
-    import pkg_resources
-except:
-    print()
-    print("ERROR: setuptools are not installed")
-    print("Install with 'pip3 install setuptools'")
-    print()
-    exit(1)
-
-
+import importlib.metadata
+import hashlib
+import json
 import logging
 import os
 import pathlib
@@ -78,6 +71,10 @@ class Shpypi:
         _shpypi_instance = self
         self.req_files = Requirements_files(version, self.for_tests)
 
+        self._installed_packages = None         # cached dict of installed packages
+        self._installed_fingerprint = None      # fingerprint of the site-packages, the cached dict belongs to
+        self.check_timings = {}                 # duration of the requirement checks: {selection: (ms, skipped)}
+
         self.scheduler_crontab = ['init', '7 3 * *']
 
         self.sh = sh
@@ -146,18 +143,138 @@ class Shpypi:
 
             https://linuxconfig.org/how-to-change-from-default-to-alternative-python-version-on-debian-linux
 
+        The result is cached as long as the directories of the Python path do not change.
+
         :return: dict of package and version
         :rtype: dict
         """
-
-        installed_packages = pkg_resources.working_set
+        fingerprint = self._get_site_fingerprint()
+        if self._installed_packages is not None and fingerprint == self._installed_fingerprint:
+            return dict(self._installed_packages)
 
         installed_packages_dict = {}
-        for dist in installed_packages:
-            installed_packages_dict[dist.key] = dist.version
+        for dist in importlib.metadata.distributions():
+            metadata = dist.metadata
+            name = metadata['Name']
+            if not name:
+                continue
+            # same key as pkg_resources used; the first distribution on the Python path wins
+            key = re.sub('[^A-Za-z0-9.]+', '-', name).lower()
+            if key not in installed_packages_dict:
+                installed_packages_dict[key] = metadata['Version']
 
+        self._installed_packages = installed_packages_dict
+        self._installed_fingerprint = fingerprint
         self.logger.info("get_installed_packages: installed_packages_dict = {}".format(installed_packages_dict))
-        return installed_packages_dict
+        return dict(installed_packages_dict)
+
+
+    def _get_site_fingerprint(self):
+        """
+        Returns a fingerprint of the installed packages
+
+        Installing, upgrading or removing a package changes the modification time of the directory it is installed to,
+        so the modification times of all directories of the Python path are used. The SmartHomeNG directory itself
+        is ignored, since files are written there at runtime.
+
+        :return: fingerprint
+        :rtype: list
+        """
+        fingerprint = [sys.executable, sys.version]
+        sh_basedir = os.path.realpath(self.req_files.sh_basedir)
+        for path in sys.path:
+            if os.path.realpath(path or '.') == sh_basedir:
+                continue
+            try:
+                st = os.stat(path or '.')
+            except OSError:
+                continue
+            fingerprint.append((path, st.st_mtime_ns))
+        return fingerprint
+
+
+    def _get_requirements_fingerprint(self, selection, plugin_conf_basename=None):
+        """
+        Returns a fingerprint of the installed packages and all requirement files, a check depends on
+
+        :param selection: 'core' | 'base' | 'conf_all'
+        :param plugin_conf_basename: basename of the plugin configuration (for 'conf_all')
+
+        :return: fingerprint as a hex string
+        :rtype: str
+        """
+        fingerprint = self._get_site_fingerprint()
+        fingerprint.append(str(self.req_files.shng_version))
+        files = []
+        for subdir in ['lib', 'modules', 'functions', 'logics', 'plugins']:
+            basedir = os.path.join(self.req_files.sh_basedir, subdir)
+            files.append(basedir)
+            files.append(os.path.join(basedir, 'requirements.txt'))
+            try:
+                with os.scandir(basedir) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            files.append(os.path.join(entry.path, 'requirements.txt'))
+            except OSError:
+                pass
+        if plugin_conf_basename is not None:
+            files.append(plugin_conf_basename + YAML_FILE)
+        for filename in sorted(files):
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            fingerprint.append((filename, st.st_mtime_ns, st.st_size))
+        return hashlib.sha256(repr((selection, fingerprint)).encode()).hexdigest()
+
+
+    def _get_check_cache_filename(self):
+        return os.path.join(self._sh_dir, 'var', 'cache_requirements', 'checked.json')
+
+
+    def _is_check_valid(self, selection, fingerprint):
+        """
+        Returns True, if the last successful check of the selection was done with the same fingerprint
+        """
+        try:
+            with open(self._get_check_cache_filename(), encoding='utf8') as f:
+                checked = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return isinstance(checked, dict) and checked.get(selection) == fingerprint
+
+
+    def _set_check_valid(self, selection, fingerprint):
+        """
+        Remember the fingerprint of a successful check of the selection
+        """
+        filename = self._get_check_cache_filename()
+        try:
+            with open(filename, encoding='utf8') as f:
+                checked = json.load(f)
+            if not isinstance(checked, dict):
+                checked = {}
+        except (OSError, ValueError):
+            checked = {}
+        checked[selection] = fingerprint
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            tmp_filename = filename + '.' + str(os.getpid())
+            with open(tmp_filename, 'w', encoding='utf8') as f:
+                json.dump(checked, f)
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            self.logger.info(f"Unable to write requirements check cache {filename}: {e}")
+
+
+    def _log_check_timing(self, selection, start, skipped, logging=True):
+        duration = round((time.perf_counter() - start) * 1000, 1)
+        self.check_timings[selection] = (duration, skipped)
+        if logging:
+            if skipped:
+                self.logger.info(f"Requirements check '{selection}' skipped - requirement files and installed packages are unchanged since the last successful check ({duration} ms)")
+            else:
+                self.logger.info(f"Requirements check '{selection}' done in {duration} ms")
 
 
     # def get_installed_packages(self):
@@ -234,6 +351,12 @@ class Shpypi:
 
     def test_core_requirements(self, logging=True, pip3_command=None):
 
+        start = time.perf_counter()
+        fingerprint = self._get_requirements_fingerprint('core')
+        if self._is_check_valid('core', fingerprint):
+            self._log_check_timing('core', start, True, logging)
+            return 1
+
         # build an actual requirements file for core+modules
         # req_files = Requirements_files(self.sh)
         self.req_files.create_requirementsfile('base')
@@ -246,6 +369,8 @@ class Shpypi:
 
         if requirements_met:
             os.remove(complete_filename)
+            self._set_check_valid('core', fingerprint)
+            self._log_check_timing('core', start, False, logging)
             return 1
         else:
             if self.install_requirements('core', logging, pip3_command):
@@ -268,6 +393,17 @@ class Shpypi:
 
         if sh is not None:
             self.sh = sh
+        if 'core' in self.check_timings:
+            # the check of the core requirements is done before logging is initialized
+            duration, skipped = self.check_timings['core']
+            self.logger.info(f"Requirements check 'core' {'skipped (unchanged)' if skipped else 'done'} in {duration} ms")
+
+        start = time.perf_counter()
+        fingerprint = self._get_requirements_fingerprint('base')
+        if self._is_check_valid('base', fingerprint):
+            self._log_check_timing('base', start, True)
+            return 1
+
         # build an actual requirements file for core+modules
         # req_files = Requirements_files(self.sh)
         self.req_files.create_requirementsfile('base')
@@ -276,6 +412,8 @@ class Shpypi:
         requirements_met = self.test_requirements(os.path.join(self._sh_dir, 'requirements', 'base.txt'), logging)
 
         if requirements_met:
+            self._set_check_valid('base', fingerprint)
+            self._log_check_timing('base', start, False)
             return 1
         else:
             if self.install_requirements('base', logging):
@@ -293,6 +431,12 @@ class Shpypi:
             self.logger.warning("Requirments for configured plugins were not checked because the plugin configuration is not in YAML format")
             return True
 
+        start = time.perf_counter()
+        fingerprint = self._get_requirements_fingerprint('conf_all', plugin_conf_basename)
+        if self._is_check_valid('conf_all', fingerprint):
+            self._log_check_timing('conf_all', start, True)
+            return 1
+
         plugin_conf = shyaml.yaml_load(plugin_conf_basename + YAML_FILE, ordered=False)
 
         req_dict = {}
@@ -338,6 +482,8 @@ class Shpypi:
 
         requirements_met = self.test_requirements(os.path.join(self._sh_dir, 'requirements', 'conf_all.txt'), True)
         if requirements_met:
+            self._set_check_valid('conf_all', fingerprint)
+            self._log_check_timing('conf_all', start, False)
             return 1
         else:
             if self.install_requirements('conf_all', logging):
@@ -33,7 +33,12 @@ are implemented in this library.
 
 import logging
 import os
+import pickle
 import shutil
+import time
+import hashlib
+import re
+import threading
 
 from collections import OrderedDict
 
@@ -55,6 +60,16 @@ except:
     logger.critical("shyaml: ruamel.yaml is not installed")
     exit(1)
 
+try:
+    # C-accelerated parser of ruamel.yaml (package ruamel.yaml.clib)
+    from ruamel.yaml.cyaml import CParser as _CParser
+except ImportError:
+    _CParser = None  # noqa
+
+# directory for the cache of parsed yaml files (see yaml_load_cached), caching is disabled if None
+_load_cache_dir = None
+_LOAD_CACHE_VERSION = 1
+
 yaml_version = '1.1'
 indent_spaces = 4
 block_seq_indent = 0
@@ -113,10 +128,7 @@ def yaml_load(filename, ordered=False, ignore_notfound=False):
         with open(filename, 'r', encoding='utf8') as stream:
             sdata = stream.read()
         sdata = sdata.replace('\n', '\n\n')
-        if ordered:
-            y = _ordered_load(sdata, yaml.SafeLoader)
-        else:
-            y = yaml.load(sdata, yaml.SafeLoader)
+        y = _safe_load(sdata, ordered)
     except Exception as e:
         estr = str(e)
         if "found character '\\t'" in estr:
@@ -140,6 +152,77 @@ def yaml_load(filename, ordered=False, ignore_notfound=False):
     return y
 
 
+def set_load_cache_dir(directory):
+    """
+    Set the directory for the cache of parsed yaml files used by yaml_load_cached()
+
+    :param directory: cache directory or None to disable the cache
+    :type directory: str
+    """
+    global _load_cache_dir
+    _load_cache_dir = directory
+
+
+def yaml_load_cached(filename, ordered=False, ignore_notfound=False, process=None, cache_key=''):
+    """
+    Load contents of a configuration file like yaml_load(), using a persistent cache of the parsed data
+
+    The cache entry of a file is valid as long as modification time and size of the file are unchanged.
+    The optional function `process` is called with the freshly loaded data and the filename and may
+    modify the data (e.g. to remove invalid entries). The processed data is only cached, if `process`
+    returns True.
+    If different callers process the same file differently, they have to use different `cache_key` values.
+
+    :param filename: name of the yaml file to load
+    :param ordered: load to an OrderedDict? Default=False
+    :param ignore_notfound: do not log a warning, if the file does not exist
+    :param process: function to process the loaded data before caching it
+    :param cache_key: additional key to distinguish cache entries of the same file
+    :type filename: str
+    :type ordered: bool
+    :type ignore_notfound: bool
+    :type process: function
+    :type cache_key: str
+
+    :return: configuration data loaded from the file (or None if an error occured)
+    :rtype: Dict | OrderedDict | None
+    """
+    start = time.perf_counter()
+    cachefile = None
+    stamp = None
+    if _load_cache_dir is not None:
+        try:
+            st = os.stat(filename)
+            stamp = (_LOAD_CACHE_VERSION, os.path.abspath(filename), ordered, cache_key, st.st_mtime_ns, st.st_size)
+            cachefile = os.path.join(_load_cache_dir, hashlib.sha1(repr(stamp[:4]).encode()).hexdigest())
+            with open(cachefile, 'rb') as f:
+                entry = pickle.load(f)
+            if entry['stamp'] == stamp:
+                logger.info(f"yaml_load_cached: '{filename}' read from cache in {(time.perf_counter()-start)*1000:.1f} ms")
+                return entry['data']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.info(f"yaml_load_cached: Ignoring cache entry for '{filename}': {e}")
+
+    y = yaml_load(filename, ordered, ignore_notfound)
+    cacheable = y is not None
+    if cacheable and process is not None:
+        cacheable = process(y, filename)
+    if cacheable and cachefile is not None:
+        try:
+            os.makedirs(_load_cache_dir, exist_ok=True)
+            # the same file may be loaded by multiple threads (e.g. metadata of multi instance plugins)
+            tmpfile = f"{cachefile}.{threading.get_ident()}.tmp"
+            with open(tmpfile, 'wb') as f:
+                pickle.dump({'stamp': stamp, 'data': y}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpfile, cachefile)
+        except Exception as e:
+            logger.warning(f"yaml_load_cached: Could not write cache entry for '{filename}': {e}")
+    logger.info(f"yaml_load_cached: '{filename}' parsed in {(time.perf_counter()-start)*1000:.1f} ms")
+    return y
+
+
 def yaml_load_fromstring(string, ordered=False):
     """
     Load contents of a string into an dict/OrderedDict structure. The string has to be valid yaml
@@ -223,6 +306,61 @@ def _format_yaml_load(data):
     return data
 
 
+_loaders = {}
+
+def _get_loader(ordered, c_parser=False):
+    """
+    Return a safe loader class
+
+    :param ordered: load mappings to OrderedDicts
+    :param c_parser: use the C-accelerated parser
+    :return: loader class
+    """
+    key = (ordered, c_parser)
+    loader = _loaders.get(key)
+    if loader is None:
+        if c_parser:
+            # like ruamel.yaml.CSafeLoader, but with the resolver of yaml.SafeLoader
+            class Loader(_CParser, yaml.constructor.SafeConstructor, yaml.resolver.VersionedResolver):
+                def __init__(self, stream, version=None, preserve_quotes=None):
+                    _CParser.__init__(self, stream)
+                    self._parser = self._composer = self
+                    yaml.constructor.SafeConstructor.__init__(self, loader=self)
+                    yaml.resolver.VersionedResolver.__init__(self, version, loader=self)
+        else:
+            class Loader(yaml.SafeLoader):
+                pass
+        if ordered:
+            def construct_mapping(loader, node):
+                loader.flatten_mapping(node)
+                return OrderedDict(loader.construct_pairs(node))
+            Loader.add_constructor(yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, construct_mapping)
+        loader = _loaders[key] = Loader
+    return loader
+
+
+_yaml_directive = re.compile(r'\s*(?:#.*\n\s*)*%YAML\s+(\d+)\.(\d+)')
+
+def _safe_load(sdata, ordered):
+    """
+    Load yaml data from a string with a safe loader, using the C-accelerated parser if available
+
+    :param sdata: yaml data
+    :param ordered: load mappings to OrderedDicts
+    :return: loaded data
+    """
+    if _CParser is not None:
+        # the C parser does not pass the version directive to the resolver
+        match = _yaml_directive.match(sdata)
+        version = (int(match.group(1)), int(match.group(2))) if match else None
+        try:
+            return yaml.load(sdata, _get_loader(ordered, c_parser=True), version=version)
+        except Exception:
+            # the C parser is stricter in some cases: use the python parser, which also gives the known error messages
+            pass
+    return yaml.load(sdata, _get_loader(ordered))
+
+
 def _ordered_load(stream, Loader=yaml.Loader, object_pairs_hook=OrderedDict):
     """
     Ordered yaml loader
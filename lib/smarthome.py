@@ -81,6 +81,7 @@ PIDFILE= os.path.join(BASE,'var','run','smarthome.pid')
 import lib.config
 import lib.connection
 import lib.daemon
+import lib.gcpolicy
 import lib.item
 import lib.log
 import lib.logic
@@ -122,9 +123,21 @@ class SmartHome():
     _fallback_language_order = 'en,de'
     _threadinfo_export = False
 
+    # for loading of plugins
+    _plugin_load_threads = 1
+    _plugin_init_timeout = 60
+
     # for scheduler
     _restart_on_num_workers = 30
 
+    # for fading of items (updates per second)
+    _fade_update_rate = 4
+
+    # for garbage collection
+    _gc_thresholds = ''
+    _gc_freeze = True
+    _gc_idle_collection = 0
+
     # ---
 
     BASE = os.path.sep.join(os.path.realpath(__file__).split(os.path.sep)[:-2])
@@ -138,7 +151,9 @@ class SmartHome():
         self.items = None
         self.plugins = None
         self.logics = None
+        self.scenes = None
         self.scheduler = None
+        self.gc_policy = None
 
         self.plugin_load_complete = False
         self.item_load_complete = False
@@ -253,6 +268,9 @@ class SmartHome():
         if MODE == 'unittest':
             return
 
+        # cache parsed configuration files (items and structs)
+        lib.shyaml.set_load_cache_dir(os.path.join(self._var_dir, 'cache_yaml'))
+
         #############################################################
         # Reading smarthome.yaml
 
@@ -308,6 +326,9 @@ class SmartHome():
 
         self.shng_status = {'code': 1, 'text': 'Initializing: Logging initialized'}
 
+        # set up the garbage collection policy (thresholds, recording of pause times)
+        self.gc_policy = lib.gcpolicy.GcPolicy(self)
+
         if hasattr(self, '_tz'):
             # set _tz again (now with logging enabled),
             # so that shtime.set_tz can produce log output
@@ -419,11 +440,9 @@ class SmartHome():
         self._logger_main.notice(" - " + self.shtime.log_msg)
 
         #############################################################
-        # check processor speed (if not done before)
+        # get processor speed (if measured before for this hardware and Python version)
+        # if not measured yet, the cpu profile is measured after the initialization has finished
         self.cpu_speed_class = self.systeminfo.get_cpu_speed(self._var_dir)
-        if self.cpu_speed_class is None:
-            self.shng_status = {'code': 3, 'text': 'Checking processor speed'}
-            self.cpu_speed_class = self.systeminfo.check_cpu_speed(self._var_dir)
 
         #############################################################
         # test if a valid locale is set in the operating system
@@ -636,17 +655,10 @@ class SmartHome():
         if self.scheduler is None:
             self.scheduler = lib.scheduler.Scheduler(self)
         self.trigger = self.scheduler.trigger
+        # set the number of workers and the warn level according to the speed of the cpu
+        self._apply_cpu_tuning(self.cpu_speed_class)
         self.scheduler.start()
 
-        # set warn level to a higher number of workers on fast cpus
-        if self.cpu_speed_class == 'fast':
-            self.scheduler.set_worker_warn_count(60)
-        elif self.cpu_speed_class == 'medium':
-            self.scheduler.set_worker_warn_count(35)
-        else:
-            #leave it on standard (20 workers)
-            pass
-
         #############################################################
         # Init Connections
         #############################################################
@@ -700,6 +712,7 @@ class SmartHome():
         #############################################################
         self.shng_status = {'code': 15, 'text': 'Starting: Initializing logics'}
 
+        lib.logic.set_bytecode_cache_dir(os.path.join(self._var_dir, 'cache_logics'))
         self.logics = lib.logic.Logics(self, self._logic_conf_basename, self._env_logic_conf_basename)
         # signal.signal(signal.SIGHUP, self.logics.reload_logics)
 
@@ -708,6 +721,9 @@ class SmartHome():
         #############################################################
         self.scenes = lib.scene.Scenes(self)
 
+        # exclude the objects created during initialization from later garbage collections
+        self.gc_policy.freeze()
+
         #############################################################
         # Start Connections - remove with lib.connection
         #############################################################
@@ -731,6 +747,8 @@ class SmartHome():
         # Execute Maintenance Method
         #############################################################
         self.scheduler.add('sh.garbage_collection', self._maintenance, prio=8, cron=['init', '4 2 * *'], offset=0)
+        if self.gc_policy.get_idle_collection_cycle() > 0:
+            self.scheduler.add('sh.gc_idle_collection', self.gc_policy.idle_collect, prio=8, cycle=self.gc_policy.get_idle_collection_cycle(), offset=0)
         if self._threadinfo_export:
             self.scheduler.add('sh.thread_info', self._export_threadinfo, prio=8, cycle=120, offset=0)
 
@@ -740,6 +758,11 @@ class SmartHome():
         self.shng_status = {'code': 20, 'text': 'Running'}
         self._logger_main.notice("--------------------   SmartHomeNG initialization finished   --------------------")
 
+        # measure the cpu profile now, so it is not skewed by the load of the initialization
+        if self.cpu_speed_class is None:
+            self._logger.notice("Measuring the cpu profile in the background")
+            self.systeminfo.start_cpu_profile(self._var_dir, callback=self._apply_cpu_tuning)
+
         # modify/replace on removing lib.connection
         while self.alive:
             try:
@@ -757,6 +780,8 @@ class SmartHome():
         self.alive = False
         self._logger.info(f"stop: Number of Threads: {threading.activeCount()}")
 
+        if self.scenes is not None:
+            self.scenes.stop()
         if self.items is not None:
             self.items.stop()
         if self.scheduler is not None:
@@ -797,6 +822,8 @@ class SmartHome():
 
         lib.daemon.remove_pidfile(PIDFILE)
 
+        # write log records, which are still queued
+        self.logs.stop_queue_logging()
         logging.shutdown()
         exit(5)  # exit code 5 -> for systemctl to restart SmartHomeNG
 
@@ -913,8 +940,29 @@ class SmartHome():
         mytb = "".join(traceback.format_tb(tb))
         self._logger.error(f"Unhandled exception: {value}\n{typ}\nrunning SmartHomeNG {self.version}\nException: {mytb}")
 
+    def _apply_cpu_tuning(self, cpu_speed_class):
+        """
+        Tune parameters to the speed of the cpu
+
+        Is called at startup and (if the cpu profile had to be measured) after the measurement in the background has finished
+
+        :param cpu_speed_class: 'slow', 'medium', 'fast' or None, if not measured yet
+        """
+        self.cpu_speed_class = cpu_speed_class
+        scheduler = getattr(self, 'scheduler', None)
+        if scheduler is None:
+            # tuning is applied, when the scheduler is initialized
+            return
+        tuning = self.systeminfo.get_tuning(cpu_speed_class)
+        if scheduler._worker_num < tuning['scheduler_workers']:
+            scheduler.set_worker_count(tuning['scheduler_workers'])
+        scheduler.set_worker_warn_count(tuning['scheduler_worker_warn'])
+
     def _garbage_collection(self):
-        c = gc.collect()
+        if self.gc_policy is not None:
+            c = self.gc_policy.collect()
+        else:
+            c = gc.collect()
         self._logger.debug("Garbage collector: collected {0} objects.".format(c))
 
 
@@ -96,6 +96,93 @@ def _get_field(cant_be_number, raw_string, convert_to, default_value, *field_nam
     return retval
 
 
+# ==========================================================================================
+#   Benchmarks of the cpu profile (each returns the number of operations and the duration in seconds)
+
+class _BenchItem:
+    __slots__ = ('_value', '_last_value', '_last_change', '_last_update', '_changed_by', '_trigger')
+
+    def __init__(self):
+        self._value = 0
+        self._last_value = 0
+        self._last_change = 0
+        self._last_update = 0
+        self._changed_by = None
+        self._trigger = []
+
+    def __call__(self, value, caller, now):
+        value = float(value)
+        self._last_update = now
+        if value != self._value:
+            self._last_value = self._value
+            self._value = value
+            self._last_change = now
+            self._changed_by = caller
+            for trigger in self._trigger:
+                trigger(self, caller)
+
+
+def _bench_item_update(count=20000):
+    import time
+    items = [_BenchItem() for _ in range(100)]
+    triggered = []
+    for item in items[::2]:
+        item._trigger.append(lambda item, caller: triggered.append(item))
+    start = time.perf_counter()
+    for i in range(count):
+        items[i % 100](i % 7, 'Logic', start)
+        if len(triggered) > 1000:
+            triggered.clear()
+    return count, time.perf_counter() - start
+
+
+def _bench_eval(count=20000):
+    import time
+    code = compile("round(value * 1.8 + 32, 1) if value > limit else max(0, value - offset)", '<eval>', 'eval')
+    env = {'limit': 3, 'offset': 2}
+    start = time.perf_counter()
+    for i in range(count):
+        env['value'] = i % 10
+        eval(code, env)
+    return count, time.perf_counter() - start
+
+
+def _bench_json(count=500):
+    import json
+    import time
+    data = {'cmd': 'item', 'items': [['living.light.%d' % i, i * 1.5] for i in range(20)]}
+    start = time.perf_counter()
+    for i in range(count):
+        json.loads(json.dumps(data))
+    return count, time.perf_counter() - start
+
+
+def _bench_dispatch(count=2000):
+    import queue
+    import threading
+    import time
+    runq = queue.PriorityQueue()
+    done = threading.Event()
+
+    def worker():
+        while True:
+            prio, seq, entry = runq.get()
+            if entry is None:
+                break
+            entry[1](*entry[2:])
+        done.set()
+
+    results = []
+    t = threading.Thread(target=worker, name='cpu_profile_worker', daemon=True)
+    t.start()
+    start = time.perf_counter()
+    for i in range(count):
+        runq.put((5, i, ('bench', results.append, i)))
+    runq.put((9, count, None))
+    done.wait(60)
+    return count, time.perf_counter() - start
+
+
 # ==========================================================================================
 
 class Systeminfo:
@@ -262,14 +349,25 @@ class Systeminfo:
 
     @classmethod
     def get_cpu_speed(cls, var_dir):
+        """
+        Returns the speed class of the cpu from a stored cpu profile
+
+        A stored profile is only used, if it has been measured on the same cpu with the same Python version
+        and the same version of the benchmark profile.
+
+        :param var_dir: var directory of SmartHomeNG
+        :return: 'slow', 'medium', 'fast' or None, if no matching profile is stored
+        """
         if yaml_support:
             # read previous results from yaml file
             cls._systeminfo_dict = shyaml.yaml_load(os.path.join(var_dir, 'systeminfo.yaml'), ignore_notfound=True)
             try:
-                cls.cpu_speed_class = cls._systeminfo_dict['systeminfo']['cpu_speed_class']
-                cls.cpu_measured_time = cls._systeminfo_dict['systeminfo']['cpu_measured_time']
-                if cls.get_cpubrand() == cls._systeminfo_dict['systeminfo']['cpu_brand']:
-                    # return time, if cpu brand has not changed since stored measurement
+                stored = cls._systeminfo_dict['systeminfo']
+                if stored.get('cpu_profile_key') == cls.get_cpu_profile_key():
+                    # return class, if cpu, Python and profile version have not changed since stored measurement
+                    cls.cpu_speed_class = stored['cpu_speed_class']
+                    cls.cpu_duration = stored['cpu_measured_time']
+                    cls.cpu_profile = stored.get('cpu_profile', {})
                     return cls.cpu_speed_class
             except:
                 return None
@@ -278,8 +376,26 @@ class Systeminfo:
 
     cpu_duration = None
     cpu_speed_class = None
+    cpu_profile = None
 
     _systeminfo_dict = {}
+    _profile_thread = None
+
+    CPU_PROFILE_VERSION = 2
+
+    # seconds of the classic calculation loop per microsecond of the profile total (measured on x86_64)
+    CPU_PROFILE_FACTOR = 0.275
+
+
+    @classmethod
+    def get_cpu_profile_key(cls):
+        """
+        Returns the key, a stored cpu profile is valid for (cpu brand, architecture, Python version, profile version)
+
+        :rtype: str
+        """
+        return f"{cls.get_cpubrand()}|{platform.machine()}|{platform.python_version()}|{cls.CPU_PROFILE_VERSION}"
+
 
     @classmethod
     def measure_cpu_speed(cls):
@@ -329,27 +445,133 @@ class Systeminfo:
 
 
     @classmethod
-    def check_cpu_speed(cls, var_dir):
+    def measure_cpu_profile(cls):
+        """
+        Run a short benchmark profile, which is representative for the work SmartHomeNG does
 
-        if yaml_support:
-            # read previous results from yaml file
-            cls._systeminfo_dict = shyaml.yaml_load(os.path.join(var_dir, 'systeminfo.yaml'), ignore_notfound=True)
-            pass
+        The profile consists of item updates, execution of eval expressions, JSON serialization and the
+        dispatch of tasks to worker threads (like the scheduler does). Each benchmark returns the time
+        in microseconds per operation.
+
+        The speed class is derived from the total of the benchmarks (see classify_cpu_profile).
+
+        :return: dict with the results of the benchmarks, the estimated duration of the classic test and the speed class
+        :rtype: dict
+        """
+        profile = {}
+        for name, benchmark in [('item_update', _bench_item_update),
+                                ('eval', _bench_eval),
+                                ('json', _bench_json),
+                                ('dispatch', _bench_dispatch)]:
+            count, duration = benchmark()
+            profile[name] = round(duration / count * 1000000, 3)
+
+        profile['total'] = round(sum(profile.values()), 3)
+        profile['cpu_measured_time'], profile['cpu_speed_class'] = cls.classify_cpu_profile(profile)
+        return profile
 
-        # execute speed test
-        cls.cpu_duration, cls.cpu_speed_class = cls.measure_cpu_speed()
+
+    @classmethod
+    def classify_cpu_profile(cls, profile):
+        """
+        Classify the machine by the results of a cpu profile
+
+        The total of the profile is converted to the duration of the classic calculation loop
+        (see measure_cpu_speed), so the thresholds and the measured data listed there stay valid.
+
+        :param profile: cpu profile, as returned by measure_cpu_profile()
+        :type profile: dict
+        :return: estimated number of seconds for the calculation loop and speed class
+        :rtype: tuple
+        """
+        cpu_duration = round(profile['total'] * cls.CPU_PROFILE_FACTOR, 2)
+
+        if cpu_duration > 120:
+            cpu_speed_class = 'slow'
+        elif cpu_duration > 50:
+            cpu_speed_class = 'medium'
+        else:
+            cpu_speed_class = 'fast'
+
+        return cpu_duration, cpu_speed_class
+
+
+    @classmethod
+    def check_cpu_speed(cls, var_dir):
+        """
+        Measure the cpu profile and store the result in var/systeminfo.yaml
+
+        :param var_dir: var directory of SmartHomeNG
+        :return: 'slow', 'medium' or 'fast'
+        """
+        profile = cls.measure_cpu_profile()
+        cls.cpu_duration = profile.pop('cpu_measured_time')
+        cls.cpu_speed_class = profile.pop('cpu_speed_class')
+        cls.cpu_profile = profile
         cls._systeminfo_dict = {}
         cls._systeminfo_dict['systeminfo'] = {}
         cls._systeminfo_dict['systeminfo']['cpu_brand'] = cls.get_cpubrand()
+        cls._systeminfo_dict['systeminfo']['cpu_profile_key'] = cls.get_cpu_profile_key()
         cls._systeminfo_dict['systeminfo']['cpu_measured_time'] = cls.cpu_duration
         cls._systeminfo_dict['systeminfo']['cpu_speed_class'] = cls.cpu_speed_class   # slow / medium / fast
+        cls._systeminfo_dict['systeminfo']['cpu_profile'] = cls.cpu_profile
 
         if yaml_support:
-
             # write results to yaml file
             shyaml.yaml_save(os.path.join(var_dir, 'systeminfo.yaml'), cls._systeminfo_dict)
         return cls._systeminfo_dict['systeminfo']['cpu_speed_class']
 
+
+    @classmethod
+    def start_cpu_profile(cls, var_dir, callback=None):
+        """
+        Measure the cpu profile in a background thread (if no measurement is running yet)
+
+        :param var_dir: var directory of SmartHomeNG
+        :param callback: function, that is called with the speed class, when the measurement has finished
+        """
+        import threading
+
+        if cls._profile_thread is not None and cls._profile_thread.is_alive():
+            return
+
+        def _measure():
+            try:
+                cpu_speed_class = cls.check_cpu_speed(var_dir)
+            except Exception as e:
+                _logger.error(f"Measuring the cpu profile failed: {e}")
+                return
+            _logger.info(f"Cpu profile measured: speed class '{cpu_speed_class}', {cls.cpu_profile}")
+            if callback is not None:
+                callback(cpu_speed_class)
+
+        cls._profile_thread = threading.Thread(target=_measure, name='cpu_profile', daemon=True)
+        cls._profile_thread.start()
+
+
+    @classmethod
+    def get_tuning(cls, cpu_speed_class=None):
+        """
+        Returns parameters, which are tuned to the speed of the cpu
+
+        - scheduler_workers: initial number of worker threads of the scheduler
+        - scheduler_worker_warn: number of worker threads, that triggers a warning
+        - websocket_flush_interval: time (in seconds) to collect item updates, before they are sent to a visu
+          (0 = send the updates, that are already queued, without waiting)
+
+        :param cpu_speed_class: 'slow', 'medium' or 'fast' (default: measured speed class)
+        :return: dict with tuned parameters
+        :rtype: dict
+        """
+        if cpu_speed_class is None:
+            cpu_speed_class = cls.cpu_speed_class
+        if cpu_speed_class == 'fast':
+            return {'scheduler_workers': 8, 'scheduler_worker_warn': 60, 'websocket_flush_interval': 0.02}
+        if cpu_speed_class == 'medium':
+            return {'scheduler_workers': 6, 'scheduler_worker_warn': 35, 'websocket_flush_interval': 0.05}
+        # slow or not measured yet: standard settings, item updates are sent without waiting
+        return {'scheduler_workers': 5, 'scheduler_worker_warn': 20, 'websocket_flush_interval': 0}
+
     # ==========================================================================================
 
     proc_cpuinfo = None
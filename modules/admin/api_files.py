@@ -496,6 +496,21 @@ class FilesController(RESTResource):
         return json.dumps({"result": "ok"})
 
 
+    def prepare_config_backup(self):
+        """
+        Create the backup in the background, so it can be downloaded without waiting for the compression
+
+        :return: progress of the backup
+        """
+        lib.backup.start_backup(self.extern_conf_dir, self.base_dir)
+        return json.dumps(lib.backup.get_backup_progress())
+
+
+    def get_config_backup_progress(self):
+
+        return json.dumps(lib.backup.get_backup_progress())
+
+
     def restore_config(self, filename):
         """
         Restore previously created backup
@@ -601,6 +616,12 @@ class FilesController(RESTResource):
 
         elif id == 'backup':
             return self.get_config_backup()
+        elif id == 'backup_prepare':
+            cherrypy.response.headers['Cache-Control'] = 'no-cache, max-age=0, must-revalidate, no-store'
+            return self.prepare_config_backup()
+        elif id == 'backup_progress':
+            cherrypy.response.headers['Cache-Control'] = 'no-cache, max-age=0, must-revalidate, no-store'
+            return self.get_config_backup_progress()
         return None
 
     read.expose_resource = True
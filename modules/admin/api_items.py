@@ -29,6 +29,7 @@ from lib.item import Items
 
 import jwt
 from .rest import RESTResource
+from .itemdata import cached_json_response
 
 
 class ItemsController(RESTResource):
@@ -80,6 +81,7 @@ class ItemsListController(RESTResource):
         self.logger = logging.getLogger(__name__)
 
         self.items = Items.get_instance()
+        self._json_cache = {}
 
         return
 
@@ -94,12 +96,17 @@ class ItemsListController(RESTResource):
         if self.items is None:
             self.items = Items.get_instance()
 
+        # the list is only rebuilt, if items have been added or removed
+        return cached_json_response(self._json_cache, 'list', self.items.get_structure_version(), self._build_item_list)
+
+
+    def _build_item_list(self):
         items_sorted = sorted(self.items.return_items(), key=lambda k: str.lower(k['_path']), reverse=False)
 
         item_list = []
         for item in items_sorted:
             item_list.append(item._path)
-        return json.dumps(item_list)
+        return item_list
 
     read.expose_resource = True
     read.authentication_needed = True
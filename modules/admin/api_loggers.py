@@ -116,7 +116,7 @@ class LoggersController(RESTResource):
     def get_active_logger_handler_names(self, logger_name):
 
         logger = logging.getLogger(logger_name)
-        handlers = logger.handlers
+        handlers = self._sh.logs.get_logger_handlers(logger)
         handler_names = []
         for h in handlers:
             handler_names.append(h.name)
@@ -131,21 +131,22 @@ class LoggersController(RESTResource):
         self.logger.info(f"set_handlers: logger='{logger_name}', new handlers={handlerlist})")
 
         # remove existing handlers from logger, which are not in the list of handlers to configure
-        handlers = list(logger.handlers)
+        # (if logging is queued, the handlers of the root logger are changed at the queue listener)
+        handlers = self._sh.logs.get_logger_handlers(logger)
         for h in handlers:
             if not h.name in handlerlist:
                 self.logger.info(f"set_handlers: - Remove handler '{h.name}' from logger '{logger_name}'")
-                logger.removeHandler(h)
+                self._sh.logs.remove_logger_handler(logger, h)
 
         # add handlers to logger, which are not in the list of existing handlers of the logger
         for hn in handlerlist:
             hn_found = False
-            for h in logger.handlers:
+            for h in self._sh.logs.get_logger_handlers(logger):
                 if h.name == hn:
                     hn_found = True
             if not hn_found:
                 self.logger.info(f"set_handlers: - Add handler '{hn}' to logger '{logger_name}'")
-                logger.addHandler(self._sh.logs.get_handler_by_name(hn))
+                self._sh.logs.add_logger_handler(logger, self._sh.logs.get_handler_by_name(hn))
 
         new_handler_names = sorted(self.get_active_logger_handler_names(logger_name))
 
@@ -164,7 +165,7 @@ class LoggersController(RESTResource):
 
         hl = []
         try:
-            for h in logger.parent.handlers:
+            for h in self._sh.logs.get_logger_handlers(logger.parent):
                 try:
                     hl.append(h.name)
                 except Exception as e:
@@ -189,7 +190,7 @@ class LoggersController(RESTResource):
 
         hl = []
         bl = []
-        for h in active_logger.handlers:
+        for h in self._sh.logs.get_logger_handlers(active_logger):
             hl.append(h.__class__.__name__)
             try:
                 bl.append(h.baseFilename)
@@ -248,7 +248,8 @@ class LogicsController(RESTResource):
 
         logics_new = sorted(self.logic_findnew(logics_list), key=lambda k: k['name'])
         logics_sorted = sorted(logics_list, key=lambda k: k['name'])
-        self.logics_data = {'logics_new': logics_new, 'logics': logics_sorted, 'groups': self.logics._groups}
+        self.logics_data = {'logics_new': logics_new, 'logics': logics_sorted, 'groups': self.logics._groups,
+                            'bytecode_cache': self.logics.get_bytecode_cache_stats()}
         return json.dumps(self.logics_data)
 
 
@@ -21,8 +21,11 @@
 
 
 import os
+import io
+import itertools
 import logging
 import json
+import threading
 import cherrypy
 
 import lib.shyaml as shyaml
@@ -47,6 +50,13 @@ class LogsController(RESTResource):
 
         self.chunksize = self.module.log_chunksize
 
+        # cached listing of the log directory (refreshed, when the mtime of the directory changes)
+        self.files = []
+        self._files_mtime = None
+        # per file index of the byte offsets of the chunks (see _update_chunk_index)
+        self._chunk_index = {}
+        self._chunk_index_lock = threading.Lock()
+
         try:
             roothandler = self.logging_conf['root']['handlers'][0]
             self.root_logname = os.path.splitext(os.path.basename(self.logging_conf['handlers'][roothandler]['filename']))[0]
@@ -109,6 +119,132 @@ class LogsController(RESTResource):
         return logfiles
 
 
+    def _list_files(self):
+        """
+        Read the names of the files in the log directory, if the directory has changed since the last call
+        """
+        mtime = os.stat(self.log_dir).st_mtime_ns
+        if mtime == self._files_mtime:
+            return
+        wrkl = sorted(os.listdir(self.log_dir))
+        files = []
+        for fn in wrkl:
+            if not(fn.startswith('.')):
+                if os.path.isfile(os.path.join(self.log_dir, fn)):
+                    files.append(fn)
+        self.files = files
+        self._files_mtime = mtime
+        # forget indexes of files that do not exist anymore
+        with self._chunk_index_lock:
+            for path in list(self._chunk_index):
+                if os.path.basename(path) not in files:
+                    del self._chunk_index[path]
+
+
+    def _update_chunk_index(self, path, chunk=0):
+        """
+        Update the chunk index of a logfile with the lines added since the last call
+
+        The index holds the byte offset of the first line of every chunk. It is keyed by
+        the inode of the file and is rebuilt, if the file has been replaced (log rotation)
+        or truncated. Only complete lines (terminated by a newline) are indexed.
+
+        :param path: path of the logfile
+        :param chunk: number of the chunk needed (stop indexing, when it is reached) or 0 to index the whole file
+        :type path: str
+        :type chunk: int
+        :return: list of chunk offsets and size of the file
+        :rtype: tuple
+        """
+        with self._chunk_index_lock:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                idx = self._chunk_index.get(path)
+                if idx is None or idx['inode'] != st.st_ino or idx['offset'] > st.st_size:
+                    idx = {'inode': st.st_ino, 'offset': 0, 'lines': 0, 'chunks': [0]}
+                    self._chunk_index[path] = idx
+
+                if st.st_size > idx['offset'] and (chunk == 0 or len(idx['chunks']) <= chunk):
+                    f.seek(idx['offset'])
+                    offset = idx['offset']
+                    lines = idx['lines']
+                    chunks = idx['chunks']
+                    rest = b''
+                    while True:
+                        block = f.read(1024*1024)
+                        if not block:
+                            break
+                        data = rest + block
+                        end = data.rfind(b'\n') + 1
+                        rest = data[end:]
+                        if end == 0:
+                            continue
+                        count = data.count(b'\n', 0, end)
+                        next_chunk = len(chunks) * self.chunksize
+                        if lines + count >= next_chunk:
+                            # chunk boundaries within this block: get the cumulated lengths of the lines
+                            lengths = list(itertools.accumulate(map(len, data[:end].split(b'\n'))))
+                            while next_chunk <= lines + count:
+                                n = next_chunk - lines
+                                # start of line n within the block = length of n lines + n newlines
+                                chunks.append(offset + lengths[n-1] + n)
+                                next_chunk += self.chunksize
+                        offset += end
+                        lines += count
+                        if chunk > 0 and len(chunks) > chunk:
+                            # start of the requested chunk and of the following chunk are known
+                            break
+                    idx['offset'] = offset
+                    idx['lines'] = lines
+            return (idx['chunks'], st.st_size)
+
+
+    def _read_chunk(self, path, chunk):
+        """
+        Read a chunk of a logfile
+
+        Multiline tracebacks are joined to one log line. Chunk 0 returns the last chunk of the file.
+
+        :param path: path of the logfile
+        :param chunk: number of the chunk (starting with 1) or 0 for the last chunk
+        :return: number of the chunk read, log lines and flag, if it is the last chunk
+        :rtype: tuple
+        """
+        chunks, filesize = self._update_chunk_index(path, chunk)
+        if chunk == 0:
+            # seek directly to the last non empty chunk
+            chunk = len(chunks)
+            if chunks[-1] >= filesize and chunk > 1:
+                chunk -= 1
+        start = chunks[chunk-1] if chunk <= len(chunks) else filesize
+
+        with open(path, 'rb') as bfile:
+            bfile.seek(start)
+            lfile = io.TextIOWrapper(bfile, encoding='UTF-8')
+            append_to_previous_line = False
+            loglines = []
+            lastchunk = True
+            # read lines of logfile
+            for line in lfile:
+                if len(loglines) < self.chunksize:
+                    if line.startswith('Traceback') and len(loglines) > 0:
+                        append_to_previous_line = True
+                    if append_to_previous_line:
+                        # append to previous log line
+                        loglines[len(loglines)-1] += '> ' + line.replace(" ", chr(160))
+                        if (not line.startswith('Traceback')) and (not line.startswith('  ')):
+                            # last line of multiline traceback reached
+                            append_to_previous_line = False
+                    else:
+                        # append new log line
+                        loglines.append(line.replace(" ", chr(160)))
+                else:
+                    # chunk length reached, but there is another line
+                    lastchunk = False
+                    break
+        return (chunk, loglines, lastchunk)
+
+
     # ======================================================================
     #  GET /api/logs
     #
@@ -124,12 +260,7 @@ class LogsController(RESTResource):
             chunk = 1
 
         # get names of files in log directory
-        wrkl = sorted(os.listdir(self.log_dir))
-        self.files = []
-        for fn in wrkl:
-            if not(fn.startswith('.')):
-                if os.path.isfile(os.path.join(self.log_dir, fn)):
-                    self.files.append(fn)
+        self._list_files()
         # get names of logs (from filenames enting with '.log')
         logs = self.get_logs()
         if id is None:
@@ -142,58 +273,18 @@ class LogsController(RESTResource):
             logfiles = self.get_files_of_log(id)
             return json.dumps(sorted(logfiles))
 
-        if os.path.isfile(os.path.join(self.log_dir, id)):
+        if id in self.files:
             # return content of the logfile specified in id, if file is found
-            chunk_read = 0
-            if chunk > 0:
-                chunk_read = chunk-1
-            skiplines = self.chunksize * (chunk-1)
-            if skiplines < 0:
-                skiplines = 0
-            skipcount = 0
-
-            # read logfile
-            with open(os.path.join(self.log_dir, id), 'r', encoding='UTF-8') as lfile:
-                append_to_previous_line = False
-                loglines = []
-                lastchunk = True
-                # read lines of logfile
-                for line in lfile:
-                    if (skiplines > 0) and (skipcount < skiplines):
-                        # skip line, if not reading first chunk
-                        skipcount += 1
-                    else:
-                        if len(loglines) < self.chunksize:
-                            if line.startswith('Traceback'):
-                                append_to_previous_line = True
-                            if append_to_previous_line:
-                                # append to previous log line
-                                loglines[len(loglines)-1] += '> ' + line.replace(" ", chr(160))
-                                if (not line.startswith('Traceback')) and (not line.startswith('  ')):
-                                    # last line of multiline traceback reached
-                                    append_to_previous_line = False
-                            else:
-                                # append new log line
-                                loglines.append(line.replace(" ", chr(160)))
-                        else:
-                            # chunk length reached, but there is another line
-                            lastchunk = False
-                            if chunk != 0:
-                                break
-                            else:
-                                chunk_read += 1
-                                # skip forward till last chunk is read
-                                loglines = []
-                                loglines.append(line.replace(" ", chr(160)))
-                                if chunk == 0:
-                                    lastchunk = True
-
-                chunk_read += 1
+            if chunk < 0:
+                chunk = 1
+            path = os.path.join(self.log_dir, id)
+            chunk_read, loglines, lastchunk = self._read_chunk(path, chunk)
+
             # return content
             first_chunk_line = (chunk_read-1)*self.chunksize   # zero based
             result = {}
             result['file'] = id
-            result['filesize'] = round(os.path.getsize(os.path.join(self.log_dir, id)) / 1024, 1)
+            result['filesize'] = round(os.path.getsize(path) / 1024, 1)
             result['chunk'] = chunk_read
             result['chunksize'] = self.chunksize
             result['lastchunk'] = lastchunk
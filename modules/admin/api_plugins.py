@@ -492,6 +492,8 @@ class PluginsInfoController(RESTResource):
                 plugin['stoppable'] = False
             if plugin['pluginname'] == 'backend':
                 plugin['stoppable'] = False
+            # duration of the initialization of the plugin in ms
+            plugin['init_duration'] = round(getattr(x, '_init_duration', 0) * 1000)
 
             plugin_list.append(plugin)
         #        plugins_sorted = sorted(plugin_list, key=lambda k: k['classpath'])
@@ -123,6 +123,31 @@ class SchedulersController(RESTResource):
                 (schedule['task_type'], schedule['task_name']) = self.build_task_info(s['obj'])
                 schedule_list.append(schedule)
 
+        # handle all pending one-shot timers of items (autotimer, timer, hysteresis)
+        items = self._sh.items
+        if items is not None:
+            for timer in items.get_pending_timers():
+                schedule = dict()
+                schedule['fullname'] = timer['name']
+                schedule['name'] = timer['name']
+                schedule['group'] = 'other'
+                schedule['next'] = timer['next'].strftime('%Y-%m-%d %H:%M:%S%z')
+                schedule['cycle'] = '-'
+                schedule['cron'] = '-'
+                schedule['prio'] = 3
+                schedule['active'] = True
+                schedule['value'] = str(timer['value'])
+                schedule['remaining'] = round(timer['remaining'], 1)
+
+                nl = timer['name'].split('.')
+                if nl[0].lower() == 'items':
+                    schedule['group'] = 'item'
+                    del nl[0]
+                    schedule['name'] = '.'.join(nl)
+
+                (schedule['task_type'], schedule['task_name']) = self.build_task_info(timer['obj'])
+                schedule_list.append(schedule)
+
         # Handle all waiting triggers
         triggers = self._sh.scheduler._triggerq.dump()    # returns a list
         for trigger in triggers:
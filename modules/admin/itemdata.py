@@ -26,6 +26,7 @@ import json
 import ast
 
 import cherrypy
+from cherrypy.lib import cptools, httputil
 
 import lib.config
 from lib.item import Items
@@ -33,11 +34,47 @@ from lib.item import Items
 from lib.constants import (ATTRIBUTE_SEPARATOR)
 
 
+def cached_json_response(cache, key, version, build):
+    """
+    Return a json response, that is rebuilt only if the version of the underlying data has changed
+
+    The response carries an ETag and a Last-Modified header. If the browser already has the
+    current version, the request is answered with '304 Not Modified'.
+
+    :param cache: dict to store the cached responses in
+    :param key: key of the response in the cache
+    :param version: version of the data the response is built from
+    :param build: function returning the data to be serialized, if the cache is outdated
+    :type cache: dict
+    :type key: str
+    :type version: int
+    :type build: function
+    :return: json string
+    :rtype: str
+    """
+    entry = cache.get(key)
+    if entry is None or entry['version'] != version:
+        entry = {'version': version, 'json': json.dumps(build()), 'modified': datetime.datetime.now().timestamp()}
+        entry['etag'] = '"{}-{}-{}"'.format(key, version, int(entry['modified']))
+        cache[key] = entry
+
+    cherrypy.response.headers['ETag'] = entry['etag']
+    cherrypy.response.headers['Last-Modified'] = httputil.HTTPDate(entry['modified'])
+    # let the browser revalidate on every request
+    cherrypy.response.headers['Cache-Control'] = 'no-cache'
+    # raises HTTPRedirect with status 304, if the browser has the current version
+    cptools.validate_etags()
+    if 'If-None-Match' not in cherrypy.request.headers:
+        cptools.validate_since()
+    return entry['json']
+
+
 class ItemData:
 
     def __init__(self):
 
         self.items = Items.get_instance()
+        self._items_json_cache = {}
 
         return
 
@@ -56,6 +93,14 @@ class ItemData:
         if self.items is None:
             self.items = Items.get_instance()
 
+        if mode != 'tree':
+            mode = 'list'
+        # the json data is only rebuilt, if items have been added or removed
+        return cached_json_response(self._items_json_cache, mode, self.items.get_structure_version(),
+                                    lambda: self._build_items_json(mode))
+
+
+    def _build_items_json(self, mode):
         items_sorted = sorted(self.items.return_items(), key=lambda k: str.lower(k['_path']), reverse=False)
 
         if mode == 'tree':
@@ -66,13 +111,13 @@ class ItemData:
 
             (item_data, item_count) = self._build_item_tree(parent_items_sorted)
             self.logger.info("admin: items_json: In tree-mode, {} items returned".format(item_count))
-            return json.dumps([item_count, item_data])
+            return [item_count, item_data]
         else:
             item_list = []
             for item in items_sorted:
                 item_list.append(item._path)
             self.logger.info("admin: items_json: Not in tree-mode, {} items returned".format(len(item_list)))
-            return json.dumps(item_list)
+            return item_list
 
 
     def _build_item_tree(self, parent_items_sorted):
@@ -247,6 +292,10 @@ class ItemData:
             if item._autotimer_value is not None:
                 autotimer += ' ' + ATTRIBUTE_SEPARATOR + ' ' + str(item._autotimer_value)
 
+            timer_remaining = item.get_timer_remaining()
+            if timer_remaining is not None:
+                timer_remaining = round(timer_remaining, 1)
+
             data_dict = {'path': item.property.path,
                          'name': item.property.name,
                          'description': description,
@@ -286,6 +335,7 @@ class ItemData:
                          'cycle': str(cycle),
                          'crontab': str(crontab),
                          'autotimer': self.disp_str(autotimer),
+                         'timer_remaining': self.disp_str(timer_remaining),
                          'threshold': self.disp_str(item._threshold),
                          'threshold_crossed': '',
 #                         'config': json.dumps(item_conf_sorted),
@@ -129,6 +129,8 @@ class SystemData:
 
         if self._sh.systeminfo.cpu_speed_class is not None:
             response['hwspeed'] = self._sh.systeminfo.cpu_speed_class
+        if self._sh.systeminfo.cpu_profile is not None:
+            response['cpu_profile'] = self._sh.systeminfo.cpu_profile
 
         response['uptime'] = time.mktime(datetime.datetime.now().timetuple()) - psutil.boot_time()
         response['sh_uptime'] = sh_runtime_seconds
@@ -31,6 +31,9 @@ from jinja2 import Environment, FileSystemLoader
 
 from lib.utils import Utils
 from lib.model.module import Module
+import lib.metrics as metrics
+
+from . import staticfiles
 
 
 class CherryPyFilter(logging.Filter):
@@ -61,7 +64,7 @@ class CherryPyFilter(logging.Filter):
 
 class Http(Module):
 
-    version = '1.7.2'
+    version = '1.7.4'
     _shortname = ''
     _longname = 'CherryPy http module for SmartHomeNG'
 
@@ -137,6 +140,11 @@ class Http(Module):
             self._starturl = self._parameters['starturl']
             self._connectionretries = self._parameters['connectionretries']
             self._webif_pagelength = self._parameters['webif_pagelength']
+
+            self._static_max_age = self._parameters['static_max_age']
+            self._precompress_static = self._parameters['precompress_static']
+            self._compress_min_size = self._parameters['compress_min_size']
+            self._metrics = self._parameters['metrics']
         except:
             self.logger.critical("Inconsistent module (invalid metadata definition)")
             self._init_complete = False
@@ -266,6 +274,7 @@ class Http(Module):
                 'webif_pagelength': self._webif_pagelength
             }
         )
+        self._init_static_tools()
         if self._use_tls:
             self._server1 = cherrypy._cpserver.Server()
             self._server1.socket_port=int(self._port)
@@ -288,6 +297,8 @@ class Http(Module):
         self.tplenv = self.init_template_environment()
 
         self._gstatic_dir = self.webif_dir + '/gstatic'
+        self._precompressed_dirs = []
+        self._precompress_static_dirs([self._gstatic_dir])
 
         # self.module_conf = {
         #     '/': {
@@ -381,9 +392,81 @@ class Http(Module):
             self.register_service(self.root.services, 'services', config_services)
 #                                  pluginclass='', instance='', description='', servicename='')
 
+        if self._metrics == True:
+            # Register the metrics endpoint (Prometheus/OpenMetrics) as a service
+            # the basic auth of the services is set by register_service()
+            config_metrics = {'/': {}}
+            self.register_service(_MetricsApp(self), 'metrics', config_metrics, description='Runtime metrics of SmartHomeNG (Prometheus/OpenMetrics)')
+
         return
 
 
+    def _init_static_tools(self):
+        """
+        Replace the CherryPy tools for static files and enable the compression of dynamic responses
+
+        The replacements of the tools staticdir and staticfile send ETags, long-lived Cache-Control
+        headers for fingerprinted files and precompressed siblings (.br, .gz) of the files. They are
+        configured by the same configuration entries as the original tools, so the web interfaces of
+        all plugins use them without changes.
+        """
+        cherrypy.tools.staticdir = cherrypy._cptools.HandlerTool(staticfiles.staticdir)
+        cherrypy.tools.staticfile = cherrypy._cptools.HandlerTool(staticfiles.staticfile)
+        cherrypy.tools.shng_compress = cherrypy.Tool('before_finalize', staticfiles.compress_response, priority=80)
+        cherrypy.config.update(
+            {
+                'tools.staticdir.max_age': self._static_max_age,
+                'tools.staticdir.precompressed': self._precompress_static,
+                'tools.staticfile.max_age': self._static_max_age,
+                'tools.staticfile.precompressed': self._precompress_static,
+                'tools.shng_compress.on': self._compress_min_size > 0,
+                'tools.shng_compress.min_size': self._compress_min_size,
+            }
+        )
+        self.logger.info(f"Static files: precompressed siblings {'enabled' if self._precompress_static else 'disabled'} (brotli {'available' if staticfiles.BROTLI_AVAILABLE else 'not installed'}), max_age {self._static_max_age} s, compression of responses >= {self._compress_min_size} bytes")
+
+
+    def _precompress_static_dirs(self, dirs):
+        """
+        Create the precompressed siblings of the static files in the given directories (in the background)
+
+        Only directories of SmartHomeNG modules are precompressed, plugins may ship the siblings
+        of their static files themselves.
+
+        :param dirs: list of static directories
+        :type dirs: list
+        """
+        if not self._precompress_static:
+            return
+        modules_dir = os.path.join(self._sh.get_basedir(), 'modules') + os.sep
+        new_dirs = []
+        for path in dirs:
+            path = os.path.normpath(path)
+            if path in self._precompressed_dirs or not os.path.isdir(path) or not (path + os.sep).startswith(modules_dir):
+                continue
+            self._precompressed_dirs.append(path)
+            new_dirs.append(path)
+        if new_dirs:
+            staticfiles.start_precompression(new_dirs)
+
+
+    def _get_static_dirs(self, conf):
+        """
+        Returns the directories served by the staticdir tool in an application configuration
+
+        :param conf: Cherrypy application configuration dictionary
+        :type conf: dict
+        :return: list of absolute directory paths
+        :rtype: list
+        """
+        root = conf.get('/', {}).get('tools.staticdir.root', '')
+        dirs = []
+        for section in conf.values():
+            if isinstance(section, dict) and section.get('tools.staticdir.on', False) and section.get('tools.staticdir.dir'):
+                dirs.append(os.path.join(section.get('tools.staticdir.root', root), section['tools.staticdir.dir']))
+        return dirs
+
+
     def init_template_environment(self):
         """
         Initialize the Jinja2 template engine environment
@@ -786,6 +869,7 @@ class Http(Module):
         if len(self._hostmap_webifs) > 0:
             conf['/']['request.dispatch'] = cherrypy.dispatch.VirtualHost(**self._hostmap_webifs)
 
+        self._precompress_static_dirs(self._get_static_dirs(conf))
         cherrypy.tree.mount(app, mount, config = conf)
         return
 
@@ -1079,3 +1163,29 @@ class _ServicesApp:
         tmpl = self.mod.tplenv.get_template('services.html')
         result = tmpl.render( services=self.mod._services )
         return result
+
+
+class _MetricsApp:
+    """
+    The module 'http' implements the metrics endpoint of SmartHomeNG.
+    This WebApp returns the runtime metrics in the Prometheus text format or in the OpenMetrics
+    format (if requested by the Accept header of the scraper).
+
+    This webservice is mounted to CherryPy as '/metrics'
+    """
+
+    def __init__(self, mod):
+        self.mod = mod
+
+    @cherrypy.expose
+    def index(self):
+        """
+        This method is exposed to CherryPy. It implements the page 'metrics'
+        """
+        openmetrics = 'application/openmetrics-text' in cherrypy.request.headers.get('Accept', '')
+        if openmetrics:
+            cherrypy.response.headers['Content-Type'] = metrics.CONTENT_TYPE_OPENMETRICS
+        else:
+            cherrypy.response.headers['Content-Type'] = metrics.CONTENT_TYPE_TEXT
+        cherrypy.response.headers['Cache-Control'] = 'no-cache'
+        return metrics.generate_text(openmetrics).encode('utf-8')
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+
+"""
+Serving of static files and compression of responses for the http module
+
+- The CherryPy tools staticdir and staticfile are replaced by versions, which send an ETag and
+  answer conditional requests with '304 Not Modified'. Fingerprinted files (e.g. the bundles of
+  the admin interface like main.369312ccdc67c9a50c53.js) are sent with a long-lived
+  Cache-Control header.
+- If the browser accepts it, a precompressed sibling of a file (<file>.br or <file>.gz) is sent
+  instead of the file itself. The siblings are created once in the background by
+  precompress_directory().
+- Dynamic responses (e.g. json responses of the admin api) above a minimum size are compressed
+  with the encoding negotiated with the browser.
+"""
+
+import gzip
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+import cherrypy
+from cherrypy.lib import cptools, httputil, set_vary_header, static
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# names of webpack bundles like 'main.369312ccdc67c9a50c53.js' or 'color.c7a33805ffda0d32bd2a.png': a hash of
+# 16 to 20 hex digits (with digits and letters) between dots. Names like 'log_20240101.txt' do not match.
+FINGERPRINTED = re.compile(r'\.(?=[0-9a-f]*[0-9])(?=[0-9a-f]*[a-f])[0-9a-f]{16,20}\.[A-Za-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# extensions of files that are worth compressing (fonts like woff/woff2 and images are compressed already)
+COMPRESSIBLE_EXTENSIONS = ('.js', '.mjs', '.css', '.html', '.htm', '.json', '.map', '.svg', '.txt', '.xml',
+                           '.ttf', '.eot', '.otf', '.ico')
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+# content encodings in the order of preference and the suffix of the precompressed siblings
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_precompress_lock = threading.Lock()
+
+
+def is_fingerprinted(filename):
+    """
+    Returns True, if the name of the file contains a content hash
+
+    :param filename: name or path of the file
+    :type filename: str
+    :rtype: bool
+    """
+    return FINGERPRINTED.search(filename) is not None
+
+
+def is_compressible(filename):
+    """
+    Returns True, if the file is a text-like file, that is worth compressing
+
+    :param filename: name or path of the file
+    :type filename: str
+    :rtype: bool
+    """
+    return filename.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def get_cache_control(filename, max_age=0):
+    """
+    Returns the value of the Cache-Control header for a static file
+
+    Fingerprinted files never change, they may be cached for a year. All other files have to
+    be revalidated (using the ETag), unless a max_age is configured.
+
+    :param filename: name or path of the file
+    :param max_age: max-age in seconds for files that are not fingerprinted
+    :type filename: str
+    :type max_age: int
+    :rtype: str
+    """
+    if is_fingerprinted(filename):
+        return IMMUTABLE_CACHE_CONTROL
+    if max_age > 0:
+        return f'public, max-age={max_age}'
+    return 'no-cache'
+
+
+def get_accepted_encodings(header):
+    """
+    Returns the content encodings accepted by the browser, in the order of preference of SmartHomeNG
+
+    :param header: value of the Accept-Encoding request header
+    :type header: str
+    :return: list of accepted encodings ('br', 'gzip')
+    :rtype: list
+    """
+    if not header:
+        return []
+    accepted = dict(_split_accept(header))
+    result = []
+    for encoding, _ in ENCODINGS:
+        qvalue = accepted.get(encoding, accepted.get('x-' + encoding, accepted.get('*', 0)))
+        if qvalue > 0:
+            result.append(encoding)
+    return result
+
+
+def _split_accept(header):
+    """
+    Split an Accept-Encoding header into (coding, qvalue) tuples
+    """
+    result = []
+    for part in header.split(','):
+        params = part.strip().split(';')
+        coding = params[0].strip().lower()
+        if not coding:
+            continue
+        qvalue = 1.0
+        for param in params[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0
+        result.append((coding, qvalue))
+    return result
+
+
+def get_precompressed(filename, st, encodings):
+    """
+    Returns the precompressed sibling of a file, that matches one of the accepted encodings
+
+    A sibling is only used, if it has been created from the current version of the file
+    (the modification time of the sibling is set to the one of the file by precompress_file()).
+
+    :param filename: path of the file
+    :param st: result of os.stat() for the file
+    :param encodings: accepted encodings
+    :type filename: str
+    :type encodings: list
+    :return: tuple (encoding, path, stat) or None
+    :rtype: tuple
+    """
+    for encoding, suffix in ENCODINGS:
+        if encoding not in encodings:
+            continue
+        try:
+            sibling_st = os.stat(filename + suffix)
+        except OSError:
+            continue
+        if sibling_st.st_mtime_ns == st.st_mtime_ns:
+            return (encoding, filename + suffix, sibling_st)
+    return None
+
+
+def serve_static(filename, content_types=None, max_age=0, precompressed=True, debug=False):
+    """
+    Serve a static file with ETag, Cache-Control and (if available) a precompressed sibling
+
+    Conditional requests (If-None-Match, If-Modified-Since) are answered with '304 Not Modified'.
+
+    :param filename: absolute path of the file
+    :param content_types: dict of {extension: content-type} pairs
+    :param max_age: max-age in seconds for files that are not fingerprinted
+    :param precompressed: send precompressed siblings, if the browser accepts the encoding
+    :return: True, if the file has been served
+    :rtype: bool
+    """
+    try:
+        st = os.stat(filename)
+    except (OSError, TypeError, ValueError):
+        return False
+    if not os.path.isfile(filename):
+        return False
+
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+
+    ext = os.path.splitext(filename)[1].lower()
+    content_type = None
+    if content_types:
+        content_type = content_types.get(ext.lstrip('.'), None)
+    if content_type is None:
+        content_type = mimetypes.types_map.get(ext, None)
+
+    variant = None
+    if precompressed and is_compressible(filename):
+        set_vary_header(response, 'Accept-Encoding')
+        variant = get_precompressed(filename, st, get_accepted_encodings(request.headers.get('Accept-Encoding')))
+
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}'
+    if variant is not None:
+        etag += '-' + variant[0]
+    response.headers['ETag'] = etag + '"'
+    response.headers['Last-Modified'] = httputil.HTTPDate(st.st_mtime)
+    response.headers['Cache-Control'] = get_cache_control(filename, max_age)
+    if debug:
+        cherrypy.log(f"Serving {filename} (variant {variant and variant[0]}), ETag {response.headers['ETag']}", 'TOOLS.STATICDIR')
+
+    # raises HTTPRedirect with status 304, if the browser has the current version
+    cptools.validate_etags()
+    if 'If-None-Match' not in request.headers:
+        cptools.validate_since()
+
+    if variant is None:
+        fileobj = open(filename, 'rb')
+    else:
+        response.headers['Content-Encoding'] = variant[0]
+        fileobj = open(variant[1], 'rb')
+    static.serve_fileobj(fileobj, content_type, debug=debug)
+    return True
+
+
+def staticdir(section, dir, root='', match='', content_types=None, index='', max_age=0, precompressed=True, debug=False):
+    """
+    Serve a static resource from the given (root +) dir
+
+    Replacement for cherrypy.lib.static.staticdir, that serves the files with serve_static().
+    It takes the same configuration (tools.staticdir.*) and additionally:
+
+    max_age
+        max-age in seconds for files that are not fingerprinted (default: 0 = revalidate every time)
+
+    precompressed
+        send precompressed siblings (.br, .gz) of files, if the browser accepts the encoding
+    """
+    request = cherrypy.serving.request
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if match and not re.search(match, request.path_info):
+        return False
+
+    dir = os.path.expanduser(dir)
+    if not os.path.isabs(dir):
+        if not root:
+            raise ValueError('Static dir requires an absolute dir (or root).')
+        dir = os.path.join(root, dir)
+
+    # Determine where we are in the object tree relative to 'section' (where the tool was defined)
+    if section == 'global':
+        section = '/'
+    section = section.rstrip(r'\/')
+    branch = request.path_info[len(section) + 1:]
+    branch = urllib.parse.unquote(branch.lstrip(r'\/'))
+
+    filename = os.path.join(dir, branch)
+    # prevent uplevel attacks ('..' in the url)
+    if not os.path.normpath(filename).startswith(os.path.normpath(dir)):
+        raise cherrypy.HTTPError(403)
+
+    handled = serve_static(filename, content_types, max_age, precompressed, debug)
+    if not handled and index:
+        handled = serve_static(os.path.join(filename, index), content_types, max_age, precompressed, debug)
+        if handled:
+            request.is_index = filename[-1] in (r'\/')
+    return handled
+
+
+def staticfile(filename, root=None, match='', content_types=None, max_age=0, precompressed=True, debug=False):
+    """
+    Serve a static resource from the given (root +) filename
+
+    Replacement for cherrypy.lib.static.staticfile, that serves the file with serve_static()
+    """
+    request = cherrypy.serving.request
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if match and not re.search(match, request.path_info):
+        return False
+    if not os.path.isabs(filename):
+        if not root:
+            raise ValueError(f"Static tool requires an absolute filename (got '{filename}').")
+        filename = os.path.join(root, filename)
+    return serve_static(filename, content_types, max_age, precompressed, debug)
+
+
+def compress_body(data, encoding, level=None):
+    """
+    Compress data with the given content encoding
+
+    :param data: data to compress
+    :param encoding: 'br' or 'gzip'
+    :param level: compression level (default: fast level for dynamic responses)
+    :type data: bytes
+    :type encoding: str
+    :type level: int
+    :rtype: bytes
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=4 if level is None else level)
+    return gzip.compress(data, 5 if level is None else level, mtime=0)
+
+
+def compress_response(min_size=1024, debug=False):
+    """
+    Compress a dynamic response, if it is larger than min_size (CherryPy hook 'before_finalize')
+
+    Only responses with a text-like Content-Type are compressed. The encoding is negotiated
+    with the browser (brotli, if the Python package is installed, otherwise gzip). Responses that
+    are streamed (static files) or already encoded are not touched.
+
+    :param min_size: minimum size of the response body in bytes (0 disables the compression)
+    :type min_size: int
+    """
+    response = cherrypy.serving.response
+    if min_size <= 0 or not isinstance(response.body, list) or 'Content-Encoding' in response.headers:
+        return
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return
+
+    set_vary_header(response, 'Accept-Encoding')
+    size = sum(len(chunk) for chunk in response.body)
+    if size < min_size:
+        return
+    encodings = get_accepted_encodings(cherrypy.serving.request.headers.get('Accept-Encoding'))
+    if not BROTLI_AVAILABLE and 'br' in encodings:
+        encodings.remove('br')
+    if not encodings:
+        return
+
+    body = compress_body(b''.join(response.body), encodings[0])
+    if debug:
+        cherrypy.log(f"Compressed response with {encodings[0]}: {size} -> {len(body)} bytes", 'TOOLS.SHNG_COMPRESS')
+    response.headers['Content-Encoding'] = encodings[0]
+    response.body = [body]
+    response.headers.pop('Content-Length', None)
+
+
+def precompress_file(filename, st=None):
+    """
+    Create the precompressed siblings (.gz and, if brotli is installed, .br) of a file
+
+    Siblings are only (re)written, if they do not belong to the current version of the file.
+    They get the modification time of the file, which marks them as current.
+
+    :param filename: path of the file
+    :param st: result of os.stat() for the file
+    :type filename: str
+    :return: number of siblings written
+    :rtype: int
+    """
+    if st is None:
+        st = os.stat(filename)
+    written = 0
+    data = None
+    for encoding, suffix in ENCODINGS:
+        if encoding == 'br' and not BROTLI_AVAILABLE:
+            continue
+        try:
+            if os.stat(filename + suffix).st_mtime_ns == st.st_mtime_ns:
+                continue
+        except OSError:
+            pass
+        if data is None:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        compressed = compress_body(data, encoding, level=9)
+        if len(compressed) >= len(data):
+            continue
+        tmp = filename + suffix + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(compressed)
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, filename + suffix)
+        written += 1
+    return written
+
+
+def precompress_directory(path, min_size=1024):
+    """
+    Create the precompressed siblings of all compressible files in a directory tree
+
+    :param path: directory to process
+    :param min_size: minimum size of files to compress
+    :type path: str
+    :type min_size: int
+    :return: tuple (number of checked files, number of written siblings)
+    :rtype: tuple
+    """
+    checked = 0
+    written = 0
+    with _precompress_lock:
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in filenames:
+                if not is_compressible(name):
+                    continue
+                filename = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(filename)
+                    if st.st_size < min_size:
+                        continue
+                    checked += 1
+                    written += precompress_file(filename, st)
+                except OSError as e:
+                    logger.warning(f"Cannot precompress static files in '{path}': {e}")
+                    return (checked, written)
+    return (checked, written)
+
+
+def start_precompression(paths, min_size=1024):
+    """
+    Create the precompressed siblings of the static files in a background thread
+
+    :param paths: list of directories to process
+    :param min_size: minimum size of files to compress
+    :type paths: list
+    :type min_size: int
+    """
+    def _run():
+        for path in paths:
+            start = time.perf_counter()
+            checked, written = precompress_directory(path, min_size)
+            if written:
+                logger.info(f"Precompressed static files in '{path}': {written} files written, {checked} files checked (took {time.perf_counter() - start:.1f} s)")
+            else:
+                logger.debug(f"Precompressed static files in '{path}' are up to date ({checked} files checked)")
+
+    threading.Thread(target=_run, name='http_precompress', daemon=True).start()
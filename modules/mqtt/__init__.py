@@ -40,10 +40,18 @@ from lib.model.module import Module
 from lib.shtime import Shtime
 from lib.utils import Utils
 from lib.scheduler import Scheduler
+import lib.metrics as metrics
+
+
+_messages = metrics.counter('shng_mqtt_messages_total', 'Number of mqtt messages received from and published to the broker', ['direction'])
+_messages_received = _messages.labels('received')
+_messages_published = _messages.labels('published')
+_publish_errors = metrics.counter('shng_mqtt_publish_errors_total', 'Number of mqtt messages that could not be published')
+_unmatched_messages = metrics.counter('shng_mqtt_unmatched_messages_total', 'Number of received mqtt messages without a matching subscription')
 
 
 class Mqtt(Module):
-    version = '1.7.6'
+    version = '1.7.7'
     longname = 'MQTT module for SmartHomeNG'
 
     __plugif_CallbackTopics = {}         # for plugin interface
@@ -162,6 +170,7 @@ class Mqtt(Module):
         self._connected = False
         self._got_disconnected = False
         self._connect_result = ''
+        metrics.gauge('shng_mqtt_connected', 'Connection state to the mqtt broker (1 = connected)').set_function(lambda: self._connected)
 
         # tls ...
         # ca_certs ...
@@ -536,6 +545,7 @@ class Mqtt(Module):
                           This is a class with members topic, payload, qos, retain.
         """
         self.logger.debug("_on_mqtt_message: RECEIVED topic '{}', payload '{}, QoS '{}', retain '{}'".format(message.topic, message.payload, message.qos, message.retain))
+        _messages_received.inc()
 
         with self._subscribed_topics_lock:
             subscibed_topics = list(self._subscribed_topics.keys())
@@ -577,6 +587,7 @@ class Mqtt(Module):
 
         if not subscription_found:
             if not self._handle_broker_infos(message):
+                _unmatched_messages.inc()
                 self.logger.error("_on_mqtt_message: Received topic '{}', payload '{}', QoS '{}', retain '{}' WITHOUT matching item/logic".format( message.topic, message.payload, message.qos, message.retain))
 
     # ----------------------------------------------------------------------------------------
@@ -791,8 +802,10 @@ class Mqtt(Module):
         payload = self.cast_to_mqtt(payload, bool_values)
         try:
             self._client.publish(topic=topic, payload=payload, qos=qos, retain=retain)
+            _messages_published.inc()
             self.logger.info("{} '{}' has published topic '{}' with payload '{}'".format(source_type, source, topic, payload))
         except Exception as e:
+            _publish_errors.inc()
             self.logger.error("{}: Publish exception '{}'".format(inspect.stack()[0][3], e))
             return False
         return True
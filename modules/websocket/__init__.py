@@ -36,10 +36,11 @@ from lib.model.module import Module
 
 from lib.shtime import Shtime
 from lib.utils import Utils
+import lib.metrics as metrics
 
 
 class Websocket(Module):
-    version = '1.1.2'
+    version = '1.1.3'
     longname = 'Websocket module for SmartHomeNG'
     port = 0
 
@@ -68,6 +69,9 @@ class Websocket(Module):
         self.use_tls = self.get_parameter_value('use_tls')
         self.tls_cert = self.get_parameter_value('tls_cert')
         self.tls_key = self.get_parameter_value('tls_key')
+        self.admin_log_rate = self.get_parameter_value('admin_log_rate')
+
+        metrics.gauge('shng_websocket_clients', 'Number of connected websocket clients').set_function(lambda: len(self.USERS))
 
         self.ssl_context = None
         if self.use_tls:
@@ -36,8 +36,10 @@ import collections
 
 from lib.item import Items
 from lib.logic import Logics
+import lib.metrics as metrics
 
 from lib.shtime import Shtime
+from lib.log import LogFilter, LogStream
 
 """
 =======================================================================================
@@ -72,6 +74,11 @@ class Protocol():
         self.client_address = ws_server.client_address
         #self.get_users = partial(ws_server.get_payload_users, self.protocol_path)
 
+        self._metric_sent = metrics.counter('shng_websocket_messages_sent_total', 'Number of messages sent to websocket clients', ['protocol']).labels(self.protocol_name)
+        metrics.gauge('shng_websocket_queue_length', 'Number of entries waiting in the send queue of the payload protocol', ['protocol']).labels(self.protocol_name).set_function(self._get_queue_length)
+
+        self.adm_log_rate = getattr(ws_server, 'admin_log_rate', self.adm_log_rate)
+
         return
 
 
@@ -84,14 +91,22 @@ class Protocol():
         if python_version == '3.7':
             self.loop.create_task(self.update_visu())
             self.loop.create_task(self.update_all_series())
+            self.loop.create_task(self.flush_logs())
         else:
             self.loop.create_task(self.update_visu(), name='update_visu')
             self.loop.create_task(self.update_all_series(), name='update_all_series')
+            self.loop.create_task(self.flush_logs(), name='flush_logs')
 
-        self.logger.dbghigh(f"start_global_tasks: create_task(s) for update_visu() and update_all_series()")
+        self.logger.dbghigh(f"start_global_tasks: create_task(s) for update_visu(), update_all_series() and flush_logs()")
         return
 
 
+    def _get_queue_length(self):
+        if self.janus_queue is None:
+            return 0
+        return self.janus_queue.sync_q.qsize()
+
+
     async def handle_protocol(self, websocket):
 
         await self.adm_protocol(websocket)
@@ -110,8 +125,15 @@ class Protocol():
     adm_querydef = False         # enable or disable the query of item definitions over websocket protocol
     adm_ser_upd_cycle = 0        # update cycle for series requests (if 0, timing from database plugin is used)
 
+    adm_log_rate = 200           # maximum number of log entries per second sent to a client (0 = unlimited)
+    adm_log_flush_interval = 0.25    # interval (in seconds), in which log entries are sent to the clients
+    adm_log_queue_max = 10000    # maximum number of log entries waiting in the queue, further entries are dropped
+
     adm_monitor_items = {}
     adm_monitor_logs = {}
+    adm_log_filters = {}         # server side filters of the log subscriptions: {client_addr: {log name: LogFilter}}
+    adm_log_streams = {}         # rate limited log streams: {client_addr: LogStream}
+    _log_send_tasks = {}         # running send tasks of the log streams: {client_addr: task}
     adm_clients = {}
     adm_update_series = {}
     clients = []
@@ -239,7 +261,15 @@ class Protocol():
                         if 'max' in data:
                             num = int(data['max'])
                         if name in self.logs:
-                            answer = {'cmd': 'log', 'name': name, 'log': self.logs[name].export(num), 'init': 'y'}
+                            log_filter = LogFilter(data.get('logger', ''), data.get('level', None), data.get('filter', ''))
+                            log = self.logs[name].export(num)
+                            if log_filter.is_active():
+                                # the logger name is not stored in the memory log, it is only filtered for updates
+                                log = [entry for entry in log if log_filter.matches(None, entry)]
+                            answer = {'cmd': 'log', 'name': name, 'log': log, 'init': 'y'}
+                            self.adm_log_filters.setdefault(client_addr, {})[name] = log_filter
+                            if client_addr not in self.adm_log_streams:
+                                self.adm_log_streams[client_addr] = LogStream(self.adm_log_rate, self.adm_log_flush_interval)
                             if client_addr not in self.adm_monitor_logs:
                                 self.adm_monitor_logs[client_addr] = []
                             if name not in self.adm_monitor_logs[client_addr]:
@@ -298,6 +328,7 @@ class Protocol():
                     # if an answer should be sent, it is done here
                     try:
                         await websocket.send(reply)
+                        self._metric_sent.inc()
                         self.logger.info(f"adm >REPLY: '{answer}'   -   to {self.build_log_info(websocket.remote_address)}")
                     #except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
                     except Exception as e:
@@ -342,6 +373,8 @@ class Protocol():
         if (client_addr in self.adm_monitor_logs):
             del (self.adm_monitor_logs[client_addr])
             self.logger.info(f"adm_cancel_all_abos: Log updates for {client_addr} were stoped")
+        self.adm_log_filters.pop(client_addr, None)
+        self.adm_log_streams.pop(client_addr, None)
 
         # Remove client from item monitoring dict
         if (client_addr in self.adm_monitor_items):
@@ -549,6 +582,7 @@ class Protocol():
                             self.logger.dbgmed(f"update_all_series: reply {reply}  -->  Replys for client {self.build_log_info(client_addr)}: {replys}")
                             try:
                                 await websocket.send(json.dumps(reply, default=self.json_serial))
+                                self._metric_sent.inc()
                                 self.logger.debug(f">SerUp {reply}: {self.build_log_info(client_addr)}")
                             # except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
                             except Exception as e:
@@ -698,6 +732,7 @@ class Protocol():
             try:
                 # Delete the log-Abos here
                 self.adm_monitor_logs[client_addr].remove(to_remove)
+                self.adm_log_filters.get(client_addr, {}).pop(to_remove, None)
                 reply = f"path={path}, max={max}"
                 self.logger.info(f"cancel_log: reply=cancel log for :{reply}")
             except Exception as e:
@@ -705,6 +740,7 @@ class Protocol():
                 answer = {"cmd": "log_cancel", "error": f"Problem to cancel log for {path}: {e}"}
             else:
                 if len(self.adm_monitor_logs[client_addr]) == 0:
+                    self.adm_log_streams.pop(client_addr, None)
                     try:
                         del self.adm_monitor_logs[client_addr]
                     except Exception as e:
@@ -753,14 +789,9 @@ class Protocol():
                     except Exception as e:
                         self.logger.error(f"update_visu: Error in 'await self.update_item(...)': {e}")
                 elif queue_entry[0] == 'log':
-                    log_entry = queue_entry[1]
-                    # log_entry: dict {'name', 'log'}
-                    #            log is a list and contains dicts: {'time', 'thread', 'level', 'message'}
-                    #self.logger.info(f"update_visu: queue_entry = {queue_entry}")
-                    try:
-                        await self.update_log(log_entry)
-                    except Exception as e:
-                        self.logger.error(f"update_visu: Error in 'await self.update_log(...)': {e}")
+                    # queue_entry: ['log', log name, serialized log entry, list of client_addr]
+                    #              log entries are sent in batches by flush_logs()
+                    self.add_log_entry(queue_entry[1], queue_entry[2], queue_entry[3])
                 elif queue_entry[0] == 'command':
                     # send command to admin client (e.g. url command)
                     command = queue_entry[1]
@@ -768,6 +799,7 @@ class Protocol():
                     websocket = self.adm_clients[client_addr]['websocket']
                     try:
                         await websocket.send(command)
+                        self._metric_sent.inc()
                         self.logger.info(f"Sending command: '{command}'   -   to {client_addr}")
                     # except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
                     except Exception as e:
@@ -829,6 +861,7 @@ class Protocol():
                 try:
                     self.logger.info(f"adm >MONIT: '{msg}'   -   to {self.build_log_info(self.client_address(websocket))}")
                     await websocket.send(msg)
+                    self._metric_sent.inc()
                 except Exception as e:
                     if str(e).startswith(('code = 1001', 'code = 1005', 'code = 1006')):
                         self.logger.info(f"update_item: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}")
@@ -837,34 +870,60 @@ class Protocol():
 
         return
 
-    async def update_log(self, log_entry):
+    def add_log_entry(self, name, serialized_entry, clients):
         """
-        send JSON data with update to log
+        Add a log entry to the log streams of the clients, that subscribed the log
+
+        :param name: name of the memory log
+        :param serialized_entry: log entry, serialized as JSON
+        :param clients: list of client_addr, whose filters the entry has passed
         """
-        remove = []
-        logs_list = list(self.adm_monitor_logs.keys())
-        for client_addr in logs_list:
-            if (client_addr in self.adm_clients) and not (client_addr in remove):
-                websocket = self.adm_clients[client_addr]['websocket']
+        for client_addr in clients:
+            stream = self.adm_log_streams.get(client_addr, None)
+            if stream is not None:
+                stream.add(name, serialized_entry)
+        return
 
-                log_entry['cmd'] = 'log'
-                msg = json.dumps(log_entry, default=self.json_serial)
-                try:
-                    #self.logger.notice(">LogUp {}: {}".format(self.client_address(websocket), msg))
-                    await websocket.send(msg)
-                except Exception as e:
-                    if not str(e).startswith(('code = 1005', 'code = 1006')):
-                        self.logger.exception(f"update_log - Error in 'await websocket.send(data)': {e}")
-                    else:
-                        self.logger.info(f"update_log - Error in 'await websocket.send(data)': {e}")
-            else:
-                self.logger.info(f"update_log: Client {self.build_log_info(client_addr)} is not active any more")
-                remove.append(client_addr)
+    async def flush_logs(self):
+        """
+        Async task to send the buffered log entries to the clients
 
-        # Remove series for clients that are not connected any more
-        for client_addr in remove:
-            self.adm_cancel_all_abos(client_addr)
+        The entries of each client are sent in batches every adm_log_flush_interval seconds. Each client is
+        sent to by its own task, so a slow client does not delay the other clients. As long as the last batch
+        has not been sent to a client, new entries are buffered (and dropped, if the rate limit is reached).
+        """
+        while True:
+            await asyncio.sleep(self.adm_log_flush_interval)
+            for client_addr, stream in list(self.adm_log_streams.items()):
+                if not stream.pending():
+                    continue
+                task = self._log_send_tasks.get(client_addr, None)
+                if task is not None and not task.done():
+                    continue
+                if client_addr not in self.adm_clients:
+                    self.logger.info(f"flush_logs: Client {self.build_log_info(client_addr)} is not active any more")
+                    self.adm_cancel_all_abos(client_addr)
+                    continue
+                websocket = self.adm_clients[client_addr]['websocket']
+                self._log_send_tasks[client_addr] = self.loop.create_task(self.send_logs(client_addr, websocket, stream.get_messages()))
 
+    async def send_logs(self, client_addr, websocket, messages):
+        """
+        send JSON data with update to log
+        """
+        for msg in messages:
+            try:
+                #self.logger.notice(">LogUp {}: {}".format(self.client_address(websocket), msg))
+                await websocket.send(msg)
+                self._metric_sent.inc()
+            except Exception as e:
+                if not str(e).startswith(('code = 1005', 'code = 1006')):
+                    self.logger.exception(f"send_logs - Error in 'await websocket.send(data)': {e}")
+                else:
+                    self.logger.info(f"send_logs - Error in 'await websocket.send(data)': {e}")
+                    self.adm_cancel_all_abos(client_addr)
+                break
+        self._log_send_tasks.pop(client_addr, None)
         return
 
     # async def request_logic(self, data, client_addr):
@@ -986,13 +1045,32 @@ class Protocol():
             self.logger.warning(f"update_visulog: Unknown event {event} received.")
             return
 
-        log_data = data.copy()  # don't filter the orignal data dict
+        if not self.janus_queue or not self.adm_monitor_logs:
+            # queue has not been created from the async side or no log is subscribed
+            return
 
-        if not log_data['log'][0]['message'].startswith('>LogUp'):
-            log_data['cmd'] = 'log'
-            if self.janus_queue:
-                # if queue has been created from the async side
-                self.janus_queue.sync_q.put(['log', log_data])
+        name = data['name']
+        logger_name = data.get('logger', None)
+        for entry in data['log']:
+            if entry['message'].startswith('>LogUp'):
+                continue
+            # apply the filters of the subscriptions before queueing
+            clients = []
+            for client_addr, names in list(self.adm_monitor_logs.items()):
+                if name in names:
+                    log_filter = self.adm_log_filters.get(client_addr, {}).get(name, None)
+                    if log_filter is None or log_filter.matches(logger_name, entry):
+                        clients.append(client_addr)
+            if not clients:
+                continue
+            if self.janus_queue.sync_q.qsize() >= self.adm_log_queue_max:
+                for client_addr in clients:
+                    stream = self.adm_log_streams.get(client_addr, None)
+                    if stream is not None:
+                        stream.drop(name)
+                continue
+            # serialize the entry once for all clients
+            self.janus_queue.sync_q.put(['log', name, json.dumps(entry, default=self.json_serial), clients])
 
         return
 
@@ -36,8 +36,10 @@ import collections
 
 from lib.item import Items
 from lib.logic import Logics
+import lib.metrics as metrics
 
 from lib.shtime import Shtime
+from lib.systeminfo import Systeminfo
 
 """
 ===============================================================================
@@ -74,6 +76,9 @@ class Protocol():
         self.client_address = ws_server.client_address
         #self.get_users = partial(ws_server.get_payload_users, self.protocol_path)
 
+        self._metric_sent = metrics.counter('shng_websocket_messages_sent_total', 'Number of messages sent to websocket clients', ['protocol']).labels(self.protocol_name)
+        metrics.gauge('shng_websocket_queue_length', 'Number of entries waiting in the send queue of the payload protocol', ['protocol']).labels(self.protocol_name).set_function(self._get_queue_length)
+
         return
 
 
@@ -94,6 +99,12 @@ class Protocol():
         return
 
 
+    def _get_queue_length(self):
+        if self.janus_queue is None:
+            return 0
+        return self.janus_queue.sync_q.qsize()
+
+
     async def handle_protocol(self, websocket):
 
         await self.smartVISU_protocol_v4(websocket)
@@ -121,6 +132,7 @@ class Protocol():
     _series_lock = threading.Lock()
 
     janus_queue = None      # var that holds the queue betweed threaded and async
+    flush_interval = 0      # time to collect item updates, before they are sent
 
     async def get_shng_class_instances(self):
         """
@@ -322,6 +334,7 @@ class Protocol():
                     # if an answer should be send, it is done here
                     try:
                         await websocket.send(reply)
+                        self._metric_sent.inc()
                         self.logger.dbgmed(f"visu >REPLY: '{answer}'   -   to {self.build_log_info(websocket.remote_address)}")
                     #except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
                     except Exception as e:
@@ -573,6 +586,7 @@ class Protocol():
                             self.logger.dbgmed(f"update_all_series: reply {reply}  -->  Replys for client {self.build_log_info(client_addr)}: {replys}")
                             try:
                                 await websocket.send(json.dumps(reply, default=self.json_serial))
+                                self._metric_sent.inc()
                                 self.logger.debug(f">SerUp {reply}: {self.build_log_info(client_addr)}")
                             # except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
                             except Exception as e:
@@ -756,11 +770,16 @@ class Protocol():
     async def update_visu(self):
         """
         Async task to update all active visus, if items have changed or an url command has been issued
+
+        Item updates, that are already queued, are sent to each visu as one message. On faster cpus
+        further updates are collected for a short time (websocket_flush_interval, tuned to the speed of the cpu).
+        On slow or not yet measured cpus no time is waited, so no latency is added.
         """
         # wait until SmartHomeNG is completly initialized
         while self._sh.shng_status['code'] != 20:
             await asyncio.sleep(1)
-        self.logger.info("Task update_visu() started")
+        self.flush_interval = Systeminfo.get_tuning(getattr(self._sh, 'cpu_speed_class', None))['websocket_flush_interval']
+        self.logger.info(f"Task update_visu() started (flush interval {self.flush_interval} sec)")
 
         if not self.janus_queue:
             self.janus_queue = janus.Queue()
@@ -770,71 +789,120 @@ class Protocol():
             if self.janus_queue:
                 queue_entry = await self.janus_queue.async_q.get()
                 if queue_entry[0] == 'item':
-                    item_data = queue_entry[1]
+                    # collect further item updates until the flush interval has passed
+                    updates = [queue_entry[1]]
+                    queue_entry = await self._collect_item_updates(updates)
                     # item_data: set (item_name, item_value, caller, source)
                     try:
-                        await self.update_item(item_data[0], item_data[1], item_data[3])
-                    except Exception as e:
-                        self.logger.error(f"update_visu: Error in 'await self.update_item(...)': {e}")
-                elif queue_entry[0] == 'log':
-                    log_entry = queue_entry[1]
-                    # log_entry: dict {'name', 'log'}
-                    #            log is a list and contains dicts: {'time', 'thread', 'level', 'message'}
-                    #self.logger.info(f"update_visu: queue_entry = {queue_entry}")
-                    try:
-                        await self.update_log(log_entry)
+                        await self.update_items(updates)
                     except Exception as e:
-                        self.logger.error(f"update_visu: Error in 'await self.update_log(...)': {e}")
-                elif queue_entry[0] == 'command':
-                    # send command to visu (e.g. url command)
-                    command = queue_entry[1]
-                    client_addr = queue_entry[2]
-                    websocket = self.sv_clients[client_addr]['websocket']
-                    try:
-                        await websocket.send(command)
-                        self.logger.info(f"Sending command: '{command}'   -   to {client_addr}")
-                    # except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
-                    except Exception as e:
-                        self.logger.error(f"Exception in 'await websocket.send(url-command)': {e}")
-                else:
-                    self.logger.error(f"update_visu: Unknown queueentry type '{queue_entry[0]}'")
+                        self.logger.error(f"update_visu: Error in 'await self.update_items(...)': {e}")
+                    if queue_entry is None:
+                        continue
+                await self._handle_queue_entry(queue_entry)
+
+    async def _collect_item_updates(self, updates):
+        """
+        Collect item updates from the queue for the duration of the flush interval
+
+        With a flush interval of 0, only the item updates, that are already queued, are collected.
+
+        :param updates: list, the item data is appended to
+        :return: the first queue entry, which is not an item update (or None)
+        """
+        deadline = self.loop.time() + self.flush_interval
+        while True:
+            try:
+                queue_entry = self.janus_queue.async_q.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    return None
+                try:
+                    queue_entry = await asyncio.wait_for(self.janus_queue.async_q.get(), timeout)
+                except asyncio.TimeoutError:
+                    return None
+            if queue_entry[0] != 'item':
+                return queue_entry
+            updates.append(queue_entry[1])
+
+    async def _handle_queue_entry(self, queue_entry):
+        """
+        Handle a log or command entry of the queue
+        """
+        if queue_entry[0] == 'log':
+            log_entry = queue_entry[1]
+            # log_entry: dict {'name', 'log'}
+            #            log is a list and contains dicts: {'time', 'thread', 'level', 'message'}
+            #self.logger.info(f"update_visu: queue_entry = {queue_entry}")
+            try:
+                await self.update_log(log_entry)
+            except Exception as e:
+                self.logger.error(f"update_visu: Error in 'await self.update_log(...)': {e}")
+        elif queue_entry[0] == 'command':
+            # send command to visu (e.g. url command)
+            command = queue_entry[1]
+            client_addr = queue_entry[2]
+            websocket = self.sv_clients[client_addr]['websocket']
+            try:
+                await websocket.send(command)
+                self._metric_sent.inc()
+                self.logger.info(f"Sending command: '{command}'   -   to {client_addr}")
+            # except (asyncio.IncompleteReadError, asyncio.connection_closed) as e:
+            except Exception as e:
+                self.logger.error(f"Exception in 'await websocket.send(url-command)': {e}")
+        else:
+            self.logger.error(f"update_visu: Unknown queueentry type '{queue_entry[0]}'")
 
     async def update_item(self, item_name, item_value, source):
         """
         send JSON data with new value of an item (for items that are monitored by a smartVISU)
         """
+        await self.update_items([(item_name, item_value, None, source)])
+        return
+
+    async def update_items(self, updates):
+        """
+        send JSON data with new values of items (for items that are monitored by a smartVISU)
+
+        All updates for a client are sent in one message. Updates are not merged: If an item has been
+        updated several times, every value is sent in the order of the updates.
+
+        :param updates: list of item data: (item_name, item_value, caller, source)
+        """
         # self.logger.warning("update_item: self.monitor['item']")
         items_list = list(self.sv_monitor_items.keys())
         for client_addr in items_list:
             items = []
             websocket = self.sv_clients[client_addr]['websocket']
-            for candidate in self.sv_monitor_items[client_addr]:
+            for item_name, item_value, caller, source in updates:
+                for candidate in self.sv_monitor_items[client_addr]:
 
-                try:
-                    # self.logger.debug("Send update to Client {0} for candidate {1} and item_name {2}?".format(client_addr, candidate, item_name))
-                    path_parts = candidate.split('.property.')
-                    if path_parts[0] != item_name:
-                        continue
+                    try:
+                        # self.logger.debug("Send update to Client {0} for candidate {1} and item_name {2}?".format(client_addr, candidate, item_name))
+                        path_parts = candidate.split('.property.')
+                        if path_parts[0] != item_name:
+                            continue
 
-                    if len(path_parts) == 1 and client_addr != source:
-                        self.logger.debug(f"Send update to Client {self.build_log_info(client_addr)} for item {path_parts[0]}")
-                        items.append([path_parts[0], item_value])
-                        continue
+                        if len(path_parts) == 1 and client_addr != source:
+                            self.logger.debug(f"Send update to Client {self.build_log_info(client_addr)} for item {path_parts[0]}")
+                            items.append([candidate, item_value])
+                            continue
 
-                    if len(path_parts) == 2:
-                        self.logger.debug(f"Send update to Client {self.build_log_info(client_addr)} for item {path_parts[0]} with property {path_parts[1]}")
-                        prop = self.items[path_parts[0]]['item'].property
-                        prop_attr = getattr(prop,path_parts[1])
-                        items.append([candidate, prop_attr])
-                        continue
+                        if len(path_parts) == 2:
+                            self.logger.debug(f"Send update to Client {self.build_log_info(client_addr)} for item {path_parts[0]} with property {path_parts[1]}")
+                            prop = self.items[path_parts[0]]['item'].property
+                            prop_attr = getattr(prop,path_parts[1])
+                            items.append([candidate, prop_attr])
+                            continue
 
-                    if client_addr == source:
-                        self.logger.warning(f"update_item: client_addr == source - {self.build_log_info(client_addr)}")
-                        continue
+                        if client_addr == source:
+                            self.logger.warning(f"update_item: client_addr == source - {self.build_log_info(client_addr)}")
+                            continue
 
-                    self.logger.warning(f"Could not send update to Client {self.build_log_info(client_addr)}: something is wrong with item path {item_name}, value={item_value}, source={source}")
-                except:
-                    pass
+                        self.logger.warning(f"Could not send update to Client {self.build_log_info(client_addr)}: something is wrong with item path {item_name}, value={item_value}, source={source}")
+                    except:
+                        pass
 
             if len(items):  # only send an update if item/value pairs found to be send
                 data = {'cmd': 'item', 'items': items}
@@ -842,6 +910,7 @@ class Protocol():
                 try:
                     self.logger.dbgmed(f"visu >MONIT: '{msg}'   -   to {self.build_log_info(self.client_address(websocket))}")
                     await websocket.send(msg)
+                    self._metric_sent.inc()
                 except Exception as e:
                     if str(e).startswith(('code = 1001', 'code = 1005', 'code = 1006')):
                         self.logger.info(f"update_item: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}")
@@ -865,6 +934,7 @@ class Protocol():
                 try:
                     #self.logger.notice(">LogUp {}: {}".format(self.client_address(websocket), msg))
                     await websocket.send(msg)
+                    self._metric_sent.inc()
                 except Exception as e:
                     if not str(e).startswith(('code = 1005', 'code = 1006')):
                         self.logger.exception(f"update_log - Error in 'await websocket.send(data)': {e}")
@@ -1000,6 +1070,8 @@ class Protocol():
             return
 
         log_data = data.copy()  # don't filter the orignal data dict
+        # the name of the logger is only used for filtering by the admin interface, it is not part of the smartVISU protocol
+        log_data.pop('logger', None)
 
         if not log_data['log'][0]['message'].startswith('>LogUp'):
             log_data['cmd'] = 'log'
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import lib.backup as backup
+
+# lib.backup logs restores with the custom loglevel NOTICE
+if not hasattr(logging.Logger, 'notice'):
+    logging.Logger.notice = logging.Logger.info
+
+
+class LibBackupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conf_dir = tempfile.mkdtemp()
+        self.base_dir = tempfile.mkdtemp()
+        for d in ['etc', 'items', 'logics', 'scenes', 'structs', 'functions']:
+            os.makedirs(os.path.join(self.conf_dir, d))
+        self.write('etc/smarthome.yaml', 'lat: 52\n')
+        self.write('items/a.yaml', 'a:\n    type: num\n')
+        self.write('items/b.yaml', 'b:\n    type: bool\n')
+        self.write('logics/l.py', 'logger.info("l")\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.conf_dir)
+        shutil.rmtree(self.base_dir)
+
+    def write(self, filename, content):
+        with open(os.path.join(self.conf_dir, filename), 'w') as f:
+            f.write(content)
+
+    def read(self, filename):
+        with open(os.path.join(self.conf_dir, filename)) as f:
+            return f.read()
+
+    def test_incremental_backup(self):
+        filename = backup.create_backup(self.conf_dir, self.base_dir)
+        with zipfile.ZipFile(filename) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(sorted(z.namelist()), ['etc/smarthome.yaml', 'items/a.yaml', 'items/b.yaml', 'logics/l.py'])
+        mtime = os.stat(filename).st_mtime_ns
+
+        # unchanged configuration: zip file is reused
+        self.assertEqual(backup.create_backup(self.conf_dir, self.base_dir), filename)
+        self.assertEqual(os.stat(filename).st_mtime_ns, mtime)
+        self.assertEqual(backup.get_backup_progress()['changed'], 0)
+
+        self.write('items/b.yaml', 'b:\n    type: str\n')
+        os.remove(os.path.join(self.conf_dir, 'items', 'a.yaml'))
+        backup.create_backup(self.conf_dir, self.base_dir)
+        self.assertEqual(backup.get_backup_progress()['changed'], 1)
+        with zipfile.ZipFile(filename) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.read('items/b.yaml'), b'b:\n    type: str\n')
+            self.assertNotIn('items/a.yaml', z.namelist())
+
+    def test_fallback_without_raw_copy(self):
+        versions = backup.RAW_COPY_PYTHON_VERSIONS
+        backup.RAW_COPY_PYTHON_VERSIONS = ((2, 0), (2, 7))
+        try:
+            filename = backup.create_backup(self.conf_dir, self.base_dir)
+        finally:
+            backup.RAW_COPY_PYTHON_VERSIONS = versions
+        with zipfile.ZipFile(filename) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.read('items/a.yaml'), b'a:\n    type: num\n')
+
+    def test_manifest_zips_pruned(self):
+        backup.create_backup(self.conf_dir, self.base_dir)
+        for i in range(3):
+            self.write('items/b.yaml', f'b{i}:\n    type: str\n')
+            backup.create_backup(self.conf_dir, self.base_dir, filename_with_timestamp=True)
+        manifest = backup._read_manifest(os.path.join(self.base_dir, 'var', 'backup'))
+        self.assertEqual(list(manifest['zips']), ['shng_config_backup.zip'])
+
+    def test_restore_changed_files(self):
+        filename = backup.create_backup(self.conf_dir, self.base_dir)
+        os.makedirs(os.path.join(self.base_dir, 'var', 'restore'), exist_ok=True)
+        shutil.copy(filename, os.path.join(self.base_dir, 'var', 'restore', 'restore.zip'))
+        unchanged_mtime = os.stat(os.path.join(self.conf_dir, 'items', 'a.yaml')).st_mtime_ns
+        self.write('items/b.yaml', 'changed')
+
+        backup.restore_backup(self.conf_dir, self.base_dir)
+        self.assertEqual(self.read('items/b.yaml'), 'b:\n    type: bool\n')
+        self.assertEqual(os.stat(os.path.join(self.conf_dir, 'items', 'a.yaml')).st_mtime_ns, unchanged_mtime)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
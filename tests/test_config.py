@@ -1,7 +1,10 @@
 import unittest
 import pathlib
+import tempfile
+import collections
 from . import common
 import lib.config
+import lib.shyaml
 
 verbose = True
 
@@ -146,5 +149,47 @@ class TestConfigYaml(unittest.TestCase,ConfigBaseTests):
         self.assertEqual(conf['section']['key_multiline_quotes'], 'line1line2')
 
 
+class TestConfigYamlCached(TestConfigYaml):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        lib.shyaml.set_load_cache_dir(cls.cache_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        lib.shyaml.set_load_cache_dir(None)
+        cls.cache_dir.cleanup()
+        super().tearDownClass()
+
+    def test_yamlread_cache_invalidated(self):
+        filename = pathlib.Path(self.cache_dir.name) / 'config_changed.yaml'
+        filename.write_text('section:\n    key: value1\n')
+        self.assertEqual(lib.config.parse(str(filename))['section']['key'], 'value1')
+        self.assertEqual(lib.config.parse(str(filename))['section']['key'], 'value1')
+        filename.write_text('section:\n    key: value22\n')
+        self.assertEqual(lib.config.parse(str(filename))['section']['key'], 'value22')
+
+
+class TestConfigStructTemplate(unittest.TestCase):
+
+    def tearDown(self):
+        lib.config.clear_struct_templates()
+
+    def test_struct_template_instance(self):
+        struct = collections.OrderedDict([('value', collections.OrderedDict([('type', 'num'), ('knx_dpt@instance', '9'), ('on_change', ['a', 'b'])]))])
+        template1 = lib.config.get_struct_template('test.struct', struct, 'inst1')
+        template2 = lib.config.get_struct_template('test.struct', struct, 'inst1')
+        self.assertEqual(template1['value']['knx_dpt@inst1'], '9')
+        self.assertEqual(template1, template2)
+        # templates must be independent copies
+        template1['value']['on_change'].append('c')
+        self.assertEqual(template2['value']['on_change'], ['a', 'b'])
+        self.assertEqual(struct['value']['on_change'], ['a', 'b'])
+        self.assertIn('knx_dpt@instance', struct['value'])
+        self.assertEqual(lib.config.get_struct_template('test.struct', struct, '')['value']['knx_dpt'], '9')
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
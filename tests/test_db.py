@@ -3,6 +3,8 @@ from . import common
 import unittest
 import sqlite3
 import threading
+import tempfile
+import os
 import lib.db
 
 class TestDbBase:
@@ -144,6 +146,121 @@ class TestDbTests(unittest.TestCase, TestDbBase):
         db.fetchall("SELECT 1")
 
 
+class TestDbSqlite(unittest.TestCase):
+
+    def db(self, format_input='named'):
+        db = lib.db.Database('test', sqlite3, {'database': ':memory:'}, format_input)
+        db.connect()
+        db.execute("CREATE TABLE log (id INTEGER, val TEXT)")
+        return db
+
+    def test_executemany(self):
+        db = self.db()
+        db.executemany("INSERT INTO log VALUES (:id, :val)", [{'id': i, 'val': str(i)} for i in range(10)])
+        self.assertEqual(10, db.fetchone("SELECT COUNT(*) FROM log")[0])
+        self.assertEqual((3, '3'), db.fetchone("SELECT id, val FROM log WHERE id = :id", {'id': 3}))
+
+    def test_executemany_formatting(self):
+        db = self.db()
+        db.executemany("INSERT INTO log VALUES (%s, %s)", [(1, 'a'), (2, 'b')], formatting='format')
+        self.assertEqual([(1, 'a'), (2, 'b')], db.fetchall("SELECT id, val FROM log ORDER BY id"))
+
+    def test_executemany_rollback(self):
+        db = self.db()
+        with self.assertRaises(Exception):
+            db.executemany("INSERT INTO log VALUES (:id, :val)", [{'id': 1, 'val': 'a'}, {'id': 2}])
+        self.assertEqual(0, db.fetchone("SELECT COUNT(*) FROM log")[0])
+
+    def test_translation_cache(self):
+        db = self.db()
+        for i in range(5):
+            db.execute("INSERT INTO log VALUES (:id, :val)", {'id': i, 'val': 'x'})
+        info = db._translate_cached.cache_info()
+        self.assertEqual(4, info.hits)
+
+
+class TestDbSqlitePool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        connect = {'database': os.path.join(self.tmpdir.name, 'test.db'), 'check_same_thread': False}
+        self.db = lib.db.Database('test', sqlite3, connect, 'qmark', pool_size=2)
+        self.db.connect()
+        self.db.lock()
+        self.db.execute("CREATE TABLE log (id INTEGER, val TEXT)")
+        self.db.commit()
+        self.db.release()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_concurrent_readers_writer(self):
+        errors = []
+        count = 200
+
+        def writer():
+            try:
+                for i in range(count):
+                    self.db.lock()
+                    self.db.execute("INSERT INTO log VALUES (?, ?)", (i, str(i)))
+                    self.db.commit()
+                    self.db.release()
+            except Exception as e:
+                errors.append(e)
+
+        def reader():
+            try:
+                last = 0
+                for i in range(count):
+                    rows = self.db.fetchone("SELECT COUNT(*) FROM log")[0]
+                    # committed rows only grow
+                    self.assertGreaterEqual(rows, last)
+                    last = rows
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(count, self.db.fetchone("SELECT COUNT(*) FROM log")[0])
+        stats = self.db.get_pool_stats()
+        self.assertEqual(2, stats['pool_size'])
+        self.assertEqual(count * 4 + 1, stats['reader']['count'])
+        self.assertGreaterEqual(stats['writer']['count'], count)
+
+    def test_lock_uses_main_connection(self):
+        self.db.lock()
+        self.db.execute("INSERT INTO log VALUES (?, ?)", (1, 'a'))
+        # uncommitted row is visible for the lock holder only
+        self.assertEqual(1, self.db.fetchone("SELECT COUNT(*) FROM log")[0])
+        result = []
+        t = threading.Thread(target=lambda: result.append(self.db.fetchone("SELECT COUNT(*) FROM log")[0]))
+        t.start()
+        t.join()
+        self.assertEqual([0], result)
+        self.db.commit()
+        self.db.release()
+        self.assertEqual(1, self.db.fetchone("SELECT COUNT(*) FROM log")[0])
+
+    def test_pool_keeps_connection_on_statement_error(self):
+        self.db.fetchone("SELECT COUNT(*) FROM log")
+        conn = self.db._pool.queue[-1]
+        self.assertIsNotNone(conn)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.db.fetchone("SELECT ?", ())
+        self.assertIs(conn, self.db._pool.queue[-1])
+        # a failed connection is discarded and reestablished on next use
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db.fetchone("SELECT COUNT(*) FROM missing")
+        self.assertIsNone(self.db._pool.queue[-1])
+        self.assertEqual(0, self.db.fetchone("SELECT COUNT(*) FROM log")[0])
+
+
 class DbQueryBaseTests(TestDbBase):
 
     format = None
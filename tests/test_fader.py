@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import threading
+import time
+import unittest
+import lib.item.fader
+from lib.item.fader import FadeEngine
+from lib.item.helpers import fadejob
+
+
+class MockSmartHome():
+
+    _fade_update_rate = 20
+
+
+class MockItem():
+    """
+    Minimal item, that behaves like lib.item.Item regarding fading
+    """
+
+    def __init__(self, path, value):
+        self._path = path
+        self._value = value
+        self._fading = False
+        self._lock = threading.Condition()
+        self.history = []
+
+    def __call__(self, value, caller='Logic'):
+        if value != self._value:
+            self._value = value
+            if caller != 'fader' and self._fading:
+                self._fading = False
+        self.history.append((value, caller))
+
+
+class LibFaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fader = FadeEngine(MockSmartHome())
+
+    def tearDown(self):
+        self.fader.stop()
+
+    def wait_idle(self, timeout=5):
+        end = time.monotonic() + timeout
+        while self.fader.get_stats()['active'] and time.monotonic() < end:
+            time.sleep(0.02)
+
+    def test_concurrent_fades(self):
+        threads_before = threading.active_count()
+        items = [MockItem(f'dimmer{i}', 0.0) for i in range(50)]
+        start = time.monotonic()
+        for i, item in enumerate(items):
+            self.assertTrue(self.fader.fade(item, float(i * 2), 0.5, easing='ease_in_out'))
+        time.sleep(0.1)
+        # all fades are driven by a single thread
+        self.assertEqual(threading.active_count(), threads_before + 1)
+        self.wait_idle()
+        self.assertLess(time.monotonic() - start, 1.0)
+        for i, item in enumerate(items):
+            self.assertEqual(item._value, float(i * 2))
+            self.assertEqual(item.history[-1], (float(i * 2), 'Fader'))
+            self.assertFalse(item._fading)
+        self.assertEqual(self.fader.get_stats()['finished'], 50)
+
+    def test_cancel_on_write(self):
+        item = MockItem('dimmer', 0.0)
+        self.fader.fade(item, 100.0, 0.5)
+        self.assertFalse(self.fader.fade(item, 50.0, 0.5))
+        time.sleep(0.15)
+        item(10.0, 'Logic')
+        self.wait_idle()
+        time.sleep(0.1)
+        self.assertEqual(item._value, 10.0)
+        self.assertNotIn('Fader', [caller for value, caller in item.history])
+        self.assertEqual(self.fader.get_stats()['cancelled'], 1)
+
+    def test_step_based_fadejob(self):
+        item = MockItem('dimmer', 10.0)
+        fadejob(item, 5.0, 1.0, 0.05, caller='Scene')
+        # fadejob returns after the fade has finished
+        values = [value for value, caller in item.history]
+        self.assertEqual(item.history[-1], (5.0, 'Scene'))
+        self.assertFalse(item._fading)
+        self.assertTrue(all(a > b for a, b in zip(values, values[1:])))
+
+    def test_fadejob_without_engine(self):
+        lib.item.fader._fader_instance = None
+        try:
+            item = MockItem('dimmer', 0.0)
+            fadejob(item, 3.0, 1.0, 0.01)
+        finally:
+            lib.item.fader._fader_instance = self.fader
+        self.assertEqual([value for value, caller in item.history], [1.0, 2.0, 3.0])
+        self.assertEqual(item.history[-1], (3.0, 'Fader'))
+        self.assertEqual(self.fader.get_stats()['started'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import gc
+import unittest
+from lib.gcpolicy import GcPolicy
+
+
+class MockScheduler():
+
+    def __init__(self, queued=0, workers=5, idle=5):
+        self.queued = queued
+        self.workers = workers
+        self.idle = idle
+        self._runq = self
+
+    def qsize(self):
+        return self.queued
+
+    def get_worker_count(self):
+        return self.workers
+
+    def get_idle_worker_count(self):
+        return self.idle
+
+
+class MockSmartHome():
+
+    def __init__(self, **kwargs):
+        self.scheduler = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+class LibGcPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.thresholds = gc.get_threshold()
+
+    def tearDown(self):
+        gc.set_threshold(*self.thresholds)
+        for callback in list(gc.callbacks):
+            if isinstance(getattr(callback, '__self__', None), GcPolicy):
+                gc.callbacks.remove(callback)
+
+    def test_thresholds_default(self):
+        gc.set_threshold(700, 10, 10)
+        for value in [None, '', 'default', 'Python', 'false']:
+            policy = GcPolicy(MockSmartHome(_gc_thresholds=value))
+            self.assertIsNone(policy.thresholds)
+            self.assertEqual(gc.get_threshold(), (700, 10, 10))
+
+    def test_thresholds(self):
+        policy = GcPolicy(MockSmartHome())
+        self.assertEqual(policy._parse_thresholds('2000, 15,15'), (2000, 15, 15))
+        self.assertEqual(policy._parse_thresholds([2000, 15]), (2000, 15))
+        self.assertEqual(policy._parse_thresholds(2000), (2000,))
+        GcPolicy(MockSmartHome(_gc_thresholds='2000,15,15'))
+        self.assertEqual(gc.get_threshold(), (2000, 15, 15))
+
+    def test_thresholds_invalid(self):
+        policy = GcPolicy(MockSmartHome())
+        for value in ['abc', '1,2,3,4', '-1', []]:
+            self.assertIsNone(policy._parse_thresholds(value))
+
+    def test_idle_collection_cycle(self):
+        self.assertEqual(GcPolicy(MockSmartHome()).get_idle_collection_cycle(), 0)
+        self.assertEqual(GcPolicy(MockSmartHome(_gc_idle_collection='900')).get_idle_collection_cycle(), 900)
+        self.assertEqual(GcPolicy(MockSmartHome(_gc_idle_collection='abc')).get_idle_collection_cycle(), 0)
+
+    def test_idle_collect(self):
+        scheduler = MockScheduler()
+        policy = GcPolicy(MockSmartHome(scheduler=scheduler))
+        # the worker running the idle collection itself is busy
+        scheduler.idle = 4
+        self.assertIsNotNone(policy.idle_collect())
+        scheduler.idle = 3
+        self.assertIsNone(policy.idle_collect())
+        scheduler.idle = 5
+        scheduler.queued = 1
+        self.assertIsNone(policy.idle_collect())
+        stats = policy.get_stats()
+        self.assertEqual(stats['total']['idle_collections'], 1)
+        self.assertEqual(stats['total']['idle_skipped'], 2)
+        self.assertGreaterEqual(stats['collections'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
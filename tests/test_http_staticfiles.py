@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import gzip
+import os
+import tempfile
+import unittest
+
+import cherrypy
+from cherrypy._cprequest import Request, Response
+from cherrypy.lib import httputil
+
+from modules.http import staticfiles
+
+
+def serving(path_info='/', headers=None, method='GET'):
+    """
+    Set up the request and response of the current thread, as CherryPy does for each request
+    """
+    request = Request(httputil.Host('127.0.0.1', 80), httputil.Host('127.0.0.1', 50000))
+    request.method = method
+    request.path_info = path_info
+    request.headers = httputil.HeaderMap()
+    request.headers.update(headers or {})
+    response = Response()
+    cherrypy.serving.load(request, response)
+    return request, response
+
+
+class ModuleHttpStaticfilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self._tmpdir.name
+        self.filename = os.path.join(self.dir, 'main.js')
+        self.data = b'function main() { return 42; }\n' * 100
+        with open(self.filename, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        cherrypy.serving.clear()
+        self._tmpdir.cleanup()
+
+    def test_fingerprinted(self):
+        self.assertTrue(staticfiles.is_fingerprinted('main.369312ccdc67c9a50c53.js'))
+        self.assertTrue(staticfiles.is_fingerprinted('/admin/color.c7a33805ffda0d32bd2a.png'))
+        # no hex digits / only digits / only letters / too short
+        self.assertFalse(staticfiles.is_fingerprinted('main.js'))
+        self.assertFalse(staticfiles.is_fingerprinted('log_20240101.txt'))
+        self.assertFalse(staticfiles.is_fingerprinted('backup.20240101123456789.txt'))
+        self.assertFalse(staticfiles.is_fingerprinted('styles.abcdefabcdefabcdef.css'))
+        self.assertFalse(staticfiles.is_fingerprinted('main.369312ccdc67.js'))
+        self.assertEqual(staticfiles.get_cache_control('main.369312ccdc67c9a50c53.js'), staticfiles.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(staticfiles.get_cache_control('main.js'), 'no-cache')
+        self.assertEqual(staticfiles.get_cache_control('main.js', 3600), 'public, max-age=3600')
+
+    def test_accepted_encodings(self):
+        self.assertEqual(staticfiles.get_accepted_encodings(None), [])
+        self.assertEqual(staticfiles.get_accepted_encodings('gzip, deflate, br'), ['br', 'gzip'])
+        self.assertEqual(staticfiles.get_accepted_encodings('gzip;q=1.0, br;q=0'), ['gzip'])
+        self.assertEqual(staticfiles.get_accepted_encodings('x-gzip'), ['gzip'])
+        self.assertEqual(staticfiles.get_accepted_encodings('*'), ['br', 'gzip'])
+        self.assertEqual(staticfiles.get_accepted_encodings('*;q=0'), [])
+        self.assertEqual(staticfiles.get_accepted_encodings('br;q=0, *'), ['gzip'])
+        self.assertEqual(staticfiles.get_accepted_encodings('gzip;q=abc'), [])
+        self.assertEqual(staticfiles.get_accepted_encodings('identity'), [])
+
+    def test_precompressed_sibling(self):
+        st = os.stat(self.filename)
+        self.assertIsNone(staticfiles.get_precompressed(self.filename, st, ['gzip']))
+
+        with open(self.filename + '.gz', 'wb') as f:
+            f.write(gzip.compress(self.data))
+        # a sibling of another version of the file is ignored
+        os.utime(self.filename + '.gz', ns=(st.st_atime_ns, st.st_mtime_ns - 1000000000))
+        self.assertIsNone(staticfiles.get_precompressed(self.filename, st, ['gzip']))
+
+        os.utime(self.filename + '.gz', ns=(st.st_atime_ns, st.st_mtime_ns))
+        variant = staticfiles.get_precompressed(self.filename, st, ['br', 'gzip'])
+        self.assertEqual(variant[:2], ('gzip', self.filename + '.gz'))
+        self.assertIsNone(staticfiles.get_precompressed(self.filename, st, ['br']))
+
+    def test_precompress_file(self):
+        self.assertGreaterEqual(staticfiles.precompress_file(self.filename), 1)
+        st = os.stat(self.filename)
+        self.assertEqual(os.stat(self.filename + '.gz').st_mtime_ns, st.st_mtime_ns)
+        with open(self.filename + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.data)
+        # the siblings are current, nothing is written again
+        self.assertEqual(staticfiles.precompress_file(self.filename), 0)
+
+    def test_serve_precompressed(self):
+        staticfiles.precompress_file(self.filename)
+        request, response = serving(headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(staticfiles.serve_static(self.filename, precompressed=True))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(gzip.decompress(b''.join(response.body)), self.data)
+
+        request, response = serving()
+        self.assertTrue(staticfiles.serve_static(self.filename))
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(b''.join(response.body), self.data)
+
+    def test_etag_not_modified(self):
+        request, response = serving()
+        self.assertTrue(staticfiles.serve_static(self.filename))
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+
+        request, response = serving(headers={'If-None-Match': etag})
+        with self.assertRaises(cherrypy.HTTPRedirect) as cm:
+            staticfiles.serve_static(self.filename)
+        self.assertEqual(cm.exception.status, 304)
+
+        # the file has changed
+        with open(self.filename, 'ab') as f:
+            f.write(b'// changed\n')
+        request, response = serving(headers={'If-None-Match': etag})
+        self.assertTrue(staticfiles.serve_static(self.filename))
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_staticdir(self):
+        request, response = serving('/static/main.js')
+        self.assertTrue(staticfiles.staticdir('/static', self.dir))
+        self.assertEqual(b''.join(response.body), self.data)
+
+        request, response = serving('/static/missing.js')
+        self.assertFalse(staticfiles.staticdir('/static', self.dir))
+
+        request, response = serving('/static/main.js', method='POST')
+        self.assertFalse(staticfiles.staticdir('/static', self.dir))
+
+    def test_staticdir_uplevel(self):
+        subdir = os.path.join(self.dir, 'sub')
+        os.mkdir(subdir)
+        for path in ['/static/../main.js', '/static/%2e%2e/main.js']:
+            request, response = serving(path)
+            with self.assertRaises(cherrypy.HTTPError) as cm:
+                staticfiles.staticdir('/static', subdir)
+            self.assertEqual(cm.exception.status, 403)
+
+    def test_compress_response(self):
+        body = [b'{"value": 42}' * 200]
+        request, response = serving(headers={'Accept-Encoding': 'gzip'})
+        response.headers['Content-Type'] = 'application/json'
+        response.body = list(body)
+        staticfiles.compress_response(min_size=1024)
+        self.assertIn(response.headers['Content-Encoding'], ['br', 'gzip'])
+        if response.headers['Content-Encoding'] == 'gzip':
+            self.assertEqual(gzip.decompress(response.body[0]), body[0])
+
+        # small responses are not compressed
+        request, response = serving(headers={'Accept-Encoding': 'gzip'})
+        response.headers['Content-Type'] = 'application/json'
+        response.body = [b'{}']
+        staticfiles.compress_response(min_size=1024)
+        self.assertNotIn('Content-Encoding', response.headers)
+
+        # responses that are already encoded are not touched
+        request, response = serving(headers={'Accept-Encoding': 'gzip'})
+        response.headers['Content-Type'] = 'text/html'
+        response.headers['Content-Encoding'] = 'br'
+        response.body = list(body)
+        staticfiles.compress_response(min_size=1024)
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(response.body, body)
+
+        # streamed responses (static files) are not touched
+        request, response = serving(headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(staticfiles.serve_static(self.filename, precompressed=False))
+        streamed = response.body
+        staticfiles.compress_response(min_size=1024)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIs(response.body, streamed)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
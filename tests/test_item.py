@@ -25,6 +25,8 @@
 from . import common
 import unittest
 import logging
+import os
+import tempfile
 
 import lib.plugin
 import lib.item
@@ -542,6 +544,71 @@ class TestItem(unittest.TestCase):
         item._eval = 'sh.return_none()'
         item._Item__run_eval()
 
+    def _record_triggers(self, item, calls):
+        item._Item__run_on_update = lambda value: calls.append('on_update')
+        item._Item__run_on_change = lambda value: calls.append('on_change')
+        item._Item__trigger_logics = lambda details: calls.append('logic')
+        item.add_logic_trigger('logic')
+        item.add_method_trigger(lambda item, caller, source, dest: calls.append('method'))
+
+    def test_update_deferred(self):
+        sh = MockSmartHome()
+        timers = lib.item.item._items_instance.timers
+        conf = {'type': 'num', 'autotimer': '5m = 42'}
+        calls = []
+        armed = []
+        item = self.create_item(config=conf, parent=sh, smarthome=sh, path='test_item01')
+        self._record_triggers(item, calls)
+        timers.arm = lambda name, obj, delay, value=None: armed.append((name, value))
+        try:
+            run_triggers = item._update_deferred(12, 'Scene')
+            # the value is set at once, the triggers are run by the returned callable
+            self.assertEqual(12, item())
+            self.assertEqual([], calls)
+            self.assertEqual([], armed)
+            run_triggers()
+            self.assertEqual(['on_update', 'method', 'logic', 'on_change'], calls)
+            self.assertEqual([('items.test_item01-Timer', {'value': 42, 'caller': 'Autotimer'})], armed)
+
+            # the same triggers as a direct update, each run exactly once
+            deferred_calls = list(calls)
+            calls.clear()
+            armed.clear()
+            item(13, 'Scene')
+            self.assertEqual(deferred_calls, calls)
+            self.assertEqual(1, len(armed))
+
+            # unchanged value: only on_update is triggered
+            calls.clear()
+            item._update_deferred(13, 'Scene')()
+            self.assertEqual(['on_update'], calls)
+        finally:
+            del timers.arm
+
+    def test_update_deferred_hysteresis(self):
+        sh = MockSmartHome()
+        conf = {'type': 'num'}
+        items = [self.create_item(config=conf, parent=sh, smarthome=sh, path='test_item0' + str(i)) for i in (1, 2)]
+        for item in items:
+            item._hysteresis_input = 'test_input'
+            item._hysteresis_upper_timer_active = True
+            item._hysteresis_lower_timer_active = True
+        items[0](1, 'Scene')
+        items[1]._update_deferred(1, 'Scene')()
+        for item in items:
+            self.assertEqual(1, item())
+            self.assertFalse(item._hysteresis_upper_timer_active)
+            self.assertFalse(item._hysteresis_lower_timer_active)
+
+    def test_update_deferred_eval(self):
+        sh = MockSmartHome()
+        conf = {'type': 'num', 'eval': '2'}
+        items = [self.create_item(config=conf, parent=sh, smarthome=sh, path='test_item0' + str(i)) for i in (1, 2)]
+        items[0](12, 'Scene')
+        # items with an eval expression are set the usual way, there are no deferred triggers
+        self.assertIsNone(items[1]._update_deferred(12, 'Scene'))
+        self.assertEqual(items[0](), items[1]())
+
     def test_jsonvars(self):
         sh = MockSmartHome()
         conf = {'type': 'num', 'eval': '2'}
@@ -663,18 +730,21 @@ class TestItem(unittest.TestCase):
         from dateutil.tz import gettz
 
         TZ = gettz('UTC')
-        fn = 'test.cache'
 
-        try:
-            lib.item.item.cache_write(value=v, filename=fn, cformat=f)
-        except:
-            lib.item._cache_write(value=v, filename=fn, cformat=f)
+        # write the cache file to a temporary directory, not to the working directory
+        with tempfile.TemporaryDirectory() as cache_dir:
+            fn = os.path.join(cache_dir, 'test.cache')
 
-        date = cachedvalue = None
-        try:
-            date, cachedvalue = lib.item.item.cache_read(filename=fn, tz=TZ, cformat=f)
-        except:
-            date, cachedvalue = lib.item._cache_read(filename=fn, tz=TZ, cformat=f)
+            try:
+                lib.item.item.cache_write(value=v, filename=fn, cformat=f)
+            except:
+                lib.item._cache_write(value=v, filename=fn, cformat=f)
+
+            date = cachedvalue = None
+            try:
+                date, cachedvalue = lib.item.item.cache_read(filename=fn, tz=TZ, cformat=f)
+            except:
+                date, cachedvalue = lib.item._cache_read(filename=fn, tz=TZ, cformat=f)
         #logger.warning(type(cachedvalue))
         self.assertEqual(v, cachedvalue)
 
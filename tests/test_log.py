@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import json
+import logging
+import queue
+import threading
+import time
+import unittest
+from lib.log import LogFilter, LogStream, Logs, ShngQueueHandler, ShngQueueListener
+
+
+def _entry(i, level='DEBUG'):
+    return {'time': '2024-01-01T00:00:00', 'thread': 'Main', 'level': level, 'message': f"message {i}"}
+
+
+class LibLogFilterTest(unittest.TestCase):
+
+    def test_filter(self):
+        self.assertTrue(LogFilter().matches('plugins.knx', _entry(1)))
+        self.assertFalse(LogFilter().is_active())
+        f = LogFilter('plugins.knx', 'info', 'TIMEOUT')
+        self.assertTrue(f.matches('plugins.knx.bus', {'level': 'WARNING', 'message': 'a timeout'}))
+        self.assertFalse(f.matches('lib.item', {'level': 'WARNING', 'message': 'a timeout'}))
+        self.assertFalse(f.matches('plugins.knx', {'level': 'DEBUG', 'message': 'a timeout'}))
+        self.assertFalse(f.matches('plugins.knx', {'level': 'ERROR', 'message': 'ok'}))
+        # unknown logger name (initial data of a log): only level and text are filtered
+        self.assertTrue(f.matches(None, {'level': 'ERROR', 'message': 'Timeout'}))
+
+
+class LibLogStreamTest(unittest.TestCase):
+
+    def test_batch(self):
+        stream = LogStream(rate=100, interval=0.1)
+        for i in range(5):
+            stream.add('env.core.log', json.dumps(_entry(i)))
+        stream.add('other.log', json.dumps(_entry(9)))
+        messages = [json.loads(m) for m in stream.get_messages()]
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0]['cmd'], 'log')
+        self.assertEqual(messages[0]['name'], 'env.core.log')
+        self.assertEqual([e['message'] for e in messages[0]['log']], [f"message {i}" for i in range(4, -1, -1)])
+        self.assertNotIn('dropped', messages[0])
+        self.assertFalse(stream.pending())
+        self.assertEqual(stream.get_messages(), [])
+
+    def test_burst(self):
+        # load test: a burst of 50000 records has to be reduced to the rate limit quickly
+        stream = LogStream(rate=200, interval=0.25)
+        start = time.perf_counter()
+        entries = 0
+        dropped = 0
+        for i in range(50000):
+            stream.add('env.core.log', json.dumps(_entry(i)))
+            if i % 10000 == 9999:
+                for message in stream.get_messages():
+                    message = json.loads(message)
+                    entries += len(message['log']) - (1 if 'dropped' in message else 0)
+                    dropped += message.get('dropped', 0)
+        duration = time.perf_counter() - start
+        self.assertEqual(entries, 5 * 50)
+        self.assertEqual(dropped, 50000 - 5 * 50)
+        self.assertEqual(stream.sent, entries)
+        self.assertEqual(stream.dropped, dropped)
+        self.assertLess(duration, 5)
+
+    def test_unlimited(self):
+        stream = LogStream(rate=0)
+        for i in range(1000):
+            self.assertTrue(stream.add('env.core.log', json.dumps(_entry(i))))
+        self.assertEqual(len(json.loads(stream.get_messages()[0])['log']), 1000)
+
+    def test_drop_marker_only(self):
+        stream = LogStream(rate=4, interval=0.25)
+        stream.drop('env.core.log', 3)
+        message = json.loads(stream.get_messages()[0])
+        self.assertEqual(message['dropped'], 3)
+        self.assertEqual(len(message['log']), 1)
+        self.assertEqual(message['log'][0]['level'], 'WARNING')
+
+
+def _record(msg, level=logging.INFO):
+    return logging.makeLogRecord({'msg': msg, 'levelno': level, 'levelname': logging.getLevelName(level)})
+
+
+def _messages(q):
+    messages = []
+    while not q.empty():
+        messages.append(q.get_nowait().getMessage())
+    return messages
+
+
+class LibLogQueueTest(unittest.TestCase):
+
+    def test_drop(self):
+        handler = ShngQueueHandler(queue.Queue(2), overflow='drop')
+        for msg in ['a', 'b', 'c']:
+            handler.handle(_record(msg))
+        self.assertEqual(handler.dropped_total, 1)
+        self.assertEqual(_messages(handler.queue), ['a', 'b'])
+
+    def test_drop_oldest(self):
+        handler = ShngQueueHandler(queue.Queue(2), overflow='drop_oldest')
+        for msg in ['a', 'b', 'c']:
+            handler.handle(_record(msg))
+        self.assertEqual(handler.dropped_total, 1)
+        self.assertEqual(_messages(handler.queue), ['b', 'c'])
+
+    def test_block(self):
+        handler = ShngQueueHandler(queue.Queue(1), overflow='block')
+        handler.handle(_record('a'))
+        t = threading.Thread(target=handler.handle, args=(_record('b'),), daemon=True)
+        t.start()
+        t.join(0.2)
+        self.assertTrue(t.is_alive())
+        self.assertEqual(handler.queue.get_nowait().getMessage(), 'a')
+        t.join(2)
+        self.assertFalse(t.is_alive())
+        self.assertEqual(_messages(handler.queue), ['b'])
+        self.assertEqual(handler.dropped_total, 0)
+
+    def test_dropped_warning(self):
+        handler = ShngQueueHandler(queue.Queue(2), overflow='drop')
+        for msg in ['a', 'b', 'c', 'd']:
+            handler.handle(_record(msg))
+        _messages(handler.queue)
+        handler.handle(_record('e'))
+        records = [handler.queue.get_nowait(), handler.queue.get_nowait()]
+        self.assertEqual(records[0].levelno, logging.WARNING)
+        self.assertEqual(records[0].getMessage(), "2 log records have been dropped because the logging queue was full")
+        self.assertEqual(records[1].getMessage(), 'e')
+        self.assertEqual(handler.dropped, 0)
+        self.assertEqual(handler.dropped_total, 2)
+
+    def test_root_handlers_of_listener(self):
+        root_logger = logging.getLogger('')
+        queue_handler = ShngQueueHandler(queue.Queue(10))
+        queue_handler.set_name(ShngQueueHandler.handler_name)
+        file_handler = logging.NullHandler()
+        file_handler.set_name('shng_details_file')
+        other_handler = logging.NullHandler()
+        other_handler.set_name('shng_warnings_file')
+        logs = Logs.__new__(Logs)
+        root_logger.addHandler(queue_handler)
+        Logs._queue_listener = ShngQueueListener(queue_handler.queue, file_handler)
+        try:
+            self.assertEqual(logs.get_logger_handlers(root_logger)[-1:], [file_handler])
+            self.assertNotIn(queue_handler, logs.get_logger_handlers(root_logger))
+            logs.add_logger_handler(root_logger, other_handler)
+            logs.add_logger_handler(root_logger, other_handler)
+            self.assertEqual(Logs._queue_listener.handlers, (file_handler, other_handler))
+            logs.remove_logger_handler(root_logger, file_handler)
+            self.assertEqual(Logs._queue_listener.handlers, (other_handler,))
+            self.assertNotIn(other_handler, root_logger.handlers)
+            self.assertNotIn(file_handler, root_logger.handlers)
+        finally:
+            Logs._queue_listener = None
+            root_logger.removeHandler(queue_handler)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -26,10 +26,11 @@ import unittest
 import logging
 import shutil
 import os
+import tempfile
 
 from lib.model.smartplugin import SmartPlugin
 from lib.logic import Logics
-#import lib.logic
+import lib.logic
 
 from tests.mock.core import MockSmartHome
 
@@ -153,6 +154,42 @@ class TestLogics(unittest.TestCase):
         self.assertEqual(len(readback),0)
 
 
+class TestLogicsBytecodeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.pathname = os.path.join(self.tempdir.name, 'example.py')
+        with open(self.pathname, 'w', encoding='UTF-8') as f:
+            f.write("result = 1\n")
+        lib.logic.set_bytecode_cache_dir(os.path.join(self.tempdir.name, 'cache'))
+
+    def tearDown(self):
+        lib.logic.set_bytecode_cache_dir(None)
+        self.tempdir.cleanup()
+
+    def run_code(self, code):
+        namespace = {}
+        exec(code, namespace)
+        return namespace['result']
+
+    def test_bytecode_cached(self):
+        stats = dict(lib.logic._bytecode_cache_stats)
+        code, stamp = lib.logic.load_bytecode(self.pathname)
+        self.assertEqual(self.run_code(code), 1)
+        cached_code, cached_stamp = lib.logic.load_bytecode(self.pathname)
+        self.assertEqual(cached_code, code)
+        self.assertEqual(cached_stamp, stamp)
+        self.assertEqual(lib.logic._bytecode_cache_stats['misses'], stats['misses'] + 1)
+        self.assertEqual(lib.logic._bytecode_cache_stats['hits'], stats['hits'] + 1)
+
+    def test_bytecode_cache_invalidated(self):
+        code, stamp = lib.logic.load_bytecode(self.pathname)
+        with open(self.pathname, 'w', encoding='UTF-8') as f:
+            f.write("result = 22\n")
+        code, stamp = lib.logic.load_bytecode(self.pathname)
+        self.assertEqual(self.run_code(code), 22)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
 
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import threading
+import unittest
+import lib.metrics as metrics
+from lib.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        c = self.registry.counter('test_events_total', 'Number of events')
+        c.inc()
+        c.inc(2.5)
+        self.assertEqual(c.get(), 3.5)
+        with self.assertRaises(ValueError):
+            c.inc(-1)
+        text = self.registry.generate_text()
+        self.assertIn('# HELP test_events_total Number of events\n', text)
+        self.assertIn('# TYPE test_events_total counter\n', text)
+        self.assertIn('test_events_total 3.5\n', text)
+
+    def test_counter_threads(self):
+        c = self.registry.counter('test_threads_total')
+        def worker():
+            for _ in range(10000):
+                c.inc()
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(c.get(), 40000)
+
+    def test_gauge(self):
+        g = self.registry.gauge('test_queue_length')
+        g.set(5)
+        g.inc()
+        g.dec(3)
+        self.assertEqual(g.get(), 3)
+        queue = [1, 2]
+        g.set_function(lambda: len(queue))
+        self.assertIn('test_queue_length 2\n', self.registry.generate_text())
+
+    def test_labels(self):
+        c = self.registry.counter('test_messages_total', 'Messages', ['direction'])
+        c.labels('in').inc()
+        c.labels('in').inc()
+        c.labels('out').inc()
+        with self.assertRaises(ValueError):
+            c.labels('in', 'out')
+        text = self.registry.generate_text()
+        self.assertIn('test_messages_total{direction="in"} 2\n', text)
+        self.assertIn('test_messages_total{direction="out"} 1\n', text)
+        c.remove('out')
+        self.assertNotIn('direction="out"', self.registry.generate_text())
+
+    def test_label_escaping(self):
+        g = self.registry.gauge('test_escaped', '', ['name'])
+        g.labels('a"b\\c\nd').set(1)
+        self.assertIn('test_escaped{name="a\\"b\\\\c\\nd"} 1\n', self.registry.generate_text())
+
+    def test_histogram(self):
+        h = self.registry.histogram('test_duration_seconds', 'Durations', ['type'], buckets=[0.1, 1])
+        child = h.labels('logic')
+        child.observe(0.05)
+        child.observe(0.1)
+        child.observe(0.5)
+        child.observe(5)
+        buckets, count, total = child.get()
+        self.assertEqual(buckets, [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(count, 4)
+        self.assertAlmostEqual(total, 5.65)
+        text = self.registry.generate_text()
+        self.assertIn('test_duration_seconds_bucket{type="logic",le="0.1"} 2\n', text)
+        self.assertIn('test_duration_seconds_bucket{type="logic",le="+Inf"} 4\n', text)
+        self.assertIn('test_duration_seconds_count{type="logic"} 4\n', text)
+        with self.assertRaises(ValueError):
+            self.registry.histogram('test_le', '', ['le'])
+
+    def test_openmetrics(self):
+        self.registry.counter('test_events_total', 'Events').inc()
+        text = self.registry.generate_text(openmetrics=True)
+        self.assertIn('# TYPE test_events counter\n', text)
+        self.assertIn('test_events_total 1\n', text)
+        self.assertTrue(text.endswith('# EOF\n'))
+        self.assertFalse(self.registry.generate_text().endswith('# EOF\n'))
+
+    def test_registry(self):
+        c = self.registry.counter('test_shared_total', '', ['a'])
+        self.assertIs(self.registry.counter('test_shared_total', '', ['a']), c)
+        with self.assertRaises(ValueError):
+            self.registry.gauge('test_shared_total', '', ['a'])
+        with self.assertRaises(ValueError):
+            self.registry.counter('test_shared_total', '', ['b'])
+        with self.assertRaises(ValueError):
+            self.registry.counter('invalid-name')
+        self.assertEqual(self.registry.get_names(), ['test_shared_total'])
+        self.registry.unregister('test_shared_total')
+        self.assertIsNone(self.registry.get('test_shared_total'))
+
+    def test_global_registry(self):
+        c = metrics.counter('test_global_total')
+        self.assertIs(metrics.get_registry().get('test_global_total'), c)
+        self.assertIn('test_global_total 0\n', metrics.generate_text())
+        metrics.get_registry().unregister('test_global_total')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import asyncio
+import http.server
+import json
+import queue
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import lib.network
+from lib.network import AsyncHttp, Framer, Network, Tcp_client, Tcp_reactor
+
+
+class LibNetworkFramerTest(unittest.TestCase):
+
+    def test_terminator_bytes(self):
+        framer = Framer(b'\r\n')
+        framer.feed(b'line1\r\nli')
+        self.assertEqual([bytes(f) for f in framer.frames()], [b'line1\r\n'])
+        framer.feed(b'ne2\r')
+        self.assertEqual(list(framer.frames()), [])
+        framer.feed(b'\nline3\r\n')
+        self.assertEqual([bytes(f) for f in framer.frames()], [b'line2\r\n', b'line3\r\n'])
+        self.assertEqual(len(framer), 0)
+
+    def test_terminator_str_excluded(self):
+        framer = Framer('\n', include_terminator=False)
+        framer.feed(b'a\nb\nc')
+        self.assertEqual([bytes(f) for f in framer.frames()], [b'a', b'b'])
+        self.assertEqual(framer.remaining(), b'c')
+
+    def test_terminator_int(self):
+        framer = Framer(3)
+        framer.feed(b'abcdefg')
+        self.assertEqual([bytes(f) for f in framer.frames()], [b'abc', b'def'])
+        framer.feed(b'hi')
+        self.assertEqual([bytes(f) for f in framer.frames()], [b'ghi'])
+
+    def test_no_terminator(self):
+        framer = Framer(None)
+        framer.feed(b'abc')
+        self.assertEqual([bytes(f) for f in framer.frames()], [b'abc'])
+        self.assertIsNone(framer.next_frame())
+
+    def test_change_terminator(self):
+        framer = Framer(b'\n', include_terminator=False)
+        framer.feed(b'len\n12345rest')
+        self.assertEqual(bytes(framer.next_frame()), b'len')
+        framer.terminator = 5
+        self.assertEqual(bytes(framer.next_frame()), b'12345')
+        self.assertEqual(framer.remaining(), b'rest')
+
+    def test_frame_in_use_on_feed(self):
+        framer = Framer(b';')
+        framer.feed(b'a;b')
+        frame = framer.next_frame()
+        framer.feed(b';')
+        self.assertEqual(bytes(frame), b'a;')
+        self.assertEqual(bytes(framer.next_frame()), b'b;')
+
+    def test_balanced(self):
+        framer = Framer(None)
+        framer.feed(b'{"a": {"b"')
+        self.assertIsNone(framer.next_balanced(b'{', b'}'))
+        framer.feed(b': 1}}{"c": 2')
+        self.assertEqual(bytes(framer.next_balanced(b'{', b'}')), b'{"a": {"b": 1}}')
+        self.assertIsNone(framer.next_balanced(ord('{'), ord('}')))
+        framer.feed(b'}')
+        self.assertEqual(bytes(framer.next_balanced('{', '}')), b'{"c": 2}')
+        self.assertEqual(len(framer), 0)
+
+    def test_unbalanced(self):
+        framer = Framer(None)
+        framer.feed(b'}{')
+        with self.assertRaises(ValueError):
+            framer.next_balanced(b'{', b'}')
+
+
+class _JsonHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.client_address)
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LibNetworkHttpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _JsonHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.baseurl = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_create_session(self):
+        session = Network.create_session(pool_maxsize=4, retries=2)
+        adapter = session.get_adapter(self.baseurl)
+        self.assertEqual(adapter._pool_connections, requests.adapters.DEFAULT_POOLSIZE)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        for i in range(3):
+            self.assertEqual(session.get(self.baseurl + '/' + str(i)).json(), {'path': '/' + str(i)})
+        session.close()
+        # all requests used the same kept-alive connection
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(set(self.server.requests)), 1)
+
+    def test_create_session_no_keepalive(self):
+        session = Network.create_session(keepalive=False)
+        self.assertEqual(session.headers['Connection'], 'close')
+        for i in range(2):
+            session.get(self.baseurl)
+        session.close()
+        self.assertEqual(len(set(self.server.requests)), 2)
+
+    @unittest.skipIf(lib.network.aiohttp is None, 'aiohttp is not installed')
+    def test_async_http(self):
+        async def poll():
+            http = AsyncHttp(self.baseurl)
+            try:
+                results = await asyncio.gather(*[http.get_json('/' + str(i)) for i in range(5)])
+                failed = await http.get_text('http://127.0.0.1:1/')
+            finally:
+                await http.close()
+            return results, failed
+
+        results, failed = asyncio.run(poll())
+        self.assertEqual(results, [{'path': '/' + str(i)} for i in range(5)])
+        self.assertIsNone(failed)
+
+    def test_async_http_without_aiohttp(self):
+        with mock.patch.object(lib.network, 'aiohttp', None):
+            with self.assertRaises(ImportError):
+                AsyncHttp(self.baseurl)
+
+
+class LibNetworkTcpReactorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.server.settimeout(5)
+        self.port = self.server.getsockname()[1]
+        self.clients = []
+        self.connections = []
+        self.events = queue.Queue()
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        for conn in self.connections:
+            conn.close()
+        self.server.close()
+
+    def create_client(self, port=None, **kwargs):
+        client = Tcp_client('127.0.0.1', port or self.port, name='test', reactor=True, **kwargs)
+        client.set_callbacks(connected=lambda c: self.events.put(('connected', threading.current_thread().name)),
+                             disconnected=lambda c: self.events.put(('disconnected', threading.current_thread().name)),
+                             data_received=lambda c, msg: self.events.put(('data', msg)))
+        self.clients.append(client)
+        return client
+
+    def accept(self):
+        conn, _ = self.server.accept()
+        conn.settimeout(5)
+        self.connections.append(conn)
+        return conn
+
+    def test_timers(self):
+        reactor = Tcp_reactor()
+        reactor.start()
+        result = []
+        done = threading.Event()
+        reactor.call_later(0.1, done.set)
+        reactor.call_later(0.06, result.append, 'b')
+        reactor.call_later(0.03, result.append, 'a')
+        reactor.cancel(reactor.call_later(0.01, result.append, 'cancelled'))
+        reactor.call_soon(result.append, 'soon')
+        self.assertTrue(done.wait(5))
+        reactor.stop()
+        self.assertFalse(reactor._thread.is_alive())
+        self.assertEqual(result, ['soon', 'a', 'b'])
+
+    def test_send_receive(self):
+        client = self.create_client(terminator=b'\n', autoreconnect=False)
+        client.connect()
+        conn = self.accept()
+        self.assertEqual(self.events.get(timeout=5), ('connected', 'TCP_Reactor'))
+        conn.sendall(b'hello\nwor')
+        conn.sendall(b'ld\n')
+        self.assertEqual(self.events.get(timeout=5), ('data', 'hello'))
+        self.assertEqual(self.events.get(timeout=5), ('data', 'world'))
+        self.assertTrue(client.send('ping\n'))
+        self.assertEqual(conn.recv(100), b'ping\n')
+
+    def test_connect_retries(self):
+        # port without a listener: all connect attempts fail
+        unused = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        unused.bind(('127.0.0.1', 0))
+        port = unused.getsockname()[1]
+        unused.close()
+        aborted = threading.Event()
+        client = self.create_client(port, connect_retries=2, connect_cycle=0.05, retry_cycle=0,
+                                    retry_abort=2, abort_callback=aborted.set)
+        client.connect()
+        self.assertTrue(aborted.wait(5))
+        self.assertFalse(client.connected())
+        self.assertEqual(client._retry_round_counter, 2)
+        self.assertIsNone(client._reactor_timer)
+
+    def test_reconnect(self):
+        client = self.create_client(autoreconnect=True)
+        client.connect()
+        conn = self.accept()
+        self.assertEqual(self.events.get(timeout=5)[0], 'connected')
+        # connection closed by peer: the client reconnects
+        conn.close()
+        self.assertEqual(self.events.get(timeout=5)[0], 'disconnected')
+        conn = self.accept()
+        self.assertEqual(self.events.get(timeout=5)[0], 'connected')
+        self.assertTrue(client.connected())
+
+    def test_partial_writes(self):
+        client = self.create_client(autoreconnect=False, binary=True)
+        client.connect()
+        conn = self.accept()
+        self.assertEqual(self.events.get(timeout=5)[0], 'connected')
+        data = bytes(range(256)) * 40000
+        self.assertTrue(client.send(data))
+        self.assertTrue(client.send(b'end'))
+
+        # the peer does not read: the rest of the data stays queued
+        deadline = time.monotonic() + 5
+        while True:
+            with client._send_queue_lock:
+                pending = sum(len(message) for message in client._send_queue)
+            if pending < len(data) + 3 or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        self.assertGreater(pending, 0)
+        self.assertLess(pending, len(data) + 3)
+
+        received = bytearray()
+        while len(received) < len(data) + 3:
+            chunk = conn.recv(1024 * 1024)
+            self.assertTrue(chunk)
+            received += chunk
+        self.assertEqual(bytes(received), data + b'end')
+        with client._send_queue_lock:
+            self.assertFalse(client._send_queue)
+
+    def test_disconnect_from_foreign_thread(self):
+        client = self.create_client(autoreconnect=False)
+        client.connect()
+        conn = self.accept()
+        self.assertEqual(self.events.get(timeout=5)[0], 'connected')
+        thread = threading.Thread(target=client._reactor.call_soon, args=(client._reactor_disconnect, False))
+        thread.start()
+        thread.join()
+        # the disconnect is handled in the reactor thread
+        self.assertEqual(self.events.get(timeout=5), ('disconnected', 'TCP_Reactor'))
+        self.assertEqual(conn.recv(100), b'')
+        self.assertFalse(client.connected())
+
+    def test_stop_with_last_client(self):
+        first = self.create_client(autoreconnect=False)
+        second = self.create_client(autoreconnect=False)
+        reactor = first._reactor
+        self.assertIs(second._reactor, reactor)
+        first.connect()
+        self.accept()
+        self.assertEqual(self.events.get(timeout=5)[0], 'connected')
+
+        first.close()
+        self.assertTrue(reactor._thread.is_alive())
+        second.close()
+        self.assertFalse(reactor._thread.is_alive())
+
+        # a closed client can be connected again, a new reactor is started
+        first.connect()
+        self.accept()
+        self.assertEqual(self.events.get(timeout=5)[0], 'connected')
+        self.assertIsNot(first._reactor, reactor)
+        self.assertTrue(first._reactor._thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
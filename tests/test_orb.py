@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import unittest
+import datetime
+import logging
+from dateutil import tz
+
+import lib.orb
+
+# lib.orb logs truncated offsets with the custom loglevel NOTICE
+if not hasattr(logging.Logger, 'notice'):
+    logging.Logger.notice = logging.Logger.info
+
+
+@unittest.skipIf(lib.orb.ephem is None, "ephem is not installed")
+class LibOrbTest(unittest.TestCase):
+
+    start = datetime.datetime(2024, 3, 29, 0, 0, tzinfo=tz.gettz('Europe/Berlin'))
+
+    def assertSameEvents(self, orb, method, args):
+        cached = lib.orb.Orb(orb, '13.4', '52.5', 40)
+        uncached = lib.orb.Orb(orb, '13.4', '52.5', 40, use_cache=False)
+        for minutes in range(0, 3 * 24 * 60, 17):
+            dt = self.start + datetime.timedelta(minutes=minutes)
+            expected = getattr(uncached, method)(*args, dt=dt)
+            result = getattr(cached, method)(*args, dt=dt)
+            # the iterative search of ephem differs by a few microseconds depending on the start
+            self.assertAlmostEqual((result - expected).total_seconds(), 0, delta=0.01, msg=f"{method}{args} for dt={dt}")
+        self.assertGreater(cached.get_cache_stats()['hits'], 0)
+
+    def test_sun_rise_set(self):
+        self.assertSameEvents('sun', 'rise', (0, 0))
+        self.assertSameEvents('sun', 'set', (0, 0))
+
+    def test_sun_offsets(self):
+        self.assertSameEvents('sun', 'rise', (-6, 0))
+        self.assertSameEvents('sun', 'set', (-6, 30))
+        self.assertSameEvents('sun', 'rise', (10, -20, False))
+        # offset is truncated to the maximum elevation of the day
+        self.assertSameEvents('sun', 'set', (60, 0))
+
+    def test_sun_noon_midnight(self):
+        self.assertSameEvents('sun', 'noon', (0, 0))
+        self.assertSameEvents('sun', 'midnight', (0, 0))
+
+    def test_moon(self):
+        self.assertSameEvents('moon', 'rise', (0, 0))
+        self.assertSameEvents('moon', 'set', (-6, 30))
+
+    def test_pos_table(self):
+        sun = lib.orb.Orb('sun', '13.4', '52.5', 40)
+        uncached = lib.orb.Orb('sun', '13.4', '52.5', 40, use_cache=False)
+        # day with change to daylight saving time has 23 hours
+        table = sun.pos_table(self.start + datetime.timedelta(days=2, hours=12), step=10, degree=True)
+        self.assertEqual(len(table), 23 * 6)
+        self.assertEqual(table[0][0], self.start + datetime.timedelta(days=2))
+        for dt, azimuth, elevation in table[::7]:
+            self.assertEqual((azimuth, elevation), uncached.pos(dt=dt.astimezone(tz.tzutc()), degree=True))
+        self.assertIs(sun.pos_table(self.start + datetime.timedelta(days=2), step=10), sun.pos_table(self.start + datetime.timedelta(days=2, hours=23), step=10))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
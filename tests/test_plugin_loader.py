@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import threading
+import time
+import unittest
+from unittest import mock
+
+import lib.plugin
+from lib.plugin import Plugins
+from lib.model.smartplugin import SmartPlugin
+
+
+class MockScheduler():
+
+    def __init__(self):
+        self._scheduler = {}
+
+    def remove(self, name, from_smartplugin=False):
+        self._scheduler.pop(name, None)
+
+
+class MockSmartHome():
+
+    _base_dir = common.BASE
+    version = 'test'
+    plugins_version = 'test'
+
+    def __init__(self):
+        self.scheduler = MockScheduler()
+
+
+class FakePlugin(SmartPlugin):
+
+    def __init__(self, name, instance):
+        self.name = name
+        self.instance = instance
+        self.deinitialized = False
+
+    def get_instance_name(self):
+        return self.instance
+
+    def get_fullname(self):
+        return self.name
+
+    def deinit(self, items=[]):
+        self.deinitialized = True
+
+
+class FakeWrapper():
+    """
+    Replaces lib.plugin.PluginWrapper: 'initializes' a plugin by sleeping for args['delay'] seconds
+    """
+
+    constructed = []
+
+    def __init__(self, smarthome, name, classname, classpath, args, instance, meta, configfile):
+        self.name = name
+        self._sh = smarthome
+        # plugins registered before this constructor runs
+        self.visible = list(smarthome.plugins._plugindict.keys())
+        time.sleep(args.get('delay', 0))
+        self.plugin = FakePlugin(name, instance)
+        self._init_complete = True
+        smarthome.scheduler._scheduler['plugins.' + name + '.poll'] = {}
+        setattr(smarthome, name, self.plugin)
+        FakeWrapper.constructed.append(name)
+
+    def get_implementation(self):
+        return self.plugin
+
+
+class TestPluginLoader(unittest.TestCase):
+
+    def setUp(self):
+        self._wrapper = lib.plugin.PluginWrapper
+        lib.plugin.PluginWrapper = FakeWrapper
+        FakeWrapper.constructed = []
+        self.sh = MockSmartHome()
+        self.plugins = Plugins.__new__(Plugins)
+        self.plugins._sh = self.sh
+        self.plugins._configfile = ''
+        self.plugins._plugins = []
+        self.plugins._plugindict = {}
+        self.plugins._threads = []
+        self.plugins._register_lock = threading.Lock()
+        self.sh.plugins = self.plugins
+
+    def tearDown(self):
+        lib.plugin.PluginWrapper = self._wrapper
+
+    def job(self, section, classpath, delay=0, instance='', startorder='normal'):
+        return {'section': section, 'classname': 'Fake', 'classpath': classpath, 'args': {'delay': delay},
+                'instance': instance, 'meta': None, 'version': 'v1', 'startorder': startorder}
+
+    def test_sequential_load(self):
+        jobs = [self.job('late1', 'plugins.a', startorder='late'), self.job('early1', 'plugins.b', startorder='early'),
+                self.job('normal1', 'plugins.c')]
+        threads_early = []
+        threads_late = []
+        for job in jobs:
+            self.plugins._load_plugin(job, threads_early, threads_late)
+        # constructed in the order of the configuration, each plugin is registered before the next one is constructed
+        self.assertEqual(FakeWrapper.constructed, ['late1', 'early1', 'normal1'])
+        self.assertEqual(jobs[2]['wrapper'].visible, ['a', 'a#', 'b', 'b#'])
+        self.assertEqual([t.name for t in threads_early], ['early1'])
+        self.assertEqual([t.name for t in threads_late], ['late1'])
+
+    def test_concurrent_load(self):
+        jobs = [self.job('first', 'plugins.a', delay=0.2), self.job('second', 'plugins.a', instance='two'),
+                self.job('other', 'plugins.b', delay=0.2)]
+        start = time.monotonic()
+        self.plugins._init_plugins(jobs, 2, 5, [], [])
+        # instances of the same plugin are initialized one after the other, different plugins concurrently
+        self.assertLess(time.monotonic() - start, 0.35)
+        self.assertLess(FakeWrapper.constructed.index('first'), FakeWrapper.constructed.index('second'))
+        self.assertIn('a', jobs[1]['wrapper'].visible)
+        self.assertEqual(len(self.plugins._plugins), 3)
+
+    def test_concurrent_load_keeps_current_directory(self):
+        chdir_threads = []
+        jobs = [self.job('first', 'plugins.a'), self.job('other', 'plugins.b')]
+        with mock.patch('os.chdir', lambda path: chdir_threads.append(threading.current_thread().name)):
+            self.plugins._init_plugins(jobs, 2, 5, [], [])
+        # the process-global current directory is not changed by the initialization threads
+        self.assertEqual(chdir_threads, [])
+        self.assertEqual(len(self.plugins._plugins), 2)
+
+    def test_timeout(self):
+        jobs = [self.job('slow', 'plugins.slow', delay=0.5), self.job('fast', 'plugins.fast')]
+        self.plugins._init_plugins(jobs, 2, 0.2, [], [])
+        self.assertTrue(jobs[0]['timed_out'])
+        self.assertEqual([t.name for t in self.plugins._threads], ['fast'])
+        self.assertIsNone(self.plugins._plugindict.get('slow'))
+        # the late initialization of the timed out plugin is undone
+        time.sleep(0.5)
+        self.assertTrue(jobs[0]['wrapper'].plugin.deinitialized)
+        self.assertFalse(hasattr(self.sh, 'slow'))
+        self.assertNotIn('plugins.slow.poll', self.sh.scheduler._scheduler)
+        self.assertIn('plugins.fast.poll', self.sh.scheduler._scheduler)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import lib.shpypi
+from lib.shpypi import Shpypi
+
+
+class LibShpypiCheckCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.base = self._tmpdir.name
+        self.site_packages = os.path.join(self.base, 'site-packages')
+        os.makedirs(self.site_packages)
+        os.makedirs(os.path.join(self.base, 'lib'))
+        os.makedirs(os.path.join(self.base, 'requirements'))
+        self.requirements = os.path.join(self.base, 'lib', 'requirements.txt')
+        with open(self.requirements, 'w') as f:
+            f.write('requests>=2.20.0\n')
+
+        with mock.patch.object(lib.shpypi, '_shpypi_instance', None):
+            self.shpypi = Shpypi(base=self.base, version='1.10.0')
+        self.shpypi.req_files.sh_basedir = self.base
+
+        # only the temporary site-packages directory is part of the Python path
+        self._patchers = [mock.patch.object(sys, 'path', [self.site_packages]),
+                          mock.patch.object(self.shpypi.req_files, 'create_requirementsfile', side_effect=self.create_requirementsfile),
+                          mock.patch.object(self.shpypi, 'install_requirements', return_value=False)]
+        for patcher in self._patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self._patchers:
+            patcher.stop()
+        self._tmpdir.cleanup()
+
+    def create_requirementsfile(self, selection):
+        with open(os.path.join(self.base, 'requirements', selection + '.txt'), 'w') as f:
+            f.write('requests>=2.20.0\n')
+
+    def check_core(self, requirements_met=True):
+        with mock.patch.object(self.shpypi, 'test_requirements', return_value=requirements_met) as test_requirements:
+            result = self.shpypi.test_core_requirements(logging=False)
+        return result, test_requirements.called
+
+    def touch(self, path):
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+    def test_cache_hit(self):
+        fingerprint = self.shpypi._get_requirements_fingerprint('core')
+        self.assertEqual(self.shpypi._get_requirements_fingerprint('core'), fingerprint)
+        self.assertNotEqual(self.shpypi._get_requirements_fingerprint('base'), fingerprint)
+
+        self.assertEqual(self.check_core(), (1, True))
+        self.assertTrue(self.shpypi._is_check_valid('core', fingerprint))
+        self.assertFalse(self.shpypi._is_check_valid('base', fingerprint))
+        self.assertFalse(self.shpypi.check_timings['core'][1])
+
+        # nothing has changed: the requirements are not checked again
+        self.assertEqual(self.check_core(), (1, False))
+        self.assertTrue(self.shpypi.check_timings['core'][1])
+
+    def test_changed_requirements(self):
+        self.assertEqual(self.check_core(), (1, True))
+        fingerprint = self.shpypi._get_requirements_fingerprint('core')
+        with open(self.requirements, 'a') as f:
+            f.write('xmltodict>=0.11.0\n')
+        self.assertNotEqual(self.shpypi._get_requirements_fingerprint('core'), fingerprint)
+        self.assertEqual(self.check_core(), (1, True))
+
+        # a requirements file of a new plugin
+        os.makedirs(os.path.join(self.base, 'plugins', 'newplugin'))
+        self.assertEqual(self.check_core(), (1, True))
+        with open(os.path.join(self.base, 'plugins', 'newplugin', 'requirements.txt'), 'w') as f:
+            f.write('paho-mqtt\n')
+        self.assertEqual(self.check_core(), (1, True))
+        self.assertEqual(self.check_core(), (1, False))
+
+    def test_changed_site_packages(self):
+        self.assertEqual(self.check_core(), (1, True))
+        fingerprint = self.shpypi._get_requirements_fingerprint('core')
+        # a package has been installed, upgraded or removed
+        self.touch(self.site_packages)
+        self.assertNotEqual(self.shpypi._get_requirements_fingerprint('core'), fingerprint)
+        self.assertEqual(self.check_core(), (1, True))
+
+    def test_failed_check(self):
+        fingerprint = self.shpypi._get_requirements_fingerprint('core')
+        self.assertEqual(self.check_core(requirements_met=False), (-1, True))
+        self.assertFalse(self.shpypi._is_check_valid('core', fingerprint))
+        self.assertFalse(os.path.exists(self.shpypi._get_check_cache_filename()))
+
+        # a failed check does not invalidate the results of other selections
+        self.shpypi._set_check_valid('base', 'abc')
+        self.assertEqual(self.check_core(requirements_met=False), (-1, True))
+        self.assertTrue(self.shpypi._is_check_valid('base', 'abc'))
+        self.assertFalse(self.shpypi._is_check_valid('core', fingerprint))
+        self.assertEqual(self.check_core(requirements_met=False), (-1, True))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
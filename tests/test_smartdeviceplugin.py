@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import logging
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from lib.model.smartdeviceplugin import SmartDevicePlugin
+
+
+class MockShtime():
+
+    def now(self):
+        return datetime.now()
+
+
+class MockConnection():
+
+    def __init__(self, concurrency=1):
+        self.concurrency = concurrency
+
+    def connected(self):
+        return True
+
+    def get_concurrency(self):
+        return self.concurrency
+
+
+def _make_plugin(commands, concurrency=1):
+    """
+    Create a SmartDevicePlugin with the attributes needed for cyclic reads
+
+    :param commands: dict {<command>: (<cycle>, <next due>)}
+    """
+    plugin = SmartDevicePlugin.__new__(SmartDevicePlugin)
+    plugin.logger = logging.getLogger(__name__)
+    plugin.alive = True
+    plugin.shtime = MockShtime()
+    plugin._connection = MockConnection(concurrency)
+    plugin._commands_cyclic = {cmd: {'cycle': cycle, 'next': due} for cmd, (cycle, due) in commands.items()}
+    plugin._triggers_cyclic = {}
+    plugin._cyclic_heap = []
+    plugin._cyclic_lock = threading.Lock()
+    plugin._cyclic_pending = set()
+    plugin._cyclic_executor = None
+    plugin._cyclic_stats = {}
+    plugin.scheduled = {}
+    plugin.get_shortname = lambda: 'test'
+    plugin.scheduler_get = lambda name: name in plugin.scheduled
+    plugin.scheduler_add = lambda name, obj, prio=3, next=None: plugin.scheduled.__setitem__(name, next)
+    plugin.scheduler_change = lambda name, next=None: plugin.scheduled.__setitem__(name, next)
+    plugin.scheduler_remove = lambda name: plugin.scheduled.pop(name, None)
+    plugin.sent = []
+    plugin.send_command = lambda cmd: plugin.sent.append(cmd)
+    return plugin
+
+
+def _heap_names(plugin):
+    return sorted(entry[1] for entry in plugin._cyclic_heap)
+
+
+class LibSmartDevicePluginCyclicTest(unittest.TestCase):
+
+    def test_due_order(self):
+        now = time.time()
+        plugin = _make_plugin({'late': (10, now - 0.5), 'early': (10, now - 1), 'future': (10, now + 100)})
+        plugin._create_cyclic_scheduler()
+        self.assertIn('test_cyclic', plugin.scheduled)
+        plugin._read_cyclic_values()
+        self.assertEqual(plugin.sent, ['early', 'late'])
+        # next reads are due one cycle after the previous due time
+        self.assertAlmostEqual(plugin._commands_cyclic['early']['next'], now + 9, places=3)
+        self.assertEqual(plugin._cyclic_heap[0][1], 'early')
+        self.assertEqual(_heap_names(plugin), ['early', 'future', 'late'])
+        self.assertEqual(plugin._cyclic_pending, set())
+
+    def test_never_read(self):
+        plugin = _make_plugin({'cmd': (10, 0)})
+        plugin._create_cyclic_scheduler()
+        plugin._read_cyclic_values()
+        self.assertEqual(plugin.sent, ['cmd'])
+
+    def test_overrun(self):
+        now = time.time()
+        plugin = _make_plugin({'cmd': (1, now - 5.5)})
+        plugin._create_cyclic_scheduler()
+        plugin._read_cyclic_values()
+        # missed cycles are skipped, the next read is due in the future on the cycle grid
+        next_due = plugin._commands_cyclic['cmd']['next']
+        self.assertGreater(next_due, now)
+        self.assertLessEqual(next_due, now + 1)
+        self.assertAlmostEqual((next_due - (now - 5.5)) % 1, 0, places=3)
+        stats = plugin.get_cyclic_stats()['cmd']
+        self.assertEqual(stats['overruns'], 1)
+        self.assertEqual(stats['count'], 1)
+
+    def test_suspend_resume(self):
+        now = time.time()
+        plugin = _make_plugin({'a': (10, now - 1), 'b': (10, now - 1)}, concurrency=2)
+        release = threading.Event()
+        plugin.send_command = lambda cmd: (release.wait(5), plugin.sent.append(cmd))
+        plugin._create_cyclic_scheduler()
+        executor = plugin._cyclic_executor
+        plugin._read_cyclic_values()
+        self.assertEqual(plugin._cyclic_pending, {'a', 'b'})
+
+        # suspend while the reads are running
+        plugin._remove_cyclic_scheduler()
+        self.assertIsNone(plugin._cyclic_executor)
+        self.assertNotIn('test_cyclic', plugin.scheduled)
+        self.assertEqual(plugin._cyclic_pending, set())
+        release.set()
+        executor.shutdown(wait=True)
+        self.assertEqual(sorted(plugin.sent), ['a', 'b'])
+
+        # resume: every entry is scheduled exactly once
+        plugin._create_cyclic_scheduler()
+        self.assertEqual(_heap_names(plugin), ['a', 'b'])
+        self.assertIn('test_cyclic', plugin.scheduled)
+        plugin._remove_cyclic_scheduler()
+
+    def test_executor_removed_while_dispatching(self):
+        now = time.time()
+        plugin = _make_plugin({'a': (10, now - 1), 'b': (10, now - 1)}, concurrency=2)
+        plugin._create_cyclic_scheduler()
+        # executor has been shut down by another thread, but not yet removed
+        plugin._cyclic_executor.shutdown(wait=True)
+        plugin._read_cyclic_values()
+        self.assertEqual(plugin.sent, [])
+        self.assertEqual(plugin._cyclic_pending, set())
+        self.assertEqual(_heap_names(plugin), ['a', 'b'])
+
+    def test_concurrent(self):
+        now = time.time()
+        commands = {'cmd' + str(i): (10, now - 1) for i in range(6)}
+        plugin = _make_plugin(commands, concurrency=3)
+        threads = set()
+        lock = threading.Lock()
+
+        def send_command(cmd):
+            time.sleep(0.05)
+            with lock:
+                plugin.sent.append(cmd)
+                threads.add(threading.current_thread().name)
+
+        plugin.send_command = send_command
+        plugin._create_cyclic_scheduler()
+        executor = plugin._cyclic_executor
+        start = time.time()
+        plugin._read_cyclic_values()
+        # reads are dispatched to the executor, the scheduler thread is not blocked
+        self.assertLess(time.time() - start, 0.2)
+        executor.shutdown(wait=True)
+        self.assertEqual(sorted(plugin.sent), sorted(commands))
+        self.assertGreater(len(threads), 1)
+        self.assertTrue(all(name.startswith('test_cyclic') for name in threads))
+        self.assertEqual(_heap_names(plugin), sorted(commands))
+        self.assertEqual(plugin._cyclic_pending, set())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import tempfile
+import threading
+import unittest
+from lib.systeminfo import Systeminfo
+
+
+class LibSysteminfoCpuProfileTest(unittest.TestCase):
+
+    def test_measure_cpu_profile(self):
+        profile = Systeminfo.measure_cpu_profile()
+        for key in ['item_update', 'eval', 'json', 'dispatch']:
+            self.assertGreater(profile[key], 0)
+        self.assertIn(profile['cpu_speed_class'], ['slow', 'medium', 'fast'])
+
+    def test_classify_cpu_profile(self):
+        self.assertEqual(Systeminfo.classify_cpu_profile({'total': 35.0})[1], 'fast')
+        self.assertEqual(Systeminfo.classify_cpu_profile({'total': 300.0})[1], 'medium')
+        self.assertEqual(Systeminfo.classify_cpu_profile({'total': 2000.0})[1], 'slow')
+        profile = Systeminfo.measure_cpu_profile()
+        self.assertEqual(Systeminfo.classify_cpu_profile(profile), (profile['cpu_measured_time'], profile['cpu_speed_class']))
+
+    def test_stored_profile(self):
+        with tempfile.TemporaryDirectory() as var_dir:
+            self.assertIsNone(Systeminfo.get_cpu_speed(var_dir))
+            done = threading.Event()
+            result = []
+            Systeminfo.start_cpu_profile(var_dir, callback=lambda speed_class: (result.append(speed_class), done.set()))
+            self.assertTrue(done.wait(60))
+            self.assertEqual(Systeminfo.get_cpu_speed(var_dir), result[0])
+            self.assertIn('dispatch', Systeminfo.cpu_profile)
+
+    def test_tuning(self):
+        self.assertGreater(Systeminfo.get_tuning('fast')['scheduler_worker_warn'], Systeminfo.get_tuning('slow')['scheduler_worker_warn'])
+        # no latency is added for item updates on slow or not yet measured systems
+        self.assertEqual(Systeminfo.get_tuning('slow')['websocket_flush_interval'], 0)
+        self.assertEqual(Systeminfo.get_tuning('unknown')['websocket_flush_interval'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import threading
+import time
+import unittest
+from lib.item.timerwheel import TimerWheel
+
+
+class MockScheduler():
+
+    def __init__(self):
+        self.fired = []
+        self.event = threading.Event()
+
+    def queue_task(self, name, obj, by='Scheduler', source=None, dest=None, value=None, prio=3):
+        self.fired.append((name, time.monotonic(), value))
+        self.event.set()
+
+
+class MockSmartHome():
+
+    shtime = None
+
+    def __init__(self):
+        self.scheduler = MockScheduler()
+
+
+class LibTimerWheelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sh = MockSmartHome()
+        # small wheel (4 slots, 2 levels -> 16 ticks) to exercise cascading and overflow
+        self.wheel = TimerWheel(self.sh, tick=0.01, slot_bits=2, levels=2)
+
+    def tearDown(self):
+        self.wheel.stop()
+
+    def wait_fired(self, count, timeout=2):
+        end = time.monotonic() + timeout
+        while len(self.sh.scheduler.fired) < count and time.monotonic() < end:
+            time.sleep(0.01)
+        return [f[0] for f in self.sh.scheduler.fired]
+
+    def test_expiry_order_across_levels(self):
+        start = time.monotonic()
+        self.wheel.arm('overflow', print, 0.3, value={'value': 3})
+        self.wheel.arm('level1', print, 0.1, value={'value': 2})
+        self.wheel.arm('level0', print, 0.02, value={'value': 1})
+        self.assertEqual(self.wait_fired(3), ['level0', 'level1', 'overflow'])
+        for name, fired, value in self.sh.scheduler.fired:
+            expected = {'level0': 0.02, 'level1': 0.1, 'overflow': 0.3}[name]
+            self.assertGreaterEqual(fired - start, expected - 0.001)
+        self.assertEqual(self.wheel.get_stats()['pending'], 0)
+
+    def test_rearm_and_cancel(self):
+        self.wheel.arm('timer', print, 0.05, value={'value': 1})
+        self.wheel.arm('timer', print, 0.1, value={'value': 2})
+        self.wheel.arm('cancelled', print, 0.05)
+        self.assertTrue(self.wheel.cancel('cancelled'))
+        self.assertFalse(self.wheel.cancel('cancelled'))
+        self.assertAlmostEqual(self.wheel.remaining('timer'), 0.1, delta=0.05)
+        self.assertEqual([t['name'] for t in self.wheel.pending()], ['timer'])
+        self.assertEqual(self.wait_fired(1), ['timer'])
+        time.sleep(0.1)
+        self.assertEqual(len(self.sh.scheduler.fired), 1)
+        self.assertEqual(self.sh.scheduler.fired[0][2], {'value': 2})
+        self.assertIsNone(self.wheel.remaining('timer'))
+        stats = self.wheel.get_stats()
+        self.assertEqual((stats['armed'], stats['rearmed'], stats['cancelled'], stats['fired']), (2, 1, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
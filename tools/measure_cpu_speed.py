@@ -21,20 +21,21 @@
 #  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
 #########################################################################
 
-import timeit
 import os
 import sys
 import platform
 
-BASE = os.path.dirname(os.path.dirname(os.path.abspath(os.path.basename(__file__))))
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE)
 
-VERSION = '0.1.0'
+from lib.systeminfo import Systeminfo
+
+VERSION = '0.2.0'
 
 
 def measure():
 
-    #return round(timeit.timeit('"|".join(str(i) for i in range(99999))', number=1000), 2)
-    return round(timeit.timeit('"|".join(str(i) for i in range(50000))', number=1000), 2)
+    return Systeminfo.measure_cpu_profile()
 
 def read_cpuinfo():
 
@@ -65,7 +66,17 @@ if __name__ == '__main__':
 
     read_cpuinfo()
 
-    sys.stdout.write(f"test duration\t: ")
+    sys.stdout.write(f"measuring cpu profile ...")
     sys.stdout.flush()
-    print(f"{measure()} seconds")
+    profile = measure()
+    print()
+    print()
+    print(f"item update\t: {profile['item_update']} µs")
+    print(f"eval\t\t: {profile['eval']} µs")
+    print(f"json\t\t: {profile['json']} µs")
+    print(f"dispatch\t: {profile['dispatch']} µs")
+    print()
+    print(f"test duration\t: {profile['cpu_measured_time']} seconds (estimated from the profile)")
+    print(f"speed class\t: {profile['cpu_speed_class']}")
+    print(f"tuning\t\t: {Systeminfo.get_tuning(profile['cpu_speed_class'])}")
     print()